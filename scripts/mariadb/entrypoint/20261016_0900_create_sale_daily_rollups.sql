@@ -0,0 +1,21 @@
+-- Rollup diario de ventas por sucursal, estado, tipo de documento y medio de pago.
+-- Se mantiene incrementalmente al cerrar ventas (services/sales_rollup.py) y
+-- alimenta los reportes de ventas diarias y el dashboard sin escanear sale_documents.
+-- warehouse_id = 0 y payment_method_code = '' representan "sin valor" para que la
+-- clave primaria funcione como dimension null-safe.
+
+CREATE TABLE IF NOT EXISTS sale_daily_rollups (
+  sale_date DATE NOT NULL,
+  warehouse_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+  status VARCHAR(20) NOT NULL,
+  document_type_code VARCHAR(30) NOT NULL DEFAULT '',
+  payment_method_code VARCHAR(20) NOT NULL DEFAULT '',
+  payment_method_name VARCHAR(100) NULL,
+  document_count INT NOT NULL DEFAULT 0,
+  total_amount DECIMAL(17,2) NOT NULL DEFAULT 0.00,
+  payment_count INT NOT NULL DEFAULT 0,
+  payment_amount DECIMAL(17,2) NOT NULL DEFAULT 0.00,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (sale_date, warehouse_id, status, document_type_code, payment_method_code),
+  KEY idx_sale_daily_rollups_status_date (status, sale_date, warehouse_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,17 @@
+-- Fecha comercial persistida de la venta.
+-- Se fija una sola vez al cerrar en caja; los reportes y el dashboard filtran por ella
+-- (sargable sobre idx_sale_documents_status_business_date) en lugar de
+-- DATE(COALESCE(updated_at, created_at)), que ademas cambiaba al editar la venta.
+
+ALTER TABLE sale_documents
+  ADD COLUMN IF NOT EXISTS business_date DATE NULL AFTER status;
+
+CREATE INDEX IF NOT EXISTS idx_sale_documents_status_business_date
+  ON sale_documents (status, business_date, warehouse_id);
+
+-- updated_at = updated_at preserva la marca de tiempo original (ON UPDATE CURRENT_TIMESTAMP).
+UPDATE sale_documents
+SET business_date = DATE(COALESCE(updated_at, created_at)),
+    updated_at = updated_at
+WHERE business_date IS NULL
+  AND status IN ('CLOSED', 'CANCELLED');
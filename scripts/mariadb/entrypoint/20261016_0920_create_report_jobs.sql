@@ -0,0 +1,25 @@
+-- Cola persistida de reportes PDF generados en segundo plano (services/report_jobs.py).
+-- El PDF resultante queda en MinIO (bucket de reportes); aqui solo estado y ubicacion.
+
+CREATE TABLE IF NOT EXISTS report_jobs (
+  id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  job_code VARCHAR(36) NOT NULL UNIQUE,
+  report_key VARCHAR(60) NOT NULL,
+  params JSON NOT NULL,
+  status ENUM('PENDING','RUNNING','COMPLETED','FAILED') NOT NULL DEFAULT 'PENDING',
+  progress TINYINT UNSIGNED NOT NULL DEFAULT 0,
+  attempts INT NOT NULL DEFAULT 0,
+  requested_by_user_id BIGINT NULL,
+  chart_object_key VARCHAR(255) NULL,
+  bucket_name VARCHAR(100) NULL,
+  object_key VARCHAR(255) NULL,
+  file_name VARCHAR(255) NULL,
+  size_bytes BIGINT NULL,
+  error_message TEXT NULL,
+  started_at TIMESTAMP NULL,
+  completed_at TIMESTAMP NULL,
+  created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  INDEX idx_report_jobs_status_created (status, created_at),
+  INDEX idx_report_jobs_user_created (requested_by_user_id, created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
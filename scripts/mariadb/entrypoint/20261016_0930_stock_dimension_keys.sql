@@ -0,0 +1,55 @@
+-- Clave de dimension unica para stock y stock_unit_balances.
+-- Los indices compuestos con columnas NULL (zona, ubicacion, lote, vencimiento, serie)
+-- no garantizan unicidad en InnoDB, asi que dos transacciones podian crear dos filas
+-- para la misma dimension. dimension_key reemplaza cada NULL por '~' y se indexa UNIQUE:
+-- services/stock_ledger.py la usa para SELECT ... FOR UPDATE e INSERT ... ON DUPLICATE KEY UPDATE.
+-- La expresion debe coincidir con stock_dimension_key / unit_balance_dimension_key.
+
+ALTER TABLE stock
+  ADD COLUMN IF NOT EXISTS serial_number VARCHAR(100) NULL AFTER expiry_date;
+
+ALTER TABLE stock
+  ADD COLUMN IF NOT EXISTS dimension_key VARCHAR(400) AS (
+    CONCAT_WS('|', product_variant_id, warehouse_id,
+      IFNULL(warehouse_zone_id, '~'), IFNULL(warehouse_zone_location_id, '~'),
+      IFNULL(batch_lot_number, '~'), IFNULL(expiry_date, '~'), IFNULL(serial_number, '~'))
+  ) PERSISTENT;
+
+ALTER TABLE stock_unit_balances
+  ADD COLUMN IF NOT EXISTS dimension_key VARCHAR(400) AS (
+    CONCAT_WS('|', product_variant_id, warehouse_id,
+      IFNULL(warehouse_zone_id, '~'), IFNULL(warehouse_zone_location_id, '~'), measurement_unit_id,
+      IFNULL(batch_lot_number, '~'), IFNULL(expiry_date, '~'), IFNULL(serial_number, '~'))
+  ) PERSISTENT;
+
+-- Consolidar duplicados existentes en la fila de menor id antes de crear el indice.
+UPDATE stock s
+JOIN (
+  SELECT dimension_key, MIN(id) AS keep_id, SUM(current_quantity) AS current_quantity,
+         SUM(reserved_quantity) AS reserved_quantity
+  FROM stock GROUP BY dimension_key HAVING COUNT(*) > 1
+) d ON d.keep_id = s.id
+SET s.current_quantity = d.current_quantity, s.reserved_quantity = d.reserved_quantity;
+
+DELETE s FROM stock s
+JOIN stock k ON k.dimension_key = s.dimension_key AND k.id < s.id;
+
+UPDATE stock_unit_balances b
+JOIN (
+  SELECT dimension_key, MIN(id) AS keep_id, SUM(current_quantity) AS current_quantity
+  FROM stock_unit_balances GROUP BY dimension_key HAVING COUNT(*) > 1
+) d ON d.keep_id = b.id
+SET b.current_quantity = d.current_quantity;
+
+DELETE b FROM stock_unit_balances b
+JOIN stock_unit_balances k ON k.dimension_key = b.dimension_key AND k.id < b.id;
+
+-- uk_stock_inventory_dimensions no incluye la serie: con lote y vencimiento informados,
+-- dos series en la misma ubicacion chocarian y el ON DUPLICATE KEY sumaria sobre la fila equivocada.
+ALTER TABLE stock
+  DROP INDEX IF EXISTS uk_stock_inventory_dimensions,
+  ADD UNIQUE KEY IF NOT EXISTS uk_stock_dimension_key (dimension_key),
+  ADD INDEX IF NOT EXISTS idx_stock_variant_warehouse (product_variant_id, warehouse_id);
+
+ALTER TABLE stock_unit_balances
+  ADD UNIQUE KEY IF NOT EXISTS uk_stock_unit_balance_dimension_key (dimension_key);
@@ -0,0 +1,105 @@
+"""
+AUTENTICACION - BENCHMARK DE LA VERIFICACION EN UNA SOLA PASADA
+Requests por segundo sobre un endpoint protegido trivial (/users/bench), con
+SimpleAuthMiddleware y Redis simulado (fakeredis):
+- Antes: la dependencia vuelve a validar el token con auth_helper.validate_token
+  (busqueda del secret y verificacion de firma por segunda vez), como hacia
+  get_current_user antes de request.state.auth.
+- Despues: get_current_user reutiliza el principal que dejo el middleware.
+
+Uso (requiere fakeredis y la configuracion JWT del backend):
+  python testing/test_auth_single_pass_benchmark.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+REQUESTS = 2000
+CONCURRENCY = 20
+USER_ID = 4242
+
+
+def _build_app(dependency):
+    from fastapi import Depends, FastAPI
+
+    from middleware.main_middleware import SimpleAuthMiddleware
+
+    app = FastAPI()
+    app.add_middleware(SimpleAuthMiddleware)
+
+    @app.get("/users/bench")
+    async def bench(user: dict = Depends(dependency)):
+        return {"user_id": user["user_id"]}
+
+    return app
+
+
+async def _requests_per_second(app, token: str) -> float:
+    import httpx
+
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        # Calentamiento: imports dinamicos y scripts de Redis
+        assert (await client.get("/users/bench", headers=headers)).status_code == 200
+
+        async def worker(count: int) -> None:
+            for _ in range(count):
+                response = await client.get("/users/bench", headers=headers)
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(REQUESTS // CONCURRENCY) for _ in range(CONCURRENCY)))
+        return REQUESTS / (time.perf_counter() - started)
+
+
+async def run() -> None:
+    import fakeredis
+    from fastapi import Request
+
+    from cache.redis_client import redis_client
+    from core.constants import RedisKeys
+    from core.security import UserSecretManager, jwt_manager
+    from utils.auth_helpers import extract_bearer_token
+    from utils.permissions_utils import auth_helper, get_current_user
+
+    redis_client._redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis_client._is_available = True
+
+    user_secret = UserSecretManager.generate_user_secret()
+    await redis_client.set(RedisKeys.user_secret(USER_ID), user_secret)
+    token = jwt_manager.create_access_token(
+        user_id=USER_ID,
+        user_secret=user_secret,
+        username="bench",
+        email="bench@example.com",
+        permissions=["USER_READ"],
+    )
+
+    async def legacy_get_current_user(request: Request) -> dict:
+        result = await auth_helper.validate_token(extract_bearer_token(request))
+        assert result["valid"], result
+        return result["payload"]
+
+    before = await _requests_per_second(_build_app(legacy_get_current_user), token)
+    after = await _requests_per_second(_build_app(get_current_user), token)
+    print(
+        f"📊 Endpoint protegido trivial, {REQUESTS:,} requests ({CONCURRENCY} concurrentes): "
+        f"doble validacion {before:,.0f} req/s, una sola pasada {after:,.0f} req/s ({after / before:.2f}x)"
+    )
+    assert after > before
+
+
+def test_auth_single_pass_benchmark():
+    import pytest
+    pytest.importorskip("fakeredis")
+    from core.config import settings
+    if not settings.JWT_ALGORITHM:
+        pytest.skip("Requiere la configuracion JWT del backend (JWT_ALGORITHM)")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
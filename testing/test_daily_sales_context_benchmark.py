@@ -0,0 +1,200 @@
+"""
+REPORTES - BENCHMARK DEL CONTEXTO DE VENTAS DIARIAS
+Compara, sobre un dataset sintetico de 1M tickets, las seis consultas secuenciales
+que armaban el contexto del PDF de ventas diarias (agregando sale_documents con
+DATE(COALESCE(updated_at, created_at)) y parseando payment_details en Python)
+contra el scan unico de routes.reports._daily_rollup_rows sobre sale_daily_rollups.
+
+- Crea un schema de pruebas (BENCH_SCHEMA, por defecto gestioncom_bench) con las
+  tablas copiadas de la base real y lo borra al terminar.
+- Genera los tickets con la tabla de secuencias de MariaDB (seq_1_to_N).
+- Comprueba que ambos caminos den los mismos totales por dia antes de medir.
+
+Uso (dentro del contenedor backend-api o con las variables MYSQL_* cargadas):
+  REPORTS_BENCHMARK=1 [BENCH_TICKETS=1000000] [BENCH_DAYS=90] python testing/test_daily_sales_context_benchmark.py
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+from sqlalchemy import text  # noqa: E402
+
+TICKETS = int(os.getenv("BENCH_TICKETS") or "1000000")
+DAYS = int(os.getenv("BENCH_DAYS") or "90")
+SCHEMA = os.getenv("BENCH_SCHEMA") or "gestioncom_bench"
+ROUNDS = 3
+DATASET_END = date(2026, 6, 30)
+
+# Consultas del contexto antes del rollup (misma forma que en routes/reports.py)
+_LEGACY_DAILY = """
+    SELECT DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
+           COALESCE(SUM(sd.total_amount), 0) AS total, COUNT(*) AS txn
+    FROM sale_documents sd
+    WHERE sd.deleted_at IS NULL AND sd.status = 'CLOSED'
+      AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+    GROUP BY sale_date ORDER BY sale_date
+"""
+_LEGACY_CANCELLED = """
+    SELECT DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date, COUNT(*) AS cancelled
+    FROM sale_documents sd
+    WHERE sd.deleted_at IS NULL AND sd.status = 'CANCELLED'
+      AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+    GROUP BY sale_date
+"""
+_LEGACY_PAYMENTS = """
+    SELECT DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
+           sd.id, sd.payment_method_name, sd.payment_method_code,
+           sd.amount_tendered, sd.change_amount, sd.payment_details, sd.total_amount
+    FROM sale_documents sd
+    WHERE sd.deleted_at IS NULL AND sd.status = 'CLOSED'
+      AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+"""
+_LEGACY_PREV_AGG = """
+    SELECT COALESCE(SUM(sd.total_amount), 0) AS total, COUNT(*) AS txn
+    FROM sale_documents sd
+    WHERE sd.deleted_at IS NULL AND sd.status = 'CLOSED'
+      AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+"""
+_LEGACY_PREV_CANCELLED = """
+    SELECT COUNT(*) AS cancelled FROM sale_documents sd
+    WHERE sd.deleted_at IS NULL AND sd.status = 'CANCELLED'
+      AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+"""
+
+
+async def _create_dataset(session, source_schema: str) -> None:
+    await session.execute(text(f"DROP DATABASE IF EXISTS {SCHEMA}"))
+    await session.execute(text(f"CREATE DATABASE {SCHEMA}"))
+    for table in ("sale_documents", "sale_daily_rollups", "warehouses"):
+        await session.execute(text(f"CREATE TABLE {SCHEMA}.{table} LIKE {source_schema}.{table}"))
+    await session.execute(text(f"USE {SCHEMA}"))
+
+    # Un año de tickets: 90% cerrados, 5% anulados, 5% pendientes; 5 sucursales
+    await session.execute(text(f"""
+        INSERT INTO sale_documents (
+          sale_code, status, business_date, document_type_code, document_type_name, warehouse_id,
+          payment_method_code, payment_method_name, amount_tendered, change_amount, total_amount,
+          subtotal_amount, line_discount_amount, document_discount_type, document_discount_value,
+          document_discount_amount, agreement_discount_amount, tax_amount, created_at, updated_at
+        )
+        SELECT
+          CONCAT('BENCH-', seq),
+          CASE WHEN seq % 20 = 0 THEN 'CANCELLED' WHEN seq % 20 = 1 THEN 'PENDING_CASHIER' ELSE 'CLOSED' END,
+          DATE_SUB(:dataset_end, INTERVAL seq % 365 DAY),
+          'TICKET', 'Ticket de venta', 1 + seq % 5,
+          ELT(1 + seq % 4, 'CASH', 'DEBIT', 'CREDIT', 'TRANSFER'), NULL,
+          1000 + seq % 50000, 0, 1000 + seq % 50000,
+          1000 + seq % 50000, 0, 'NONE', 0, 0, 0, 0,
+          TIMESTAMP(DATE_SUB(:dataset_end, INTERVAL seq % 365 DAY), '12:00:00'),
+          TIMESTAMP(DATE_SUB(:dataset_end, INTERVAL seq % 365 DAY), '12:00:00')
+        FROM seq_1_to_{TICKETS}
+    """), {"dataset_end": DATASET_END})
+
+    # Mismo contenido que dejaria rebuild_sales_rollup (sin pagos MIXED en el dataset)
+    await session.execute(text("""
+        INSERT INTO sale_daily_rollups (
+          sale_date, warehouse_id, status, document_type_code, payment_method_code,
+          payment_method_name, document_count, total_amount, payment_count, payment_amount
+        )
+        SELECT
+          business_date, warehouse_id, status, document_type_code, payment_method_code, NULL,
+          COUNT(*), SUM(total_amount),
+          SUM(status = 'CLOSED'), SUM(CASE WHEN status = 'CLOSED' THEN amount_tendered - change_amount ELSE 0 END)
+        FROM sale_documents
+        WHERE status IN ('CLOSED', 'CANCELLED')
+        GROUP BY business_date, warehouse_id, status, document_type_code, payment_method_code
+    """))
+
+
+async def _legacy_context(session, start: date, end: date, prev_start: date, prev_end: date) -> dict:
+    from routes.reports import _money, _payment_amount, _payment_details, _row, _rows
+
+    current = {"date_from": start, "date_to": end}
+    previous = {"date_from": prev_start, "date_to": prev_end}
+    daily = _rows(await session.execute(text(_LEGACY_DAILY), current))
+    _rows(await session.execute(text(_LEGACY_CANCELLED), current))
+    payments = _rows(await session.execute(text(_LEGACY_PAYMENTS), current))
+    _row(await session.execute(text(_LEGACY_PREV_AGG), previous))
+    _row(await session.execute(text(_LEGACY_PREV_CANCELLED), previous))
+    _rows(await session.execute(text(_LEGACY_DAILY), previous))
+
+    by_method: dict = {}
+    for row in payments:
+        details = _payment_details(row.get("payment_details"))
+        if isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED":
+            for payment in details.get("payments") or []:
+                code = payment.get("payment_method_code")
+                by_method[code] = by_method.get(code, 0.0) + _payment_amount(payment)
+        else:
+            received = _money(row.get("amount_tendered") or row.get("total_amount")) - _money(row.get("change_amount"))
+            code = row.get("payment_method_code")
+            by_method[code] = by_method.get(code, 0.0) + received
+    return {row["sale_date"].isoformat(): round(_money(row["total"]), 2) for row in daily}
+
+
+async def _rollup_context(session, start: date, end: date, prev_start: date) -> dict:
+    from routes.reports import _daily_rollup_rows, _money
+
+    totals: dict = {}
+    for row in await _daily_rollup_rows(session, prev_start, end, []):
+        if row["sale_date"] >= start:
+            iso = row["sale_date"].isoformat()
+            totals[iso] = round(totals.get(iso, 0.0) + _money(row["total"]), 2)
+    return {iso: total for iso, total in totals.items() if total}
+
+
+async def _timed(label: str, factory) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        await factory()
+        best = min(best, time.perf_counter() - started)
+    print(f"   {label:<28} {best * 1000:10.1f} ms")
+    return best
+
+
+async def run() -> None:
+    from database.database import db_manager
+
+    end = DATASET_END
+    start = end - timedelta(days=DAYS - 1)
+    prev_end = start - timedelta(days=1)
+    prev_start = prev_end - timedelta(days=DAYS - 1)
+
+    db_manager.initialize()
+    try:
+        async with db_manager.get_async_session() as session:
+            source_schema = (await session.execute(text("SELECT DATABASE()"))).scalar_one()
+            try:
+                print(f"⏳ Generando {TICKETS:,} tickets en {SCHEMA}...")
+                await _create_dataset(session, source_schema)
+
+                legacy = await _legacy_context(session, start, end, prev_start, prev_end)
+                rollup = await _rollup_context(session, start, end, prev_start)
+                assert legacy == rollup, "los totales por dia del rollup no coinciden con sale_documents"
+
+                print(f"📊 Contexto de ventas diarias, {DAYS} dias sobre {TICKETS:,} tickets (mejor de {ROUNDS}):")
+                legacy_time = await _timed("6 consultas sobre tickets", lambda: _legacy_context(session, start, end, prev_start, prev_end))
+                rollup_time = await _timed("1 scan sobre el rollup", lambda: _rollup_context(session, start, end, prev_start))
+                print(f"✅ {legacy_time / rollup_time:.1f}x mas rapido")
+            finally:
+                await session.execute(text(f"USE {source_schema}"))
+                await session.execute(text(f"DROP DATABASE IF EXISTS {SCHEMA}"))
+    finally:
+        await db_manager.close()
+
+
+def test_daily_sales_context_benchmark():
+    if not os.getenv("REPORTS_BENCHMARK"):
+        import pytest
+        pytest.skip("Requiere MariaDB y REPORTS_BENCHMARK=1")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
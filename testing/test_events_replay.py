@@ -0,0 +1,139 @@
+"""
+EVENTS ORCHESTRATOR - REPLAY AL RECONECTAR EL STREAM SSE
+Con un Redis simulado (fakeredis) se abre /events/stream, se recibe un evento y se
+corta la conexion. Mientras esta caida se publican dos eventos al usuario:
+- reconectando con last_event_id (el ultimo id recibido, como hace sseCoordinator.js)
+  llegan los dos eventos perdidos y en orden;
+- reconectando sin last_event_id no llega ninguno.
+
+Uso (requiere fakeredis):
+  python testing/test_events_replay.py
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "events-orchestrator"))
+
+USER_ID = 7
+READ_TIMEOUT_SECONDS = 2
+
+
+class _ConnectedRequest:
+    async def is_disconnected(self) -> bool:
+        return False
+
+
+def _parse(chunk: str) -> dict:
+    fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines())
+    return {"id": fields.get("id"), "data": json.loads(fields["data"])}
+
+
+async def _next(response) -> dict:
+    return _parse(await asyncio.wait_for(response.body_iterator.__anext__(), READ_TIMEOUT_SECONDS))
+
+
+async def _publish(publisher, main, name: str) -> None:
+    event = {
+        "type": "user.v1.test",
+        "payload": {"name": name},
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await publisher.xadd(main.user_stream(USER_ID), {"event": json.dumps(event)})
+
+
+async def _open(main, last_event_id=None):
+    return await main.stream_events(
+        request=_ConnectedRequest(),
+        ticket="ticket",
+        token=None,
+        client_id="tab-1",
+        last_event_id=last_event_id,
+        last_event_id_header=None,
+    )
+
+
+async def run() -> dict:
+    import fakeredis
+
+    # Fuera de docker compose el .env del orquestador trae placeholders vacios
+    for name, default in (("EVENTS_ORCHESTRATOR_PORT_INTERNAL", "8040"), ("REDIS_PORT", "6379"), ("REDIS_DB", "0")):
+        if not os.getenv(name):
+            os.environ[name] = default
+
+    import main
+    from connection_registry import ConnectionRegistry
+    from schemas import AuthenticatedUser
+    from stream_hub import SLOW_CONSUMER_DISCONNECT, StreamHub
+
+    async def validate_sse_ticket(ticket: str) -> AuthenticatedUser:
+        return AuthenticatedUser(user_id=USER_ID, username="prueba")
+
+    original_validate = main.validate_sse_ticket
+    server = fakeredis.FakeServer()
+    main.redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    publisher = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    main.validate_sse_ticket = validate_sse_ticket
+    main.stream_hub = StreamHub(
+        main.prepare_stream_message,
+        block_ms=50,
+        read_count=100,
+        client_buffer=100,
+        slow_consumer_policy=SLOW_CONSUMER_DISCONNECT,
+    )
+    main.stream_hub.start(main.redis_client)
+    main.connection_registry = ConnectionRegistry(main.connection_key, ttl_seconds=90, max_per_user=3)
+    main.connection_registry.start(main.redis_client)
+    try:
+        first = await _open(main)
+        assert (await _next(first))["data"]["payload"]["connected"]
+        # Que el lector del hub tome el stream antes de publicar
+        await asyncio.sleep(0.2)
+        await _publish(publisher, main, "antes del corte")
+        received = await _next(first)
+        assert received["data"]["payload"]["name"] == "antes del corte"
+        last_event_id = received["id"]
+        await first.on_close()
+
+        await _publish(publisher, main, "perdido 1")
+        await _publish(publisher, main, "perdido 2")
+
+        resumed = await _open(main, last_event_id=last_event_id)
+        hello = await _next(resumed)
+        replayed = [(await _next(resumed))["data"]["payload"]["name"] for _ in range(hello["data"]["payload"]["replayed"])]
+        await resumed.on_close()
+
+        fresh = await _open(main)
+        fresh_hello = await _next(fresh)
+        await fresh.on_close()
+        return {"replayed": replayed, "without_cursor": fresh_hello["data"]["payload"]["replayed"]}
+    finally:
+        await main.stream_hub.stop()
+        await main.connection_registry.stop()
+        await main.redis_client.aclose()
+        await publisher.aclose()
+        main.validate_sse_ticket = original_validate
+
+
+def _check(result: dict) -> None:
+    print(
+        f"📊 reconexion con last_event_id: {len(result['replayed'])} eventos reenviados; "
+        f"sin last_event_id: {result['without_cursor']}"
+    )
+    assert result["replayed"] == ["perdido 1", "perdido 2"]
+    assert result["without_cursor"] == 0
+
+
+def test_reconnect_with_last_event_id_replays_missed_events():
+    import pytest
+
+    pytest.importorskip("fakeredis")
+    _check(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    _check(asyncio.run(run()))
+    print("✅ Los eventos publicados durante el corte llegan al reconectar")
@@ -0,0 +1,154 @@
+"""
+CLIENTE GOTENBERG - PRUEBAS CONTRA UN GOTENBERG SIMULADO
+- httpx.MockTransport: conversion exitosa con el multipart esperado, cache por
+  contenido, conversiones identicas concurrentes compartidas, 5xx y timeout como
+  GotenbergUnavailable y 4xx como GotenbergError.
+- Servidor HTTP local minimo: varias conversiones secuenciales reutilizan la misma
+  conexion TCP (keep-alive).
+
+Corre sin servicios externos:
+  python testing/test_gotenberg_client.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+import httpx  # noqa: E402
+
+from services.gotenberg_client import GotenbergClient, GotenbergError, GotenbergUnavailable  # noqa: E402
+
+PDF = b"%PDF-1.4 prueba"
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_convert_success_and_content_cache():
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await request.aread()
+        return httpx.Response(200, content=PDF)
+
+    async def scenario():
+        client = GotenbergClient(transport=httpx.MockTransport(handler))
+        try:
+            html = "<html><body>Reporte</body></html>"
+            assert await client.html_to_pdf(html) == PDF
+            assert await client.html_to_pdf(html) == PDF
+            return client.stats()
+        finally:
+            await client.close()
+
+    stats = _run(scenario())
+    assert len(requests) == 1, "la segunda exportacion identica debe salir del cache"
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+    request = requests[0]
+    assert request.url.path == "/forms/chromium/convert/html"
+    body = request.content
+    assert request.headers["Content-Length"] == str(len(body))
+    boundary = request.headers["Content-Type"].split("boundary=")[1]
+    assert body.startswith(f"--{boundary}\r\n".encode())
+    assert b'filename="index.html"' in body
+    assert b"<html><body>Reporte</body></html>" in body
+    assert body.endswith(f"\r\n--{boundary}--\r\n".encode())
+
+
+def test_concurrent_identical_exports_share_one_conversion():
+    calls = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, content=PDF)
+
+    async def scenario():
+        client = GotenbergClient(transport=httpx.MockTransport(handler))
+        try:
+            return await asyncio.gather(*(client.html_to_pdf("<p>mismo</p>") for _ in range(10)))
+        finally:
+            await client.close()
+
+    assert _run(scenario()) == [PDF] * 10
+    assert calls == 1
+
+
+def test_server_error_and_timeout_are_unavailable():
+    async def server_error(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503, text="reiniciando")
+
+    async def timeout(request: httpx.Request) -> httpx.Response:
+        raise httpx.ReadTimeout("sin respuesta", request=request)
+
+    async def bad_request(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(400, text="html invalido")
+
+    async def convert(handler) -> Exception:
+        client = GotenbergClient(transport=httpx.MockTransport(handler))
+        try:
+            await client.html_to_pdf("<p>error</p>")
+        except GotenbergError as exc:
+            return exc
+        finally:
+            await client.close()
+        raise AssertionError("se esperaba un error de Gotenberg")
+
+    assert isinstance(_run(convert(server_error)), GotenbergUnavailable)
+    assert isinstance(_run(convert(timeout)), GotenbergUnavailable)
+    error = _run(convert(bad_request))
+    assert isinstance(error, GotenbergError) and not isinstance(error, GotenbergUnavailable)
+
+
+def test_keep_alive_reuses_connection():
+    async def scenario():
+        connections = 0
+
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            nonlocal connections
+            connections += 1
+            try:
+                while True:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                    length = 0
+                    for line in head.decode("latin-1").split("\r\n"):
+                        if line.lower().startswith("content-length:"):
+                            length = int(line.split(":", 1)[1])
+                    await reader.readexactly(length)
+                    writer.write(
+                        b"HTTP/1.1 200 OK\r\nContent-Type: application/pdf\r\n"
+                        + f"Content-Length: {len(PDF)}\r\n\r\n".encode() + PDF
+                    )
+                    await writer.drain()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = GotenbergClient()
+        client.base_url = f"http://127.0.0.1:{port}"
+        try:
+            for index in range(5):
+                assert await client.html_to_pdf(f"<p>reporte {index}</p>") == PDF
+        finally:
+            await client.close()
+            server.close()
+            await server.wait_closed()
+        return connections
+
+    assert _run(scenario()) == 1
+
+
+if __name__ == "__main__":
+    test_convert_success_and_content_cache()
+    test_concurrent_identical_exports_share_one_conversion()
+    test_server_error_and_timeout_are_unavailable()
+    test_keep_alive_reuses_connection()
+    print("✅ Cliente Gotenberg: conversion, cache, errores y keep-alive")
@@ -0,0 +1,202 @@
+"""
+CACHE L1 - PRUEBA DE PROPAGACION ENTRE WORKERS
+Dos procesos con su propio L1 contra el Redis real del entorno:
+
+- El "worker" arranca LocalCacheInvalidator, carga un user secret en su L1 y espera.
+- El proceso principal borra la key en Redis e invalida con
+  user_cache_service.invalidate_user_secret, igual que la API.
+- El worker debe ver su L1 vaciado y, al recargar, no debe encontrar el valor viejo.
+- Blacklist: varios workers cachean "no revocado" para un token por el camino del
+  middleware; el proceso principal lo revoca y cada worker debe rechazarlo antes
+  de que venza el TTL negativo del L1.
+- Sin Redis: una invalidacion que llega mientras se lee la fuente impide guardar
+  en el L1 el valor leido.
+
+Uso (dentro del contenedor backend-api o con las variables REDIS_* cargadas):
+  LOCAL_CACHE_TEST=1 python testing/test_local_cache_propagation.py
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api")
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_USER_ID = 987654321
+TEST_JTI = "l1-propagation-test-jti"
+BLACKLIST_WORKERS = 3
+PROPAGATION_TIMEOUT_SECONDS = 5
+
+
+def _worker(ready, invalidated, result) -> None:
+    sys.path.insert(0, BACKEND_DIR)
+
+    from cache.local_cache import local_cache_invalidator, user_secret_l1
+    from cache.redis_client import close_redis, initialize_redis
+
+    async def run():
+        await initialize_redis()
+        local_cache_invalidator.start()
+        for _ in range(50):
+            if local_cache_invalidator.active:
+                break
+            await asyncio.sleep(0.1)
+        user_secret_l1.set(str(TEST_USER_ID), "secret-viejo")
+        ready.set()
+
+        await asyncio.get_running_loop().run_in_executor(None, invalidated.wait, PROPAGATION_TIMEOUT_SECONDS)
+        for _ in range(PROPAGATION_TIMEOUT_SECONDS * 10):
+            if user_secret_l1.get(str(TEST_USER_ID)) is None:
+                break
+            await asyncio.sleep(0.1)
+        result.put(user_secret_l1.get(str(TEST_USER_ID)))
+        await local_cache_invalidator.stop()
+        await close_redis()
+
+    asyncio.run(run())
+
+
+def _blacklist_worker(ready, revoked, result) -> None:
+    sys.path.insert(0, BACKEND_DIR)
+
+    from cache.local_cache import blacklist_l1, blacklist_l1_key, local_cache_invalidator
+    from cache.redis_client import close_redis, initialize_redis
+    from middleware.auth_middleware import _load_token_state
+
+    async def run():
+        await initialize_redis()
+        local_cache_invalidator.start()
+        for _ in range(50):
+            if local_cache_invalidator.active:
+                break
+            await asyncio.sleep(0.1)
+        blacklisted, _secret = await _load_token_state(TEST_JTI, TEST_USER_ID)
+        cached = blacklist_l1.get(blacklist_l1_key(TEST_JTI, TEST_USER_ID))
+        ready.put((blacklisted, cached))
+
+        await asyncio.get_running_loop().run_in_executor(None, revoked.wait, PROPAGATION_TIMEOUT_SECONDS)
+        for _ in range(PROPAGATION_TIMEOUT_SECONDS * 10):
+            blacklisted, _secret = await _load_token_state(TEST_JTI, TEST_USER_ID)
+            if blacklisted:
+                break
+            await asyncio.sleep(0.1)
+        result.put(blacklisted)
+        await local_cache_invalidator.stop()
+        await close_redis()
+
+    asyncio.run(run())
+
+
+async def _invalidate() -> None:
+    from cache.redis_client import close_redis, initialize_redis
+    from cache.services.user_cache import user_cache_service
+
+    await initialize_redis()
+    await user_cache_service.invalidate_user_secret(TEST_USER_ID)
+    await close_redis()
+
+
+def run() -> None:
+    context = multiprocessing.get_context("spawn")
+    ready, invalidated, result = context.Event(), context.Event(), context.Queue()
+    worker = context.Process(target=_worker, args=(ready, invalidated, result))
+    worker.start()
+    try:
+        assert ready.wait(10), "el worker no llego a suscribirse"
+        asyncio.run(_invalidate())
+        invalidated.set()
+        value = result.get(timeout=PROPAGATION_TIMEOUT_SECONDS + 5)
+        assert value is None, f"el L1 del otro worker conserva {value!r}"
+        print("✅ Invalidacion de user secret propagada al L1 de otro proceso")
+    finally:
+        worker.join(10)
+        if worker.is_alive():
+            worker.terminate()
+
+
+async def _set_user_secret(value: str) -> None:
+    from cache.redis_client import close_redis, initialize_redis, redis_client
+    from core.constants import RedisKeys
+
+    await initialize_redis()
+    await redis_client.set(RedisKeys.user_secret(TEST_USER_ID), value, ex=60)
+    await close_redis()
+
+
+async def _revoke() -> None:
+    from cache.redis_client import close_redis, initialize_redis
+    from cache.services.blacklist_service import blacklist_service
+
+    await initialize_redis()
+    assert await blacklist_service.blacklist_token(TEST_JTI, "LOGOUT", TEST_USER_ID)
+    await close_redis()
+
+
+async def _cleanup_blacklist() -> None:
+    from cache.redis_client import close_redis, initialize_redis
+    from cache.services.blacklist_service import blacklist_service
+
+    await initialize_redis()
+    await blacklist_service.remove_from_blacklist(TEST_JTI, TEST_USER_ID)
+    await close_redis()
+
+
+def run_blacklist() -> None:
+    asyncio.run(_cleanup_blacklist())
+    asyncio.run(_set_user_secret("secret-de-prueba"))
+    context = multiprocessing.get_context("spawn")
+    ready, revoked, result = context.Queue(), context.Event(), context.Queue()
+    workers = [context.Process(target=_blacklist_worker, args=(ready, revoked, result)) for _ in range(BLACKLIST_WORKERS)]
+    for worker in workers:
+        worker.start()
+    try:
+        for _ in workers:
+            blacklisted, cached = ready.get(timeout=15)
+            assert blacklisted is False and cached is False, "el worker no cacheo el token como vigente"
+        asyncio.run(_revoke())
+        revoked.set()
+        outcomes = [result.get(timeout=PROPAGATION_TIMEOUT_SECONDS + 5) for _ in workers]
+        assert all(outcomes), f"algun worker sigue aceptando el token revocado: {outcomes}"
+        print(f"✅ Token revocado rechazado en los {BLACKLIST_WORKERS} workers")
+    finally:
+        for worker in workers:
+            worker.join(10)
+            if worker.is_alive():
+                worker.terminate()
+        asyncio.run(_cleanup_blacklist())
+
+
+def test_l1_set_skipped_after_concurrent_invalidation():
+    from cache.local_cache import LocalTTLCache
+
+    cache = LocalTTLCache("prueba", max_entries=10, ttl_seconds=60)
+    version = cache.version
+    # Llega la invalidacion mientras se lee Redis/BD (la key aun no estaba en el L1)
+    cache.delete("42")
+    cache.set("42", "secret-viejo", version=version)
+    assert cache.get("42") is None and cache.stale_sets == 1
+
+    version = cache.version
+    cache.set("42", "secret-nuevo", version=version)
+    assert cache.get("42") == "secret-nuevo"
+
+
+def test_local_cache_propagation():
+    if not os.getenv("LOCAL_CACHE_TEST"):
+        import pytest
+        pytest.skip("Requiere Redis y LOCAL_CACHE_TEST=1")
+    run()
+
+
+def test_blacklist_propagation_to_every_worker():
+    if not os.getenv("LOCAL_CACHE_TEST"):
+        import pytest
+        pytest.skip("Requiere Redis y LOCAL_CACHE_TEST=1")
+    run_blacklist()
+
+
+if __name__ == "__main__":
+    run()
+    run_blacklist()
@@ -0,0 +1,71 @@
+"""
+ACCESOS A MENUS - VOLCADO PARCIAL E INDICE POR USUARIO
+Con un Redis simulado (fakeredis) y el INSERT reemplazado por una BD en memoria:
+- Un lote con una fila que viola integridad y un error transitorio a mitad de la
+  biseccion: lo ya insertado no se reencola (sin duplicados), la fila mala va a
+  menu_access:dead y el siguiente volcado escribe solo lo que faltaba.
+- pending_for_user lee el indice del usuario y se vacia a medida que se escribe.
+
+Uso (requiere fakeredis):
+  python testing/test_menu_access_recorder.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+BAD_MENU_ID = 3
+FLAKY_MENU_ID = 6
+
+
+async def run() -> None:
+    import fakeredis
+    from sqlalchemy.exc import IntegrityError, OperationalError
+
+    from cache.redis_client import redis_client
+    from services.menu_access_recorder import MENU_ACCESS_DEAD_KEY, MENU_ACCESS_QUEUE_KEY, MenuAccessRecorder
+
+    redis_client._redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis_client._is_available = True
+    recorder = MenuAccessRecorder(flush_seconds=10, batch_size=8, max_queue=100)
+
+    database = []
+    failed_once = []
+
+    async def insert_events(events):
+        if any(event["menu_item_id"] == BAD_MENU_ID for event in events):
+            raise IntegrityError("INSERT", {}, Exception("menu_item_id inexistente"))
+        if any(event["menu_item_id"] == FLAKY_MENU_ID for event in events) and len(events) < 8 and not failed_once:
+            failed_once.append(True)
+            raise OperationalError("INSERT", {}, Exception("conexion perdida"))
+        database.extend(events)
+
+    recorder._insert_events = insert_events
+    for menu_id in range(8):
+        await recorder.record(7 if menu_id % 2 else 9, menu_id, None, None, None)
+    assert len(await recorder.pending_for_user(7)) == len(await recorder.pending_for_user(9)) == 4
+
+    # Primer volcado: se corta por el error transitorio despues de escribir 0, 1 y 2
+    assert await recorder.flush() == 3
+    requeued = await redis_client.lrange(MENU_ACCESS_QUEUE_KEY)
+    assert [event["menu_item_id"] for event in requeued] == [4, 5, 6, 7]
+    assert sorted(event["menu_item_id"] for event in await recorder.pending_for_user(7)) == [5, 7]
+    assert sorted(event["menu_item_id"] for event in await recorder.pending_for_user(9)) == [4, 6]
+
+    # Segundo volcado: solo lo que faltaba
+    assert await recorder.flush() == 4
+    assert sorted(event["menu_item_id"] for event in database) == [0, 1, 2, 4, 5, 6, 7]
+    assert [event["menu_item_id"] for event in await redis_client.lrange(MENU_ACCESS_DEAD_KEY)] == [BAD_MENU_ID]
+    assert await recorder.pending_for_user(7) == [] and await recorder.pending_for_user(9) == []
+    print(f"✅ Volcado parcial sin duplicados: {recorder.stats()}")
+
+
+def test_partial_flush_requeues_only_remaining():
+    import pytest
+    pytest.importorskip("fakeredis")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,127 @@
+"""
+POOL DE BCRYPT - LATENCIA DEL LOOP DURANTE LOGINS Y RECUPERACION DEL POOL
+- Benchmark: p99 de un endpoint ajeno (/ping) mientras llegan 50 logins
+  concurrentes, con bcrypt en el event loop (antes) y en PasswordHashPool (despues).
+- Si muere un proceso hijo, el pool roto se cierra (shutdown) y se reemplaza.
+
+Corre sin servicios externos:
+  python testing/test_password_pool.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+import bcrypt  # noqa: E402
+
+from core.password_pool import PasswordHashPool, bcrypt_check, bcrypt_hash  # noqa: E402
+
+LOGINS = 50
+# Menos rondas que en produccion (12) para que el benchmark dure segundos
+BCRYPT_ROUNDS = int(os.getenv("BENCH_BCRYPT_ROUNDS") or "10")
+PING_INTERVAL_SECONDS = 0.005
+PASSWORD = b"Clave-Segura-123"
+
+
+def _build_app(pool):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+    password_hash = bcrypt.hashpw(PASSWORD, bcrypt.gensalt(rounds=BCRYPT_ROUNDS))
+
+    @app.post("/auth/login")
+    async def login():
+        if pool is None:
+            valid = bcrypt.checkpw(PASSWORD, password_hash)
+        else:
+            valid = await pool.run(bcrypt_check, PASSWORD, password_hash)
+        return {"valid": valid}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+async def _ping_p99_during_logins(pool) -> tuple:
+    import httpx
+
+    app = _build_app(pool)
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        logins = [asyncio.create_task(client.post("/auth/login")) for _ in range(LOGINS)]
+        # Latencia desde el momento programado de cada ping: si el loop estuvo
+        # bloqueado, los pings atrasados cuentan toda la espera
+        finished = []
+        done = asyncio.gather(*logins)
+        done.add_done_callback(lambda _: finished.append(time.perf_counter()))
+        started = time.perf_counter()
+        index = 0
+        while True:
+            scheduled = started + index * PING_INTERVAL_SECONDS
+            if finished and scheduled > finished[0]:
+                break
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            assert (await client.get("/ping")).status_code == 200
+            latencies.append(time.perf_counter() - scheduled)
+            index += 1
+        responses = await done
+    assert all(response.json()["valid"] for response in responses)
+    return statistics.quantiles(latencies, n=100)[98], len(latencies)
+
+
+async def _benchmark() -> tuple:
+    inline_p99, inline_pings = await _ping_p99_during_logins(None)
+
+    pool = PasswordHashPool(workers=2, max_queue=LOGINS)
+    pool.start()
+    try:
+        pooled_p99, pooled_pings = await _ping_p99_during_logins(pool)
+    finally:
+        pool.shutdown()
+
+    print(
+        f"📊 p99 de /ping durante {LOGINS} logins concurrentes (bcrypt {BCRYPT_ROUNDS} rondas): "
+        f"en el loop {inline_p99 * 1000:.1f} ms ({inline_pings} pings), "
+        f"en el pool {pooled_p99 * 1000:.1f} ms ({pooled_pings} pings)"
+    )
+    return inline_p99, pooled_p99
+
+
+async def _broken_pool_is_replaced() -> None:
+    pool = PasswordHashPool(workers=1, max_queue=0)
+    try:
+        password_hash = await pool.run(bcrypt_hash, PASSWORD, 4)
+        broken = pool._executor
+        shutdown_calls = []
+        original_shutdown = broken.shutdown
+        broken.shutdown = lambda *args, **kwargs: (shutdown_calls.append(kwargs), original_shutdown(*args, **kwargs))
+        for process in list(broken._processes.values()):
+            process.kill()
+        await asyncio.sleep(0.5)
+
+        assert await pool.run(bcrypt_check, PASSWORD, password_hash) is True
+        assert pool.restarts == 1
+        assert pool._executor is not broken
+        assert shutdown_calls == [{"wait": False, "cancel_futures": True}], "el pool roto no se cerro"
+    finally:
+        pool.shutdown()
+
+
+def test_password_pool_keeps_loop_responsive():
+    inline_p99, pooled_p99 = asyncio.run(_benchmark())
+    assert pooled_p99 < inline_p99
+
+
+def test_broken_pool_is_shut_down_and_replaced():
+    asyncio.run(_broken_pool_is_replaced())
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
+    asyncio.run(_broken_pool_is_replaced())
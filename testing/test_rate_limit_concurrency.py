@@ -0,0 +1,76 @@
+"""
+RATE LIMITING - REQUESTS CONCURRENTES CONTRA EL LIMITE
+Con un Redis simulado (fakeredis con Lua), 35 requests concurrentes de la misma IP
+contra un limite de 20 por ventana: exactamente 20 pasan y 15 reciben 429, con
+sliding window y con token bucket. Pasa por RateLimitMiddleware como en main.py con
+RATE_LIMIT_MIDDLEWARE_ENABLED=true.
+
+Uso (requiere fakeredis[lua]):
+  python testing/test_rate_limit_concurrency.py
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+LIMIT = 20
+CONCURRENT = 35
+
+
+async def _allowed_of_concurrent(algorithm: str) -> tuple:
+    import fakeredis
+    import httpx
+    from fastapi import FastAPI
+
+    from cache.redis_client import redis_client
+    from cache.services.rate_limit_service import rate_limit_service
+    from middleware.rate_limit_middleware import RateLimitMiddleware
+
+    redis_client._redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis_client._is_available = True
+    rate_limit_service.default_requests_per_minute = LIMIT
+    rate_limit_service.default_window = 60
+    rate_limit_service.default_algorithm = algorithm
+
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware)
+
+    @app.get("/warehouses/ping")
+    async def ping():
+        await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    headers = {"X-Forwarded-For": "203.0.113.7"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.get("/warehouses/ping", headers=headers) for _ in range(CONCURRENT)))
+    statuses = [response.status_code for response in responses]
+    return statuses.count(200), statuses.count(429), rate_limit_service.get_stats()
+
+
+def _check(algorithm: str) -> None:
+    allowed, rejected, stats = asyncio.run(_allowed_of_concurrent(algorithm))
+    print(f"📊 {algorithm}: {allowed} de {CONCURRENT} permitidas (limite {LIMIT}), {rejected} con 429")
+    assert (allowed, rejected) == (LIMIT, CONCURRENT - LIMIT)
+    assert stats["mode"] == "redis"
+
+
+def _require_fakeredis() -> None:
+    import pytest
+    pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+
+
+def test_sliding_window_allows_exactly_limit():
+    _require_fakeredis()
+    _check("sliding_window")
+
+
+def test_token_bucket_allows_exactly_limit():
+    _require_fakeredis()
+    _check("token_bucket")
+
+
+if __name__ == "__main__":
+    _check("sliding_window")
+    _check("token_bucket")
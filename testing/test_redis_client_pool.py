@@ -0,0 +1,116 @@
+"""
+CLIENTE REDIS - REEMPLAZO DEL POOL Y BENCHMARK DE MGET
+Contra el Redis real del entorno:
+- Reinicializar mientras hay un comando en curso: el comando termina sobre el pool
+  anterior, que se cierra despues del reemplazo.
+- Varias reconexiones concurrentes crean un solo pool nuevo.
+- Benchmark: 1.000 GET secuenciales contra un MGET de las mismas 1.000 keys.
+
+Uso (dentro del contenedor backend-api o con las variables REDIS_* cargadas):
+  REDIS_CLIENT_TEST=1 python testing/test_redis_client_pool.py
+"""
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+KEY_PREFIX = "test:redis_client_pool:"
+BENCH_KEYS = 1000
+ROUNDS = 3
+
+
+async def _swap_keeps_in_flight_commands() -> None:
+    from cache.redis_client import redis_client
+
+    assert await redis_client.initialize()
+    queue_key = f"{KEY_PREFIX}queue"
+    await redis_client.delete(queue_key)
+    old_redis = redis_client._redis
+
+    # Comando bloqueante en curso sobre el pool actual
+    in_flight = asyncio.create_task(old_redis.blpop([queue_key], timeout=3))
+    await asyncio.sleep(0.1)
+
+    assert await redis_client.initialize()
+    assert redis_client._redis is not old_redis
+    assert await redis_client.rpush(queue_key, "listo") == 1
+    assert tuple(await in_flight) == (queue_key, "listo"), "el comando en curso se corto al reemplazar el pool"
+    assert len(redis_client._retired) == 1
+
+    await redis_client.close()
+    assert redis_client._retired == []
+
+
+async def _concurrent_reconnects_create_one_pool() -> None:
+    from cache.redis_client import redis_client
+
+    assert await redis_client.initialize()
+    redis_client._is_available = False
+    generation = redis_client._pool_generation
+    results = await asyncio.gather(*(redis_client.initialize() for _ in range(10)))
+    assert all(results)
+    assert redis_client._pool_generation == generation + 1
+    await redis_client.close()
+
+
+async def _mget_benchmark() -> None:
+    from cache.redis_client import redis_client
+
+    assert await redis_client.initialize()
+    keys = [f"{KEY_PREFIX}bench:{index}" for index in range(BENCH_KEYS)]
+    await redis_client.mset_with_ttl({key: {"index": index} for index, key in enumerate(keys)}, 60)
+    try:
+        serial_best = mget_best = float("inf")
+        for _ in range(ROUNDS):
+            started = time.perf_counter()
+            serial = [await redis_client.get(key) for key in keys]
+            serial_best = min(serial_best, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            batched = await redis_client.mget(keys)
+            mget_best = min(mget_best, time.perf_counter() - started)
+
+        assert serial == batched == [{"index": index} for index in range(BENCH_KEYS)]
+        print(
+            f"📊 {BENCH_KEYS:,} keys (mejor de {ROUNDS}): GET secuencial {serial_best * 1000:.1f} ms, "
+            f"MGET {mget_best * 1000:.1f} ms ({serial_best / mget_best:.1f}x)"
+        )
+        assert mget_best < serial_best
+    finally:
+        await redis_client.delete(*keys)
+        await redis_client.close()
+
+
+def run() -> None:
+    asyncio.run(_swap_keeps_in_flight_commands())
+    asyncio.run(_concurrent_reconnects_create_one_pool())
+    asyncio.run(_mget_benchmark())
+    print("✅ Reemplazo del pool Redis sin cortar comandos en curso")
+
+
+def _require_redis() -> None:
+    if not os.getenv("REDIS_CLIENT_TEST"):
+        import pytest
+        pytest.skip("Requiere Redis y REDIS_CLIENT_TEST=1")
+
+
+def test_pool_swap_keeps_in_flight_commands():
+    _require_redis()
+    asyncio.run(_swap_keeps_in_flight_commands())
+
+
+def test_concurrent_reconnects_create_one_pool():
+    _require_redis()
+    asyncio.run(_concurrent_reconnects_create_one_pool())
+
+
+def test_serial_get_vs_mget_benchmark():
+    _require_redis()
+    asyncio.run(_mget_benchmark())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,78 @@
+"""
+CACHE DE REPORTES - GENERACION POR DIA Y SUCURSAL
+Con un Redis simulado (fakeredis con Lua):
+- Una venta de otro dia u otra sucursal durante el calculo no impide guardar el reporte.
+- Una venta de un dia/sucursal que el reporte cubre, durante el calculo, descarta el
+  guardado (y tambien lo descarta a un reporte sin filtro de sucursal).
+- invalidate_all durante el calculo descarta el guardado.
+
+Uso (requiere fakeredis[lua]):
+  python testing/test_report_cache_generations.py
+"""
+import asyncio
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+SEPTEMBER = (date(2026, 9, 1), date(2026, 9, 30))
+
+
+async def run() -> None:
+    import fakeredis
+
+    from cache.redis_client import redis_client
+    from cache.services.report_cache import ReportCacheService
+
+    redis_client._redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    redis_client._is_available = True
+    cache = ReportCacheService()
+    cache.enabled = True
+    computed = 0
+
+    def computing(during=None):
+        async def compute() -> dict:
+            nonlocal computed
+            computed += 1
+            if during:
+                await during()
+            return {"run": computed}
+        return compute
+
+    # Venta de hoy en otra sucursal: el reporte del mes pasado se guarda igual
+    other_scope = computing(lambda: cache.invalidate_sales([(date(2026, 10, 16), 2)]))
+    assert await cache.get_or_compute("ventas", *SEPTEMBER, [1], other_scope) == {"run": 1}
+    assert await cache.get_or_compute("ventas", *SEPTEMBER, [1], computing()) == {"run": 1}
+
+    # Venta de un dia cubierto: el calculo en curso no se guarda
+    same_scope = computing(lambda: cache.invalidate_sales([(date(2026, 9, 5), 1)]))
+    assert await cache.get_or_compute("pagos", *SEPTEMBER, [1], same_scope) == {"run": 2}
+    assert await cache.get_or_compute("pagos", *SEPTEMBER, [1], computing()) == {"run": 3}
+
+    # Sin filtro de sucursal ("all") tambien cubre la venta de la sucursal 1
+    all_scope = computing(lambda: cache.invalidate_sales([(date(2026, 9, 7), 1)]))
+    assert await cache.get_or_compute("pagos", *SEPTEMBER, [], all_scope) == {"run": 4}
+    assert await cache.get_or_compute("pagos", *SEPTEMBER, [], computing()) == {"run": 5}
+
+    # La invalidacion borra las entradas ya guardadas que cubren ese dia
+    await cache.invalidate_sales([(date(2026, 9, 10), 1)])
+    assert await cache.get_or_compute("ventas", *SEPTEMBER, [1], computing()) == {"run": 6}
+
+    # Reconstruir el rollup durante el calculo
+    assert await cache.get_or_compute("stock", *SEPTEMBER, [1], computing(cache.invalidate_all)) == {"run": 7}
+    assert await cache.get_or_compute("stock", *SEPTEMBER, [1], computing()) == {"run": 8}
+
+    assert cache.stale_discards == 3
+    print(f"✅ Cache de reportes por dia/sucursal: {cache.stats()}")
+
+
+def test_report_cache_generation_per_scope():
+    import pytest
+    pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
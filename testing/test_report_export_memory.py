@@ -0,0 +1,88 @@
+"""
+REPORTES - MEMORIA DE LA EXPORTACION EN STREAMING
+Cada formato (csv, xlsx, ndjson) exporta 1.000 y 1.000.000 de filas desde un
+generador async, igual que las filas que llegan de stream_results, y descarta los
+bloques a medida que salen. Cada corrida va en su propio proceso y se compara el
+pico de RSS (ru_maxrss): no debe crecer con la cantidad de filas.
+
+Corre sin servicios externos (tarda alrededor de un minuto):
+  python testing/test_report_export_memory.py
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api")
+
+SMALL_ROWS = 1_000
+LARGE_ROWS = int(os.getenv("EXPORT_RSS_ROWS") or "1000000")
+# Margen para ruido del allocator; materializar 1M filas ocuparia cientos de MB
+MAX_GROWTH_KB = 20 * 1024
+
+_CHILD = """
+import asyncio, resource, sys
+from datetime import date
+from decimal import Decimal
+sys.path.insert(0, {backend_dir!r})
+from utils.report_export import _export_chunks
+
+COLUMNS = ["id", "fecha", "cliente", "medio", "monto", "nota"]
+
+async def rows():
+    for index in range({rows}):
+        yield {{
+            "id": index,
+            "fecha": date(2026, 1, 1 + index % 28),
+            "cliente": f"Cliente {{index % 5000}}",
+            "medio": ("EFECTIVO", "DEBITO", "CREDITO")[index % 3],
+            "monto": Decimal(index % 90000) / 100,
+            "nota": "pago parcial" if index % 7 == 0 else None,
+        }}
+
+async def main():
+    total = 0
+    async for chunk in _export_chunks({fmt!r}, rows(), COLUMNS):
+        total += len(chunk)
+    print(total, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+asyncio.run(main())
+"""
+
+
+def _peak_rss_kb(fmt: str, rows: int) -> tuple[int, int]:
+    output = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(backend_dir=BACKEND_DIR, rows=rows, fmt=fmt)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+    return int(output[-2]), int(output[-1])
+
+
+def _check(fmt: str) -> None:
+    small_bytes, small_rss = _peak_rss_kb(fmt, SMALL_ROWS)
+    large_bytes, large_rss = _peak_rss_kb(fmt, LARGE_ROWS)
+    print(
+        f"📊 {fmt}: {SMALL_ROWS:,} filas -> {small_rss / 1024:.1f} MB RSS; "
+        f"{LARGE_ROWS:,} filas ({large_bytes / 1024 / 1024:.0f} MB exportados) -> {large_rss / 1024:.1f} MB RSS"
+    )
+    assert large_bytes > small_bytes * 100
+    assert large_rss - small_rss < MAX_GROWTH_KB, f"{fmt}: el RSS crecio {(large_rss - small_rss) / 1024:.1f} MB"
+
+
+def test_csv_export_memory_is_flat():
+    _check("csv")
+
+
+def test_xlsx_export_memory_is_flat():
+    _check("xlsx")
+
+
+def test_ndjson_export_memory_is_flat():
+    _check("ndjson")
+
+
+if __name__ == "__main__":
+    for export_format in ("csv", "xlsx", "ndjson"):
+        _check(export_format)
@@ -0,0 +1,120 @@
+"""
+REPORTES - MICRO-BENCHMARK DEL MOTOR DE TEMPLATES
+Render de daily_sales.html con una seccion de detalle de 5.000 filas paginada:
+motor anterior (leer archivos, resolver partials con regex y un str.replace por
+clave del contexto, tambien por cada cabecera/pie de pagina) contra el motor
+compilado y cacheado de routes/reports.py.
+
+Corre sin servicios externos. Para ver los tiempos:
+  python testing/test_report_template_benchmark.py
+"""
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+from routes import reports  # noqa: E402
+
+DETAIL_ROWS = 5000
+ROWS_PER_PAGE = 40
+ROUNDS = 5
+
+
+# ─── Motor anterior (copia de routes/reports.py antes de compilar templates) ──
+
+def _legacy_resolve_partials(source: str, depth: int = 0) -> str:
+    if depth > 5:
+        return source
+
+    def _include(match: re.Match) -> str:
+        name = match.group(1).strip()
+        path = os.path.join(reports._PARTIALS_DIR, f"{name}.html")
+        try:
+            return _legacy_resolve_partials(reports._load_file(path), depth + 1)
+        except FileNotFoundError:
+            return f"<!-- PARTIAL NOT FOUND: {name} -->"
+    return re.sub(r'\{\{>\s*(\S+)\s*\}\}', _include, source)
+
+
+def _legacy_render(template_name: str, ctx: dict) -> str:
+    html = _legacy_resolve_partials(reports._load_file(os.path.join(reports._TEMPLATES_DIR, template_name)))
+    for key, value in ctx.items():
+        html = html.replace(f"{{{{{key}}}}}", str(value))
+    return html
+
+
+def _legacy_partial(name: str, ctx: dict) -> str:
+    content = reports._load_file(os.path.join(reports._PARTIALS_DIR, f"{name}.html"))
+    for key, value in ctx.items():
+        content = content.replace(f"{{{{{key}}}}}", str(value))
+    return content
+
+
+# ─── Contexto sintetico ───────────────────────────────────────────────────
+
+def _base_context() -> dict:
+    names = set(reports._get_template(os.path.join(reports._TEMPLATES_DIR, "daily_sales.html")).names)
+    for partial in ("_page_header", "_page_footer"):
+        names.update(reports._get_template(os.path.join(reports._PARTIALS_DIR, f"{partial}.html")).names)
+    return {name: f"<span>{name.lower()}</span>" for name in sorted(names)}
+
+
+def _detail_pages(ctx: dict, render_partial) -> str:
+    pages = []
+    for start in range(0, DETAIL_ROWS, ROWS_PER_PAGE):
+        rows = "".join(
+            f"<tr><td>{index:05d}</td><td>2026-01-{index % 28 + 1:02d}</td>"
+            f"<td>Sucursal {index % 3}</td><td class=\"num\">$ {index * 37 % 90000:,}</td></tr>"
+            for index in range(start, min(start + ROWS_PER_PAGE, DETAIL_ROWS))
+        )
+        pages.append(
+            render_partial("_page_header", ctx)
+            + f"<table class=\"detail\"><tbody>{rows}</tbody></table>"
+            + render_partial("_page_footer", ctx)
+        )
+    return "".join(pages)
+
+
+def _render_legacy(ctx: dict) -> str:
+    return _legacy_render("daily_sales.html", {**ctx, "DETAIL_PAGES": _detail_pages(ctx, _legacy_partial)})
+
+
+def _render_compiled(ctx: dict) -> str:
+    return reports._render("daily_sales.html", {**ctx, "DETAIL_PAGES": _detail_pages(ctx, reports._render_partial)})
+
+
+def _best_of(render, ctx: dict) -> float:
+    best = float("inf")
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        render(ctx)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _without_styles_comment(html: str) -> str:
+    # El motor anterior expandia 6 niveles el "Incluir con: {{> _styles}}" de _styles.html
+    return re.sub(r"<style>.*?</style>", "", html, flags=re.S)
+
+
+def test_compiled_templates_match_and_beat_legacy():
+    ctx = _base_context()
+    legacy_html = _render_legacy(ctx)
+    compiled_html = _render_compiled(ctx)
+    assert _without_styles_comment(compiled_html) == _without_styles_comment(legacy_html)
+
+    legacy_time = _best_of(_render_legacy, ctx)
+    compiled_time = _best_of(_render_compiled, ctx)
+    print(
+        f"📊 daily_sales.html con {DETAIL_ROWS:,} filas de detalle (mejor de {ROUNDS}): "
+        f"anterior {legacy_time * 1000:.1f} ms, compilado {compiled_time * 1000:.1f} ms "
+        f"({legacy_time / compiled_time:.1f}x)"
+    )
+    assert compiled_time < legacy_time
+
+
+if __name__ == "__main__":
+    test_compiled_templates_match_and_beat_legacy()
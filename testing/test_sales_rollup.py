@@ -0,0 +1,128 @@
+"""
+ROLLUP DE VENTAS - CONSISTENCIA CONTRA EL AGREGADO EN VIVO
+- Sin base de datos: un set sintetico de ventas (pago simple, MIXED, anuladas y
+  abiertas) agregado con rollup_entries debe coincidir con el agregado directo.
+- Contra la MariaDB real: sale_daily_rollups debe coincidir con el agregado de
+  sale_documents por dia x sucursal x estado, leidos en el mismo snapshot.
+
+Uso (dentro del contenedor backend-api o con las variables MYSQL_* cargadas):
+  SALES_ROLLUP_TEST=1 python testing/test_sales_rollup.py
+"""
+import asyncio
+import os
+import random
+import sys
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+from sqlalchemy import text  # noqa: E402
+
+from services.sales_rollup import ROLLUP_TABLE, _merge_entry, rollup_entries  # noqa: E402
+
+METHODS = ("CASH", "DEBIT", "CREDIT", "TRANSFER")
+
+
+def _synthetic_sales(count: int = 2000) -> list:
+    rng = random.Random(7)
+    sales = []
+    for sale_id in range(1, count + 1):
+        total = Decimal(rng.randint(100, 90000))
+        sale = {
+            "id": sale_id,
+            "business_date": date(2026, 1, 1) + timedelta(days=rng.randint(0, 30)),
+            "status": rng.choice(("CLOSED", "CLOSED", "CLOSED", "CANCELLED", "OPEN")),
+            "warehouse_id": rng.randint(1, 3),
+            "document_type_code": rng.choice(("BOLETA", "FACTURA")),
+            "payment_method_code": rng.choice(METHODS),
+            "payment_method_name": None,
+            "total_amount": total,
+            "amount_tendered": total,
+            "change_amount": Decimal("0"),
+            "payment_details": None,
+        }
+        if rng.random() < 0.2:
+            first = Decimal(rng.randint(1, int(total)))
+            sale["payment_method_code"] = "MIXED"
+            sale["payment_details"] = {
+                "type": "MIXED",
+                "payments": [
+                    {"payment_method_code": "CASH", "amount": str(first)},
+                    {"payment_method_code": "DEBIT", "amount": str(total - first)},
+                ],
+            }
+        sales.append(sale)
+    return sales
+
+
+def test_rollup_entries_match_direct_aggregate():
+    sales = _synthetic_sales()
+
+    acc: dict = {}
+    for sale in sales:
+        for entry in rollup_entries(sale, sale["business_date"]):
+            _merge_entry(acc, entry)
+
+    rollup = defaultdict(lambda: [0, Decimal("0")])
+    paid = Decimal("0")
+    for entry in acc.values():
+        key = (entry["sale_date"], entry["warehouse_id"], entry["status"])
+        rollup[key][0] += entry["document_count"]
+        rollup[key][1] += entry["total_amount"]
+        paid += entry["payment_amount"]
+
+    direct = defaultdict(lambda: [0, Decimal("0")])
+    for sale in sales:
+        if sale["status"] in ("CLOSED", "CANCELLED"):
+            key = (sale["business_date"], sale["warehouse_id"], sale["status"])
+            direct[key][0] += 1
+            direct[key][1] += sale["total_amount"]
+
+    assert dict(rollup) == dict(direct)
+    # Lo cobrado se reparte por medio de pago sin perder ni duplicar montos
+    assert paid == sum(sale["total_amount"] for sale in sales if sale["status"] == "CLOSED")
+
+
+async def run() -> None:
+    from database.database import db_manager
+
+    db_manager.initialize()
+    try:
+        async with db_manager.get_async_session() as session:
+            # Mismo snapshot (REPEATABLE READ) para ambas lecturas
+            rollup_rows = (await session.execute(text(f"""
+                SELECT sale_date, warehouse_id, status, SUM(document_count), SUM(total_amount)
+                FROM {ROLLUP_TABLE}
+                GROUP BY sale_date, warehouse_id, status
+            """))).all()
+            live_rows = (await session.execute(text("""
+                SELECT business_date, warehouse_id, status, COUNT(*), SUM(total_amount)
+                FROM sale_documents
+                WHERE deleted_at IS NULL
+                  AND status IN ('CLOSED', 'CANCELLED')
+                  AND business_date IS NOT NULL
+                GROUP BY business_date, warehouse_id, status
+            """))).all()
+    finally:
+        await db_manager.close()
+
+    rollup = {(row[0], int(row[1]), row[2]): (int(row[3]), Decimal(str(row[4]))) for row in rollup_rows}
+    live = {(row[0], int(row[1]), row[2]): (int(row[3]), Decimal(str(row[4]))) for row in live_rows}
+    diff = {key: (rollup.get(key), live.get(key)) for key in rollup.keys() | live.keys() if rollup.get(key) != live.get(key)}
+    assert not diff, f"rollup y agregado en vivo difieren en {len(diff)} grupos, p. ej. {list(diff.items())[:5]}"
+    print(f"✅ Rollup consistente con sale_documents en {len(live)} grupos dia x sucursal x estado")
+
+
+def test_sales_rollup_matches_live_aggregate():
+    if not os.getenv("SALES_ROLLUP_TEST"):
+        import pytest
+        pytest.skip("Requiere MariaDB y SALES_ROLLUP_TEST=1")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_rollup_entries_match_direct_aggregate()
+    asyncio.run(run())
@@ -0,0 +1,119 @@
+"""
+STOCK LEDGER - PRUEBA DE CONCURRENCIA
+Golpea una misma dimension de stock desde 50 corrutinas, cada una en su propia
+transaccion, contra la MariaDB real del entorno.
+
+- 50 x (+1) sobre una dimension nueva: todas crean/bloquean la misma fila, sin
+  deadlocks ni filas duplicadas, y el saldo final es 50.
+- 50 x (-1) sobre un saldo de 25 sin permitir negativos: exactamente 25 pasan,
+  el resto recibe InsufficientStockError y el saldo nunca baja de 0.
+
+Uso (dentro del contenedor backend-api o con las variables MYSQL_* cargadas):
+  STOCK_TEST_VARIANT_ID=<id> STOCK_TEST_WAREHOUSE_ID=<id> [STOCK_TEST_UNIT_ID=<id>] \\
+    python testing/test_stock_ledger_concurrency.py
+
+Usa un lote unico por corrida y borra sus filas al terminar.
+"""
+import asyncio
+import os
+import sys
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "backend-api"))
+
+from sqlalchemy import text  # noqa: E402
+
+from database.database import db_manager  # noqa: E402
+from services import stock_ledger  # noqa: E402
+
+CONCURRENCY = 50
+
+
+async def _apply(dimension: dict, delta: int, allow_negative: bool) -> bool:
+    try:
+        async with db_manager.get_async_session() as session:
+            await stock_ledger.apply_stock_delta(
+                session, **dimension, delta=Decimal(delta), movement_type="ADJUSTMENT", allow_negative=allow_negative,
+            )
+        return True
+    except Exception as error:
+        # get_async_session envuelve el error en DatabaseException
+        if isinstance(error.__context__ or error, stock_ledger.InsufficientStockError):
+            return False
+        raise
+
+
+async def _apply_unit(dimension: dict, measurement_unit_id: int) -> None:
+    async with db_manager.get_async_session() as session:
+        await stock_ledger.apply_unit_balance_delta(
+            session, **dimension, measurement_unit_id=measurement_unit_id, delta=Decimal(1),
+        )
+
+
+async def _rows(table: str, batch_lot_number: str) -> list:
+    async with db_manager.get_async_session() as session:
+        result = await session.execute(
+            text(f"SELECT current_quantity FROM {table} WHERE batch_lot_number = :lot"),
+            {"lot": batch_lot_number},
+        )
+        return [Decimal(str(value)) for value in result.scalars().all()]
+
+
+async def _cleanup(batch_lot_number: str) -> None:
+    async with db_manager.get_async_session() as session:
+        for table in ("stock", "stock_unit_balances"):
+            await session.execute(text(f"DELETE FROM {table} WHERE batch_lot_number = :lot"), {"lot": batch_lot_number})
+
+
+async def run() -> None:
+    variant_id = int(os.environ["STOCK_TEST_VARIANT_ID"])
+    warehouse_id = int(os.environ["STOCK_TEST_WAREHOUSE_ID"])
+    unit_id = os.getenv("STOCK_TEST_UNIT_ID")
+
+    batch_lot_number = f"LEDGER-TEST-{uuid.uuid4().hex[:12]}"
+    dimension = {
+        "product_variant_id": variant_id,
+        "warehouse_id": warehouse_id,
+        "batch_lot_number": batch_lot_number,
+    }
+
+    db_manager.initialize()
+    try:
+        # 1. Creacion concurrente de la misma dimension
+        results = await asyncio.gather(*(_apply(dimension, 1, True) for _ in range(CONCURRENCY)))
+        rows = await _rows("stock", batch_lot_number)
+        assert all(results), "alguna suma concurrente fallo"
+        assert rows == [Decimal(CONCURRENCY)], f"se esperaba una fila con {CONCURRENCY}, hay {rows}"
+        print(f"✅ {CONCURRENCY} sumas concurrentes sobre dimension nueva: saldo {rows[0]}")
+
+        # 2. Descuentos concurrentes sin permitir negativos
+        half = CONCURRENCY // 2
+        await _apply(dimension, -half, False)
+        results = await asyncio.gather(*(_apply(dimension, -1, False) for _ in range(CONCURRENCY)))
+        rows = await _rows("stock", batch_lot_number)
+        assert sum(results) == half, f"se esperaban {half} descuentos aceptados, hubo {sum(results)}"
+        assert rows == [Decimal(0)], f"el saldo final deberia ser 0, es {rows}"
+        print(f"✅ {CONCURRENCY} descuentos concurrentes: {sum(results)} aceptados, saldo {rows[0]}")
+
+        # 3. Saldo por unidad de medida (opcional)
+        if unit_id:
+            await asyncio.gather(*(_apply_unit(dimension, int(unit_id)) for _ in range(CONCURRENCY)))
+            rows = await _rows("stock_unit_balances", batch_lot_number)
+            assert rows == [Decimal(CONCURRENCY)], f"se esperaba una fila con {CONCURRENCY}, hay {rows}"
+            print(f"✅ {CONCURRENCY} sumas concurrentes por unidad de medida: saldo {rows[0]}")
+    finally:
+        await _cleanup(batch_lot_number)
+        await db_manager.close()
+
+
+def test_stock_ledger_concurrency():
+    if not os.getenv("STOCK_TEST_VARIANT_ID") or not os.getenv("STOCK_TEST_WAREHOUSE_ID"):
+        import pytest
+        pytest.skip("Requiere MariaDB y STOCK_TEST_VARIANT_ID / STOCK_TEST_WAREHOUSE_ID")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,97 @@
+"""
+EVENTS ORCHESTRATOR - CARGA DEL HUB DE STREAMS
+Con un Redis simulado (fakeredis) se suscriben 10 y luego 5.000 clientes a los
+mismos streams (uno global y 10 de usuario) y se publican 100 eventos. Se cuentan
+los comandos que el hub manda a Redis: con un solo lector por proceso deben ser
+los mismos con 10 que con 5.000 clientes, y cada cliente recibe todos sus eventos.
+
+Uso (requiere fakeredis):
+  python testing/test_stream_hub_load.py
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "volumes" / "events-orchestrator"))
+
+EVENTS = 100
+USER_STREAMS = 10
+PUBLISH_INTERVAL_SECONDS = 0.005
+# Margen para vueltas de XREAD que coinciden o no con una publicacion
+MAX_COMMAND_GROWTH = 1.5
+
+
+async def _run_load(clients: int) -> dict:
+    import fakeredis
+
+    from stream_hub import SLOW_CONSUMER_DISCONNECT, StreamHub
+
+    class CountingRedis(fakeredis.FakeAsyncRedis):
+        commands = 0
+
+        async def execute_command(self, *args, **options):
+            CountingRedis.commands += 1
+            return await super().execute_command(*args, **options)
+
+    server = fakeredis.FakeServer()
+    hub_redis = CountingRedis(server=server, decode_responses=True)
+    publisher = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+    hub = StreamHub(
+        prepare_message=lambda stream_name, stream_id, values: f"id: {stream_id}\ndata: {values['n']}\n\n",
+        block_ms=100,
+        read_count=100,
+        client_buffer=EVENTS + 1,
+        slow_consumer_policy=SLOW_CONSUMER_DISCONNECT,
+    )
+    hub.start(hub_redis)
+    try:
+        subscriptions = [
+            await hub.subscribe(["events:global", f"events:user:{index % USER_STREAMS}"])
+            for index in range(clients)
+        ]
+        # Que el lector tome los streams nuevos antes de medir
+        await asyncio.sleep(0.2)
+
+        commands_before = CountingRedis.commands
+        started = time.perf_counter()
+        for n in range(EVENTS):
+            stream = "events:global" if n % 2 == 0 else f"events:user:{(n // 2) % USER_STREAMS}"
+            await publisher.xadd(stream, {"n": n})
+            await asyncio.sleep(PUBLISH_INTERVAL_SECONDS)
+        # Cada cliente: todos los globales y los de su stream de usuario
+        expected = EVENTS // 2 + EVENTS // 2 // USER_STREAMS
+        deadline = time.perf_counter() + 10
+        while hub.delivered < clients * expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+        commands = CountingRedis.commands - commands_before
+
+        received = [subscription.queue.qsize() for subscription in subscriptions]
+        assert hub.slow_consumers == 0
+        assert received == [expected] * clients, "algun cliente no recibio todos sus eventos"
+        return {"clients": clients, "commands": commands, "rate": commands / elapsed, "delivered": hub.delivered}
+    finally:
+        await hub.stop()
+
+
+async def run() -> None:
+    small = await _run_load(10)
+    large = await _run_load(5000)
+    for result in (small, large):
+        print(
+            f"📊 {result['clients']:>5,} clientes: {result['commands']} comandos a Redis "
+            f"({result['rate']:.0f}/s), {result['delivered']:,} mensajes repartidos"
+        )
+    assert large["commands"] <= small["commands"] * MAX_COMMAND_GROWTH, "los comandos a Redis crecen con los clientes"
+
+
+def test_stream_hub_redis_commands_flat_with_clients():
+    import pytest
+    pytest.importorskip("fakeredis")
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,275 @@
+"""
+volumes/backend-api/cache/local_cache.py
+Cache L1 en memoria del proceso (uno por worker) delante de Redis
+
+- LRU acotado con TTL por entrada para user secrets, blacklist y permisos.
+- Invalidacion entre workers por Redis pub/sub (canal cache:l1:invalidate).
+- Pub/sub no garantiza entrega: mientras el listener no esta suscrito el L1 se
+  ignora y se vacia en cada confirmacion de (re)suscripcion. El listener usa una
+  conexion propia sin socket_timeout y un PING periodico para detectar caidas. Los "no esta en blacklist" usan un TTL corto
+  como cota adicional si se pierde un mensaje con la conexion arriba.
+- Cada cache lleva un contador de invalidaciones (version). Quien lee Redis o la BD
+  para llenar el L1 toma la version antes de leer y la pasa a set(): si llego una
+  invalidacion mientras tanto, el valor leido puede ser viejo y no se guarda.
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from cache.redis_client import redis_client
+from core.config import settings
+from utils.log_helper import setup_logger
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+INVALIDATION_CHANNEL = "cache:l1:invalidate"
+
+# Espera maxima por mensaje antes de comprobar la conexion con PING
+_LISTENER_HEALTH_CHECK_SECONDS = 10
+
+
+class LocalTTLCache:
+    """
+    LRU con TTL por entrada. None no se cachea: get() devuelve None en un miss.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+        # Contadores expuestos en /system/status
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+        # Cambia con cada invalidacion, aunque la key no estuviera cacheada
+        self.version = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None, version: Optional[int] = None) -> None:
+        """
+        version: la leida antes de consultar la fuente; si cambio, no se guarda
+        """
+        if value is None:
+            return
+        if version is not None and version != self.version:
+            self.stale_sets += 1
+            return
+        self._entries[key] = (time.monotonic() + (ttl or self.ttl_seconds), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        self.version += 1
+        if self._entries.pop(key, None) is None:
+            return False
+        self.invalidations += 1
+        return True
+
+    def delete_prefix(self, prefix: str) -> int:
+        self.version += 1
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> int:
+        self.version += 1
+        count = len(self._entries)
+        self._entries.clear()
+        self.invalidations += count
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_sets": self.stale_sets,
+        }
+
+
+# ==========================================
+# INSTANCIAS GLOBALES (POR WORKER)
+# ==========================================
+
+user_secret_l1 = LocalTTLCache("user_secret", settings.LOCAL_CACHE_MAX_ENTRIES, settings.LOCAL_CACHE_TTL_SECONDS)
+blacklist_l1 = LocalTTLCache("blacklist", settings.LOCAL_CACHE_MAX_ENTRIES, settings.LOCAL_CACHE_TTL_SECONDS)
+permissions_l1 = LocalTTLCache("permissions", settings.LOCAL_CACHE_MAX_ENTRIES, settings.LOCAL_CACHE_TTL_SECONDS)
+
+_CACHES = (user_secret_l1, blacklist_l1, permissions_l1)
+
+
+def blacklist_l1_key(jti: str, user_id: Optional[int]) -> str:
+    return f"{user_id or 0}:{jti}"
+
+
+def _apply_invalidation(message: Dict[str, Any]) -> None:
+    scope = message.get("scope")
+    user_id = message.get("user_id")
+    if scope == "user_secret":
+        user_secret_l1.delete(str(user_id))
+    elif scope == "blacklist":
+        blacklist_l1.delete(blacklist_l1_key(message.get("jti"), user_id))
+    elif scope == "blacklist_user":
+        blacklist_l1.delete_prefix(f"{user_id or 0}:")
+    elif scope == "permissions":
+        permissions_l1.delete(str(user_id))
+    elif scope == "permissions_all":
+        permissions_l1.clear()
+    elif scope == "user":
+        user_secret_l1.delete(str(user_id))
+        permissions_l1.delete(str(user_id))
+        blacklist_l1.delete_prefix(f"{user_id or 0}:")
+
+
+class LocalCacheInvalidator:
+    """
+    Listener de pub/sub que aplica en este worker las invalidaciones publicadas por cualquiera
+    """
+
+    def __init__(self):
+        self.enabled = settings.LOCAL_CACHE_ENABLED
+        self.subscribed = False
+        self.received = 0
+        self.reconnects = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def active(self) -> bool:
+        """El L1 solo se usa con el listener suscrito; sin el no hay cota de propagacion."""
+        return self.enabled and self.subscribed
+
+    def start(self) -> None:
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._set_unsubscribed()
+
+    def _set_unsubscribed(self) -> None:
+        self.subscribed = False
+        for cache in _CACHES:
+            cache.clear()
+
+    def _on_subscribed(self) -> None:
+        # Lo cacheado antes de (re)suscribirse pudo perder invalidaciones
+        for cache in _CACHES:
+            cache.clear()
+        self.subscribed = True
+
+    async def _run(self) -> None:
+        while True:
+            was_subscribed = False
+            client = redis_client.dedicated_client()
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(timeout=_LISTENER_HEALTH_CHECK_SECONDS)
+                    if message is None:
+                        # Sin trafico: un PING detecta la conexion caida en vez de esperar para siempre
+                        await pubsub.ping()
+                        continue
+                    message_type = message.get("type")
+                    if message_type == "subscribe":
+                        # Tambien llega si redis-py reconecta y resuscribe por su cuenta
+                        if self.subscribed:
+                            self.reconnects += 1
+                        self._on_subscribed()
+                        was_subscribed = True
+                    elif message_type == "message":
+                        self.received += 1
+                        try:
+                            _apply_invalidation(json.loads(message["data"]))
+                        except (TypeError, ValueError) as e:
+                            logger.warning(f"Mensaje de invalidacion L1 invalido: {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Listener de invalidacion L1 desconectado: {e}")
+            finally:
+                self._set_unsubscribed()
+                try:
+                    await pubsub.aclose()
+                    await client.aclose()
+                except Exception:
+                    pass
+            self.reconnects += 1
+            # Sin Redis no insistir cada segundo
+            await asyncio.sleep(1 if was_subscribed else 5)
+
+
+# ==========================================
+# INSTANCIA GLOBAL
+# ==========================================
+
+local_cache_invalidator = LocalCacheInvalidator()
+
+
+# ==========================================
+# FUNCIONES DE CONVENIENCIA
+# ==========================================
+
+def local_cache_active() -> bool:
+    return local_cache_invalidator.active
+
+
+async def publish_invalidation(scope: str, **fields: Any) -> None:
+    """
+    Invalidar en este worker de inmediato y avisar al resto por pub/sub
+    """
+    message = {"scope": scope, **fields}
+    _apply_invalidation(message)
+    try:
+        await redis_client.publish(INVALIDATION_CHANNEL, message)
+    except Exception as e:
+        logger.warning(f"No se pudo publicar invalidacion L1 {scope}: {e}")
+
+
+def get_local_cache_stats() -> Dict[str, Any]:
+    return {
+        "enabled": local_cache_invalidator.enabled,
+        "active": local_cache_invalidator.active,
+        "invalidations_received": local_cache_invalidator.received,
+        "listener_reconnects": local_cache_invalidator.reconnects,
+        "caches": {cache.name: cache.stats() for cache in _CACHES},
+    }
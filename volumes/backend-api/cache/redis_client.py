@@ -3,10 +3,11 @@ volumes/backend-api/cache/redis_client.py
 Cliente Redis configurado con connection pooling, fallback y manejo de errores
 """
 import asyncio
-import json
 from utils.log_helper import setup_logger
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Callable
 from contextlib import asynccontextmanager
+from decimal import Decimal
+import orjson
 from redis.asyncio import ConnectionPool, Redis
 from redis.exceptions import (
     ConnectionError as RedisConnectionError,
@@ -20,6 +21,56 @@ from core.exceptions import CacheException
 # Configurar logger
 logger = setup_logger(__name__)
 
+# Prefijo de valores serializados (dict/list/bool). Los valores anteriores sin prefijo
+# se siguen leyendo como JSON; strings y numeros se guardan tal cual (INCR sigue funcionando).
+_JSON_TAG = "\x1ej:"
+
+
+def _json_default(value: Any) -> Any:
+    # Decimal como número, igual que jsonable_encoder de FastAPI en las respuestas;
+    # el resto (UUID, Enum, etc.) como texto
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def serialize_value(value: Any) -> str:
+    """
+    Serializar un valor para Redis con orjson y marca de tipo.
+    
+    Claves no string se guardan como texto ({1: ...} vuelve como {"1": ...}, igual
+    que con json.dumps). Decimal vuelve como float y datetime/date como ISO 8601.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple, bool)):
+        return _JSON_TAG + orjson.dumps(value, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return str(value)
+
+
+def _to_number(value: Any) -> Any:
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return value
+
+
+def deserialize_value(value: Any, default: Any = None) -> Any:
+    """
+    Deserializar un valor leído de Redis (con o sin marca de tipo)
+    """
+    if value is None:
+        return default
+    if isinstance(value, str) and value.startswith(_JSON_TAG):
+        return orjson.loads(value[len(_JSON_TAG):])
+    try:
+        return orjson.loads(value)
+    except (orjson.JSONDecodeError, TypeError):
+        return value
+
 
 class RedisClient:
     """
@@ -27,7 +78,7 @@ class RedisClient:
     - Connection pooling
     - Fallback graceful cuando Redis no está disponible
     - Retry automático con backoff
-    - Serialización automática JSON
+    - Serialización automática JSON (orjson, con marca de tipo)
     - Pipelines para operaciones batch
     - Health checking
     """
@@ -43,14 +94,31 @@ class RedisClient:
         # Configuración de retry
         self._max_retries = 2
         self._retry_delay = 0.1  # seconds
+        
+        # Scripts Lua registrados (EVALSHA), indexados por su código fuente
+        self._scripts: Dict[str, Any] = {}
+        
+        # Reemplazo del pool: uno a la vez; los anteriores se cierran en segundo plano
+        self._init_lock = asyncio.Lock()
+        self._pool_generation = 0
+        self._retired: List[tuple] = []
+        self._closing_tasks: set = set()
     
     async def initialize(self) -> bool:
         """
-        Inicializar conexión Redis con retry automático
-        """
-        try:
+        Inicializar conexión Redis con retry automático.
+        
+        El pool nuevo se crea y se prueba aparte y se reemplaza bajo un lock: las
+        operaciones en curso terminan sobre el anterior, que se cierra después.
+        """
+        generation = self._pool_generation
+        async with self._init_lock:
+            # Otra corutina ya reconectó mientras se esperaba el lock
+            if generation != self._pool_generation and self._is_available:
+                return True
+            
             # Crear connection pool
-            self._pool = ConnectionPool(
+            pool = ConnectionPool(
                 host=settings.REDIS_HOST,
                 port=settings.REDIS_PORT,
                 db=settings.REDIS_DB,
@@ -63,27 +131,81 @@ class RedisClient:
                 decode_responses=True,     # Decodificar respuestas automáticamente
                 encoding='utf-8'
             )
+            redis = Redis(connection_pool=pool)
             
-            # Crear cliente Redis
-            self._redis = Redis(connection_pool=self._pool)
-            
-            # Probar conexión
-            await self._test_connection()
+            try:
+                # Probar conexión antes de reemplazar el pool actual
+                await redis.ping()
+            except Exception as e:
+                self._is_available = False
+                self._connection_attempts += 1
+                logger.error(f"Error conectando a Redis (intento {self._connection_attempts}): {e}")
+                
+                if self._redis is None:
+                    # Sin pool previo se conserva el nuevo: probe() lo reutiliza
+                    self._redis, self._pool = redis, pool
+                    self._pool_generation += 1
+                else:
+                    await self._close_client(redis, pool)
+                
+                # Si no se pudo conectar, el sistema funcionará en modo degradado
+                return False
             
+            old_redis, old_pool = self._redis, self._pool
+            self._redis, self._pool = redis, pool
+            self._pool_generation += 1
             self._is_available = True
             self._connection_attempts = 0
-            
-            logger.info(f"Redis conectado exitosamente: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
-            return True
-            
+        
+        if old_redis is not None:
+            self._close_later(old_redis, old_pool)
+        
+        logger.info(f"Redis conectado exitosamente: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+        return True
+    
+    def _close_later(self, redis: Redis, pool: ConnectionPool) -> None:
+        """
+        Cerrar un pool reemplazado cuando ya no puede tener comandos en curso
+        (el más lento termina o vence por socket_timeout)
+        """
+        retired = (redis, pool)
+        self._retired.append(retired)
+        
+        async def _close():
+            await asyncio.sleep(settings.REDIS_SOCKET_TIMEOUT)
+            if retired in self._retired:
+                self._retired.remove(retired)
+                await self._close_client(redis, pool)
+        
+        task = asyncio.create_task(_close())
+        self._closing_tasks.add(task)
+        task.add_done_callback(self._closing_tasks.discard)
+    
+    @staticmethod
+    async def _close_client(redis: Optional[Redis], pool: Optional[ConnectionPool]) -> None:
+        try:
+            if redis:
+                await redis.aclose()
+            if pool:
+                await pool.disconnect()
         except Exception as e:
+            logger.debug(f"Error cerrando pool Redis anterior: {e}")
+    
+    async def probe(self) -> bool:
+        """
+        Comprobar si Redis volvió: PING sobre el pool existente (redis-py reabre las
+        conexiones caídas) y solo sin pool se inicializa uno nuevo
+        """
+        if self._redis is None:
+            return await self.initialize()
+        try:
+            await self._test_connection()
+        except Exception:
             self._is_available = False
-            self._connection_attempts += 1
-            
-            logger.error(f"Error conectando a Redis (intento {self._connection_attempts}): {e}")
-            
-            # Si no se pudo conectar, el sistema funcionará en modo degradado
             return False
+        self._is_available = True
+        self._connection_attempts = 0
+        return True
     
     async def _test_connection(self):
         """
@@ -96,13 +218,16 @@ class RedisClient:
         """
         Cerrar conexiones Redis limpiamente
         """
-        if self._redis:
-            await self._redis.close()
-        
-        if self._pool:
-            await self._pool.disconnect()
+        async with self._init_lock:
+            redis, pool = self._redis, self._pool
+            self._redis, self._pool = None, None
+            self._pool_generation += 1
+            self._is_available = False
+            await self._close_client(redis, pool)
         
-        self._is_available = False
+            retired, self._retired = self._retired, []
+            for old_redis, old_pool in retired:
+                await self._close_client(old_redis, old_pool)
         logger.info("Conexiones Redis cerradas")
     
     async def _execute_with_retry(self, operation, *args, **kwargs):
@@ -164,15 +289,7 @@ class RedisClient:
         Obtener valor de Redis con deserialización automática
         """
         async def _get_operation():
-            value = await self._redis.get(key)
-            if value is None:
-                return default
-            
-            # Intentar deserializar JSON, si falla devolver string
-            try:
-                return json.loads(value)
-            except (json.JSONDecodeError, TypeError):
-                return value
+            return deserialize_value(await self._redis.get(key), default)
         
         return await self._execute_with_retry(_get_operation)
     
@@ -193,13 +310,7 @@ class RedisClient:
             nx: Solo establecer si la clave no existe
         """
         async def _set_operation():
-            # Serializar valor si no es string
-            if isinstance(value, (dict, list, bool, int, float)) and not isinstance(value, str):
-                serialized_value = json.dumps(value, ensure_ascii=False)
-            else:
-                serialized_value = str(value)
-            
-            return await self._redis.set(key, serialized_value, ex=ex, nx=nx)
+            return await self._redis.set(key, serialize_value(value), ex=ex, nx=nx)
         
         result = await self._execute_with_retry(_set_operation)
         return result is True
@@ -281,33 +392,37 @@ class RedisClient:
         Agregar elementos al inicio de una lista
         """
         async def _lpush_operation():
-            serialized_values = []
-            for value in values:
-                if isinstance(value, (dict, list, bool, int, float)) and not isinstance(value, str):
-                    serialized_values.append(json.dumps(value, ensure_ascii=False))
-                else:
-                    serialized_values.append(str(value))
-            
-            return await self._redis.lpush(key, *serialized_values)
+            return await self._redis.lpush(key, *(serialize_value(value) for value in values))
         
         return await self._execute_with_retry(_lpush_operation)
     
+    async def rpush(self, key: str, *values: Any) -> Optional[int]:
+        """
+        Agregar elementos al final de una lista (devuelve el largo resultante)
+        """
+        async def _rpush_operation():
+            return await self._redis.rpush(key, *(serialize_value(value) for value in values))
+        
+        return await self._execute_with_retry(_rpush_operation)
+    
+    async def lpop(self, key: str, count: int = 1) -> List[Any]:
+        """
+        Extraer hasta count elementos del inicio de una lista en un solo comando
+        """
+        async def _lpop_operation():
+            values = await self._redis.lpop(key, count)
+            return [deserialize_value(value) for value in values or []]
+        
+        result = await self._execute_with_retry(_lpop_operation)
+        return result or []
+    
     async def lrange(self, key: str, start: int = 0, end: int = -1) -> List[Any]:
         """
         Obtener rango de elementos de una lista
         """
         async def _lrange_operation():
             values = await self._redis.lrange(key, start, end)
-            
-            # Deserializar cada valor
-            result = []
-            for value in values:
-                try:
-                    result.append(json.loads(value))
-                except (json.JSONDecodeError, TypeError):
-                    result.append(value)
-            
-            return result
+            return [deserialize_value(value) for value in values]
         
         result = await self._execute_with_retry(_lrange_operation)
         return result or []
@@ -331,14 +446,7 @@ class RedisClient:
         Agregar elementos a un set
         """
         async def _sadd_operation():
-            serialized_values = []
-            for value in values:
-                if isinstance(value, (dict, list, bool, int, float)) and not isinstance(value, str):
-                    serialized_values.append(json.dumps(value, ensure_ascii=False))
-                else:
-                    serialized_values.append(str(value))
-            
-            return await self._redis.sadd(key, *serialized_values)
+            return await self._redis.sadd(key, *(serialize_value(value) for value in values))
         
         return await self._execute_with_retry(_sadd_operation)
     
@@ -347,14 +455,7 @@ class RedisClient:
         Remover elementos de un set
         """
         async def _srem_operation():
-            serialized_values = []
-            for value in values:
-                if isinstance(value, (dict, list, bool, int, float)) and not isinstance(value, str):
-                    serialized_values.append(json.dumps(value, ensure_ascii=False))
-                else:
-                    serialized_values.append(str(value))
-            
-            return await self._redis.srem(key, *serialized_values)
+            return await self._redis.srem(key, *(serialize_value(value) for value in values))
         
         return await self._execute_with_retry(_srem_operation)
     
@@ -364,28 +465,198 @@ class RedisClient:
         """
         async def _smembers_operation():
             values = await self._redis.smembers(key)
+            return [deserialize_value(value) for value in values]
+        
+        result = await self._execute_with_retry(_smembers_operation)
+        return result or []
+    
+    async def sismember(self, key: str, value: Any) -> bool:
+        """
+        Verificar si un elemento pertenece a un set
+        """
+        async def _sismember_operation():
+            return await self._redis.sismember(key, serialize_value(value))
+        
+        result = await self._execute_with_retry(_sismember_operation)
+        return bool(result)
+    
+    # ==========================================
+    # OPERACIONES DE HASH
+    # ==========================================
+    
+    async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
+        """
+        Incrementar valor de un field en un hash
+        
+        Args:
+            key: Clave del hash
+            field: Campo del hash a incrementar
+            amount: Cantidad a incrementar (default 1)
             
-            # Deserializar cada valor
-            result = []
-            for value in values:
-                try:
-                    result.append(json.loads(value))
-                except (json.JSONDecodeError, TypeError):
-                    result.append(value)
+        Returns:
+            Nuevo valor después del incremento
+        """
+        async def _hincrby_operation():
+            return await self._redis.hincrby(key, field, amount)
+        
+        result = await self._execute_with_retry(_hincrby_operation)
+        return result or 0
+    
+    async def hget(self, key: str, field: str) -> Optional[Any]:
+        """
+        Obtener valor de un field en un hash (numérico si es posible)
+        """
+        async def _hget_operation():
+            value = await self._redis.hget(key, field)
+            if value is None:
+                return None
+            return _to_number(value)
+        
+        return await self._execute_with_retry(_hget_operation)
+    
+    async def hgetall(self, key: str) -> Dict[str, Any]:
+        """
+        Obtener todos los fields y valores de un hash (numéricos si es posible)
+        """
+        async def _hgetall_operation():
+            result = await self._redis.hgetall(key)
+            return {field: _to_number(value) for field, value in result.items()}
+        
+        result = await self._execute_with_retry(_hgetall_operation)
+        return result or {}
+    
+    # ==========================================
+    # OPERACIONES MULTI-KEY
+    # ==========================================
+    
+    async def mget(self, keys: List[str]) -> List[Any]:
+        """
+        Obtener varias claves en un solo round-trip (None para las que no existen)
+        """
+        if not keys:
+            return []
+        
+        async def _mget_operation():
+            values = await self._redis.mget(keys)
+            return [deserialize_value(value) for value in values]
+        
+        result = await self._execute_with_retry(_mget_operation)
+        return result if result is not None else [None] * len(keys)
+    
+    async def mset_with_ttl(self, mapping: Dict[str, Any], ttl: int) -> bool:
+        """
+        Establecer varias claves con el mismo TTL en un solo round-trip
+        """
+        if not mapping:
+            return True
+        
+        def _build(pipe):
+            for key, value in mapping.items():
+                pipe.set(key, serialize_value(value), ex=ttl)
+        
+        results = await self.pipeline_execute(_build)
+        return bool(results) and all(result is True for result in results)
+    
+    async def pipeline_execute(self, build: Callable[[Any], None], transaction: bool = False) -> List[Any]:
+        """
+        Ejecutar un pipeline con la misma semántica de retry que el resto de operaciones.
+        
+        Args:
+            build: Función que encola los comandos en el pipeline recibido. Se vuelve
+                   a llamar en cada reintento, sobre un pipeline nuevo.
+            transaction: MULTI/EXEC si se requiere atomicidad
             
-            return result
+        Returns:
+            Resultados en el orden de los comandos ([] si Redis no está disponible)
+        """
+        async def _pipeline_operation():
+            pipe = self._redis.pipeline(transaction=transaction)
+            build(pipe)
+            return await pipe.execute()
         
-        result = await self._execute_with_retry(_smembers_operation)
+        result = await self._execute_with_retry(_pipeline_operation)
         return result or []
     
+    async def keys(self, pattern: str) -> List[str]:
+        """
+        Claves que coinciden con un patrón (SCAN incremental, no bloquea Redis como KEYS)
+        """
+        async def _keys_operation():
+            return [key async for key in self._redis.scan_iter(match=pattern, count=500)]
+        
+        result = await self._execute_with_retry(_keys_operation)
+        return result or []
+    
+    # ==========================================
+    # SCRIPTS LUA
+    # ==========================================
+
+    async def run_script(self, source: str, keys: List[str], args: List[Any]) -> Any:
+        """
+        Ejecutar un script Lua de forma atómica en el servidor.
+        
+        Usa EVALSHA y carga el script automáticamente si el servidor no lo tiene
+        (reinicio de Redis, SCRIPT FLUSH). None si Redis no está disponible.
+        """
+        async def _script_operation():
+            script = self._scripts.get(source)
+            if script is None:
+                script = self._redis.register_script(source)
+                self._scripts[source] = script
+            # client explícito: tras una reconexión self._redis es otra instancia
+            return await script(keys=keys, args=args, client=self._redis)
+
+        return await self._execute_with_retry(_script_operation)
+
+    # ==========================================
+    # PUB/SUB
+    # ==========================================
+
+    async def publish(self, channel: str, message: Any) -> int:
+        """
+        Publicar mensaje en un canal (dict/list se serializan a JSON)
+        """
+        async def _publish_operation():
+            payload = message if isinstance(message, str) else orjson.dumps(message, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+            return await self._redis.publish(channel, payload)
+
+        result = await self._execute_with_retry(_publish_operation)
+        return result or 0
+
+    def pubsub(self):
+        """
+        Cliente pub/sub sobre el mismo pool (None si Redis no está disponible)
+        """
+        if not self._is_available or not self._redis:
+            return None
+        return self._redis.pubsub(ignore_subscribe_messages=True)
+
+    def dedicated_client(self) -> Redis:
+        """
+        Cliente con conexión propia y sin socket_timeout, para suscripciones de
+        larga vida: con el timeout del pool, redis-py corta y resuscribe en
+        silencio cada REDIS_SOCKET_TIMEOUT segundos sin mensajes. Lo cierra el llamador.
+        """
+        return Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            password=settings.REDIS_PASSWORD,
+            socket_connect_timeout=settings.REDIS_CONNECTION_TIMEOUT,
+            socket_timeout=None,
+            socket_keepalive=True,
+            decode_responses=True,
+            encoding='utf-8'
+        )
+
     # ==========================================
     # PIPELINE OPERATIONS
     # ==========================================
-    
+
     @asynccontextmanager
     async def pipeline(self):
         """
-        Context manager para operaciones pipeline
+        Context manager para operaciones pipeline (sin retry; preferir pipeline_execute)
         """
         if not self._is_available or not self._redis:
             # Si Redis no está disponible, devolver un pipeline dummy
@@ -516,67 +787,3 @@ def redis_fallback(fallback_value: Any = None):
         
         return wrapper
     return decorator
-
-
-# Agregar al RedisClient en cache/redis_client.py
-
-async def hincrby(self, key: str, field: str, amount: int = 1) -> int:
-    """
-    Incrementar valor de un field en un hash
-    
-    Args:
-        key: Clave del hash
-        field: Campo del hash a incrementar
-        amount: Cantidad a incrementar (default 1)
-        
-    Returns:
-        Nuevo valor después del incremento
-    """
-    async def _hincrby_operation():
-        return await self._redis.hincrby(key, field, amount)
-    
-    result = await self._execute_with_retry(_hincrby_operation)
-    return result or 0
-
-async def hget(self, key: str, field: str) -> Optional[Any]:
-    """
-    Obtener valor de un field en un hash
-    """
-    async def _hget_operation():
-        value = await self._redis.hget(key, field)
-        if value is None:
-            return None
-        
-        # Intentar convertir a número si es posible
-        try:
-            return int(value)
-        except (ValueError, TypeError):
-            try:
-                return float(value)
-            except (ValueError, TypeError):
-                return value
-    
-    return await self._execute_with_retry(_hget_operation)
-
-async def hgetall(self, key: str) -> Dict[str, Any]:
-    """
-    Obtener todos los fields y valores de un hash
-    """
-    async def _hgetall_operation():
-        result = await self._redis.hgetall(key)
-        
-        # Convertir valores a tipos apropiados
-        converted = {}
-        for field, value in result.items():
-            try:
-                converted[field] = int(value)
-            except (ValueError, TypeError):
-                try:
-                    converted[field] = float(value)
-                except (ValueError, TypeError):
-                    converted[field] = value
-        
-        return converted
-    
-    result = await self._execute_with_retry(_hgetall_operation)
-    return result or {}
\ No newline at end of file
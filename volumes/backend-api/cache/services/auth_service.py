@@ -231,7 +231,7 @@ class UserService:
         """Autenticar credenciales de usuario"""
         from database.models.users import User
         from sqlalchemy import select, and_, or_
-        from core.password_manager import verify_user_password
+        from core.password_manager import verify_user_password_async
         
         # Buscar usuario
         stmt = select(User).where(
@@ -256,7 +256,7 @@ class UserService:
                 error_code=ErrorCode.AUTH_USER_INACTIVE
             )
         
-        if not verify_user_password(password, user.password_hash):
+        if not await verify_user_password_async(password, user.password_hash):
             raise AuthenticationException(
                 message="Credenciales inválidas",
                 error_code=ErrorCode.AUTH_INVALID_CREDENTIALS
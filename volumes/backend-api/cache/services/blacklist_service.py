@@ -7,7 +7,9 @@ from utils.log_helper import setup_logger
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 
+from cache.local_cache import blacklist_l1, blacklist_l1_key, local_cache_active, publish_invalidation
 from cache.redis_client import redis_client
+from core.config import settings
 from database.schemas.token import BlacklistReason, TokenType
 import json
 
@@ -81,7 +83,7 @@ class BlacklistService:
             metadata_key = f"{self.blacklist_metadata_prefix}{jti}"
             
             # 4. Usar pipeline para operación atómica
-            async with redis_client.pipeline() as pipe:
+            def _build(pipe):
                 # Marcar token como blacklisteado
                 pipe.setex(token_key, ttl, "1")
                 
@@ -90,18 +92,20 @@ class BlacklistService:
                 pipe.expire(user_tokens_key, ttl)
                 
                 # Guardar metadata
-                # pipe.setex(metadata_key, ttl, metadata)
                 pipe.setex(metadata_key, ttl, json.dumps(metadata))
                 
                 # Incrementar contador global
                 pipe.incr("blacklist:stats:total")
                 pipe.incr(f"blacklist:stats:reason:{reason}")
-                
-                results = await pipe.execute()
+            
+            results = await redis_client.pipeline_execute(_build)
             
             # 5. Verificar que todas las operaciones fueron exitosas
             success = all(results[:3])  # Las primeras 3 operaciones deben ser exitosas
             
+            # Los workers que cachearon "no revocado" deben volver a consultar Redis
+            await publish_invalidation("blacklist", user_id=user_id, jti=jti)
+            
             if success:
                 logger.info(f"Token {jti} blacklisted successfully for user {user_id}, reason: {reason}")
             else:
@@ -124,6 +128,15 @@ class BlacklistService:
         Returns:
             True si el token está blacklisteado
         """
+        use_l1 = local_cache_active()
+        l1_key = blacklist_l1_key(jti, user_id)
+        if use_l1:
+            local_result = blacklist_l1.get(l1_key)
+            if local_result is not None:
+                return local_result
+        # Antes de leer Redis: si se invalida durante la lectura no se guarda en el L1
+        l1_version = blacklist_l1.version
+
         try:
             token_key = f"{self.token_blacklist_prefix}{jti}"
             
@@ -142,8 +155,12 @@ class BlacklistService:
                         logger.warning(f"Token {jti} in blacklist but not associated with user {user_id}")
                         return False
                 
+                if use_l1:
+                    blacklist_l1.set(l1_key, True, version=l1_version)
                 return True
             
+            if use_l1:
+                blacklist_l1.set(l1_key, False, ttl=settings.LOCAL_CACHE_BLACKLIST_NEGATIVE_TTL_SECONDS, version=l1_version)
             return False
             
         except Exception as e:
@@ -168,14 +185,15 @@ class BlacklistService:
             metadata_key = f"{self.blacklist_metadata_prefix}{jti}"
             
             # Usar pipeline para operación atómica
-            async with redis_client.pipeline() as pipe:
+            def _build(pipe):
                 pipe.delete(token_key)
                 pipe.srem(user_tokens_key, jti)
                 pipe.delete(metadata_key)
-                
-                results = await pipe.execute()
             
-            removed = results[0] > 0  # Si se deletó al menos 1 key
+            results = await redis_client.pipeline_execute(_build)
+            
+            await publish_invalidation("blacklist", user_id=user_id, jti=jti)
+            removed = bool(results) and results[0] > 0  # Si se deletó al menos 1 key
             
             if removed:
                 logger.info(f"Token {jti} removed from blacklist for user {user_id}")
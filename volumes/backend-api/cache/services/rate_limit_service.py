@@ -2,16 +2,139 @@
 volumes/backend-api/cache/services/rate_limit_service.py
 Servicio de rate limiting usando Redis con algoritmo sliding window
 """
+import asyncio
+import math
 import time
+import uuid
+from collections import OrderedDict
 from utils.log_helper import setup_logger
 from typing import Optional, Dict, Any, Tuple, List
 
-from cache.redis_client import redis_client, redis_fallback
+from cache.redis_client import redis_client
 from core.config import settings
 
 
 logger = setup_logger(__name__)
 
+# ==========================================
+# SCRIPTS LUA (UN ROUND-TRIP, ATÓMICOS)
+# ==========================================
+# La hora la pone el servidor (TIME) para que todos los workers compartan reloj.
+# Ambos devuelven {allowed, remaining, reset_ms}.
+
+# KEYS[1] = zset de la ventana; ARGV = limit, window_ms, member, increment (0/1)
+# Cada request es un miembro único con score en milisegundos; los rechazados no se agregan.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+local allowed = 0
+if count < limit then
+    allowed = 1
+    if ARGV[4] == '1' then
+        redis.call('ZADD', key, now, ARGV[3])
+        redis.call('PEXPIRE', key, window + 1000)
+        count = count + 1
+    end
+end
+
+local reset = now + window
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window
+end
+return {allowed, limit - count, reset}
+"""
+
+# KEYS[1] = hash {tokens, ts}; ARGV = capacity, window_ms, increment (0/1)
+# Recarga capacity tokens por ventana; admite ráfagas de hasta capacity requests.
+_TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local capacity = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local rate = capacity / window
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local allowed = 0
+if tokens >= 1 then
+    allowed = 1
+    if ARGV[3] == '1' then
+        tokens = tokens - 1
+    end
+end
+if ARGV[3] == '1' then
+    redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, window + 1000)
+end
+
+local reset
+if allowed == 1 then
+    reset = now + math.ceil((capacity - tokens) / rate)
+else
+    reset = now + math.ceil((1 - tokens) / rate)
+end
+return {allowed, math.floor(tokens), reset}
+"""
+
+SLIDING_WINDOW = "sliding_window"
+TOKEN_BUCKET = "token_bucket"
+
+# Modos que pueden resolver una decisión (métricas en /system/status)
+MODE_REDIS = "redis"
+MODE_LOCAL = "local"
+MODE_OPEN = "open"
+
+
+class LocalRateLimiter:
+    """
+    Token bucket en memoria del worker para cuando Redis no está disponible.
+    
+    Aproximado: cada worker admite limit / RATE_LIMIT_WORKERS por ventana, así que
+    entre todos quedan cerca del límite global sin coordinarse.
+    """
+    
+    def __init__(self, workers: int, max_keys: int):
+        self.workers = max(1, workers)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+    
+    def check(self, key: str, limit: int, window_seconds: int, increment: bool = True) -> Tuple[bool, int, int]:
+        capacity = max(1, math.ceil(limit / self.workers))
+        rate = capacity / window_seconds  # tokens por segundo
+        now = time.monotonic()
+        
+        bucket = self._buckets.get(key)
+        tokens = float(capacity) if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        
+        allowed = tokens >= 1
+        if increment:
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        
+        wait = (capacity - tokens) / rate if allowed else (1 - tokens) / rate
+        return allowed, int(tokens), math.ceil(time.time() + wait)
+    
+    def clear(self) -> None:
+        self._buckets.clear()
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+
 
 class RateLimitService:
     """
@@ -19,7 +142,7 @@ class RateLimitService:
     - Rate limiting general por IP
     - Rate limiting específico para login
     - Rate limiting por usuario autenticado
-    - Sliding window para distribución uniforme
+    - Sliding window para distribución uniforme (o token bucket, ver RATE_LIMIT_ALGORITHM)
     - Burst protection
     """
     
@@ -28,6 +151,18 @@ class RateLimitService:
         self.default_requests_per_minute = settings.RATE_LIMIT_REQUESTS_PER_MINUTE
         self.default_login_attempts_per_hour = settings.RATE_LIMIT_LOGIN_ATTEMPTS_PER_HOUR
         self.default_window = settings.RATE_LIMIT_WINDOW
+        self.default_algorithm = settings.RATE_LIMIT_ALGORITHM
+        
+        # Fallback local cuando Redis no responde
+        self.local_fallback_enabled = settings.RATE_LIMIT_LOCAL_FALLBACK_ENABLED
+        self.local_limiter = LocalRateLimiter(settings.RATE_LIMIT_WORKERS, settings.RATE_LIMIT_LOCAL_MAX_KEYS)
+        self.redis_probe_seconds = settings.RATE_LIMIT_REDIS_PROBE_SECONDS
+        self.mode = MODE_REDIS
+        self.mode_switches = 0
+        self.decisions = {MODE_REDIS: 0, MODE_LOCAL: 0, MODE_OPEN: 0}
+        self.rejections = {MODE_REDIS: 0, MODE_LOCAL: 0}
+        self._probe_task: Optional[asyncio.Task] = None
+        self._last_probe = 0.0
         
         # Configuración de burst protection
         self.burst_threshold = 10  # Máximo burst antes de aplicar penalización
@@ -37,104 +172,174 @@ class RateLimitService:
     # RATE LIMITING PRINCIPAL
     # ==========================================
     
-    @redis_fallback((True, 999, int(time.time()) + 60))  # Si Redis falla, permitir con límites altos
     async def check_rate_limit(
         self,
         key: str,
         limit: int,
         window_seconds: int = 60,
-        increment: bool = True
+        increment: bool = True,
+        algorithm: str = SLIDING_WINDOW
     ) -> Tuple[bool, int, int]:
         """
-        Verificar y aplicar rate limiting usando sliding window
+        Verificar y aplicar rate limiting (ver check_rate_limit_with_mode)
+        """
+        allowed, remaining, reset_time, _ = await self.check_rate_limit_with_mode(
+            key, limit, window_seconds, increment, algorithm
+        )
+        return allowed, remaining, reset_time
+    
+    async def check_rate_limit_with_mode(
+        self,
+        key: str,
+        limit: int,
+        window_seconds: int = 60,
+        increment: bool = True,
+        algorithm: str = SLIDING_WINDOW
+    ) -> Tuple[bool, int, int, str]:
+        """
+        Verificar y aplicar rate limiting con un script Lua atómico.
+        Si Redis no está disponible decide el limitador local del worker.
         
         Args:
             key: Clave única para el rate limit (IP, user_id, etc.)
             limit: Número máximo de requests permitidos
             window_seconds: Ventana de tiempo en segundos
             increment: Si incrementar el contador (False para solo verificar)
+            algorithm: sliding_window o token_bucket
         
         Returns:
-            Tuple (allowed, remaining, reset_time)
+            Tuple (allowed, remaining, reset_time, mode)
             - allowed: Si el request está permitido
             - remaining: Requests restantes en la ventana
-            - reset_time: Timestamp cuando se resetea la ventana
+            - reset_time: Timestamp en que vuelve a haber cupo (rechazado) o se libera la ventana
+            - mode: Quién decidió (redis, local u open); self.mode es global y puede
+              cambiar por otro request mientras este espera
         """
         if not key or limit <= 0:
-            return True, limit, int(time.time()) + window_seconds
+            return True, limit, int(time.time()) + window_seconds, MODE_REDIS
+        
+        if not redis_client.is_available:
+            # Sin esperar al reintento/reconexión de redis_client en cada request
+            return self._check_degraded(key, limit, window_seconds, increment)
         
         try:
-            current_time = int(time.time())
-            window_start = current_time - window_seconds
-            rate_limit_key = f"rate_limit:{key}"
+            window_ms = window_seconds * 1000
+            flag = 1 if increment else 0
             
-            # Usar pipeline para operaciones atómicas
-            async with redis_client.pipeline() as pipe:
-                # 1. Limpiar entradas antiguas fuera de la ventana
-                pipe.zremrangebyscore(rate_limit_key, 0, window_start)
-                
-                # 2. Contar requests actuales en la ventana
-                pipe.zcard(rate_limit_key)
-                
-                # 3. Si se debe incrementar, agregar request actual
-                if increment:
-                    pipe.zadd(rate_limit_key, {str(current_time): current_time})
-                
-                # 4. Establecer expiración de la clave
-                pipe.expire(rate_limit_key, window_seconds + 60)  # TTL extra para cleanup
-                
-                results = await pipe.execute()
-            
-            # Obtener el conteo actual (después de limpiar entries antiguos)
-            current_count = results[1] if len(results) > 1 else 0
+            if algorithm == TOKEN_BUCKET:
+                result = await redis_client.run_script(
+                    _TOKEN_BUCKET_LUA, [f"token_bucket:{key}"], [limit, window_ms, flag]
+                )
+            else:
+                result = await redis_client.run_script(
+                    _SLIDING_WINDOW_LUA, [f"rate_limit:{key}"], [limit, window_ms, uuid.uuid4().hex, flag]
+                )
             
-            # Si se incrementó, incluir el nuevo request en el conteo
-            if increment and current_count < limit:
-                current_count += 1
+            if not result:
+                # Redis se cayó durante la operación
+                return self._check_degraded(key, limit, window_seconds, increment)
             
-            # Determinar si está permitido
-            allowed = current_count <= limit
-            remaining = max(0, limit - current_count)
-            reset_time = current_time + window_seconds
+            allowed = int(result[0]) == 1
+            remaining = max(0, int(result[1]))
+            reset_time = math.ceil(int(result[2]) / 1000)
+            self._set_mode(MODE_REDIS)
+            self._record_decision(MODE_REDIS, allowed)
             
             # Log para debugging
             if not allowed:
-                logger.warning(f"Rate limit exceeded for key {key}: {current_count}/{limit}")
+                logger.warning(f"Rate limit exceeded for key {key}: limit {limit}/{window_seconds}s ({algorithm})")
             else:
-                logger.debug(f"Rate limit check for key {key}: {current_count}/{limit}")
+                logger.debug(f"Rate limit check for key {key}: {limit - remaining}/{limit}")
             
-            return allowed, remaining, reset_time
+            return allowed, remaining, reset_time, MODE_REDIS
             
         except Exception as e:
             logger.error(f"Error in rate limit check for key {key}: {e}")
-            # En caso de error, permitir el request (fail open)
-            return True, limit - 1, int(time.time()) + window_seconds
+            return self._check_degraded(key, limit, window_seconds, increment)
+    
+    # ==========================================
+    # FALLBACK LOCAL (REDIS DEGRADADO)
+    # ==========================================
+    
+    def _check_degraded(self, key: str, limit: int, window_seconds: int, increment: bool) -> Tuple[bool, int, int, str]:
+        """
+        Decidir sin Redis: limitador local del worker, o fail open si está deshabilitado
+        """
+        if not self.local_fallback_enabled:
+            self._set_mode(MODE_OPEN)
+            self._record_decision(MODE_OPEN, True)
+            return True, limit, int(time.time()) + window_seconds, MODE_OPEN
+        
+        self._set_mode(MODE_LOCAL)
+        self._schedule_redis_probe()
+        allowed, remaining, reset_time = self.local_limiter.check(key, limit, window_seconds, increment)
+        self._record_decision(MODE_LOCAL, allowed)
+        if not allowed:
+            logger.warning(f"Rate limit (local) exceeded for key {key}: limit {limit}/{window_seconds}s")
+        return allowed, remaining, reset_time, MODE_LOCAL
+    
+    def _record_decision(self, mode: str, allowed: bool) -> None:
+        self.decisions[mode] += 1
+        if not allowed:
+            self.rejections[mode] += 1
+    
+    def _set_mode(self, mode: str) -> None:
+        if mode == self.mode:
+            return
+        logger.warning(f"Rate limiting cambia de modo {self.mode} -> {mode}")
+        self.mode = mode
+        self.mode_switches += 1
+        if mode == MODE_REDIS:
+            # Los buckets locales no aplican a la próxima caída
+            self.local_limiter.clear()
+    
+    def _schedule_redis_probe(self) -> None:
+        """
+        Reintentar la conexión en segundo plano; redis_client deja de reconectar
+        solo tras agotar sus intentos y sin esto nunca se volvería a modo redis.
+        """
+        now = time.monotonic()
+        if self._probe_task and not self._probe_task.done():
+            return
+        if now - self._last_probe < self.redis_probe_seconds:
+            return
+        self._last_probe = now
+        self._probe_task = asyncio.create_task(self._probe_redis())
+    
+    async def _probe_redis(self) -> None:
+        try:
+            if await redis_client.probe():
+                logger.info("Redis disponible de nuevo para rate limiting")
+        except Exception as e:
+            logger.debug(f"Probe de Redis para rate limiting falló: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "algorithm": self.default_algorithm,
+            "local_fallback_enabled": self.local_fallback_enabled,
+            "workers": self.local_limiter.workers,
+            "local_keys": len(self.local_limiter),
+            "mode_switches": self.mode_switches,
+            "decisions": dict(self.decisions),
+            "rejections": dict(self.rejections),
+        }
     
     async def check_burst_protection(self, key: str, window_seconds: int = 60) -> bool:
         """
         Verificar protección contra burst de requests
         """
         try:
-            burst_key = f"burst:{key}"
-            current_time = int(time.time())
-            
-            # Contar requests en los últimos 10 segundos
-            burst_window_start = current_time - 10
-            
-            async with redis_client.pipeline() as pipe:
-                pipe.zremrangebyscore(burst_key, 0, burst_window_start)
-                pipe.zcard(burst_key)
-                pipe.expire(burst_key, 60)
-                
-                results = await pipe.execute()
-            
-            burst_count = results[1] if len(results) > 1 else 0
+            # Contar (y registrar) requests en los últimos 10 segundos
+            result = await redis_client.run_script(
+                _SLIDING_WINDOW_LUA, [f"burst:{key}"], [self.burst_threshold, 10_000, uuid.uuid4().hex, 1]
+            )
             
             # Si hay demasiados requests en burst, aplicar penalización
-            if burst_count >= self.burst_threshold:
+            if result and int(result[0]) == 0:
                 penalty_key = f"penalty:{key}"
                 await redis_client.setex(penalty_key, self.burst_penalty_seconds, "burst_detected")
-                logger.warning(f"Burst protection activated for key {key}: {burst_count} requests in 10s")
+                logger.warning(f"Burst protection activated for key {key}: {self.burst_threshold}+ requests in 10s")
                 return False
             
             return True
@@ -162,11 +367,19 @@ class RateLimitService:
         """
         Rate limiting general (por IP, usuario, etc.)
         """
+        allowed, remaining, reset_time, _ = await self.check_general_rate_limit_with_mode(identifier)
+        return allowed, remaining, reset_time
+    
+    async def check_general_rate_limit_with_mode(self, identifier: str) -> Tuple[bool, int, int, str]:
+        """
+        Rate limiting general, indicando además el modo que decidió
+        """
         key = f"general_{identifier}"
-        return await self.check_rate_limit(
+        return await self.check_rate_limit_with_mode(
             key=key,
             limit=self.default_requests_per_minute,
-            window_seconds=self.default_window
+            window_seconds=self.default_window,
+            algorithm=self.default_algorithm
         )
     
     async def check_login_rate_limit(self, identifier: str) -> Tuple[bool, int, int]:
@@ -341,13 +554,13 @@ class RateLimitService:
             current_time = int(time.time())
             
             # Obtener información del rate limit
-            async with redis_client.pipeline() as pipe:
+            def _build(pipe):
                 pipe.zcard(rate_limit_key)
                 pipe.ttl(rate_limit_key)
                 pipe.exists(f"penalty:{key}")
                 pipe.ttl(f"penalty:{key}")
-                
-                results = await pipe.execute()
+            
+            results = await redis_client.pipeline_execute(_build) or [0, 0, 0, 0]
             
             current_count = results[0] if results[0] else 0
             ttl = results[1] if results[1] and results[1] > 0 else 0
@@ -428,12 +641,14 @@ class RateLimitService:
         """
         try:
             rate_limit_key = f"rate_limit:{key}"
+            token_bucket_key = f"token_bucket:{key}"
             penalty_key = f"penalty:{key}"
             failed_key = f"failed_login:{key}"
             login_penalty_key = f"login_penalty:{key}"
             
             deleted = await redis_client.delete(
                 rate_limit_key,
+                token_bucket_key,
                 penalty_key,
                 failed_key,
                 login_penalty_key
@@ -549,6 +764,13 @@ async def get_login_stats(hours: int = 24) -> Dict[str, Any]:
     return await rate_limit_service.get_login_stats(hours)
 
 
+def get_rate_limit_stats() -> Dict[str, Any]:
+    """
+    Modo actual y decisiones por modo de este worker
+    """
+    return rate_limit_service.get_stats()
+
+
 # ==========================================
 # DECORADORES PARA ENDPOINTS ESPECÍFICOS
 # ==========================================
@@ -0,0 +1,310 @@
+"""
+volumes/backend-api/cache/services/report_cache.py
+Cache en Redis de payloads de reportes, con invalidacion por dia y sucursal
+
+- Key: reporte + filtros normalizados (rango de fechas, sucursales, vista).
+- TTL largo si el rango ya termino y TTL corto si incluye el dia actual (UTC,
+  igual que business_date).
+- Cada entrada queda indexada en report:cache:idx:{dia}:{sucursal|all}. Cerrar,
+  anular o devolver una venta borra solo las entradas que cubren ese dia y esa
+  sucursal, despues del commit de la transaccion.
+- Cada (dia, sucursal|all) tiene su generacion en report:cache:gen:{dia}:{sucursal|all},
+  que la invalidacion incrementa junto con el borrado. Un calculo solo se guarda si
+  no cambio la generacion de ninguno de los dias/sucursales que cubre (script Lua),
+  asi un calculo lento no reescribe datos anteriores a la invalidacion y una venta
+  de hoy no descarta un reporte del mes pasado.
+- Reconstruir el rollup incrementa report:cache:epoch: las entradas de otra
+  epoca se ignoran aunque su TTL siga vigente y los calculos en curso no se guardan.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from cache.redis_client import redis_client, serialize_value
+from core.config import settings
+from utils.log_helper import setup_logger
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+_PENDING_KEY = "report_cache_invalidations"
+
+# Guarda la entrada y sus indices solo si nadie invalido esos dias/sucursales
+# (ni todo el cache) desde que empezo el calculo.
+# KEYS: epoca, entrada, indices..., generaciones... (mismo orden que los indices)
+# ARGV: epoca leida, ttl, valor, ttl indices, generaciones leidas...
+_STORE_IF_CURRENT_LUA = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+  return 0
+end
+local scopes = (#KEYS - 2) / 2
+for i = 1, scopes do
+  if (redis.call('GET', KEYS[2 + scopes + i]) or '0') ~= ARGV[4 + i] then
+    return 0
+  end
+end
+redis.call('SETEX', KEYS[2], ARGV[2], ARGV[3])
+for i = 3, 2 + scopes do
+  redis.call('SADD', KEYS[i], KEYS[2])
+  redis.call('EXPIRE', KEYS[i], ARGV[4])
+end
+return 1
+"""
+_background_tasks: set = set()
+
+
+class ReportCacheService:
+    """
+    Cache de resultados de reportes con fallback directo al calculo
+    """
+
+    def __init__(self):
+        self.enabled = settings.REPORT_CACHE_ENABLED
+        self.past_ttl = settings.REPORT_CACHE_PAST_TTL_SECONDS
+        self.live_ttl = settings.REPORT_CACHE_LIVE_TTL_SECONDS
+        # Rangos mas largos no se cachean: el indice por dia seria demasiado grande.
+        self.max_indexed_days = 400
+
+        # Prefijos de Redis keys
+        self.entry_prefix = "report:cache:entry:"
+        self.index_prefix = "report:cache:idx:"
+        # Sin TTL: una key por dia y sucursal con ventas; si venciera durante un
+        # calculo y otra invalidacion la recreara, el valor podria volver a coincidir
+        self.generation_prefix = "report:cache:gen:"
+        self.epoch_key = "report:cache:epoch"
+
+        # Contadores del proceso, expuestos en /system/status
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.invalidated_entries = 0
+        self.stale_discards = 0
+
+    # ==========================================
+    # KEYS Y TTL
+    # ==========================================
+
+    def build_key(self, report_kind: str, date_from: date, date_to: date, warehouse_ids: Iterable[int], **filters: Any) -> str:
+        """
+        Key determinista: mismos filtros en otro orden o con duplicados -> misma entrada
+        """
+        normalized = {
+            "from": date_from.isoformat(),
+            "to": date_to.isoformat(),
+            "wh": sorted({int(w) for w in warehouse_ids or []}),
+            **{k: str(v).lower() for k, v in sorted(filters.items()) if v is not None},
+        }
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+        return f"{self.entry_prefix}{report_kind}:{digest}"
+
+    def ttl_for(self, date_to: date) -> int:
+        today = datetime.now(timezone.utc).date()
+        return self.past_ttl if date_to < today else self.live_ttl
+
+    @staticmethod
+    def _scope(day: date, warehouse_id: Optional[int]) -> str:
+        return f"{day.isoformat()}:{warehouse_id if warehouse_id else 'all'}"
+
+    def _index_key(self, day: date, warehouse_id: Optional[int]) -> str:
+        return f"{self.index_prefix}{self._scope(day, warehouse_id)}"
+
+    def _scopes_for(self, date_from: date, date_to: date, warehouse_ids: List[int]) -> List[str]:
+        """
+        (dia, sucursal|all) que cubre un reporte: los mismos que indexan la entrada
+        """
+        scopes = []
+        day = date_from
+        while day <= date_to:
+            for warehouse_id in (warehouse_ids or [None]):
+                scopes.append(self._scope(day, warehouse_id))
+            day += timedelta(days=1)
+        return scopes
+
+    def _count(self, report_kind: str, field: str) -> None:
+        stats = self._stats.setdefault(report_kind, {"hits": 0, "misses": 0})
+        stats[field] += 1
+
+    # ==========================================
+    # LECTURA / ESCRITURA
+    # ==========================================
+
+    async def get_or_compute(
+        self,
+        report_kind: str,
+        date_from: date,
+        date_to: date,
+        warehouse_ids: List[int],
+        compute: Callable[[], Awaitable[dict]],
+        **filters: Any,
+    ) -> dict:
+        """
+        Devolver el payload cacheado o calcularlo y guardarlo.
+        Si Redis falla, el reporte se calcula igual.
+        """
+        if not self.enabled or (date_to - date_from).days >= self.max_indexed_days:
+            return await compute()
+
+        cache_key = self.build_key(report_kind, date_from, date_to, warehouse_ids, **filters)
+        try:
+            cached, epoch = await redis_client.mget([cache_key, self.epoch_key])
+        except Exception as e:
+            logger.warning(f"Error leyendo cache de reporte {report_kind}: {e}")
+            return await compute()
+
+        epoch = int(epoch or 0)
+        if isinstance(cached, dict) and cached.get("epoch") == epoch:
+            self._count(report_kind, "hits")
+            return cached["payload"]
+
+        self._count(report_kind, "misses")
+        scopes = self._scopes_for(date_from, date_to, warehouse_ids)
+        try:
+            # Antes de calcular: lo que se invalide durante el calculo cambia estas generaciones
+            generations = await redis_client.mget([f"{self.generation_prefix}{scope}" for scope in scopes])
+        except Exception as e:
+            logger.warning(f"Error leyendo generaciones de reporte {report_kind}: {e}")
+            # Sin generaciones leidas no se puede validar el guardado
+            return await compute()
+
+        payload = await compute()
+        await self._store(cache_key, payload, epoch, scopes, [int(g or 0) for g in generations], date_to)
+        return payload
+
+    async def _store(
+        self,
+        cache_key: str,
+        payload: dict,
+        epoch: int,
+        scopes: List[str],
+        generations: List[int],
+        date_to: date,
+    ) -> None:
+        index_keys = [f"{self.index_prefix}{scope}" for scope in scopes]
+        generation_keys = [f"{self.generation_prefix}{scope}" for scope in scopes]
+
+        try:
+            stored = await redis_client.run_script(
+                _STORE_IF_CURRENT_LUA,
+                keys=[self.epoch_key, cache_key, *index_keys, *generation_keys],
+                # El indice vive lo mismo que la entrada mas larga que referencia.
+                args=[
+                    str(epoch),
+                    self.ttl_for(date_to),
+                    serialize_value({"epoch": epoch, "payload": payload}),
+                    self.past_ttl,
+                    *(str(g) for g in generations),
+                ],
+            )
+        except Exception as e:
+            logger.warning(f"Error guardando cache de reporte {cache_key}: {e}")
+            return
+        if stored == 0:
+            self.stale_discards += 1
+
+    # ==========================================
+    # INVALIDACION
+    # ==========================================
+
+    async def invalidate_sales(self, targets: Iterable[Tuple[Optional[date], Optional[int]]]) -> int:
+        """
+        Borrar las entradas que cubren (dia, sucursal). Un reporte filtrado por la
+        sucursal o sin filtro de sucursal ("all") incluye esa venta.
+        """
+        scopes = set()
+        for day, warehouse_id in targets:
+            day = day or datetime.now(timezone.utc).date()
+            scopes.add(self._scope(day, None))
+            if warehouse_id:
+                scopes.add(self._scope(day, warehouse_id))
+        if not scopes:
+            return 0
+        index_keys = [f"{self.index_prefix}{scope}" for scope in scopes]
+
+        try:
+            entry_keys = set()
+            for index_key in index_keys:
+                entry_keys.update(await redis_client.smembers(index_key))
+
+            def _build(pipe):
+                pipe.delete(*entry_keys, *index_keys)
+                for scope in scopes:
+                    pipe.incr(f"{self.generation_prefix}{scope}")
+
+            results = await redis_client.pipeline_execute(_build, transaction=True)
+            deleted = results[0] if results else 0
+        except Exception as e:
+            logger.warning(f"Error invalidando cache de reportes: {e}")
+            return 0
+
+        self.invalidated_entries += len(entry_keys)
+        if entry_keys:
+            logger.debug(f"Cache de reportes: {len(entry_keys)} entradas invalidadas")
+        return deleted
+
+    async def invalidate_all(self) -> None:
+        """
+        Descartar todas las entradas (p. ej. tras reconstruir el rollup). Las
+        existentes quedan huerfanas hasta que venza su TTL.
+        """
+        try:
+            await redis_client.incr(self.epoch_key)
+        except Exception as e:
+            logger.warning(f"Error invalidando todo el cache de reportes: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(s["hits"] for s in self._stats.values())
+        misses = sum(s["misses"] for s in self._stats.values())
+        total = hits + misses
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "invalidated_entries": self.invalidated_entries,
+            "stale_discards": self.stale_discards,
+            "by_report": {kind: dict(s) for kind, s in self._stats.items()},
+        }
+
+
+# ==========================================
+# INSTANCIA GLOBAL
+# ==========================================
+
+report_cache_service = ReportCacheService()
+
+
+# ==========================================
+# FUNCIONES DE CONVENIENCIA
+# ==========================================
+
+def invalidate_sales_reports_on_commit(session, business_date: Optional[date], warehouse_id: Optional[int]) -> None:
+    """
+    Registrar (dia, sucursal) para invalidar cuando la sesion haga commit.
+    Invalidar antes del commit dejaria una ventana para re-cachear datos viejos.
+    """
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    if not pending:
+        loop = asyncio.get_running_loop()
+
+        def _after_commit(_sync_session):
+            targets = session.info.pop(_PENDING_KEY, set())
+            if targets:
+                task = loop.create_task(report_cache_service.invalidate_sales(targets))
+                _background_tasks.add(task)
+                task.add_done_callback(_background_tasks.discard)
+
+        def _after_rollback(_sync_session):
+            session.info.pop(_PENDING_KEY, None)
+
+        event.listen(session.sync_session, "after_commit", _after_commit, once=True)
+        event.listen(session.sync_session, "after_rollback", _after_rollback, once=True)
+    pending.add((business_date, warehouse_id))
+
+
+def get_report_cache_stats() -> Dict[str, Any]:
+    """
+    Contadores de hit/miss del cache de reportes
+    """
+    return report_cache_service.stats()
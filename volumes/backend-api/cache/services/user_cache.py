@@ -7,6 +7,7 @@ from utils.log_helper import setup_logger
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 
+from cache.local_cache import local_cache_active, permissions_l1, publish_invalidation, user_secret_l1
 from cache.redis_client import redis_client
 from core.config import settings
 from core.constants import RedisKeys
@@ -16,6 +17,17 @@ from core.exceptions import CacheException
 # Configurar logger
 logger = setup_logger(__name__)
 
+# Miembro fijo de todo snapshot de rol; no es un permiso y se descarta al resolver
+_EMPTY_SNAPSHOT_MARKER = "~"
+
+
+def _role_version_key(role_code: str) -> str:
+    return f"perm:role:{role_code}:version"
+
+
+def _role_snapshot_key(role_code: str, version: int) -> str:
+    return f"perm:role:{role_code}:v{version}"
+
 
 class UserCacheService:
     """
@@ -54,6 +66,14 @@ class UserCacheService:
             logger.warning("get_user_secret called with invalid user_id")
             return None
         
+        use_l1 = local_cache_active()
+        if use_l1:
+            local_secret = user_secret_l1.get(str(user_id))
+            if local_secret is not None:
+                return local_secret
+        # Antes de leer Redis/BD: si se invalida durante la lectura no se guarda en el L1
+        l1_version = user_secret_l1.version
+
         try:
             # 1. Intentar desde cache primero
             cache_key = RedisKeys.user_secret(user_id)
@@ -61,6 +81,8 @@ class UserCacheService:
             
             if cached_secret is not None:
                 logger.debug(f"User secret cache HIT for user {user_id}")
+                if use_l1:
+                    user_secret_l1.set(str(user_id), cached_secret, version=l1_version)
                 return cached_secret
             
             logger.debug(f"User secret cache MISS for user {user_id}")
@@ -73,6 +95,8 @@ class UserCacheService:
                     # Cachear para próximas consultas
                     await self._cache_user_secret(user_id, db_secret)
                     logger.debug(f"User secret cached from DB for user {user_id}")
+                    if use_l1:
+                        user_secret_l1.set(str(user_id), db_secret, version=l1_version)
                 
                 return db_secret
             
@@ -102,7 +126,10 @@ class UserCacheService:
         Returns:
             True si se cacheó exitosamente
         """
-        return await self._cache_user_secret(user_id, user_secret)
+        cached = await self._cache_user_secret(user_id, user_secret)
+        # Secret nuevo: los workers no deben seguir validando con el anterior
+        await publish_invalidation("user_secret", user_id=user_id)
+        return cached
     
     async def invalidate_user_secret(self, user_id: int) -> bool:
         """
@@ -117,6 +144,8 @@ class UserCacheService:
         try:
             cache_key = RedisKeys.user_secret(user_id)
             deleted = await redis_client.delete(cache_key)
+            # Despues del delete: un worker que recargue desde Redis ya no ve el valor viejo
+            await publish_invalidation("user_secret", user_id=user_id)
             
             if deleted:
                 logger.info(f"User secret cache invalidated for user {user_id}")
@@ -287,7 +316,7 @@ class UserCacheService:
             from sqlalchemy import select
             from database.database import db_manager
             
-            async with db_manager.get_session() as session:
+            async with db_manager.get_async_session() as session:
                 stmt = select(
                     User.id,
                     User.username,
@@ -323,40 +352,60 @@ class UserCacheService:
         """
         Obtener roles y permisos de usuario desde cache
         
+        La entrada del usuario guarda sus roles, sus permisos directos y la versión
+        de cada rol con la que se resolvió. Si algún rol cambió de versión, los
+        permisos se recomponen desde los snapshots por rol sin ir a BD.
+        
         Args:
             user_id: ID del usuario
             
         Returns:
             Dict con 'roles' y 'permissions' como listas
         """
+        use_l1 = local_cache_active()
+        if use_l1:
+            local_permissions = permissions_l1.get(str(user_id))
+            if local_permissions is not None:
+                # Copia: quien modifique el resultado no debe alterar el L1
+                return {
+                    "roles": list(local_permissions["roles"]),
+                    "permissions": list(local_permissions["permissions"]),
+                }
+        l1_version = permissions_l1.version
+
         try:
 
             cache_key = f"user:permissions:{user_id}"
-            cached_permissions = await redis_client.get(cache_key)
-            
-            if cached_permissions:
-                # Verificar que el cache tenga datos útiles (roles o permisos no vacíos)
-                roles = cached_permissions.get("roles", [])
-                permissions = cached_permissions.get("permissions", [])
-                
-                if roles or permissions:  # Solo retornar si tiene al menos roles o permisos
-                    logger.debug(f"User permissions cache HIT for user {user_id}")
-                    return cached_permissions
-                else:
-                    logger.debug(f"User permissions cache HIT but empty for user {user_id}, falling back to DB")
-            
-            logger.debug(f"User permissions cache MISS for user {user_id}")
-            
-            # Fallback a BD
-            if self.enable_db_fallback:
-                db_permissions = await self._fetch_user_permissions_from_db(user_id)
-                
-                if db_permissions:
-                    await self._cache_user_permissions(user_id, db_permissions)
-                
-                return db_permissions
-            
-            return {"roles": [], "permissions": []}
+            entry = await redis_client.get(cache_key)
+            
+            # Entradas sin role_versions son del formato anterior: se recalculan
+            if not isinstance(entry, dict) or "role_versions" not in entry or not (
+                entry.get("roles") or entry.get("direct_permissions")
+            ):
+                logger.debug(f"User permissions cache MISS for user {user_id}")
+                if not self.enable_db_fallback:
+                    return {"roles": [], "permissions": []}
+                entry = await self._fetch_user_grants_from_db(user_id)
+            
+            roles = entry.get("roles", [])
+            role_versions = await self._get_role_versions(roles)
+            
+            if entry.get("role_versions") == role_versions and "permissions" in entry:
+                logger.debug(f"User permissions cache HIT for user {user_id}")
+            else:
+                entry["permissions"] = await self._resolve_permissions(
+                    roles, role_versions, entry.get("direct_permissions", [])
+                )
+                entry["role_versions"] = role_versions
+                await self._cache_user_permissions(user_id, entry)
+            
+            result = {"roles": roles, "permissions": entry["permissions"]}
+            if use_l1 and (result["roles"] or result["permissions"]):
+                permissions_l1.set(str(user_id), {
+                    "roles": list(result["roles"]),
+                    "permissions": list(result["permissions"]),
+                }, version=l1_version)
+            return result
             
         except Exception as e:
             logger.error(f"Error getting user permissions for {user_id}: {e}")
@@ -375,12 +424,16 @@ class UserCacheService:
         """
         Cachear roles y permisos de usuario
         """
+        # Sin separar permisos directos de heredados no se puede versionar:
+        # la entrada queda sin role_versions y la próxima lectura la recompone
         permissions_data = {
             "roles": roles,
             "permissions": permissions
         }
             
-        return await self._cache_user_permissions(user_id, permissions_data)
+        cached = await self._cache_user_permissions(user_id, permissions_data)
+        await publish_invalidation("permissions", user_id=user_id)
+        return cached
     
     async def invalidate_user_permissions(self, user_id: int) -> bool:
         """
@@ -389,6 +442,8 @@ class UserCacheService:
         try:
             cache_key = f"user:permissions:{user_id}"
             deleted = await redis_client.delete(cache_key)
+            # Despues del delete: un worker que recargue desde Redis ya no ve el valor viejo
+            await publish_invalidation("permissions", user_id=user_id)
             
             if deleted:
                 logger.info(f"User permissions cache invalidated for user {user_id}")
@@ -443,6 +498,94 @@ class UserCacheService:
                 "_cached_at": datetime.now(timezone.utc).isoformat()
             }
 
+    async def _fetch_user_grants_from_db(self, user_id: int) -> Dict[str, Any]:
+        """Roles y permisos directos del usuario, sin expandir los roles"""
+        from services.permissions_service import permissions_service
+        
+        return await permissions_service.get_user_grants(user_id)
+    
+    # ==========================================
+    # SNAPSHOTS DE PERMISOS POR ROL
+    # ==========================================
+    # perm:role:{code}:version  contador INCR, sin TTL
+    # perm:role:{code}:v{n}     SET con los permisos del rol en la versión n
+    # Editar un rol solo incrementa su versión: las entradas de usuario que la
+    # referencian dejan de coincidir y se recomponen con SUNION de snapshots.
+    
+    async def _get_role_versions(self, role_codes: List[str]) -> Dict[str, int]:
+        """Versión vigente de cada rol en un solo MGET (0 si nunca se editó)"""
+        if not role_codes:
+            return {}
+        values = await redis_client.mget([_role_version_key(code) for code in role_codes])
+        return {code: int(value or 0) for code, value in zip(role_codes, values)}
+    
+    async def _resolve_permissions(
+        self,
+        role_codes: List[str],
+        role_versions: Dict[str, int],
+        direct_permissions: List[str]
+    ) -> List[str]:
+        """
+        Unión de los snapshots de los roles más los permisos directos.
+        Los snapshots que faltan se construyen desde BD en una sola consulta.
+        """
+        permissions = set(direct_permissions)
+        if not role_codes:
+            return sorted(permissions)
+        
+        snapshot_keys = [_role_snapshot_key(code, role_versions.get(code, 0)) for code in role_codes]
+        
+        def _build(pipe):
+            for key in snapshot_keys:
+                pipe.exists(key)
+            pipe.sunion(snapshot_keys)
+        
+        results = await redis_client.pipeline_execute(_build)
+        if results:
+            present, union_members = results[:-1], results[-1]
+            permissions.update(union_members)
+        else:
+            present = [0] * len(role_codes)
+        
+        missing = [code for code, exists in zip(role_codes, present) if not exists]
+        if missing:
+            from services.permissions_service import permissions_service
+            
+            snapshots = await permissions_service.get_roles_permissions(missing)
+            await self._store_role_snapshots(snapshots, role_versions)
+            for role_permissions in snapshots.values():
+                permissions.update(role_permissions)
+        
+        permissions.discard(_EMPTY_SNAPSHOT_MARKER)
+        return sorted(permissions)
+    
+    async def _store_role_snapshots(self, snapshots: Dict[str, List[str]], role_versions: Dict[str, int]) -> None:
+        """Guardar snapshots bajo la versión con la que se leyeron (MULTI para no exponer uno a medias)"""
+        def _build(pipe):
+            for role_code, role_permissions in snapshots.items():
+                key = _role_snapshot_key(role_code, role_versions.get(role_code, 0))
+                pipe.delete(key)
+                # La marca permite guardar roles sin permisos (Redis no tiene sets vacíos)
+                pipe.sadd(key, _EMPTY_SNAPSHOT_MARKER, *role_permissions)
+                pipe.expire(key, self.permission_ttl)
+        
+        if snapshots:
+            await redis_client.pipeline_execute(_build, transaction=True)
+    
+    async def bump_role_version(self, role_code: str) -> Optional[int]:
+        """
+        Publicar un cambio en los permisos de un rol: O(1) en vez de invalidar a
+        cada usuario. El snapshot anterior caduca solo por TTL.
+        """
+        version = await redis_client.incr(_role_version_key(role_code))
+        if version is None:
+            logger.warning(f"No se pudo incrementar la versión del rol {role_code}")
+        else:
+            logger.info(f"Role {role_code} permissions version bumped to {version}")
+        
+        # Las entradas L1 ya resueltas no consultan versiones
+        await publish_invalidation("permissions_all", role_code=role_code)
+        return version
 
     # ==========================================
     # OPERACIONES BATCH Y OPTIMIZACIÓN
@@ -508,14 +651,14 @@ class UserCacheService:
             from sqlalchemy import select
             from database.database import db_manager
             
-            async with db_manager.get_session() as session:
+            async with db_manager.get_async_session() as session:
                 stmt = select(User.id, User.secret).where(User.id.in_(user_ids))
                 result = await session.execute(stmt)
                 
                 # Convertir a dict
                 secrets_dict = {}
                 for row in result.fetchall():
-                    secrets_dict[row.id] = row.user_secret
+                    secrets_dict[row.id] = row.secret
                 
                 # Asegurar que todos los user_ids estén en el resultado
                 for user_id in user_ids:
@@ -546,6 +689,9 @@ class UserCacheService:
             
             # Usar pipeline para eficiencia
             deleted_count = await redis_client.delete(*keys_to_delete)
+
+            # Despues del delete: un worker que recargue desde Redis ya no ve el valor viejo
+            await publish_invalidation("user", user_id=user_id)
             
             logger.info(f"Invalidated {deleted_count} cache keys for user {user_id}")
             
@@ -559,23 +705,11 @@ class UserCacheService:
         """
         Invalidar cache de permisos para usuarios que tienen un rol específico
         
-        Nota: Esta operación puede ser costosa. En producción considera usar
-        un patrón pub/sub para notificar cambios de roles.
+        Basta con incrementar la versión del rol: cada entrada de usuario detecta
+        el cambio en su siguiente lectura.
         """
         try:
-            # En una implementación real, tendrías una lista de usuarios por rol
-            # Por ahora, invalidaremos usando un patrón de key
-            
-            pattern = "user:permissions:*"
-            keys = await redis_client.keys(pattern)
-            
-            if keys:
-                deleted_count = await redis_client.delete(*keys)
-                logger.info(f"Invalidated {deleted_count} permission cache keys due to role {role_code} change")
-                return deleted_count > 0
-            
-            return True
-            
+            return await self.bump_role_version(role_code) is not None
         except Exception as e:
             logger.error(f"Error invalidating cache for role {role_code}: {e}")
             return False
@@ -767,6 +901,13 @@ async def invalidate_user_permissions(user_id: int) -> bool:
     return await user_cache_service.invalidate_user_permissions(user_id)
 
 
+async def invalidate_role_permissions(role_code: str) -> bool:
+    """
+    Invalidar permisos de todos los usuarios de un rol (incrementa su versión)
+    """
+    return await user_cache_service.invalidate_users_by_role_change(role_code)
+
+
 # ==========================================
 # FUNCIONES ADMINISTRATIVAS
 # ==========================================
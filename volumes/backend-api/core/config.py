@@ -69,6 +69,16 @@ class Settings:
     DOCS_API_URL: Optional[str] = os.getenv("DOCS_API_URL")
     TASKS_API_URL: Optional[str] = os.getenv("TASKS_API_URL")
     GOTENBERG_URL: str = os.getenv("GOTENBERG_URL", "http://gotenberg:3000")
+    GOTENBERG_MAX_CONCURRENCY: int = int(os.getenv("GOTENBERG_MAX_CONCURRENCY") or "4")
+    GOTENBERG_TIMEOUT_SECONDS: int = int(os.getenv("GOTENBERG_TIMEOUT_SECONDS") or "60")
+    GOTENBERG_QUEUE_TIMEOUT_SECONDS: int = int(os.getenv("GOTENBERG_QUEUE_TIMEOUT_SECONDS") or "30")
+    GOTENBERG_PDF_CACHE_MAX_MB: int = int(os.getenv("GOTENBERG_PDF_CACHE_MAX_MB") or "64")
+    GOTENBERG_PDF_CACHE_TTL_SECONDS: int = int(os.getenv("GOTENBERG_PDF_CACHE_TTL_SECONDS") or "600")
+
+    # ====== Cache de reportes (Redis) ======
+    REPORT_CACHE_ENABLED: bool = os.getenv("REPORT_CACHE_ENABLED", "true").lower() == "true"
+    REPORT_CACHE_PAST_TTL_SECONDS: int = int(os.getenv("REPORT_CACHE_PAST_TTL_SECONDS") or "604800")
+    REPORT_CACHE_LIVE_TTL_SECONDS: int = int(os.getenv("REPORT_CACHE_LIVE_TTL_SECONDS") or "60")
 
     # ====== Inventory alerts ======
     INVENTORY_EXPIRY_ALERTS_ENABLED: bool = os.getenv("INVENTORY_EXPIRY_ALERTS_ENABLED", "true").lower() == "true"
@@ -89,9 +99,22 @@ class Settings:
     MINIO_PUBLIC_SECURE: bool = os.getenv("MINIO_PUBLIC_SECURE", os.getenv("MINIO_SECURE", "false")).lower() == "true"
     MINIO_REGION: str = os.getenv("MINIO_REGION", "us-east-1")
     MEDIA_PRESIGNED_EXPIRE_SECONDS: int = int(os.getenv("MEDIA_PRESIGNED_EXPIRE_SECONDS") or "3600")
+    MINIO_REPORTS_BUCKET: str = os.getenv("MINIO_REPORTS_BUCKET", "reports")
+
+    # ====== Report jobs (PDF en segundo plano) ======
+    REPORT_JOBS_ENABLED: bool = os.getenv("REPORT_JOBS_ENABLED", "true").lower() == "true"
+    REPORT_JOBS_CONCURRENCY: int = int(os.getenv("REPORT_JOBS_CONCURRENCY") or "2")
+    REPORT_JOBS_POLL_SECONDS: int = int(os.getenv("REPORT_JOBS_POLL_SECONDS") or "5")
+    REPORT_JOBS_STALE_SECONDS: int = int(os.getenv("REPORT_JOBS_STALE_SECONDS") or "900")
+    REPORT_JOBS_MAX_ATTEMPTS: int = int(os.getenv("REPORT_JOBS_MAX_ATTEMPTS") or "3")
+    # Espera antes de reintentar con Gotenberg caido: base * 2^(intento-1), con tope
+    REPORT_JOBS_RETRY_BASE_SECONDS: int = int(os.getenv("REPORT_JOBS_RETRY_BASE_SECONDS") or "30")
+    REPORT_JOBS_RETRY_MAX_SECONDS: int = int(os.getenv("REPORT_JOBS_RETRY_MAX_SECONDS") or "900")
     
     # ====== Configuraciones adicionales ======
     DEBUG_MODE: bool = os.getenv("BACKEND_API_DEBUG_MODE", "false").lower() == "true"
+    # Loguea consultas del engine sincrono (PyMySQL) ejecutadas en el hilo del event loop
+    DB_BLOCKING_CALL_DETECTOR: bool = os.getenv("DB_BLOCKING_CALL_DETECTOR", str(DEBUG_MODE)).lower() == "true"
     LOG_DIR = os.getenv("BACKEND_API_LOG_DIR", "/var/log/app")
     LOG_LEVEL = os.getenv("BACKEND_API_LOG_LEVEL", "INFO").upper()
     LOG_FILE_NAME = os.getenv("BACKEND_API_LOG_FILE_NAME", "app.log")
@@ -104,8 +127,36 @@ class Settings:
     RATE_LIMIT_REQUESTS_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_REQUESTS_PER_MINUTE") or "60")
     RATE_LIMIT_LOGIN_ATTEMPTS_PER_HOUR: int = int(os.getenv("RATE_LIMIT_LOGIN_ATTEMPTS_PER_HOUR") or "10")
     RATE_LIMIT_WINDOW: int = int(os.getenv("RATE_LIMIT_WINDOW") or "60")
+    # sliding_window (conteo exacto en la ventana) | token_bucket (tolera rafagas hasta el limite)
+    RATE_LIMIT_ALGORITHM: str = os.getenv("RATE_LIMIT_ALGORITHM", "sliding_window").lower()
+    # Limitador local por worker cuando Redis no esta disponible (en lugar de fail open)
+    RATE_LIMIT_LOCAL_FALLBACK_ENABLED: bool = os.getenv("RATE_LIMIT_LOCAL_FALLBACK_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_WORKERS: int = int(os.getenv("RATE_LIMIT_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1")
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS") or "10000")
+    RATE_LIMIT_REDIS_PROBE_SECONDS: int = int(os.getenv("RATE_LIMIT_REDIS_PROBE_SECONDS") or "5")
+    # RateLimitMiddleware (limite general por IP). Apagado por defecto: detras de un proxy
+    # sin X-Forwarded-For todos los clientes comparten IP, y el login ya se limita en AuthHelper
+    RATE_LIMIT_MIDDLEWARE_ENABLED: bool = os.getenv("RATE_LIMIT_MIDDLEWARE_ENABLED", "false").lower() == "true"
     MAX_LOGIN_ATTEMPTS: int = int(os.getenv("MAX_LOGIN_ATTEMPTS") or "5")
+    # bcrypt en pool de procesos por worker; con mas de workers + cola pendientes responde 503
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS") or "2")
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE") or "32")
     LOCKOUT_DURATION_MINUTES: int = int(os.getenv("LOCKOUT_DURATION_MINUTES") or "15")
+    # Ultima actividad de sesiones: se acumula por worker y se escribe en lote cada N segundos
+    SESSION_ACTIVITY_FLUSH_SECONDS: int = int(os.getenv("SESSION_ACTIVITY_FLUSH_SECONDS") or "15")
+    SESSION_ACTIVITY_MAX_PENDING: int = int(os.getenv("SESSION_ACTIVITY_MAX_PENDING") or "5000")
+    # Log de accesos a menus: cola en Redis volcada a menu_access_log por tiempo o tamaño
+    MENU_ACCESS_FLUSH_SECONDS: int = int(os.getenv("MENU_ACCESS_FLUSH_SECONDS") or "10")
+    MENU_ACCESS_BATCH_SIZE: int = int(os.getenv("MENU_ACCESS_BATCH_SIZE") or "500")
+    MENU_ACCESS_MAX_QUEUE: int = int(os.getenv("MENU_ACCESS_MAX_QUEUE") or "5000")
+    # Eventos SSE: buffer por worker enviado en lotes a /events/publish/batch del orquestador
+    EVENTS_PUBLISH_BATCH_SIZE: int = int(os.getenv("EVENTS_PUBLISH_BATCH_SIZE") or "100")
+    EVENTS_PUBLISH_FLUSH_MS: int = int(os.getenv("EVENTS_PUBLISH_FLUSH_MS") or "50")
+    EVENTS_PUBLISH_MAX_PENDING: int = int(os.getenv("EVENTS_PUBLISH_MAX_PENDING") or "2000")
+    EVENTS_PUBLISH_ENQUEUE_TIMEOUT_MS: int = int(os.getenv("EVENTS_PUBLISH_ENQUEUE_TIMEOUT_MS") or "200")
+    EVENTS_PUBLISH_RETRY_MAX: int = int(os.getenv("EVENTS_PUBLISH_RETRY_MAX") or "1000")
+    EVENTS_PUBLISH_RETRY_MAX_AGE_SECONDS: int = int(os.getenv("EVENTS_PUBLISH_RETRY_MAX_AGE_SECONDS") or "60")
+    EVENTS_PUBLISH_TIMEOUT_SECONDS: int = int(os.getenv("EVENTS_PUBLISH_TIMEOUT_SECONDS") or "2")
 
     REDIS_TTL_RESETPASS: int = int(os.getenv("REDIS_TTL_RESETPASS") or "15")
     RESET_PASSWORD_REQUESTS_PER_HOUR: int = int(os.getenv("RESET_PASSWORD_REQUESTS_PER_HOUR") or "3")
@@ -116,6 +167,13 @@ class Settings:
     # ====== Cache TTLs ======
     USER_SECRET_CACHE_TTL: int = int(os.getenv("USER_SECRET_CACHE_TTL") or "3600")
     TOKEN_BLACKLIST_TTL: int = int(os.getenv("TOKEN_BLACKLIST_TTL") or "1800")
+
+    # ====== Cache L1 en proceso (delante de Redis) ======
+    LOCAL_CACHE_ENABLED: bool = os.getenv("LOCAL_CACHE_ENABLED", "true").lower() == "true"
+    LOCAL_CACHE_MAX_ENTRIES: int = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES") or "10000")
+    LOCAL_CACHE_TTL_SECONDS: int = int(os.getenv("LOCAL_CACHE_TTL_SECONDS") or "300")
+    # TTL de "token no revocado": cota si se pierde un mensaje de pub/sub
+    LOCAL_CACHE_BLACKLIST_NEGATIVE_TTL_SECONDS: int = int(os.getenv("LOCAL_CACHE_BLACKLIST_NEGATIVE_TTL_SECONDS") or "15")
     
     # ====== JWT Refresh Token Settings ======
     JWT_REFRESH_TOKEN_ROTATION: bool = os.getenv("JWT_REFRESH_TOKEN_ROTATION", "false").lower() == "true"
@@ -32,9 +32,9 @@ class DatabaseHelper:
     
     @staticmethod
     async def execute_with_session(query_func, *args, **kwargs):
-        """Wrapper para manejo centralizado de sesiones"""
+        """Wrapper para manejo centralizado de sesiones (AsyncSession: query_func debe hacer await)"""
         try:
-            async with db_manager.get_session() as session:
+            async with db_manager.get_async_session() as session:
                 return await query_func(session, *args, **kwargs)
         except Exception as e:
             logger.error(f"Database operation failed: {e}")
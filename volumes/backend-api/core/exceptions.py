@@ -333,6 +333,20 @@ class CacheException(SystemException):
         )
 
 
+class ServiceUnavailableException(BaseAppException):
+    """Servicio temporalmente saturado o no disponible (503)"""
+    
+    def __init__(self, details: Optional[str] = None, retry_after: Optional[int] = None):
+        super().__init__(
+            message="Servicio no disponible",
+            error_code=ErrorCode.SYSTEM_SERVICE_UNAVAILABLE,
+            error_type=ErrorType.SYSTEM_ERROR,
+            status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+            details=details or "El servicio está temporalmente no disponible",
+            extra_data={"retry_after": retry_after} if retry_after else None
+        )
+
+
 class ConfigurationException(SystemException):
     """Error de configuración"""
     
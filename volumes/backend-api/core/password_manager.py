@@ -7,7 +7,7 @@ import secrets
 import bcrypt
 from typing import Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
-from .exceptions import ValidationException, SystemException
+from .exceptions import ValidationException, SystemException, ServiceUnavailableException
 from .constants import ErrorCode
 
 
@@ -149,6 +149,64 @@ class PasswordManager:
                 details=f"Error interno en verificación: {str(e)}"
             )
     
+    @classmethod
+    async def hash_password_async(cls, password: str) -> str:
+        """
+        Igual que hash_password, con bcrypt en el pool de procesos (no bloquea el loop)
+        
+        Raises:
+            ValidationException: Si la contraseña no es válida
+            ServiceUnavailableException: Si el pool está saturado (503)
+            SystemException: Si hay error en el proceso de hash
+        """
+        from .password_pool import hash_password_bytes
+        
+        validation_result = cls.validate_password_strength(password)
+        if not validation_result.is_valid:
+            mensajes = validation_result.errors + validation_result.suggestions
+            raise ValidationException(
+                message=mensajes,
+                error_code=ErrorCode.VALIDATION_PASSWORD_WEAK,
+                details=f"{validation_result.score} - {validation_result.errors} - {validation_result.suggestions}"
+            )
+        
+        try:
+            password_bytes = password.encode('utf-8') if isinstance(password, str) else password
+            return await hash_password_bytes(password_bytes, cls.BCRYPT_ROUNDS)
+        except ServiceUnavailableException:
+            raise
+        except Exception as e:
+            raise SystemException(
+                message="Error al procesar contraseña",
+                details=f"Error interno en hash: {str(e)}"
+            )
+    
+    @classmethod
+    async def verify_password_async(cls, password: str, password_hash: str) -> bool:
+        """
+        Igual que verify_password, con bcrypt en el pool de procesos (no bloquea el loop)
+        
+        Raises:
+            ServiceUnavailableException: Si el pool está saturado (503)
+            SystemException: Si hay error en el proceso de verificación
+        """
+        from .password_pool import check_password_bytes
+        
+        if not password or not password_hash:
+            return False
+        
+        try:
+            password_bytes = password.encode('utf-8') if isinstance(password, str) else password
+            hash_bytes = password_hash.encode('utf-8') if isinstance(password_hash, str) else password_hash
+            return await check_password_bytes(password_bytes, hash_bytes)
+        except ServiceUnavailableException:
+            raise
+        except Exception as e:
+            raise SystemException(
+                message="Error al verificar contraseña",
+                details=f"Error interno en verificación: {str(e)}"
+            )
+    
     @classmethod
     def validate_password_strength(cls, password: str) -> PasswordStrengthResult:
         """
@@ -446,6 +504,20 @@ def verify_user_password(password: str, password_hash: str) -> bool:
     return PasswordManager.verify_password(password, password_hash)
 
 
+async def hash_user_password_async(password: str) -> str:
+    """
+    Como hash_user_password, sin bloquear el event loop
+    """
+    return await PasswordManager.hash_password_async(password)
+
+
+async def verify_user_password_async(password: str, password_hash: str) -> bool:
+    """
+    Como verify_user_password, sin bloquear el event loop
+    """
+    return await PasswordManager.verify_password_async(password, password_hash)
+
+
 def validate_user_password(password: str) -> PasswordStrengthResult:
     """
     Función de conveniencia para validar contraseña de usuario
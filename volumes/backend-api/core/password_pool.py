@@ -0,0 +1,140 @@
+"""
+volumes/backend-api/core/password_pool.py
+Pool de procesos acotado para bcrypt: hash y verificación fuera del event loop
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+import bcrypt
+
+from .config import settings
+from .exceptions import ServiceUnavailableException
+
+
+# ==========================================
+# FUNCIONES EJECUTADAS EN LOS PROCESOS HIJOS
+# ==========================================
+# Deben ser funciones de módulo (picklables) y no tocar estado de la aplicación.
+
+def bcrypt_hash(password: bytes, rounds: int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds))
+
+
+def bcrypt_check(password: bytes, password_hash: bytes) -> bool:
+    return bcrypt.checkpw(password, password_hash)
+
+
+class PasswordHashPool:
+    """
+    ProcessPoolExecutor con límite de trabajos pendientes.
+
+    Un bcrypt de 12 rondas tarda ~250 ms de CPU: en el loop bloquea todo el worker.
+    Con el pool saturado se rechaza con 503 en vez de encolar sin límite.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_pending = self.workers + max(0, max_queue)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+        # Contadores expuestos en /system/status
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: no heredar sockets, locks ni el event loop del worker
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def start(self) -> None:
+        """Levantar los procesos en el startup para que el primer login no pague el spawn."""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(bcrypt_check, b"", bcrypt_hash(b"", 4))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _replace_broken(self, executor: ProcessPoolExecutor) -> None:
+        # Varios trabajos ven el mismo pool roto: solo el primero lo reemplaza
+        if self._executor is not executor:
+            return
+        self.restarts += 1
+        self._executor = None
+        # Liberar el thread de gestión y los hijos que sigan vivos del pool anterior
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise ServiceUnavailableException(
+                details="Demasiadas validaciones de contraseña en curso. Intente nuevamente",
+                retry_after=1,
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            try:
+                result = await loop.run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # Un hijo murió (OOM, kill): recrear el pool y reintentar una vez
+                self._replace_broken(executor)
+                result = await loop.run_in_executor(self._get_executor(), fn, *args)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self._pending -= 1
+        self.completed += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+            "started": self._executor is not None,
+        }
+
+
+# ==========================================
+# INSTANCIA GLOBAL (POR WORKER)
+# ==========================================
+
+password_hash_pool = PasswordHashPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+
+# ==========================================
+# FUNCIONES DE CONVENIENCIA
+# ==========================================
+
+async def hash_password_bytes(password: bytes, rounds: int) -> str:
+    return (await password_hash_pool.run(bcrypt_hash, password, rounds)).decode("utf-8")
+
+
+async def check_password_bytes(password: bytes, password_hash: bytes) -> bool:
+    return await password_hash_pool.run(bcrypt_check, password, password_hash)
+
+
+def get_password_pool_stats() -> Dict[str, Any]:
+    return password_hash_pool.stats()
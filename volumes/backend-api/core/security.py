@@ -48,6 +48,28 @@ class PasswordManager:
         except Exception:
             return False
     
+    async def hash_password_async(self, password: str) -> str:
+        """
+        Generar hash bcrypt en el pool de procesos (no bloquea el event loop)
+        """
+        from .password_pool import hash_password_bytes
+        # Mismas rondas que pwd_context, para que needs_update() no marque estos hashes
+        rounds = self.pwd_context.handler("bcrypt").default_rounds
+        return await hash_password_bytes(password.encode('utf-8'), rounds)
+    
+    async def verify_password_async(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verificar contraseña en el pool de procesos (no bloquea el event loop)
+        """
+        from .exceptions import ServiceUnavailableException
+        from .password_pool import check_password_bytes
+        try:
+            return await check_password_bytes(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+        except ServiceUnavailableException:
+            raise
+        except Exception:
+            return False
+    
     def needs_update(self, hashed_password: str) -> bool:
         """
         Verificar si el hash necesita actualización
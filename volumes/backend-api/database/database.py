@@ -5,7 +5,9 @@ Configuración de SQLAlchemy para la base de datos
 from utils.log_helper import setup_logger
 from typing import AsyncGenerator
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import traceback
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
@@ -26,6 +28,26 @@ logger = setup_logger(__name__)
 
 Base = declarative_base()
 
+
+def _warn_if_on_event_loop(statement: str) -> None:
+    """
+    El engine síncrono bloquea el hilo que lo llama; si ese hilo es el del event loop,
+    todas las requests del worker esperan a la consulta.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return  # Threadpool o scripts: no bloquea el loop
+    caller = next(
+        (
+            frame for frame in reversed(traceback.extract_stack()[:-1])
+            if "sqlalchemy" not in frame.filename and frame.filename != __file__
+        ),
+        None,
+    )
+    where = f"{caller.filename}:{caller.lineno} ({caller.name})" if caller else "desconocido"
+    logger.warning(f"Consulta síncrona en el hilo del event loop desde {where}: {statement[:200]}")
+
 # ==========================================
 # CONFIGURACIÓN DE ENGINES
 # ==========================================
@@ -175,6 +197,17 @@ class DatabaseManager:
         def set_async_mysql_mode(dbapi_connection, connection_record):
             configure_mysql_connection(dbapi_connection)
         
+        # ==========================================
+        # LISTENER: Detector de llamadas bloqueantes
+        # ==========================================
+        
+        # Solo el engine síncrono: el async ejecuta sobre el mismo hilo pero sin bloquearlo (greenlet)
+        if settings.DB_BLOCKING_CALL_DETECTOR:
+            
+            @event.listens_for(self._engine, "before_cursor_execute")
+            def detect_blocking_call(conn, cursor, statement, parameters, context, executemany):
+                _warn_if_on_event_loop(statement)
+        
         # ==========================================
         # LISTENER: Log de conexiones (solo en debug)
         # ==========================================
@@ -140,6 +140,7 @@ class SaleDocument(BaseModel):
 
     sale_code = Column(String(36), nullable=False, unique=True)
     status = Column(Enum(SaleStatus), nullable=False, default=SaleStatus.PENDING_CASHIER)
+    business_date = Column(Date, nullable=True, comment="Fecha comercial de la venta, fijada al cerrar en caja")
     document_type_code = Column(String(30), nullable=False, default="TICKET")
     document_type_name = Column(String(100), nullable=False, default="Ticket de venta")
     ticket_number = Column(String(60), nullable=True, unique=True)
@@ -179,6 +180,7 @@ class SaleDocument(BaseModel):
     __table_args__ = (
         Index("idx_sale_documents_sale_code", "sale_code"),
         Index("idx_sale_documents_status", "status"),
+        Index("idx_sale_documents_status_business_date", "status", "business_date", "warehouse_id"),
         Index("idx_sale_documents_ticket_number", "ticket_number"),
         Index("idx_sale_documents_sales_point_id", "sales_point_id"),
         Index("idx_sale_documents_cash_register_id", "cash_register_id"),
@@ -11,10 +11,13 @@ from datetime import datetime, timezone
 import traceback
 
 from middleware.main_middleware import TraceMiddleware, SimpleAuthMiddleware
+from middleware.rate_limit_middleware import RateLimitMiddleware
 from core.response import ResponseManager
 from core.constants import RESPONSE_MANAGER_AVAILABLE, PRIVATE_ROUTES, HTTPStatus
 from core.config import settings
+from core.exceptions import ServiceUnavailableException
 from services.inventory_expiry_scheduler import start_inventory_expiry_alert_scheduler, stop_inventory_expiry_alert_scheduler
+from services.report_jobs import start_report_job_runner, stop_report_job_runner
 from utils.router_loader import load_routers
 
 # ==========================================
@@ -94,6 +97,11 @@ app.add_middleware(TraceMiddleware)
 # Agregar middleware de autenticación
 app.add_middleware(SimpleAuthMiddleware)
 
+# Rate limiting general por IP, antes de autenticar. Queda deshabilitado salvo
+# RATE_LIMIT_MIDDLEWARE_ENABLED=true (ver core/config.py)
+if settings.RATE_LIMIT_MIDDLEWARE_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # CORS debe quedar como capa externa para cubrir tambien respuestas cortadas por middleware.
 app.add_middleware(
     CORSMiddleware,
@@ -339,6 +347,16 @@ async def root(request: Request):
 # ==========================================
 # MANEJO DE EXCEPCIONES GLOBAL
 # ==========================================
+@app.exception_handler(ServiceUnavailableException)
+async def service_unavailable_handler(request: Request, exc: ServiceUnavailableException):
+    """Saturación (p. ej. pool de bcrypt lleno): 503 con Retry-After, no 500"""
+    response = ResponseManager.from_exception(exc, request)
+    retry_after = (exc.extra_data or {}).get("retry_after")
+    if retry_after:
+        response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Manejador global de excepciones"""
@@ -395,6 +413,27 @@ async def _run_schema_migrations():
          "ALTER TABLE sales_points ADD COLUMN printer_paper_width_mm INT NOT NULL DEFAULT 80"),
         ("sales_points", "printer_api_key",
          "ALTER TABLE sales_points ADD COLUMN printer_api_key VARCHAR(19) NULL UNIQUE"),
+        ("sale_documents", "business_date",
+         "ALTER TABLE sale_documents ADD COLUMN business_date DATE NULL AFTER status"),
+        ("stock", "serial_number",
+         "ALTER TABLE stock ADD COLUMN serial_number VARCHAR(100) NULL AFTER expiry_date"),
+        ("stock", "dimension_key",
+         "ALTER TABLE stock ADD COLUMN dimension_key VARCHAR(400) AS ("
+         "CONCAT_WS('|', product_variant_id, warehouse_id, IFNULL(warehouse_zone_id, '~'), "
+         "IFNULL(warehouse_zone_location_id, '~'), IFNULL(batch_lot_number, '~'), "
+         "IFNULL(expiry_date, '~'), IFNULL(serial_number, '~'))) PERSISTENT"),
+        ("stock_unit_balances", "dimension_key",
+         "ALTER TABLE stock_unit_balances ADD COLUMN dimension_key VARCHAR(400) AS ("
+         "CONCAT_WS('|', product_variant_id, warehouse_id, IFNULL(warehouse_zone_id, '~'), "
+         "IFNULL(warehouse_zone_location_id, '~'), measurement_unit_id, IFNULL(batch_lot_number, '~'), "
+         "IFNULL(expiry_date, '~'), IFNULL(serial_number, '~'))) PERSISTENT"),
+        ("report_jobs", "next_attempt_at",
+         "ALTER TABLE report_jobs ADD COLUMN next_attempt_at TIMESTAMP NULL AFTER attempts"),
+    ]
+    # (table, index_name, ddl)
+    index_additions = [
+        ("sale_documents", "idx_sale_documents_status_business_date",
+         "ALTER TABLE sale_documents ADD INDEX idx_sale_documents_status_business_date (status, business_date, warehouse_id)"),
     ]
     drop_columns = [
         ("agreements", "deleted_at", "ALTER TABLE agreements DROP COLUMN deleted_at"),
@@ -474,15 +513,53 @@ async def _run_schema_migrations():
             INDEX idx_print_jobs_status (status),
             INDEX idx_print_jobs_deleted_at (deleted_at)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci""",
+        """CREATE TABLE IF NOT EXISTS sale_daily_rollups (
+            sale_date DATE NOT NULL,
+            warehouse_id BIGINT UNSIGNED NOT NULL DEFAULT 0,
+            status VARCHAR(20) NOT NULL,
+            document_type_code VARCHAR(30) NOT NULL DEFAULT '',
+            payment_method_code VARCHAR(20) NOT NULL DEFAULT '',
+            payment_method_name VARCHAR(100) NULL,
+            document_count INT NOT NULL DEFAULT 0,
+            total_amount DECIMAL(17,2) NOT NULL DEFAULT 0.00,
+            payment_count INT NOT NULL DEFAULT 0,
+            payment_amount DECIMAL(17,2) NOT NULL DEFAULT 0.00,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            PRIMARY KEY (sale_date, warehouse_id, status, document_type_code, payment_method_code),
+            INDEX idx_sale_daily_rollups_status_date (status, sale_date, warehouse_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci""",
+        """CREATE TABLE IF NOT EXISTS report_jobs (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            job_code VARCHAR(36) NOT NULL UNIQUE,
+            report_key VARCHAR(60) NOT NULL,
+            params JSON NOT NULL,
+            status ENUM('PENDING','RUNNING','COMPLETED','FAILED') NOT NULL DEFAULT 'PENDING',
+            progress TINYINT UNSIGNED NOT NULL DEFAULT 0,
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NULL,
+            requested_by_user_id BIGINT NULL,
+            chart_object_key VARCHAR(255) NULL,
+            bucket_name VARCHAR(100) NULL,
+            object_key VARCHAR(255) NULL,
+            file_name VARCHAR(255) NULL,
+            size_bytes BIGINT NULL,
+            error_message TEXT NULL,
+            started_at TIMESTAMP NULL,
+            completed_at TIMESTAMP NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_report_jobs_status_created (status, created_at),
+            INDEX idx_report_jobs_user_created (requested_by_user_id, created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci""",
     ]
     # DDL (CREATE TABLE) en sesión separada: en MySQL las DDL hacen commit implícito
     # y pueden dejar la sesión en estado inconsistente si se mezclan con DML.
     try:
         async with db_manager.get_async_session() as session:
             for ddl in new_tables:
-                table_name = ddl.strip().split("print_")[1].split(" ")[0] if "print_" in ddl else "?"
+                table_name = ddl.split("CREATE TABLE IF NOT EXISTS", 1)[1].split("(", 1)[0].strip()
                 await session.execute(_text(ddl))
-                print(f"✅ Table ensured: print_{table_name}")
+                print(f"✅ Table ensured: {table_name}")
     except Exception as exc:
         print(f"⚠️  Error creando tablas nuevas: {exc}")
 
@@ -534,9 +611,90 @@ async def _run_schema_migrations():
                 if f"'{new_value}'" not in col_type:
                     await session.execute(_text(ddl))
                     print(f"✅ ENUM extended: {table}.{column} += '{new_value}'")
+            for table, index_name, ddl in index_additions:
+                result = await session.execute(
+                    _text(
+                        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND INDEX_NAME = :i"
+                    ),
+                    {"t": table, "i": index_name},
+                )
+                if result.scalar() == 0:
+                    await session.execute(_text(ddl))
+                    print(f"✅ Index created: {table}.{index_name}")
     except Exception as exc:
         print(f"⚠️  Migration check failed: {exc}")
 
+    # Unicidad por dimension_key (services/stock_ledger.py). Se consolidan los duplicados
+    # en la fila de menor id antes de crear el indice; bloque aparte para que un fallo
+    # aqui no impida el resto de las migraciones.
+    stock_key_indexes = [
+        ("stock", "uk_stock_dimension_key", "SUM(current_quantity) AS current_quantity, SUM(reserved_quantity) AS reserved_quantity",
+         "t.current_quantity = d.current_quantity, t.reserved_quantity = d.reserved_quantity"),
+        ("stock_unit_balances", "uk_stock_unit_balance_dimension_key", "SUM(current_quantity) AS current_quantity",
+         "t.current_quantity = d.current_quantity"),
+    ]
+    try:
+        async with db_manager.get_async_session() as session:
+            for table, index_name, sums, assignments in stock_key_indexes:
+                result = await session.execute(
+                    _text(
+                        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :t AND INDEX_NAME = :i"
+                    ),
+                    {"t": table, "i": index_name},
+                )
+                if result.scalar() > 0:
+                    continue
+                await session.execute(_text(
+                    f"UPDATE {table} t JOIN (SELECT dimension_key, MIN(id) AS keep_id, {sums} "
+                    f"FROM {table} GROUP BY dimension_key HAVING COUNT(*) > 1) d ON d.keep_id = t.id "
+                    f"SET {assignments}"
+                ))
+                merged = await session.execute(_text(
+                    f"DELETE t FROM {table} t JOIN {table} k ON k.dimension_key = t.dimension_key AND k.id < t.id"
+                ))
+                if table == "stock":
+                    await session.execute(_text(
+                        "ALTER TABLE stock DROP INDEX IF EXISTS uk_stock_inventory_dimensions, "
+                        "ADD INDEX IF NOT EXISTS idx_stock_variant_warehouse (product_variant_id, warehouse_id)"
+                    ))
+                await session.execute(_text(f"ALTER TABLE {table} ADD UNIQUE KEY {index_name} (dimension_key)"))
+                print(f"✅ Index created: {table}.{index_name} ({merged.rowcount or 0} duplicate rows merged)")
+    except Exception as exc:
+        print(f"⚠️  Stock dimension key migration failed: {exc}")
+
+    # Backfill de business_date por bloques: cada bloque en su propia transaccion para no
+    # bloquear sale_documents. updated_at = updated_at evita que ON UPDATE mueva la fecha.
+    try:
+        backfilled = 0
+        while True:
+            async with db_manager.get_async_session() as session:
+                result = await session.execute(_text(
+                    "UPDATE sale_documents "
+                    "SET business_date = DATE(COALESCE(updated_at, created_at)), updated_at = updated_at "
+                    "WHERE business_date IS NULL AND status IN ('CLOSED', 'CANCELLED') "
+                    "LIMIT 5000"
+                ))
+            backfilled += result.rowcount or 0
+            if (result.rowcount or 0) < 5000:
+                break
+        if backfilled:
+            print(f"✅ Backfill applied: sale_documents.business_date ({backfilled} rows)")
+    except Exception as exc:
+        print(f"⚠️  business_date backfill failed: {exc}")
+
+    try:
+        from services.sales_rollup import ensure_sales_rollup_backfilled
+        backfill = await ensure_sales_rollup_backfilled()
+        if backfill:
+            # Después del commit: los reportes cacheados no reflejan el rollup nuevo
+            from cache.services.report_cache import report_cache_service
+            await report_cache_service.invalidate_all()
+            print(f"✅ Sales rollup backfilled: {backfill}")
+    except Exception as exc:
+        print(f"⚠️  Sales rollup backfill failed: {exc}")
+
 
 @app.on_event("startup")
 async def startup_event():
@@ -565,11 +723,52 @@ async def startup_event():
     except Exception as e:
         print(f"⚠️  Redis no disponible: {e}")
 
+    try:
+        from cache.local_cache import local_cache_invalidator
+        local_cache_invalidator.start()
+        print("✅ Cache L1 en proceso con invalidación por pub/sub")
+    except Exception as e:
+        print(f"⚠️  Cache L1 no disponible: {e}")
+
+    try:
+        from core.password_pool import password_hash_pool
+        password_hash_pool.start()
+        print(f"✅ Pool de bcrypt con {password_hash_pool.workers} procesos")
+    except Exception as e:
+        print(f"⚠️  Pool de bcrypt no disponible: {e}")
+
+    try:
+        from services.session_activity import session_activity_buffer
+        session_activity_buffer.start()
+        print(f"✅ Actividad de sesiones en lote cada {session_activity_buffer.flush_seconds}s")
+    except Exception as e:
+        print(f"⚠️  Buffer de actividad de sesiones no disponible: {e}")
+
+    try:
+        from services.menu_access_recorder import menu_access_recorder
+        menu_access_recorder.start()
+        print(f"✅ Log de accesos a menús en lote cada {menu_access_recorder.flush_seconds}s")
+    except Exception as e:
+        print(f"⚠️  Log diferido de accesos a menús no disponible: {e}")
+
+    try:
+        from services.event_publisher import event_publisher
+        event_publisher.start()
+        print(f"✅ Publicación de eventos SSE en lotes de hasta {event_publisher.batch_size}")
+    except Exception as e:
+        print(f"⚠️  Publicador de eventos SSE en lote no disponible: {e}")
+
     try:
         start_inventory_expiry_alert_scheduler()
         print("✅ Scheduler de alertas de vencimiento activo")
     except Exception as e:
         print(f"⚠️  Scheduler de alertas de vencimiento no disponible: {e}")
+
+    try:
+        start_report_job_runner()
+        print("✅ Runner de reportes en segundo plano activo")
+    except Exception as e:
+        print(f"⚠️  Runner de reportes en segundo plano no disponible: {e}")
     
     print("✅ API iniciada correctamente")
     print(f"🔒 Rutas protegidas configuradas: {PRIVATE_ROUTES}")
@@ -579,6 +778,25 @@ async def shutdown_event():
     """Eventos de cierre"""
     print("🛑 API cerrando...")
     
+    try:
+        from cache.local_cache import local_cache_invalidator
+        await local_cache_invalidator.stop()
+    except Exception:
+        pass
+
+    # Antes de cerrar la BD: volcar la actividad pendiente
+    try:
+        from services.session_activity import session_activity_buffer
+        await session_activity_buffer.stop()
+    except Exception:
+        pass
+
+    try:
+        from services.menu_access_recorder import menu_access_recorder
+        await menu_access_recorder.stop()
+    except Exception:
+        pass
+
     # Cerrar Redis
     try:
         from cache.redis_client import close_redis
@@ -591,6 +809,30 @@ async def shutdown_event():
         await stop_inventory_expiry_alert_scheduler()
     except Exception:
         pass
+
+    try:
+        await stop_report_job_runner()
+    except Exception:
+        pass
+
+    # Después del runner de reportes, que también publica eventos
+    try:
+        from services.event_publisher import event_publisher
+        await event_publisher.stop()
+    except Exception:
+        pass
+
+    try:
+        from core.password_pool import password_hash_pool
+        password_hash_pool.shutdown()
+    except Exception:
+        pass
+
+    try:
+        from services.gotenberg_client import close_gotenberg
+        await close_gotenberg()
+    except Exception:
+        pass
     
     print("✅ API cerrada correctamente")
 
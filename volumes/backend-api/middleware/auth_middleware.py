@@ -2,7 +2,8 @@
 volumes/backend-api/middleware/auth_middleware.py
 Middleware de autenticación JWT con doble secreto integrado a tu estructura existente
 """
-from typing import Optional, Dict, Any
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Tuple
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 
@@ -18,6 +19,87 @@ from core.exceptions import (
 )
 
 
+@dataclass
+class AuthContext:
+    """
+    Principal verificado de la request. Lo crea el middleware y lo reutilizan
+    get_current_user y los require_* sin volver a validar el token.
+    """
+    token: str
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.payload.get("user_id")
+
+    @property
+    def jti(self) -> Optional[str]:
+        return self.payload.get("jti")
+
+
+def get_auth_context(request: Request) -> Optional[AuthContext]:
+    """
+    Contexto de autenticación ya verificado para esta request (o None)
+    """
+    return getattr(request.state, "auth", None)
+
+
+async def _load_token_state(jti: str, user_id: int) -> Tuple[bool, Optional[str]]:
+    """
+    Blacklist y user secret desde el L1 del worker o, si falta alguno, en un solo
+    round-trip a Redis. Si Redis no responde se usan los servicios por separado,
+    que conservan su propio fallback (BD para el secret, rechazo para la blacklist).
+    """
+    from cache.local_cache import blacklist_l1, blacklist_l1_key, local_cache_active, user_secret_l1
+    from cache.redis_client import redis_client
+    from cache.services.blacklist_service import blacklist_service, is_token_blacklisted
+    from cache.services.user_cache import get_user_secret
+    from core.config import settings
+    from core.constants import RedisKeys
+
+    use_l1 = local_cache_active()
+    l1_key = blacklist_l1_key(jti, user_id)
+    if use_l1:
+        local_blacklisted = blacklist_l1.get(l1_key)
+        if local_blacklisted:
+            return True, None
+        local_secret = user_secret_l1.get(str(user_id))
+        if local_blacklisted is False and local_secret:
+            return False, local_secret
+    # Antes de leer Redis: una invalidacion durante la lectura deja fuera del L1 lo leido
+    blacklist_version = blacklist_l1.version
+    secret_version = user_secret_l1.version
+
+    state = None
+    if redis_client.is_available:
+        def _build(pipe):
+            pipe.exists(f"{blacklist_service.token_blacklist_prefix}{jti}")
+            pipe.sismember(f"{blacklist_service.user_tokens_prefix}{user_id}", jti)
+            pipe.get(RedisKeys.user_secret(user_id))
+
+        try:
+            state = await redis_client.pipeline_execute(_build)
+        except Exception:
+            state = None
+
+    if state:
+        in_blacklist, is_user_token, cached_secret = state
+        # Igual que is_token_blacklisted: solo cuenta si el jti pertenece al usuario
+        if in_blacklist and is_user_token:
+            if use_l1:
+                blacklist_l1.set(l1_key, True, version=blacklist_version)
+            return True, None
+        if use_l1:
+            blacklist_l1.set(l1_key, False, ttl=settings.LOCAL_CACHE_BLACKLIST_NEGATIVE_TTL_SECONDS, version=blacklist_version)
+            user_secret_l1.set(str(user_id), cached_secret, version=secret_version)
+        # Cache miss del secret: fallback a BD (y re-cacheo) del servicio
+        return False, cached_secret or await get_user_secret(user_id)
+
+    if await is_token_blacklisted(jti, user_id):
+        return True, None
+    return False, await get_user_secret(user_id)
+
+
 async def authenticate_request(request: Request) -> None:
     """
     Verifica la autenticación del usuario mediante JWT con doble secreto.
@@ -52,23 +134,17 @@ async def authenticate_request(request: Request) -> None:
             raise TokenInvalidException("Token sin identificador válido")
         
         # ==========================================
-        # 3. VERIFICAR BLACKLIST (REDIS)
+        # 3. BLACKLIST + USER SECRET (UN ROUND-TRIP A REDIS)
         # ==========================================
         
-        # Importación dinámica para evitar circular imports
-        from cache.services.blacklist_service import is_token_blacklisted
-        
-        if await is_token_blacklisted(jti, user_id):
+        blacklisted, user_secret = await _load_token_state(jti, user_id)
+        if blacklisted:
             raise TokenBlacklistedException("Token ha sido revocado")
         
         # ==========================================
-        # 4. OBTENER USER SECRET (CACHE/BD)
+        # 4. USER SECRET
         # ==========================================
         
-        # Importación dinámica para evitar circular imports
-        from cache.services.user_cache import get_user_secret
-        
-        user_secret = await get_user_secret(user_id)
         if not user_secret:
             raise AuthenticationException(
                 message="Error de autenticación",
@@ -119,6 +195,9 @@ async def authenticate_request(request: Request) -> None:
         request.state.token_issued_at = payload.get("iat")
         request.state.token_expires_at = payload.get("exp")
         
+        # Principal completo para get_current_user / require_*
+        request.state.auth = AuthContext(token=token, payload=payload)
+        
         # Flag de autenticación exitosa
         request.state.authenticated = True
         
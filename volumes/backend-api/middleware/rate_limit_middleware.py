@@ -44,48 +44,50 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # ==========================================
         
         client_ip = self._get_client_ip(request)
+        is_login = self._is_login_endpoint(path)
         
         try:
             # ==========================================
             # 3. APLICAR RATE LIMITING SEGÚN ENDPOINT
             # ==========================================
             
-            if self._is_login_endpoint(path):
+            if is_login:
                 await self._check_login_rate_limit(client_ip)
             else:
                 await self._check_general_rate_limit(client_ip, request)
             
-            # ==========================================
-            # 4. PROCESAR REQUEST
-            # ==========================================
-            
-            response = await call_next(request)
-            
-            # ==========================================
-            # 5. REGISTRAR REQUEST EXITOSO
-            # ==========================================
-            
-            if self._is_login_endpoint(path):
-                await self._record_login_attempt(client_ip, response.status_code)
-            else:
-                await self._record_general_request(client_ip, request)
-            
-            return response
-            
         except (TooManyRequestsException, TooManyLoginAttemptsException) as e:
             # ==========================================
-            # 6. MANEJAR RATE LIMIT EXCEEDED
+            # 4. MANEJAR RATE LIMIT EXCEEDED
             # ==========================================
             
             return ResponseManager.from_exception(e, request)
         
-        except Exception as e:
-            # ==========================================
-            # 7. MANEJAR ERRORES INESPERADOS
-            # ==========================================
-            
+        except Exception:
             # Si hay error en rate limiting, permitir request (fail open)
             return await call_next(request)
+        
+        # ==========================================
+        # 5. PROCESAR REQUEST
+        # ==========================================
+        
+        # Fuera del try: un error del endpoint no debe volver a ejecutarlo
+        response = await call_next(request)
+        
+        # ==========================================
+        # 6. REGISTRAR REQUEST Y HEADERS
+        # ==========================================
+        
+        try:
+            if is_login:
+                await self._record_login_attempt(client_ip, response.status_code)
+            else:
+                await self._record_general_request(client_ip, request)
+            await self._add_rate_limit_headers(response, request)
+        except Exception:
+            pass
+        
+        return response
     
     def _get_client_ip(self, request: Request) -> str:
         """
@@ -116,14 +118,13 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         Verificar rate limit general por IP
         """
         # Importación dinámica para evitar circular imports
-        from cache.services.rate_limit_service import check_rate_limit
+        from cache.services.rate_limit_service import rate_limit_service
         
-        key = f"general_{client_ip}"
-        allowed, remaining, reset_time = await check_rate_limit(
-            key=key,
-            limit=self.general_limit,
-            window_seconds=self.window_seconds
-        )
+        # Script Lua atómico; algoritmo según RATE_LIMIT_ALGORITHM.
+        # Con Redis degradado el servicio decide con el limitador local del worker.
+        # El modo viene con la decisión: rate_limit_service.mode es global al worker.
+        allowed, remaining, reset_time, mode = await rate_limit_service.check_general_rate_limit_with_mode(client_ip)
+        request.state.rate_limit_mode = mode
         
         if not allowed:
             retry_after = max(1, reset_time - int(time.time()))
@@ -177,6 +178,9 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             response.headers["X-RateLimit-Reset"] = str(request.state.rate_limit_reset)
         
         response.headers["X-RateLimit-Limit"] = str(self.general_limit)
+        
+        if hasattr(request.state, 'rate_limit_mode'):
+            response.headers["X-RateLimit-Mode"] = request.state.rate_limit_mode
 
 
 # ==========================================
@@ -12,7 +12,7 @@ from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
 from services.media_storage import media_storage
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 from utils.phone import normalize_phone_for_storage
 from utils.rut import validate_and_normalize_chilean_rut
 
@@ -242,11 +242,6 @@ RESOURCES = {
 }
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 DEFAULT_READ_PERMISSIONS = [
     "FOUNDATION_MAINTAINERS_ACCESS",
     "FOUNDATION_MAINTAINERS_MANAGE",
@@ -352,14 +347,14 @@ def _allowed_permissions(resource: str, mode: str) -> list[str]:
 
 
 def _ensure_resource_permission(user: dict, resource: str, mode: str, request: Request) -> None:
-    if not _has_any_permission(user, _allowed_permissions(resource, mode)):
+    if not has_any_permission(user, _allowed_permissions(resource, mode)):
         _permission_error(request)
 
 
 async def require_read(request: Request) -> dict:
     user = await get_current_user(request)
     allowed_permissions = DEFAULT_READ_PERMISSIONS + RESOURCE_PERMISSION_OVERRIDES["warehouse-zones"]["read"]
-    if _has_any_permission(user, allowed_permissions):
+    if has_any_permission(user, allowed_permissions):
         return user
     _permission_error(request)
 
@@ -367,7 +362,7 @@ async def require_read(request: Request) -> dict:
 async def require_write(request: Request) -> dict:
     user = await get_current_user(request)
     allowed_permissions = DEFAULT_WRITE_PERMISSIONS + RESOURCE_PERMISSION_OVERRIDES["warehouse-zones"]["write"]
-    if _has_any_permission(user, allowed_permissions):
+    if has_any_permission(user, allowed_permissions):
         return user
     _permission_error(request)
 
@@ -580,7 +575,7 @@ async def list_resources(request: Request, user: dict = Depends(require_read)):
     visible_resources = [
         resource
         for resource in RESOURCES.keys()
-        if _has_any_permission(user, _allowed_permissions(resource, "read"))
+        if has_any_permission(user, _allowed_permissions(resource, "read"))
     ]
     return ResponseManager.success(data=sorted(visible_resources), request=request)
 
@@ -21,6 +21,7 @@ from database.schemas.token import TokenValidateResponse
 from core.response import ResponseManager
 from core.constants import ErrorCode, HTTPStatus, JWTClaims
 from core.config import settings
+from core.exceptions import ServiceUnavailableException
 
 # Import del helper principal
 from utils.auth_helpers import (
@@ -490,7 +491,7 @@ async def change_password(
         from database import get_async_session
         from database.models.users import User
         from sqlalchemy import select, update
-        from core.password_manager import verify_user_password, hash_user_password
+        from core.password_manager import verify_user_password_async, hash_user_password_async
         
         async for db in get_async_session():
             # Obtener usuario de la BD
@@ -507,7 +508,7 @@ async def change_password(
                 )
             
             # Verificar contraseña actual
-            if not verify_user_password(password_data.current_password, user.password_hash):
+            if not await verify_user_password_async(password_data.current_password, user.password_hash):
                 return ResponseManager.error(
                     message="Contraseña actual incorrecta",
                     status_code=HTTPStatus.BAD_REQUEST,
@@ -518,7 +519,9 @@ async def change_password(
             
             # Generar hash de nueva contraseña
             try:
-                new_password_hash = hash_user_password(password_data.new_password)
+                new_password_hash = await hash_user_password_async(password_data.new_password)
+            except ServiceUnavailableException:
+                raise
             except Exception as e:
                 logger.error(f"Error en cambio de contraseña: {e}")
                 return ResponseManager.error(
@@ -579,6 +582,8 @@ async def change_password(
                 request=request
             )
         
+    except ServiceUnavailableException:
+        raise
     except Exception as e:
         logger.error(f"Error en cambio de contraseña: {e}")
         return ResponseManager.internal_server_error(
@@ -614,7 +619,7 @@ async def admin_change_password(
         from database import get_async_session
         from database.models.users import User
         from sqlalchemy import select
-        from core.password_manager import hash_user_password
+        from core.password_manager import hash_user_password_async
         
         async for db in get_async_session():
             # Obtener usuario target
@@ -631,7 +636,7 @@ async def admin_change_password(
                     request=request
                 )
             
-            new_password_hash = hash_user_password(admin_password_data.new_password)
+            new_password_hash = await hash_user_password_async(admin_password_data.new_password)
             changed_at = datetime.now(timezone.utc)
             
             old_password_set = bool(target_user.password_hash)
@@ -695,6 +700,8 @@ async def admin_change_password(
                 request=request
             )
         
+    except ServiceUnavailableException:
+        raise
     except Exception as e:
         logger.error(f"Error en cambio de contraseña admin: {e}")
         return ResponseManager.internal_server_error(
@@ -939,7 +946,7 @@ async def reset_password(
         from database import get_async_session
         from database.models.users import User
         from sqlalchemy import select, update
-        from core.password_manager import hash_user_password
+        from core.password_manager import hash_user_password_async
         
         async for db in get_async_session():
             # Buscar usuario por ID (ya validado en forgot-password)
@@ -958,7 +965,7 @@ async def reset_password(
                 )
             
             # Generar hash de nueva contraseña
-            new_password_hash = hash_user_password(reset_data.new_password)
+            new_password_hash = await hash_user_password_async(reset_data.new_password)
             
             # Actualizar contraseña
             await db.execute(
@@ -1005,6 +1012,8 @@ async def reset_password(
                 request=request
             )
         
+    except ServiceUnavailableException:
+        raise
     except Exception as e:
         logger.error(f"Error en reset password: {e}")
         return ResponseManager.internal_server_error(
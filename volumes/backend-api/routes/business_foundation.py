@@ -46,20 +46,15 @@ from database.schemas.business_foundation import (
 )
 from utils.code_generator import generate_sequential_code
 from utils.product_feature_flags import apply_product_flag_visibility, product_flag_visibility
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 from services.media_storage import media_storage
 
 router = APIRouter(tags=["Business Foundation"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def _require(request: Request, permissions: list[str], detail: str) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, permissions):
+    if has_any_permission(user, permissions):
         return user
     from fastapi import HTTPException
     import json
@@ -17,7 +17,7 @@ from database.schemas.cash_registers import CashRegisterCreate, CashRegisterUpda
 from utils.auth_helpers import get_client_ip
 from utils.code_generator import generate_sequential_code
 from utils.log_helper import setup_logger
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 logger = setup_logger(__name__)
 
@@ -33,14 +33,9 @@ router = APIRouter(
 )
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_cash_register_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["CASH_POS_ADMIN_ACCESS", "CASH_SETTINGS_MANAGE", "CASH_SETTINGS_ADMIN"]):
+    if has_any_permission(user, ["CASH_POS_ADMIN_ACCESS", "CASH_SETTINGS_MANAGE", "CASH_SETTINGS_ADMIN"]):
         return user
 
     logger.warning(
@@ -66,7 +61,7 @@ async def require_cash_register_read(request: Request) -> dict:
 
 async def require_cash_register_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["CASH_SETTINGS_MANAGE", "CASH_SETTINGS_ADMIN"]):
+    if has_any_permission(user, ["CASH_SETTINGS_MANAGE", "CASH_SETTINGS_ADMIN"]):
         return user
 
     logger.warning(
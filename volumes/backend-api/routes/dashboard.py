@@ -1,7 +1,6 @@
 """
 Resumen operacional para el dashboard principal.
 """
-import json
 from datetime import date, timedelta
 from decimal import Decimal
 
@@ -45,84 +44,6 @@ def _warehouse_filter_clause(alias: str = "sd") -> str:
     return f"AND (:warehouse_id IS NULL OR {alias}.warehouse_id = :warehouse_id)"
 
 
-def _money(value) -> float:
-    if value is None:
-        return 0.0
-    try:
-        return float(value)
-    except (TypeError, ValueError):
-        return 0.0
-
-
-def _payment_details(value) -> dict | list | None:
-    if isinstance(value, (dict, list)):
-        return value
-    if isinstance(value, str) and value.strip():
-        try:
-            return json.loads(value)
-        except json.JSONDecodeError:
-            return None
-    return None
-
-
-def _payment_amount(payment: dict) -> float:
-    foreign = payment.get("foreign_currency") if isinstance(payment.get("foreign_currency"), dict) else {}
-    agreement = payment.get("agreement") if isinstance(payment.get("agreement"), dict) else {}
-    check = payment.get("check") if isinstance(payment.get("check"), dict) else {}
-    return _money(
-        payment.get("clp_amount")
-        or payment.get("amount")
-        or foreign.get("clp_amount")
-        or agreement.get("amount")
-        or check.get("amount")
-        or payment.get("received_amount")
-    )
-
-
-def _summarize_payment_methods(rows: list[dict]) -> list[dict]:
-    summary: dict[str, dict] = {}
-
-    def add_payment(code: str | None, name: str | None, amount: float, sale_id) -> None:
-        if amount <= 0:
-            return
-        method_code = (code or "UNSPECIFIED").upper()
-        method_name = name or code or "Sin metodo"
-        entry = summary.setdefault(method_code, {
-            "method_name": method_name,
-            "method_code": method_code,
-            "transactions": 0,
-            "total": 0.0,
-            "_sale_ids": set(),
-        })
-        entry["method_name"] = method_name
-        entry["total"] += amount
-        entry["_sale_ids"].add(sale_id)
-        entry["transactions"] = len(entry["_sale_ids"])
-
-    for row in rows:
-        details = _payment_details(row.get("payment_details"))
-        if isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED":
-            for payment in details.get("payments") or []:
-                if not isinstance(payment, dict):
-                    continue
-                add_payment(
-                    payment.get("payment_method_code"),
-                    payment.get("payment_method_name"),
-                    _payment_amount(payment),
-                    row.get("id"),
-                )
-            continue
-
-        received = _money(row.get("amount_tendered") or row.get("total_amount")) - _money(row.get("change_amount"))
-        add_payment(row.get("payment_method_code"), row.get("payment_method_name"), received, row.get("id"))
-
-    result = []
-    for item in summary.values():
-        item.pop("_sale_ids", None)
-        result.append(item)
-    return sorted(result, key=lambda item: (-item["total"], -item["transactions"], item["method_name"]))
-
-
 @router.get("/summary", response_class=JSONResponse)
 async def get_dashboard_summary(
     request: Request,
@@ -138,6 +59,7 @@ async def get_dashboard_summary(
     params = {
         "date_from": date_from,
         "date_to": date_to,
+        "date_to_next": date_to + timedelta(days=1),
         "previous_from": previous_from,
         "previous_to": previous_to,
         "today": date.today(),
@@ -160,14 +82,13 @@ async def get_dashboard_summary(
         today_stats = _row(await session.execute(text(
             f"""
             SELECT
-              COALESCE(SUM(sd.total_amount), 0) AS sales_total,
-              COUNT(*) AS transactions,
-              COALESCE(ROUND(AVG(sd.total_amount)), 0) AS avg_ticket
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) = :today
-              {_warehouse_filter_clause("sd")}
+              COALESCE(SUM(r.total_amount), 0) AS sales_total,
+              COALESCE(SUM(r.document_count), 0) AS transactions,
+              COALESCE(ROUND(SUM(r.total_amount) / NULLIF(SUM(r.document_count), 0)), 0) AS avg_ticket
+            FROM sale_daily_rollups r
+            WHERE r.status = 'CLOSED'
+              AND r.sale_date = :today
+              {_warehouse_filter_clause("r")}
             """
         ), params))
 
@@ -195,36 +116,34 @@ async def get_dashboard_summary(
         daily_sales = _rows(await session.execute(text(
             f"""
             SELECT
-              DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
-              sd.warehouse_id,
+              r.sale_date,
+              NULLIF(r.warehouse_id, 0) AS warehouse_id,
               COALESCE(w.warehouse_name, 'Sin sucursal') AS warehouse_name,
-              COALESCE(SUM(sd.total_amount), 0) AS total,
-              COUNT(*) AS transactions
-            FROM sale_documents sd
-            LEFT JOIN warehouses w ON w.id = sd.warehouse_id
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {_warehouse_filter_clause("sd")}
-            GROUP BY sale_date, sd.warehouse_id, w.warehouse_name
-            ORDER BY sale_date, warehouse_name
+              COALESCE(SUM(r.total_amount), 0) AS total,
+              COALESCE(SUM(r.document_count), 0) AS transactions
+            FROM sale_daily_rollups r
+            LEFT JOIN warehouses w ON w.id = r.warehouse_id
+            WHERE r.status = 'CLOSED'
+              AND r.sale_date BETWEEN :date_from AND :date_to
+              {_warehouse_filter_clause("r")}
+            GROUP BY r.sale_date, r.warehouse_id, w.warehouse_name
+            ORDER BY r.sale_date, warehouse_name
             """
         ), params))
 
         branch_totals = _rows(await session.execute(text(
             f"""
             SELECT
-              sd.warehouse_id,
+              NULLIF(r.warehouse_id, 0) AS warehouse_id,
               COALESCE(w.warehouse_name, 'Sin sucursal') AS warehouse_name,
-              COALESCE(SUM(sd.total_amount), 0) AS total,
-              COUNT(*) AS transactions
-            FROM sale_documents sd
-            LEFT JOIN warehouses w ON w.id = sd.warehouse_id
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {_warehouse_filter_clause("sd")}
-            GROUP BY sd.warehouse_id, w.warehouse_name
+              COALESCE(SUM(r.total_amount), 0) AS total,
+              COALESCE(SUM(r.document_count), 0) AS transactions
+            FROM sale_daily_rollups r
+            LEFT JOIN warehouses w ON w.id = r.warehouse_id
+            WHERE r.status = 'CLOSED'
+              AND r.sale_date BETWEEN :date_from AND :date_to
+              {_warehouse_filter_clause("r")}
+            GROUP BY r.warehouse_id, w.warehouse_name
             ORDER BY total DESC
             """
         ), params))
@@ -232,37 +151,34 @@ async def get_dashboard_summary(
         previous_totals = _rows(await session.execute(text(
             f"""
             SELECT
-              sd.warehouse_id,
+              NULLIF(r.warehouse_id, 0) AS warehouse_id,
               COALESCE(w.warehouse_name, 'Sin sucursal') AS warehouse_name,
-              COALESCE(SUM(sd.total_amount), 0) AS total
-            FROM sale_documents sd
-            LEFT JOIN warehouses w ON w.id = sd.warehouse_id
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :previous_from AND :previous_to
-              {_warehouse_filter_clause("sd")}
-            GROUP BY sd.warehouse_id, w.warehouse_name
+              COALESCE(SUM(r.total_amount), 0) AS total
+            FROM sale_daily_rollups r
+            LEFT JOIN warehouses w ON w.id = r.warehouse_id
+            WHERE r.status = 'CLOSED'
+              AND r.sale_date BETWEEN :previous_from AND :previous_to
+              {_warehouse_filter_clause("r")}
+            GROUP BY r.warehouse_id, w.warehouse_name
             """
         ), params))
 
-        payment_method_rows = _rows(await session.execute(text(
+        payment_methods = _rows(await session.execute(text(
             f"""
             SELECT
-              sd.id,
-              sd.payment_method_name,
-              sd.payment_method_code,
-              sd.amount_tendered,
-              sd.change_amount,
-              sd.payment_details,
-              sd.total_amount
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {_warehouse_filter_clause("sd")}
+              COALESCE(MAX(r.payment_method_name), NULLIF(r.payment_method_code, ''), 'Sin metodo') AS method_name,
+              COALESCE(NULLIF(r.payment_method_code, ''), 'UNSPECIFIED') AS method_code,
+              COALESCE(SUM(r.payment_count), 0) AS transactions,
+              COALESCE(SUM(r.payment_amount), 0) AS total
+            FROM sale_daily_rollups r
+            WHERE r.status = 'CLOSED'
+              AND r.sale_date BETWEEN :date_from AND :date_to
+              {_warehouse_filter_clause("r")}
+            GROUP BY method_code
+            HAVING total > 0
+            ORDER BY total DESC, transactions DESC, method_name
             """
         ), params))
-        payment_methods = _summarize_payment_methods(payment_method_rows)
 
         sessions = _rows(await session.execute(text(
             """
@@ -319,7 +235,10 @@ async def get_dashboard_summary(
               GROUP BY sale_document_id
             ) items ON items.sale_document_id = sd.id
             WHERE sd.deleted_at IS NULL
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND (
+                (sd.status IN ('CLOSED', 'CANCELLED') AND sd.business_date BETWEEN :date_from AND :date_to)
+                OR (sd.status = 'PENDING_CASHIER' AND sd.created_at >= :date_from AND sd.created_at < :date_to_next)
+              )
               {_warehouse_filter_clause("sd")}
             ORDER BY COALESCE(sd.updated_at, sd.created_at) DESC
             LIMIT 10
@@ -340,7 +259,7 @@ async def get_dashboard_summary(
             LEFT JOIN products p ON p.id = sdl.product_id
             WHERE sd.deleted_at IS NULL
               AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {_warehouse_filter_clause("sd")}
             GROUP BY id, sku, name
             ORDER BY units DESC, total DESC
@@ -367,7 +286,7 @@ async def get_dashboard_summary(
             ) stock_totals ON stock_totals.product_variant_id = sdl.product_variant_id
             WHERE sd.deleted_at IS NULL
               AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {_warehouse_filter_clause("sd")}
             GROUP BY id, sku, name, stock
             ORDER BY units ASC, stock DESC
@@ -15,19 +15,14 @@ from database.models.document_config import DocumentCategory, DocumentSeries, Do
 from database.models.warehouses import Warehouse
 from database.schemas.document_config import DocumentSeriesCreate, DocumentSeriesUpdate, DocumentTypeUpdate
 from utils.code_generator import generate_sequential_code
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Document Config"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_document_config_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["DOCUMENT_SERIES_ACCESS", "DOCUMENT_SERIES_MANAGE"]):
+    if has_any_permission(user, ["DOCUMENT_SERIES_ACCESS", "DOCUMENT_SERIES_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
@@ -37,7 +32,7 @@ async def require_document_config_read(request: Request) -> dict:
 
 async def require_document_config_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["DOCUMENT_SERIES_MANAGE"]):
+    if has_any_permission(user, ["DOCUMENT_SERIES_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
@@ -11,19 +11,14 @@ from sqlalchemy import text
 from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Electronic Billing"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_dte_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["DTE_ACCESS", "DTE_VIEW", "DTE_CONFIG_MANAGE"]):
+    if has_any_permission(user, ["DTE_ACCESS", "DTE_VIEW", "DTE_CONFIG_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
@@ -40,7 +35,7 @@ async def require_dte_read(request: Request) -> dict:
 
 async def require_dte_manage(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["DTE_CONFIG_MANAGE"]):
+    if has_any_permission(user, ["DTE_CONFIG_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
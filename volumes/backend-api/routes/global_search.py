@@ -9,16 +9,11 @@ from sqlalchemy import text
 
 from core.response import ResponseManager
 from database.database import db_manager
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Global Search"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 def _result(entity: str, title: str, subtitle: str, path: str, icon: str, meta: dict | None = None, domain: str | None = None, destination_label: str | None = None) -> dict:
     return {
         "entity": entity,
@@ -47,7 +42,7 @@ async def global_search(
     term = f"%{q.strip()}%"
     results = []
     async with db_manager.get_async_session() as session:
-        if _has_any_permission(user, ["PRODUCTS_ACCESS", "PRODUCTS_MANAGE"]):
+        if has_any_permission(user, ["PRODUCTS_ACCESS", "PRODUCTS_MANAGE"]):
             rows = await session.execute(
                 text(
                     """
@@ -91,7 +86,7 @@ async def global_search(
                     "Inventario >> Catalogo de productos",
                 ))
 
-        if _has_any_permission(user, ["FOUNDATION_MAINTAINERS_ACCESS", "FOUNDATION_MAINTAINERS_MANAGE"]):
+        if has_any_permission(user, ["FOUNDATION_MAINTAINERS_ACCESS", "FOUNDATION_MAINTAINERS_MANAGE"]):
             rows = await session.execute(
                 text(
                     """
@@ -150,7 +145,7 @@ async def global_search(
             for row in rows.mappings().all():
                 results.append(_result("Moneda", row["currency_name"], f"{row['currency_code']} / {row['currency_symbol']}", _deep_path("/finance/currencies", tab="currencies", search=row["currency_code"], open="edit", id=row["id"]), "CircleDollarSign", domain="Finanzas", destination_label="Finanzas >> Monedas y tipos de cambio"))
 
-        if _has_any_permission(user, ["USER_READ", "USER_MANAGER"]):
+        if has_any_permission(user, ["USER_READ", "USER_MANAGER"]):
             rows = await session.execute(
                 text(
                     """
@@ -175,7 +170,7 @@ async def global_search(
                 subtitle = " / ".join([value for value in [row["username"], row["email"], row["phone"]] if value])
                 results.append(_result("Usuario", title, subtitle, _deep_path("/admin/users", search=row["username"], open="edit", id=row["id"]), "Users", {"is_active": row["is_active"]}, "Administracion", "Administracion >> Administracion de usuarios"))
 
-        if _has_any_permission(user, ["WAREHOUSE_READ", "WAREHOUSE_MANAGER", "WAREHOUSES_ACCESS"]):
+        if has_any_permission(user, ["WAREHOUSE_READ", "WAREHOUSE_MANAGER", "WAREHOUSES_ACCESS"]):
             rows = await session.execute(
                 text(
                     """
@@ -192,7 +187,7 @@ async def global_search(
             for row in rows.mappings().all():
                 results.append(_result("Bodega", row["warehouse_name"], f"{row['warehouse_code']} / {row['warehouse_type']} / {row['city'] or 'Sin ciudad'}", _deep_path("/inventory/warehouses", search=row["warehouse_code"], open="edit", id=row["id"]), "Store", {"is_active": row["is_active"]}, "Inventario", "Inventario >> Administracion de bodegas"))
 
-        if _has_any_permission(user, ["PRICE_LISTS_ACCESS", "PRICE_LISTS_MANAGE"]):
+        if has_any_permission(user, ["PRICE_LISTS_ACCESS", "PRICE_LISTS_MANAGE"]):
             rows = await session.execute(
                 text(
                     """
@@ -16,7 +16,7 @@ from database.schemas.measurement_units import MeasurementUnitCreate, Measuremen
 from utils.auth_helpers import get_client_ip
 from utils.code_generator import generate_sequential_code
 from utils.log_helper import setup_logger
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 logger = setup_logger(__name__)
 
@@ -32,14 +32,9 @@ router = APIRouter(
 )
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_measurement_unit_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["MEASUREMENT_UNITS_ACCESS", "MEASUREMENT_UNITS_MANAGE"]):
+    if has_any_permission(user, ["MEASUREMENT_UNITS_ACCESS", "MEASUREMENT_UNITS_MANAGE"]):
         return user
 
     logger.warning(
@@ -65,7 +60,7 @@ async def require_measurement_unit_read(request: Request) -> dict:
 
 async def require_measurement_unit_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["MEASUREMENT_UNITS_MANAGE"]):
+    if has_any_permission(user, ["MEASUREMENT_UNITS_MANAGE"]):
         return user
 
     logger.warning(
@@ -30,7 +30,7 @@ from core.response import ResponseManager
 from core.constants import ErrorCode, ErrorType
 
 # Service imports
-from services.menu_service import MenuService
+from services.menu_service import AsyncMenuService
 
 # Utils imports
 from utils.permissions_utils import require_permission
@@ -131,11 +131,11 @@ async def list_menus(
     """Listar menús con filtros"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Obtener menús
-            menus = service.list_menus(
+            menus = await service.list_menus(
                 parent_id=parent_id,
                 active_only=active_only,
                 visible_only=visible_only,
@@ -145,7 +145,7 @@ async def list_menus(
             )
             
             # Contar total
-            total_count = service.count_menus(
+            total_count = await service.count_menus(
                 parent_id=parent_id,
                 active_only=active_only
             )
@@ -191,11 +191,11 @@ async def get_menu_tree(
     """Obtener árbol jerárquico de menús"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Obtener árbol
-            tree = service.get_menu_tree(
+            tree = await service.get_menu_tree(
                 parent_id=parent_id,
                 max_depth=max_depth
             )
@@ -230,10 +230,10 @@ async def get_menu(
     """Obtener menú por ID"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
-            menu = service.get_menu_by_id(menu_id)
+            menu = await service.get_menu_by_id(menu_id)
             
             if not menu:
                 return ResponseManager.error(
@@ -268,11 +268,11 @@ async def create_menu(
     """Crear nuevo menú"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Crear menú
-            new_menu = service.create_menu(menu_data, user['user_id'])
+            new_menu = await service.create_menu(menu_data, user['user_id'])
             
             logger.info(f"Usuario {user['username']} creó menú {new_menu.menu_code}")
             
@@ -307,11 +307,11 @@ async def update_menu(
     """Actualizar menú existente"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Actualizar menú
-            updated_menu = service.update_menu(menu_id, menu_data, user['user_id'])
+            updated_menu = await service.update_menu(menu_id, menu_data, user['user_id'])
             
             logger.info(f"Usuario {user['username']} actualizó menú {updated_menu.menu_code}")
             
@@ -346,11 +346,11 @@ async def delete_menu(
     """Eliminar menú"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Eliminar menú
-            success = service.delete_menu(menu_id, force_delete=force)
+            success = await service.delete_menu(menu_id, force_delete=force)
             
             delete_type = "físicamente" if force else "lógicamente"
             logger.info(f"Usuario {user['username']} eliminó menú {menu_id} {delete_type}")
@@ -394,11 +394,11 @@ async def move_menu(
     """Mover menú a nueva posición jerárquica"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Mover menú
-            moved_menu = service.move_menu(
+            moved_menu = await service.move_menu(
                 menu_id=menu_id,
                 new_parent_id=move_data.new_parent_id,
                 new_sort_order=move_data.new_sort_order
@@ -437,11 +437,11 @@ async def reorder_children(
     """Reordenar menús hijos"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Reordenar hijos
-            updated_count = service.reorder_children(
+            updated_count = await service.reorder_children(
                 parent_id=parent_id,
                 ordered_child_ids=reorder_data.ordered_child_ids
             )
@@ -482,11 +482,11 @@ async def normalize_orders(
     """Normalizar órdenes de menús"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Normalizar órdenes
-            updated_count = service.normalize_menu_orders(parent_id)
+            updated_count = await service.normalize_menu_orders(parent_id)
             
             scope = f"padre {parent_id}" if parent_id else "todos los niveles"
             logger.info(f"Usuario {user['username']} normalizó órdenes en {scope}: {updated_count} actualizados")
@@ -523,11 +523,11 @@ async def toggle_menu_status(
     """Activar/desactivar menú"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Obtener y actualizar menú
-            menu = service.get_menu_by_id(menu_id)
+            menu = await service.get_menu_by_id(menu_id)
             if not menu:
                 return ResponseManager.error(
                     error_code=ErrorCode.NOT_FOUND,
@@ -539,7 +539,7 @@ async def toggle_menu_status(
             # Actualizar solo el estado
             from database.schemas.menu_items import MenuItemUpdate
             update_data = MenuItemUpdate(is_active=toggle_data.is_active)
-            updated_menu = service.update_menu(menu_id, update_data, user['user_id'])
+            updated_menu = await service.update_menu(menu_id, update_data, user['user_id'])
             
             status_text = "activado" if toggle_data.is_active else "desactivado"
             logger.info(f"Usuario {user['username']} {status_text} menú {updated_menu.menu_code}")
@@ -567,11 +567,11 @@ async def bulk_toggle_status(
     """Activar/desactivar menús en lote"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
             # Operación masiva
-            updated_count, error_count = service.bulk_toggle_status(
+            updated_count, error_count = await service.bulk_toggle_status(
                 menu_ids=bulk_data.menu_ids,
                 is_active=bulk_data.is_active
             )
@@ -642,10 +642,10 @@ async def get_menu_by_code(
     """Obtener menú por código"""
     
     try:
-        async with db_manager.get_session() as session:
-            service = MenuService(session)
+        async with db_manager.get_async_session() as session:
+            service = AsyncMenuService(session)
             
-            menu = service.get_menu_by_code(menu_code)
+            menu = await service.get_menu_by_code(menu_code)
             
             if not menu:
                 return ResponseManager.error(
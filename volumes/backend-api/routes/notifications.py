@@ -10,19 +10,14 @@ from sqlalchemy import text
 from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Notifications"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_notifications_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["NOTIFICATIONS_ACCESS"]):
+    if has_any_permission(user, ["NOTIFICATIONS_ACCESS"]):
         return user
     from fastapi import HTTPException
     import json
@@ -32,7 +27,7 @@ async def require_notifications_read(request: Request) -> dict:
 
 async def require_notification_types_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["NOTIFICATIONS_MANAGE_TYPES"]):
+    if has_any_permission(user, ["NOTIFICATIONS_MANAGE_TYPES"]):
         return user
     from fastapi import HTTPException
     import json
@@ -15,7 +15,7 @@ from database.schemas.payment_methods import PaymentMethodCreate, PaymentMethodU
 from utils.auth_helpers import get_client_ip
 from utils.code_generator import generate_sequential_code
 from utils.log_helper import setup_logger
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 logger = setup_logger(__name__)
 
@@ -31,14 +31,9 @@ router = APIRouter(
 )
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_payment_method_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PAYMENT_METHODS_ACCESS", "PAYMENT_METHODS_MANAGE"]):
+    if has_any_permission(user, ["PAYMENT_METHODS_ACCESS", "PAYMENT_METHODS_MANAGE"]):
         return user
 
     logger.warning(
@@ -64,7 +59,7 @@ async def require_payment_method_read(request: Request) -> dict:
 
 async def require_payment_method_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PAYMENT_METHODS_MANAGE"]):
+    if has_any_permission(user, ["PAYMENT_METHODS_MANAGE"]):
         return user
 
     logger.warning(
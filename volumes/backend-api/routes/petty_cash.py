@@ -17,7 +17,7 @@ from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
 from services.media_storage import media_storage
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Petty Cash"])
 
@@ -103,11 +103,6 @@ def _format_clp(value) -> str:
     return f"${int(amount):,}".replace(",", ".")
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 def _permission_error(request: Request):
     response = ResponseManager.error(
         message="Acceso denegado",
@@ -184,21 +179,21 @@ async def _store_receipt_file(file: UploadFile, *, expense_code: str) -> dict:
 
 async def require_petty_cash_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, READ_PERMISSIONS):
+    if has_any_permission(user, READ_PERMISSIONS):
         return user
     _permission_error(request)
 
 
 async def require_petty_cash_create(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, CREATE_PERMISSIONS):
+    if has_any_permission(user, CREATE_PERMISSIONS):
         return user
     _permission_error(request)
 
 
 async def require_petty_cash_approve(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, APPROVE_PERMISSIONS):
+    if has_any_permission(user, APPROVE_PERMISSIONS):
         return user
     _permission_error(request)
 
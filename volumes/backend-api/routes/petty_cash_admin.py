@@ -24,18 +24,13 @@ from database.schemas.petty_cash import (
 from utils.auth_helpers import get_client_ip
 from utils.code_generator import generate_sequential_code
 from utils.log_helper import setup_logger
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 logger = setup_logger(__name__)
 
 router = APIRouter(tags=["Petty Cash Admin"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 def _deny(request: Request, user: dict, details: str):
     logger.warning(
         "ACCESO DENEGADO - Usuario: %s sin permisos para caja chica admin en %s %s - IP: %s",
@@ -57,28 +52,28 @@ def _deny(request: Request, user: dict, details: str):
 
 async def require_petty_cash_category_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PETTY_CASH_CATEGORIES_ACCESS", "PETTY_CASH_ADMIN_ACCESS", "PETTY_CASH_MANAGE"]):
+    if has_any_permission(user, ["PETTY_CASH_CATEGORIES_ACCESS", "PETTY_CASH_ADMIN_ACCESS", "PETTY_CASH_MANAGE"]):
         return user
     _deny(request, user, "Se requiere permiso para administrar categorias de caja chica")
 
 
 async def require_petty_cash_category_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PETTY_CASH_CATEGORIES_MANAGE", "PETTY_CASH_MANAGE"]):
+    if has_any_permission(user, ["PETTY_CASH_CATEGORIES_MANAGE", "PETTY_CASH_MANAGE"]):
         return user
     _deny(request, user, "Se requiere permiso para gestionar categorias de caja chica")
 
 
 async def require_petty_cash_fund_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PETTY_CASH_FUNDS_ACCESS", "PETTY_CASH_ACCESS", "PETTY_CASH_ADMIN_ACCESS", "PETTY_CASH_MANAGE", "PETTY_CASH_APPROVE"]):
+    if has_any_permission(user, ["PETTY_CASH_FUNDS_ACCESS", "PETTY_CASH_ACCESS", "PETTY_CASH_ADMIN_ACCESS", "PETTY_CASH_MANAGE", "PETTY_CASH_APPROVE"]):
         return user
     _deny(request, user, "Se requiere permiso para acceder a fondos de caja chica")
 
 
 async def require_petty_cash_fund_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PETTY_CASH_FUNDS_MANAGE", "PETTY_CASH_MANAGE", "PETTY_CASH_APPROVE", "PETTY_CASH_REPLENISH"]):
+    if has_any_permission(user, ["PETTY_CASH_FUNDS_MANAGE", "PETTY_CASH_MANAGE", "PETTY_CASH_APPROVE", "PETTY_CASH_REPLENISH"]):
         return user
     _deny(request, user, "Se requiere permiso para gestionar fondos de caja chica")
 
@@ -13,8 +13,9 @@ from sqlalchemy import text
 from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
+from services import stock_ledger
 from utils.inventory_tracking import validate_serial_quantity, validate_tracking_dimensions
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Physical Inventory"])
 
@@ -69,11 +70,6 @@ def _row(row) -> dict | None:
     return {key: _json_value(value) for key, value in row.items()} if row else None
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 def _permission_error(request: Request):
     response = ResponseManager.error(
         message="Acceso denegado",
@@ -97,14 +93,14 @@ def _validation_response(message: str, request: Request):
 
 async def require_physical_inventory_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, READ_PERMISSIONS):
+    if has_any_permission(user, READ_PERMISSIONS):
         return user
     _permission_error(request)
 
 
 async def require_physical_inventory_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, WRITE_PERMISSIONS):
+    if has_any_permission(user, WRITE_PERMISSIONS):
         return user
     _permission_error(request)
 
@@ -643,31 +639,6 @@ async def approve_count(data: PhysicalCountNotes, request: Request, count_id: in
         return ResponseManager.internal_server_error(message="Error al aprobar conteo", details=str(exc), request=request)
 
 
-async def _stock_row(session, item: dict, warehouse_id: int) -> dict | None:
-    result = await session.execute(
-        text(
-            "SELECT * FROM stock "
-            "WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
-            "AND warehouse_zone_id <=> :warehouse_zone_id "
-            "AND warehouse_zone_location_id <=> :warehouse_zone_location_id "
-            "AND batch_lot_number <=> :batch_lot_number "
-            "AND expiry_date <=> :expiry_date "
-            "AND serial_number <=> :serial_number "
-            "LIMIT 1"
-        ),
-        {
-            "product_variant_id": item["product_variant_id"],
-            "warehouse_id": warehouse_id,
-            "warehouse_zone_id": item.get("warehouse_zone_id"),
-            "warehouse_zone_location_id": item.get("warehouse_zone_location_id"),
-            "batch_lot_number": item.get("batch_lot_number"),
-            "expiry_date": item.get("expiry_date"),
-            "serial_number": item.get("serial_number"),
-        },
-    )
-    return _row(result.mappings().first())
-
-
 @router.post("/counts/{count_id}/post", response_class=JSONResponse)
 async def post_count(data: PhysicalCountNotes, request: Request, count_id: int = Path(..., gt=0), user: dict = Depends(require_physical_inventory_write)):
     try:
@@ -695,36 +666,18 @@ async def post_count(data: PhysicalCountNotes, request: Request, count_id: int =
                     difference = counted_quantity - system_quantity
                     if difference == 0:
                         continue
-                    stock_row = await _stock_row(session, item, int(count["warehouse_id"]))
-                    quantity_before = Decimal(str(stock_row["current_quantity"])) if stock_row else Decimal("0")
-                    quantity_after = counted_quantity
-                    if stock_row:
-                        await session.execute(
-                            text(
-                                "UPDATE stock SET current_quantity = :quantity_after, last_movement_date = CURRENT_TIMESTAMP, "
-                                "last_movement_type = 'ADJUSTMENT' WHERE id = :stock_id"
-                            ),
-                            {"quantity_after": quantity_after, "stock_id": stock_row["id"]},
-                        )
-                    else:
-                        await session.execute(
-                            text(
-                                "INSERT INTO stock (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, batch_lot_number, expiry_date, serial_number, "
-                                "current_quantity, reserved_quantity, last_movement_date, last_movement_type) "
-                                "VALUES (:product_variant_id, :warehouse_id, :warehouse_zone_id, :warehouse_zone_location_id, :batch_lot_number, :expiry_date, :serial_number, "
-                                ":quantity_after, 0, CURRENT_TIMESTAMP, 'ADJUSTMENT')"
-                            ),
-                            {
-                                "product_variant_id": item["product_variant_id"],
-                                "warehouse_id": count["warehouse_id"],
-                                "warehouse_zone_id": item.get("warehouse_zone_id"),
-                                "warehouse_zone_location_id": item.get("warehouse_zone_location_id"),
-                                "batch_lot_number": item.get("batch_lot_number"),
-                                "expiry_date": item.get("expiry_date"),
-                                "serial_number": item.get("serial_number"),
-                                "quantity_after": quantity_after,
-                            },
-                        )
+                    quantity_before, quantity_after = await stock_ledger.set_stock_quantity(
+                        session,
+                        product_variant_id=item["product_variant_id"],
+                        warehouse_id=int(count["warehouse_id"]),
+                        zone_id=item.get("warehouse_zone_id"),
+                        location_id=item.get("warehouse_zone_location_id"),
+                        batch_lot_number=item.get("batch_lot_number"),
+                        expiry_date=item.get("expiry_date"),
+                        serial_number=item.get("serial_number"),
+                        quantity=counted_quantity,
+                        movement_type="ADJUSTMENT",
+                    )
                     await session.execute(
                         text(
                             "INSERT INTO stock_movements (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
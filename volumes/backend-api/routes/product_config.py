@@ -26,19 +26,14 @@ from database.schemas.product_config import (
 )
 from utils.code_generator import generate_sequential_code
 from utils.product_feature_flags import PRODUCT_FLAG_FEATURES, product_flag_settings
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Product Config"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_product_config_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["CATEGORIES_ACCESS", "PRODUCT_CATEGORIES_MANAGE", "PRODUCT_ATTRIBUTES_ACCESS", "PRODUCT_ATTRIBUTES_MANAGE"]):
+    if has_any_permission(user, ["CATEGORIES_ACCESS", "PRODUCT_CATEGORIES_MANAGE", "PRODUCT_ATTRIBUTES_ACCESS", "PRODUCT_ATTRIBUTES_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
@@ -48,7 +43,7 @@ async def require_product_config_read(request: Request) -> dict:
 
 async def require_product_config_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PRODUCT_CATEGORIES_MANAGE", "PRODUCT_ATTRIBUTES_MANAGE"]):
+    if has_any_permission(user, ["PRODUCT_CATEGORIES_MANAGE", "PRODUCT_ATTRIBUTES_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
@@ -58,7 +53,7 @@ async def require_product_config_write(request: Request) -> dict:
 
 async def require_product_flag_settings_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PRODUCTS_ACCESS", "PRODUCTS_MANAGE", "PRODUCT_FLAG_SETTINGS_ACCESS", "PRODUCT_FLAG_SETTINGS_MANAGE", "FOUNDATION_MAINTAINERS_ACCESS", "FOUNDATION_MAINTAINERS_MANAGE"]):
+    if has_any_permission(user, ["PRODUCTS_ACCESS", "PRODUCTS_MANAGE", "PRODUCT_FLAG_SETTINGS_ACCESS", "PRODUCT_FLAG_SETTINGS_MANAGE", "FOUNDATION_MAINTAINERS_ACCESS", "FOUNDATION_MAINTAINERS_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
@@ -68,7 +63,7 @@ async def require_product_flag_settings_read(request: Request) -> dict:
 
 async def require_product_flag_settings_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PRODUCT_FLAG_SETTINGS_MANAGE", "FOUNDATION_MAINTAINERS_MANAGE", "PRODUCTS_MANAGE"]):
+    if has_any_permission(user, ["PRODUCT_FLAG_SETTINGS_MANAGE", "FOUNDATION_MAINTAINERS_MANAGE", "PRODUCTS_MANAGE"]):
         return user
     from fastapi import HTTPException
     import json
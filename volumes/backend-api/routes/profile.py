@@ -14,7 +14,7 @@ from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
 from services.media_storage import media_storage
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 from utils.phone import normalize_phone_for_storage
 
 router = APIRouter(tags=["Profile"])
@@ -28,14 +28,9 @@ def _user_id(user: dict) -> int:
     return int(user.get("user_id") or user.get("id"))
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 async def require_profile(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["PROFILE_ACCESS"]):
+    if has_any_permission(user, ["PROFILE_ACCESS"]):
         return user
     from fastapi import HTTPException
     import json
@@ -315,7 +310,7 @@ async def upload_avatar(request: Request, file: UploadFile = File(...), user: di
 
 @router.post("/companies/{company_id}/{media_role}", response_class=JSONResponse)
 async def upload_company_media(request: Request, company_id: int = Path(..., gt=0), media_role: str = Path(...), file: UploadFile = File(...), user: dict = Depends(get_current_user)):
-    if not _has_any_permission(user, ["COMPANY_CONFIG_MANAGE"]):
+    if not has_any_permission(user, ["COMPANY_CONFIG_MANAGE"]):
         return ResponseManager.error(message="Acceso denegado", status_code=HTTPStatus.FORBIDDEN, error_code=ErrorCode.PERMISSION_DENIED, error_type=ErrorType.PERMISSION_ERROR, request=request)
     role = media_role.strip().upper()
     if role not in {"LOGO", "BANNER"}:
@@ -333,7 +328,7 @@ async def upload_company_media(request: Request, company_id: int = Path(..., gt=
 
 @router.post("/products/{product_id}/image", response_class=JSONResponse)
 async def upload_product_image(request: Request, product_id: int = Path(..., gt=0), file: UploadFile = File(...), user: dict = Depends(get_current_user)):
-    if not _has_any_permission(user, ["PRODUCTS_MANAGE"]):
+    if not has_any_permission(user, ["PRODUCTS_MANAGE"]):
         return ResponseManager.error(message="Acceso denegado", status_code=HTTPStatus.FORBIDDEN, error_code=ErrorCode.PERMISSION_DENIED, error_type=ErrorType.PERMISSION_ERROR, request=request)
     try:
         async with db_manager.get_async_session() as session:
@@ -382,7 +377,7 @@ async def upload_product_image(request: Request, product_id: int = Path(..., gt=
 
 @router.delete("/products/{product_id}/image", response_class=JSONResponse)
 async def delete_product_image(request: Request, product_id: int = Path(..., gt=0), user: dict = Depends(get_current_user)):
-    if not _has_any_permission(user, ["PRODUCTS_MANAGE"]):
+    if not has_any_permission(user, ["PRODUCTS_MANAGE"]):
         return ResponseManager.error(message="Acceso denegado", status_code=HTTPStatus.FORBIDDEN, error_code=ErrorCode.PERMISSION_DENIED, error_type=ErrorType.PERMISSION_ERROR, request=request)
     async with db_manager.get_async_session() as session:
         product = await session.execute(
@@ -414,7 +409,7 @@ async def delete_product_image(request: Request, product_id: int = Path(..., gt=
 
 @router.post("/product-variants/{variant_id}/image", response_class=JSONResponse)
 async def upload_variant_image(request: Request, variant_id: int = Path(..., gt=0), file: UploadFile = File(...), user: dict = Depends(get_current_user)):
-    if not _has_any_permission(user, ["PRODUCTS_MANAGE"]):
+    if not has_any_permission(user, ["PRODUCTS_MANAGE"]):
         return ResponseManager.error(message="Acceso denegado", status_code=HTTPStatus.FORBIDDEN, error_code=ErrorCode.PERMISSION_DENIED, error_type=ErrorType.PERMISSION_ERROR, request=request)
     try:
         async with db_manager.get_async_session() as session:
@@ -440,7 +435,7 @@ async def upload_variant_image(request: Request, variant_id: int = Path(..., gt=
 
 @router.delete("/product-variants/{variant_id}/image", response_class=JSONResponse)
 async def delete_variant_image(request: Request, variant_id: int = Path(..., gt=0), user: dict = Depends(get_current_user)):
-    if not _has_any_permission(user, ["PRODUCTS_MANAGE"]):
+    if not has_any_permission(user, ["PRODUCTS_MANAGE"]):
         return ResponseManager.error(message="Acceso denegado", status_code=HTTPStatus.FORBIDDEN, error_code=ErrorCode.PERMISSION_DENIED, error_type=ErrorType.PERMISSION_ERROR, request=request)
     async with db_manager.get_async_session() as session:
         row = (await session.execute(
@@ -508,7 +503,7 @@ async def delete_agreement_logo(request: Request, agreement_id: int = Path(...,
 
 @router.post("/customers/{customer_id}/{media_role}", response_class=JSONResponse)
 async def upload_customer_media(request: Request, customer_id: int = Path(..., gt=0), media_role: str = Path(...), file: UploadFile = File(...), user: dict = Depends(get_current_user)):
-    if not _has_any_permission(user, ["FOUNDATION_MAINTAINERS_MANAGE"]):
+    if not has_any_permission(user, ["FOUNDATION_MAINTAINERS_MANAGE"]):
         return ResponseManager.error(message="Acceso denegado", status_code=HTTPStatus.FORBIDDEN, error_code=ErrorCode.PERMISSION_DENIED, error_type=ErrorType.PERMISSION_ERROR, request=request)
     role = media_role.strip().upper()
     if role not in {"LOGO", "BANNER"}:
@@ -526,7 +521,7 @@ async def upload_customer_media(request: Request, customer_id: int = Path(..., g
 
 @router.post("/suppliers/{supplier_id}/{media_role}", response_class=JSONResponse)
 async def upload_supplier_media(request: Request, supplier_id: int = Path(..., gt=0), media_role: str = Path(...), file: UploadFile = File(...), user: dict = Depends(get_current_user)):
-    if not _has_any_permission(user, ["FOUNDATION_MAINTAINERS_MANAGE"]):
+    if not has_any_permission(user, ["FOUNDATION_MAINTAINERS_MANAGE"]):
         return ResponseManager.error(message="Acceso denegado", status_code=HTTPStatus.FORBIDDEN, error_code=ErrorCode.PERMISSION_DENIED, error_type=ErrorType.PERMISSION_ERROR, request=request)
     role = media_role.strip().upper()
     if role not in {"LOGO", "BANNER"}:
@@ -3,28 +3,36 @@ routes/reports.py
 Generación de reportes PDF usando Gotenberg (HTML → PDF).
 Template: templates/reports/daily_sales.html
 """
-import asyncio
 import base64
 import html
 import json
 import math
 import os
 import re
-import urllib.error
-import urllib.request
-import uuid
 from datetime import date, timedelta
 from decimal import Decimal
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from fastapi import APIRouter, Depends, File, Form, Query, Request, UploadFile
 from fastapi.responses import JSONResponse, Response
 from sqlalchemy import text
 
+from cache.services.report_cache import report_cache_service
 from core.config import settings
 from database.database import db_manager
+from services.gotenberg_client import GotenbergUnavailable, html_to_pdf
+from services.report_jobs import (
+    enqueue_report_job,
+    get_report_job,
+    has_report_builder,
+    job_to_dict,
+    list_report_jobs,
+    read_report_artifact,
+    register_report_builder,
+)
 from utils.log_helper import setup_logger
 from utils.permissions_utils import get_current_user
+from utils.report_export import export_response, is_export_format
 
 logger = setup_logger(__name__)
 CURRENCY_LABEL = "Peso chileno (CLP)"
@@ -102,6 +110,14 @@ def _parse_id_list(value) -> list[int]:
     return ids
 
 
+# Documentos cerrados/anulados filtran por business_date (fijada al cerrar); los pendientes
+# aun no la tienen y se ubican por created_at. Ambas ramas son rangos sobre indices.
+_ANY_STATUS_DATE_FILTER = (
+    "((sd.status IN ('CLOSED', 'CANCELLED') AND sd.business_date BETWEEN :date_from AND :date_to)"
+    " OR (sd.status = 'PENDING_CASHIER' AND sd.created_at >= :date_from AND sd.created_at < :date_to_next))"
+)
+
+
 def _append_in_filter(filters: list[str], params: dict, column: str, values: list[int], prefix: str) -> None:
     if not values:
         return
@@ -113,6 +129,30 @@ def _append_in_filter(filters: list[str], params: dict, column: str, values: lis
     filters.append(f"{column} IN ({', '.join(placeholders)})")
 
 
+_EXPORT_FORMAT_PATTERN = "^(json|csv|xlsx|ndjson)$"
+
+
+async def _stream_rows(sql: str, params: dict) -> AsyncIterator[dict]:
+    """Filas desde un cursor del lado del servidor: no materializa el resultado completo."""
+    async with db_manager.get_async_session() as session:
+        result = await session.stream(text(sql), params)
+        async for row in result.mappings():
+            yield {k: _json_val(v) for k, v in row.items()}
+
+
+def _export_payload(payload: dict, export_format: str, filename: str):
+    """Exporta las filas más granulares del payload (detail_rows > rows > data)."""
+    rows = next((payload[key] for key in ("detail_rows", "rows", "data") if key in payload), [])
+    return export_response(rows, export_format, filename)
+
+
+def _json_or_export(payload: dict, export_format: str, filename: str):
+    if is_export_format(export_format):
+        return _export_payload(payload, export_format, filename)
+    return JSONResponse(payload)
+
+
+
 # ─── Template engine (partials + variable replacement) ────────────────────
 
 _TEMPLATES_DIR = os.path.normpath(
@@ -126,32 +166,104 @@ def _load_file(path: str) -> str:
         return f.read()
 
 
-def _resolve_partials(text: str, depth: int = 0) -> str:
-    """Replace {{> partial_name}} with the content of partials/_partial_name.html.
-    Supports one level of nesting (partials can also contain variable placeholders
-    but not further partial includes, to keep it simple)."""
-    if depth > 5:
-        return text
-    import re
-    def _include(match: re.Match) -> str:
-        name = match.group(1).strip()
-        path = os.path.join(_PARTIALS_DIR, f"{name}.html")
+# {{> partial}} se inlinea al compilar; {{VAR}} queda como hueco a rellenar en render.
+# Una inclusión cíclica (p.ej. el "Incluir con: {{> _styles}}" de _styles.html) queda como texto.
+_TOKEN_RE = re.compile(r"\{\{>\s*([^\s}]+)\s*\}\}|\{\{([^{}\s>][^{}\s]*)\}\}")
+_MISSING = object()
+
+
+class _CompiledTemplate:
+    """Template pre-parseado: literals[i] va antes de names[i]; literals tiene un elemento más.
+    deps guarda (path -> mtime_ns) del template y de cada partial inlineado."""
+
+    __slots__ = ("literals", "names", "deps")
+
+    def __init__(self, literals: list[str], names: list[str], deps: dict[str, int]):
+        self.literals = literals
+        self.names    = names
+        self.deps     = deps
+
+    def is_fresh(self) -> bool:
         try:
-            content = _load_file(path)
-            return _resolve_partials(content, depth + 1)
+            return all(os.stat(path).st_mtime_ns == mtime for path, mtime in self.deps.items())
+        except OSError:
+            return False
+
+    def render(self, ctx: dict) -> str:
+        """Una sola pasada: los placeholders sin valor en ctx se dejan tal cual."""
+        literals = self.literals
+        out = [literals[0]]
+        for idx, name in enumerate(self.names, 1):
+            value = ctx.get(name, _MISSING)
+            out.append(f"{{{{{name}}}}}" if value is _MISSING else str(value))
+            out.append(literals[idx])
+        return "".join(out)
+
+
+_TEMPLATE_CACHE: dict[str, _CompiledTemplate] = {}
+
+
+def _compile_source(source: str, stack: tuple[str, ...] = ()) -> _CompiledTemplate:
+    literals: list[str] = []
+    names: list[str] = []
+    deps: dict[str, int] = {}
+    chunk: list[str] = []
+    pos = 0
+    for match in _TOKEN_RE.finditer(source):
+        chunk.append(source[pos:match.start()])
+        pos = match.end()
+        partial, name = match.group(1), match.group(2)
+        if name:
+            literals.append("".join(chunk))
+            names.append(name)
+            chunk = []
+            continue
+        path = os.path.join(_PARTIALS_DIR, f"{partial}.html")
+        if path in stack:
+            chunk.append(match.group(0))
+            continue
+        try:
+            sub = _get_template(path, stack)
         except FileNotFoundError:
-            return f"<!-- PARTIAL NOT FOUND: {name} -->"
-    return re.sub(r'\{\{>\s*(\S+)\s*\}\}', _include, text)
+            chunk.append(f"<!-- PARTIAL NOT FOUND: {partial} -->")
+            continue
+        chunk.append(sub.literals[0])
+        for sub_name, sub_literal in zip(sub.names, sub.literals[1:]):
+            literals.append("".join(chunk))
+            names.append(sub_name)
+            chunk = [sub_literal]
+        deps.update(sub.deps)
+    chunk.append(source[pos:])
+    literals.append("".join(chunk))
+    return _CompiledTemplate(literals, names, deps)
+
+
+def _get_template(path: str, stack: tuple[str, ...] = ()) -> _CompiledTemplate:
+    """Compila una vez por (path, mtime) del template y sus partials."""
+    cached = _TEMPLATE_CACHE.get(path)
+    if cached is not None and cached.is_fresh():
+        return cached
+    mtime    = os.stat(path).st_mtime_ns
+    compiled = _compile_source(_load_file(path), stack + (path,))
+    compiled.deps[path] = mtime
+    _TEMPLATE_CACHE[path] = compiled
+    return compiled
 
 
 def _render(template_name: str, ctx: dict) -> str:
-    """Load template, resolve partials, then replace all {{VAR}} placeholders."""
-    path   = os.path.join(_TEMPLATES_DIR, template_name)
-    source = _load_file(path)
-    html   = _resolve_partials(source)
-    for key, value in ctx.items():
-        html = html.replace(f"{{{{{key}}}}}", str(value))
-    return html
+    """Render de templates/reports/<template_name> con partials y {{VAR}} resueltos."""
+    return _get_template(os.path.join(_TEMPLATES_DIR, template_name)).render(ctx)
+
+
+def _render_partial(name: str, ctx: dict) -> str:
+    """Render de partials/<name>.html (cabecera/pie de las páginas de tabla)."""
+    return _get_template(os.path.join(_PARTIALS_DIR, f"{name}.html")).render(ctx)
+
+
+def _render_source(source: str, ctx: dict) -> str:
+    """Render de HTML armado en código (p.ej. la página de gráficos); no se cachea
+    porque incrusta las imágenes del reporte y cambia en cada request."""
+    return _compile_source(source).render(ctx)
 
 
 # ─── Mock data helpers (mirrors DailySales.jsx logic) ──────────────────────
@@ -288,6 +400,7 @@ async def list_returns_exchanges_report(
     warehouse_ids: str | None = Query(None, description="Bodegas/locales a filtrar, separadas por coma"),
     document_type: str = Query("all", description="all | RETURN_TICKET | EXCHANGE_DRAFT"),
     status: str = Query("CLOSED", description="all | PENDING_CASHIER | CLOSED | CANCELLED"),
+    export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN, description="json | csv | xlsx | ndjson"),
 ):
     if date_from > date_to:
         return JSONResponse(status_code=400, content={"message": "La fecha inicial no puede ser posterior a la fecha final."})
@@ -308,9 +421,9 @@ async def list_returns_exchanges_report(
     filters = [
         "sd.deleted_at IS NULL",
         "sd.document_type_code IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')",
-        "DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to",
+        _ANY_STATUS_DATE_FILTER,
     ]
-    params = {"date_from": date_from, "date_to": date_to}
+    params = {"date_from": date_from, "date_to": date_to, "date_to_next": date_to + timedelta(days=1)}
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
     if selected_warehouse_ids:
         _append_in_filter(filters, params, "sd.warehouse_id", selected_warehouse_ids, "warehouse_id")
@@ -433,7 +546,7 @@ async def list_returns_exchanges_report(
         key: (_float(value) if isinstance(value, Decimal) else value)
         for key, value in totals.items()
     }
-    return JSONResponse(content={"data": data, "totals": totals_payload})
+    return _json_or_export({"data": data, "totals": totals_payload}, export_format, "cambios-devoluciones")
 
 
 # ─── Returns & exchanges PDF ──────────────────────────────────────────────
@@ -524,15 +637,8 @@ def _rx_row(r: dict) -> str:
 
 
 def _build_rx_detail_pages(rows: list[dict], ctx: dict) -> str:
-    def _partial(name: str) -> str:
-        path = os.path.join(_PARTIALS_DIR, f"{name}.html")
-        content = _load_file(path)
-        for k, v in ctx.items():
-            content = content.replace(f"{{{{{k}}}}}", str(v))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
     pages = []
     chunks = [rows[:_RX_ROWS_FIRST]] + [
         rows[_RX_ROWS_FIRST + i * _RX_ROWS_REST: _RX_ROWS_FIRST + (i + 1) * _RX_ROWS_REST]
@@ -593,15 +699,8 @@ def _build_rx_detail_pages(rows: list[dict], ctx: dict) -> str:
 
 
 def _build_rx_grouped_pages(rows: list[dict], ctx: dict, date_from: str, date_to: str) -> str:
-    def _partial(name: str) -> str:
-        path = os.path.join(_PARTIALS_DIR, f"{name}.html")
-        content = _load_file(path)
-        for k, v in ctx.items():
-            content = content.replace(f"{{{{{k}}}}}", str(v))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
     by_day: dict[str, dict] = {}
     cur = date.fromisoformat(date_from)
     end = date.fromisoformat(date_to)
@@ -740,9 +839,9 @@ async def _build_rx_context(
     filters = [
         "sd.deleted_at IS NULL",
         "sd.document_type_code IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')",
-        "DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to",
+        _ANY_STATUS_DATE_FILTER,
     ]
-    params: dict = {"date_from": start, "date_to": end}
+    params: dict = {"date_from": start, "date_to": end, "date_to_next": end + timedelta(days=1)}
     _append_in_filter(filters, params, "sd.warehouse_id", warehouse_ids, "warehouse_id")
     if doc_type_norm != "all":
         filters.append("sd.document_type_code = :document_type")
@@ -922,6 +1021,32 @@ async def _build_rx_context(
     return ctx
 
 
+async def _returns_exchanges_html(
+    date_from: str, date_to: str, warehouse_id: str, document_type: str, status: str, view_mode: str,
+    chart_png: bytes | None,
+) -> str:
+    ctx = await _build_rx_context(date_from, date_to, warehouse_id, document_type, status, view_mode)
+    if chart_png:
+        b64 = base64.b64encode(chart_png).decode()
+        chart_page = (
+            '<section class="report-page">'
+            '{{> _page_header}}'
+            '<div class="section-heading">'
+            '<div class="section-label">Gráfico</div>'
+            '<h2 class="section-title">Evolución del período</h2>'
+            '</div>'
+            '<div class="chart-card no-break">'
+            '<div class="chart-header"><div class="chart-header-title">Cambios y devoluciones por día</div></div>'
+            '<div class="chart-section" style="min-height:0">'
+            f'<img src="data:image/png;base64,{b64}" style="width:100%;height:auto;display:block;" />'
+            '</div></div>'
+            '{{> _page_footer}}'
+            '</section>'
+        )
+        ctx["CHART_PAGE"] = _render_source(chart_page, ctx)
+    return _render("returns_exchanges.html", ctx)
+
+
 @router.post("/sales/returns-exchanges/pdf", response_class=Response)
 async def returns_exchanges_pdf(
     date_from:    str                  = Form(...),
@@ -933,42 +1058,10 @@ async def returns_exchanges_pdf(
     chart_bar:    Optional[UploadFile] = File(None),
     user:         dict                 = Depends(get_current_user),
 ):
-    async def _chart_card(file, title) -> str:
-        if not file:
-            return ""
-        raw = await file.read()
-        if not raw:
-            return ""
-        b64 = base64.b64encode(raw).decode()
-        return (
-            '<div class="chart-card no-break">'
-            f'<div class="chart-header"><div class="chart-header-title">{title}</div></div>'
-            '<div class="chart-section" style="min-height:0">'
-            f'<img src="data:image/png;base64,{b64}" style="width:100%;height:auto;display:block;" />'
-            '</div></div>'
-        )
-
-    chart_bar_card = await _chart_card(chart_bar, "Cambios y devoluciones por día")
+    chart_png = await chart_bar.read() if chart_bar else None
 
     try:
-        ctx = await _build_rx_context(date_from, date_to, warehouse_id, document_type, status, view_mode)
-        if chart_bar_card:
-            chart_page = (
-                '<section class="report-page">'
-                '{{> _page_header}}'
-                '<div class="section-heading">'
-                '<div class="section-label">Gráfico</div>'
-                '<h2 class="section-title">Evolución del período</h2>'
-                '</div>'
-                f'{chart_bar_card}'
-                '{{> _page_footer}}'
-                '</section>'
-            )
-            chart_page = _resolve_partials(chart_page)
-            for key, value in ctx.items():
-                chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
-            ctx["CHART_PAGE"] = chart_page
-        html = _render("returns_exchanges.html", ctx)
+        html = await _returns_exchanges_html(date_from, date_to, warehouse_id, document_type, status, view_mode, chart_png)
     except Exception as exc:
         logger.error("Error preparando template returns_exchanges: %s", exc)
         return JSONResponse({"error": "Error preparando reporte", "detail": str(exc)}, status_code=500)
@@ -976,10 +1069,7 @@ async def returns_exchanges_pdf(
     filename = f"cambios-devoluciones_{date_from}_{date_to}.pdf"
 
     try:
-        loop      = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(
-            None, _call_gotenberg_sync, html.encode("utf-8"), settings.GOTENBERG_URL
-        )
+        pdf_bytes = await html_to_pdf(html)
     except Exception as exc:
         logger.error("Gotenberg error returns_exchanges: %s", exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -1060,15 +1150,8 @@ def _table_row(r: dict, methods: list[dict], best_row: dict | None) -> str:
 def _build_detail_pages(rows: list[dict], methods: list[dict], best_row: dict | None, ctx: dict) -> str:
     """Generate one <section class="report-page"> per page of table data."""
 
-    def _partial(name: str) -> str:
-        path    = os.path.join(_PARTIALS_DIR, f"{name}.html")
-        content = _load_file(path)
-        for k, v in ctx.items():
-            content = content.replace(f"{{{{{k}}}}}", str(v))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
 
     chunks: list[list[dict]] = []
     if len(rows) <= _ROWS_FIRST:
@@ -1168,15 +1251,8 @@ def _sales_detail_row(r: dict) -> str:
 
 
 def _build_sales_document_pages(rows: list[dict], ctx: dict) -> str:
-    def _partial(name: str) -> str:
-        path    = os.path.join(_PARTIALS_DIR, f"{name}.html")
-        content = _load_file(path)
-        for k, v in ctx.items():
-            content = content.replace(f"{{{{{k}}}}}", str(v))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
     first = 20
     rest = 26
     chunks = [rows[:first]]
@@ -1395,6 +1471,46 @@ def _build_comparison_summary(curr_rows: list[dict], prev_rows: list[dict]) -> s
     return header + body + "</tbody></table>"
 
 
+# ─── Daily sales rollup scan ──────────────────────────────────────────────
+
+async def _daily_rollup_rows(session, date_from: date, date_to: date, warehouse_ids: list[int]) -> list[dict]:
+    """One scan over sale_daily_rollups: per day × branch × payment method, with
+    CLOSED/CANCELLED split by conditional aggregation. Callers fold the rows into
+    daily totals, cancellations and payment breakdown (current and previous window
+    can be requested in a single range)."""
+    params: dict = {"date_from": date_from, "date_to": date_to}
+    filters: list[str] = []
+    _append_in_filter(filters, params, "r.warehouse_id", warehouse_ids, "warehouse_id")
+    warehouse_clause = f"AND {' AND '.join(filters)}" if filters else ""
+    return _rows(await session.execute(text(f"""
+        SELECT
+          r.sale_date,
+          NULLIF(r.warehouse_id, 0)                                                      AS warehouse_id,
+          COALESCE(w.warehouse_name, 'Sin sucursal')                                     AS warehouse_name,
+          COALESCE(NULLIF(r.payment_method_code, ''), 'OTHER')                           AS code,
+          MAX(r.payment_method_name)                                                     AS name,
+          COALESCE(SUM(CASE WHEN r.status = 'CLOSED'    THEN r.total_amount   END), 0)   AS total,
+          COALESCE(SUM(CASE WHEN r.status = 'CLOSED'    THEN r.document_count END), 0)   AS txn,
+          COALESCE(SUM(CASE WHEN r.status = 'CANCELLED' THEN r.document_count END), 0)   AS cancelled,
+          COALESCE(SUM(CASE WHEN r.status = 'CLOSED'    THEN r.payment_amount END), 0)   AS amount
+        FROM sale_daily_rollups r
+        LEFT JOIN warehouses w ON w.id = r.warehouse_id
+        WHERE r.status IN ('CLOSED', 'CANCELLED')
+          AND r.sale_date BETWEEN :date_from AND :date_to
+          {warehouse_clause}
+        GROUP BY r.sale_date, r.warehouse_id, w.warehouse_name, code
+    """), params))
+
+
+def _add_method(by_method: dict, row: dict) -> None:
+    amount = _money(row["amount"])
+    if amount <= 0:
+        return
+    entry = by_method.setdefault(row["code"], {"code": row["code"], "name": row["name"] or row["code"], "amount": 0.0})
+    entry["name"]    = row["name"] or entry["name"]
+    entry["amount"] += amount
+
+
 # ─── Full context builder (real DB data) ──────────────────────────────────
 
 async def _build_context(date_from: str, date_to: str, branch: str, view_mode: str = "grouped") -> dict:
@@ -1407,14 +1523,10 @@ async def _build_context(date_from: str, date_to: str, branch: str, view_mode: s
     prev_end   = start - timedelta(days=1)
     prev_start = prev_end - timedelta(days=duration - 1)
 
-    params_c = {"date_from": start,      "date_to": end}
-    params_p = {"date_from": prev_start, "date_to": prev_end}
+    params_c = {"date_from": start, "date_to": end}
     filters_c: list[str] = []
-    filters_p: list[str] = []
     _append_in_filter(filters_c, params_c, "sd.warehouse_id", warehouse_ids, "warehouse_id")
-    _append_in_filter(filters_p, params_p, "sd.warehouse_id", warehouse_ids, "prev_warehouse_id")
     warehouse_clause_c = f"AND {' AND '.join(filters_c)}" if filters_c else ""
-    warehouse_clause_p = f"AND {' AND '.join(filters_p)}" if filters_p else ""
 
     async with db_manager.get_async_session() as session:
         if warehouse_ids:
@@ -1429,88 +1541,40 @@ async def _build_context(date_from: str, date_to: str, branch: str, view_mode: s
         else:
             branch_label = "Todas las sucursales"
 
-        daily_totals = _rows(await session.execute(text(f"""
-            SELECT DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
-                   COALESCE(SUM(sd.total_amount), 0) AS total, COUNT(*) AS txn
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause_c}
-            GROUP BY sale_date ORDER BY sale_date
-        """), params_c))
-
-        daily_cancelled = _rows(await session.execute(text(f"""
-            SELECT DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date, COUNT(*) AS cancelled
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL AND sd.status = 'CANCELLED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause_c}
-            GROUP BY sale_date
-        """), params_c))
-
-        payment_rows = _rows(await session.execute(text(f"""
-            SELECT DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
-                   sd.id, sd.payment_method_name, sd.payment_method_code,
-                   sd.amount_tendered, sd.change_amount, sd.payment_details, sd.total_amount
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause_c}
-        """), params_c))
+        # Current + previous window in one rollup scan
+        rollup_rows = await _daily_rollup_rows(session, prev_start, end, warehouse_ids)
 
-        prev_agg = _row(await session.execute(text(f"""
-            SELECT COALESCE(SUM(sd.total_amount), 0) AS total, COUNT(*) AS txn
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause_p}
-        """), params_p))
-
-        prev_cancel_row = _row(await session.execute(text(f"""
-            SELECT COUNT(*) AS cancelled FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL AND sd.status = 'CANCELLED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause_p}
-        """), params_p))
-
-        prev_daily = _rows(await session.execute(text(f"""
-            SELECT DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
-                   COALESCE(SUM(sd.total_amount), 0) AS total, COUNT(*) AS txn
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause_p}
-            GROUP BY sale_date ORDER BY sale_date
-        """), params_p))
-
-        detail_db_rows = _rows(await session.execute(text(f"""
-            SELECT
-              sd.id,
-              sd.sale_code,
-              COALESCE(sd.ticket_number, sd.sale_code) AS folio,
-              sd.document_type_code,
-              sd.document_type_name,
-              sd.status,
-              sd.customer_snapshot,
-              sd.warehouse_id,
-              COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
-              sd.payment_method_name,
-              sd.payment_method_code,
-              sd.payment_details,
-              sd.amount_tendered,
-              sd.change_amount,
-              sd.total_amount,
-              sd.created_at,
-              sd.updated_at
-            FROM sale_documents sd
-            LEFT JOIN warehouses w ON w.id = sd.warehouse_id
-            WHERE sd.deleted_at IS NULL
-              AND sd.status IN ('CLOSED', 'CANCELLED')
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause_c}
-            ORDER BY COALESCE(sd.updated_at, sd.created_at) ASC, sd.id ASC
-            LIMIT 2000
-        """), params_c))
+        # Document listing is only rendered in detail view
+        detail_db_rows: list[dict] = []
+        if view_mode == "detail":
+            detail_db_rows = _rows(await session.execute(text(f"""
+                SELECT
+                  sd.id,
+                  sd.sale_code,
+                  COALESCE(sd.ticket_number, sd.sale_code) AS folio,
+                  sd.document_type_code,
+                  sd.document_type_name,
+                  sd.status,
+                  sd.customer_snapshot,
+                  sd.warehouse_id,
+                  COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
+                  sd.payment_method_name,
+                  sd.payment_method_code,
+                  sd.payment_details,
+                  sd.amount_tendered,
+                  sd.change_amount,
+                  sd.total_amount,
+                  sd.created_at,
+                  sd.updated_at
+                FROM sale_documents sd
+                LEFT JOIN warehouses w ON w.id = sd.warehouse_id
+                WHERE sd.deleted_at IS NULL
+                  AND sd.status IN ('CLOSED', 'CANCELLED')
+                  AND sd.business_date BETWEEN :date_from AND :date_to
+                  {warehouse_clause_c}
+                ORDER BY COALESCE(sd.updated_at, sd.created_at) ASC, sd.id ASC
+                LIMIT 2000
+            """), params_c))
 
     # ── Build date index ───────────────────────────────────────────────
     date_idx: dict[str, dict] = {}
@@ -1519,39 +1583,22 @@ async def _build_context(date_from: str, date_to: str, branch: str, view_mode: s
         date_idx[cur.isoformat()] = {"total": 0.0, "txn": 0, "cancelled": 0, "by_method": {}}
         cur += timedelta(days=1)
 
-    for r in daily_totals:
-        iso = r["sale_date"] if isinstance(r["sale_date"], str) else r["sale_date"].isoformat()
-        if iso in date_idx:
-            date_idx[iso]["total"] = _money(r["total"])
-            date_idx[iso]["txn"]   = int(r["txn"])
-
-    for r in daily_cancelled:
-        iso = r["sale_date"] if isinstance(r["sale_date"], str) else r["sale_date"].isoformat()
-        if iso in date_idx:
-            date_idx[iso]["cancelled"] = int(r["cancelled"])
+    prev_date_idx: dict[str, dict] = {}
+    cur = prev_start
+    while cur <= prev_end:
+        prev_date_idx[cur.isoformat()] = {"total": 0.0, "txn": 0, "cancelled": 0}
+        cur += timedelta(days=1)
 
-    for r in payment_rows:
+    for r in rollup_rows:
         iso = r["sale_date"] if isinstance(r["sale_date"], str) else r["sale_date"].isoformat()
-        if iso not in date_idx:
+        day = date_idx.get(iso) or prev_date_idx.get(iso)
+        if day is None:
             continue
-        bm = date_idx[iso]["by_method"]
-
-        def _add(code, name, amount, _bm=bm):
-            if amount <= 0:
-                return
-            code  = (code or "OTHER").upper()
-            entry = _bm.setdefault(code, {"code": code, "name": name or code, "amount": 0.0})
-            entry["name"]   = name or entry["name"]
-            entry["amount"] += amount
-
-        details = _payment_details(r.get("payment_details"))
-        if isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED":
-            for p in (details.get("payments") or []):
-                if isinstance(p, dict):
-                    _add(p.get("payment_method_code"), p.get("payment_method_name"), _payment_amount(p))
-        else:
-            received = _money(r.get("amount_tendered") or r.get("total_amount")) - _money(r.get("change_amount"))
-            _add(r.get("payment_method_code"), r.get("payment_method_name"), received)
+        day["total"]     += _money(r["total"])
+        day["txn"]       += int(r["txn"])
+        day["cancelled"] += int(r["cancelled"])
+        if iso in date_idx:
+            _add_method(day["by_method"], r)
 
     detail_rows = []
     for r in detail_db_rows:
@@ -1604,24 +1651,10 @@ async def _build_context(date_from: str, date_to: str, branch: str, view_mode: s
     all_methods = sorted(method_map.values(), key=lambda x: -x["_t"])
 
     # ── Previous period (for comparison) ──────────────────────────────
-    prev_date_idx: dict[str, dict] = {}
-    cur = prev_start
-    while cur <= prev_end:
-        prev_date_idx[cur.isoformat()] = {"total": 0.0, "txn": 0, "cancelled": 0}
-        cur += timedelta(days=1)
-    for r in prev_daily:
-        iso = r["sale_date"] if isinstance(r["sale_date"], str) else r["sale_date"].isoformat()
-        if iso in prev_date_idx:
-            prev_date_idx[iso]["total"] = _money(r["total"])
-            prev_date_idx[iso]["txn"]   = int(r["txn"])
     prev_rows = [
-        {"iso": iso, "total": d["total"], "txn": d["txn"], "cancelled": 0}
+        {"iso": iso, "total": d["total"], "txn": d["txn"], "cancelled": d["cancelled"]}
         for iso, d in sorted(prev_date_idx.items())
     ]
-    # Inject real cancelled total for summary table
-    p_cancel_total = int(prev_cancel_row.get("cancelled", 0) or 0)
-    if prev_rows:
-        prev_rows[0]["cancelled"] = p_cancel_total  # summary uses sum, only needs total once
 
     # ── Aggregates ────────────────────────────────────────────────────
     total      = sum(r["total"]     for r in curr_rows)
@@ -1633,8 +1666,8 @@ async def _build_context(date_from: str, date_to: str, branch: str, view_mode: s
     best_row  = max(non_empty, key=lambda r: r["total"], default=None)
     worst_row = min(non_empty, key=lambda r: r["total"], default=None)
 
-    p_total = _money(prev_agg.get("total", 0))
-    p_txn   = int(prev_agg.get("txn", 0) or 0)
+    p_total = sum(r["total"] for r in prev_rows)
+    p_txn   = sum(r["txn"]   for r in prev_rows)
 
     # ── Context dict ──────────────────────────────────────────────────
     today_str    = date.today().strftime("%d/%m/%Y")
@@ -1833,44 +1866,9 @@ def _build_context_mock(date_from: str, date_to: str, branch: str) -> dict:
     return ctx
 
 
-# ─── Gotenberg call ────────────────────────────────────────────────────────
-
-def _call_gotenberg_sync(html_bytes: bytes, gotenberg_url: str) -> bytes:
-    boundary = uuid.uuid4().hex.encode()
-    nl       = b"\r\n"
-    body = (
-        b"--" + boundary + nl
-        + b'Content-Disposition: form-data; name="files"; filename="index.html"' + nl
-        + b"Content-Type: text/html; charset=utf-8" + nl
-        + nl
-        + html_bytes + nl
-        + b"--" + boundary + b"--" + nl
-    )
-    req = urllib.request.Request(
-        f"{gotenberg_url}/forms/chromium/convert/html",
-        data=body,
-        headers={"Content-Type": f"multipart/form-data; boundary={boundary.decode()}"},
-        method="POST",
-    )
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        return resp.read()
-
-
 # ─── Endpoints ─────────────────────────────────────────────────────────────
 
-@router.get("/daily-sales/data", response_class=JSONResponse)
-async def daily_sales_data(
-    date_from:    date       = Query(...),
-    date_to:      date       = Query(...),
-    warehouse_id: int | None = Query(None),
-    warehouse_ids: str | None = Query(None),
-    request:      Request    = None,
-    user:         dict       = Depends(get_current_user),
-):
-    if date_from > date_to:
-        date_from, date_to = date_to, date_from
-
-    selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+async def _daily_sales_payload(date_from: date, date_to: date, selected_warehouse_ids: list[int]) -> dict:
     params = {"date_from": date_from, "date_to": date_to}
     warehouse_filters: list[str] = []
     _append_in_filter(warehouse_filters, params, "sd.warehouse_id", selected_warehouse_ids, "warehouse_id")
@@ -1886,51 +1884,7 @@ async def daily_sales_data(
             ORDER BY warehouse_name
         """)))
 
-        daily_by_wh = _rows(await session.execute(text(f"""
-            SELECT
-              DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
-              sd.warehouse_id,
-              COALESCE(w.warehouse_name, 'Sin sucursal')   AS warehouse_name,
-              COALESCE(SUM(sd.total_amount), 0)            AS total,
-              COUNT(*)                                      AS txn
-            FROM sale_documents sd
-            LEFT JOIN warehouses w ON w.id = sd.warehouse_id
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause}
-            GROUP BY sale_date, sd.warehouse_id, w.warehouse_name
-            ORDER BY sale_date, warehouse_name
-        """), params))
-
-        daily_cancelled = _rows(await session.execute(text(f"""
-            SELECT
-              DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
-              COUNT(*) AS cancelled
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CANCELLED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause}
-            GROUP BY sale_date
-        """), params))
-
-        payment_rows = _rows(await session.execute(text(f"""
-            SELECT
-              DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
-              sd.id,
-              sd.payment_method_name,
-              sd.payment_method_code,
-              sd.amount_tendered,
-              sd.change_amount,
-              sd.payment_details,
-              sd.total_amount
-            FROM sale_documents sd
-            WHERE sd.deleted_at IS NULL
-              AND sd.status = 'CLOSED'
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
-              {warehouse_clause}
-        """), params))
+        rollup_rows = await _daily_rollup_rows(session, date_from, date_to, selected_warehouse_ids)
 
         detail_db_rows = _rows(await session.execute(text(f"""
             SELECT
@@ -1955,7 +1909,7 @@ async def daily_sales_data(
             LEFT JOIN warehouses w ON w.id = sd.warehouse_id
             WHERE sd.deleted_at IS NULL
               AND sd.status IN ('CLOSED', 'CANCELLED')
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             ORDER BY COALESCE(sd.updated_at, sd.created_at) ASC, sd.id ASC
             LIMIT 2000
@@ -1968,43 +1922,22 @@ async def daily_sales_data(
         date_idx[cur.isoformat()] = {"by_wh": {}, "cancelled": 0, "by_method": {}}
         cur += timedelta(days=1)
 
-    for r in daily_by_wh:
-        iso = r["sale_date"] if isinstance(r["sale_date"], str) else r["sale_date"].isoformat()
-        if iso in date_idx:
-            date_idx[iso]["by_wh"][r["warehouse_id"]] = {
-                "warehouse_id":   r["warehouse_id"],
-                "warehouse_name": r["warehouse_name"],
-                "total":          _money(r["total"]),
-                "txn":            int(r["txn"]),
-            }
-
-    for r in daily_cancelled:
-        iso = r["sale_date"] if isinstance(r["sale_date"], str) else r["sale_date"].isoformat()
-        if iso in date_idx:
-            date_idx[iso]["cancelled"] = int(r["cancelled"])
-
-    for r in payment_rows:
+    for r in rollup_rows:
         iso = r["sale_date"] if isinstance(r["sale_date"], str) else r["sale_date"].isoformat()
         if iso not in date_idx:
             continue
-        by_method = date_idx[iso]["by_method"]
-
-        def _add(code, name, amount, _bm=by_method):
-            if amount <= 0:
-                return
-            code  = (code or "OTHER").upper()
-            entry = _bm.setdefault(code, {"code": code, "name": name or code, "amount": 0.0})
-            entry["name"]   = name or entry["name"]
-            entry["amount"] += amount
-
-        details = _payment_details(r.get("payment_details"))
-        if isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED":
-            for p in (details.get("payments") or []):
-                if isinstance(p, dict):
-                    _add(p.get("payment_method_code"), p.get("payment_method_name"), _payment_amount(p))
-        else:
-            received = _money(r.get("amount_tendered") or r.get("total_amount")) - _money(r.get("change_amount"))
-            _add(r.get("payment_method_code"), r.get("payment_method_name"), received)
+        day = date_idx[iso]
+        day["cancelled"] += int(r["cancelled"])
+        _add_method(day["by_method"], r)
+        if int(r["txn"]) > 0:
+            branch = day["by_wh"].setdefault(r["warehouse_id"], {
+                "warehouse_id":   r["warehouse_id"],
+                "warehouse_name": r["warehouse_name"],
+                "total":          0.0,
+                "txn":            0,
+            })
+            branch["total"] += _money(r["total"])
+            branch["txn"]   += int(r["txn"])
 
     detail_rows = []
     for r in detail_db_rows:
@@ -2058,7 +1991,7 @@ async def daily_sales_data(
             "by_method":  methods,
         })
 
-    return {
+    payload = {
         "rows": rows_out,
         "detail_rows": detail_rows,
         "warehouses": [
@@ -2066,6 +1999,30 @@ async def daily_sales_data(
             for w in warehouses
         ],
     }
+    return payload
+
+
+@router.get("/daily-sales/data", response_class=JSONResponse)
+async def daily_sales_data(
+    date_from:    date       = Query(...),
+    date_to:      date       = Query(...),
+    warehouse_id: int | None = Query(None),
+    warehouse_ids: str | None = Query(None),
+    export_format: str       = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN),
+    request:      Request    = None,
+    user:         dict       = Depends(get_current_user),
+):
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+
+    selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+    payload = await report_cache_service.get_or_compute(
+        "daily_sales", date_from, date_to, selected_warehouse_ids,
+        lambda: _daily_sales_payload(date_from, date_to, selected_warehouse_ids),
+    )
+    if is_export_format(export_format):
+        return _export_payload(payload, export_format, "ventas-diarias")
+    return payload
 
 @router.post("/daily-sales/pdf", response_class=Response)
 async def daily_sales_pdf(
@@ -2104,11 +2061,8 @@ async def daily_sales_pdf(
     filename = f"ventas-diarias_{date_from}_{date_to}.pdf"
 
     try:
-        loop      = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(
-            None, _call_gotenberg_sync, html.encode("utf-8"), settings.GOTENBERG_URL
-        )
-    except urllib.error.URLError as exc:
+        pdf_bytes = await html_to_pdf(html)
+    except GotenbergUnavailable as exc:
         logger.error("Gotenberg no disponible en %s: %s", settings.GOTENBERG_URL, exc)
         return JSONResponse(
             {"error": "Servicio PDF no disponible", "detail": "Gotenberg no responde"},
@@ -2345,22 +2299,17 @@ async def petty_cash_detail_data(
     warehouse_ids: str | None = Query(None),
     category_id:   int | None = Query(None),
     status:        str        = Query("all"),
+    export_format: str        = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN),
     user:          dict       = Depends(get_current_user),
 ):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
     payload = await _petty_cash_detail_payload(date_from, date_to, selected_warehouse_ids, category_id, status)
-    return JSONResponse(payload)
+    return _json_or_export(payload, export_format, "caja-chica-detalle")
 
 
 def _build_petty_cash_table_pages(rows: list[dict], view_mode: str, ctx: dict) -> str:
-    def _partial(name: str) -> str:
-        content = _load_file(os.path.join(_PARTIALS_DIR, f"{name}.html"))
-        for key, value in ctx.items():
-            content = content.replace(f"{{{{{key}}}}}", str(value))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
     first = _PETTY_CASH_DAILY_ROWS_FIRST if view_mode == "grouped" else _PETTY_CASH_DETAIL_ROWS_FIRST
     rest = _PETTY_CASH_DAILY_ROWS_REST if view_mode == "grouped" else _PETTY_CASH_DETAIL_ROWS_REST
 
@@ -2541,9 +2490,7 @@ async def petty_cash_detail_pdf(
                 '{{> _page_footer}}'
                 '</section>'
             )
-            chart_page = _resolve_partials(chart_page)
-            for key, value in ctx.items():
-                chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
+            chart_page = _render_source(chart_page, ctx)
             ctx["CHART_PAGE"] = chart_page
         html_out = _render("petty_cash_detail.html", ctx)
     except Exception as exc:
@@ -2551,10 +2498,7 @@ async def petty_cash_detail_pdf(
         return JSONResponse({"error": "Error preparando reporte", "detail": str(exc)}, status_code=500)
 
     try:
-        loop = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(
-            None, _call_gotenberg_sync, html_out.encode("utf-8"), settings.GOTENBERG_URL
-        )
+        pdf_bytes = await html_to_pdf(html_out)
     except Exception as exc:
         logger.error("Gotenberg error petty_cash_detail: %s", exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -2777,38 +2721,32 @@ async def _petty_cash_replenishments_payload(date_from_value: date, date_to_valu
 
 
 @router.get("/petty-cash/weekly/data", response_class=JSONResponse)
-async def petty_cash_weekly_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), category_id: int | None = Query(None), status: str = Query("all"), user: dict = Depends(get_current_user)):
+async def petty_cash_weekly_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), category_id: int | None = Query(None), status: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _petty_cash_weekly_payload(date_from, date_to, selected_warehouse_ids, category_id, status))
+    return _json_or_export(await _petty_cash_weekly_payload(date_from, date_to, selected_warehouse_ids, category_id, status), export_format, "caja-chica-semanal")
 
 
 @router.get("/petty-cash/by-category/data", response_class=JSONResponse)
-async def petty_cash_by_category_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), status: str = Query("all"), user: dict = Depends(get_current_user)):
+async def petty_cash_by_category_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), status: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _petty_cash_by_category_payload(date_from, date_to, selected_warehouse_ids, status))
+    return _json_or_export(await _petty_cash_by_category_payload(date_from, date_to, selected_warehouse_ids, status), export_format, "caja-chica-por-categoria")
 
 
 @router.get("/petty-cash/fund-status/data", response_class=JSONResponse)
-async def petty_cash_fund_status_data(warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), status: str = Query("all"), user: dict = Depends(get_current_user)):
+async def petty_cash_fund_status_data(warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), status: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _petty_cash_fund_status_payload(selected_warehouse_ids, status))
+    return _json_or_export(await _petty_cash_fund_status_payload(selected_warehouse_ids, status), export_format, "caja-chica-estado-fondos")
 
 
 @router.get("/petty-cash/replenishments/data", response_class=JSONResponse)
-async def petty_cash_replenishments_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), user: dict = Depends(get_current_user)):
+async def petty_cash_replenishments_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _petty_cash_replenishments_payload(date_from, date_to, selected_warehouse_ids))
+    return _json_or_export(await _petty_cash_replenishments_payload(date_from, date_to, selected_warehouse_ids), export_format, "caja-chica-reposiciones")
 
 
 def _simple_petty_cash_pages(rows: list[dict], columns: list[tuple[str, str, str]], title: str, ctx: dict) -> str:
-    def _partial(name: str) -> str:
-        content = _load_file(os.path.join(_PARTIALS_DIR, f"{name}.html"))
-        for key, value in ctx.items():
-            content = content.replace(f"{{{{{key}}}}}", str(value))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
     chunks = [rows[:24]]
     rest = rows[24:]
     while rest:
@@ -2974,13 +2912,10 @@ async def _simple_petty_cash_pdf(
                 '{{> _page_footer}}'
                 '</section>'
             )
-            chart_page = _resolve_partials(chart_page)
-            for key, value in ctx.items():
-                chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
+            chart_page = _render_source(chart_page, ctx)
             ctx["CHART_PAGE"] = chart_page
         html_out = _render("petty_cash_detail.html", ctx)
-        loop = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(None, _call_gotenberg_sync, html_out.encode("utf-8"), settings.GOTENBERG_URL)
+        pdf_bytes = await html_to_pdf(html_out)
     except Exception as exc:
         logger.error("Error generando PDF %s: %s", report_kind, exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -3238,120 +3173,148 @@ async def _cash_pos_extra_movements_payload(date_from_value: date, date_to_value
     return {"rows": sorted(grouped.values(), key=lambda item: -abs(_money(item.get("total")))), "detail_rows": detail_rows, "totals": totals, "branch_label": branch_label}
 
 
-async def _cash_pos_collection_payload(date_from_value: date, date_to_value: date, warehouse_ids: list[int], method_code: str) -> dict:
+def _cash_pos_collection_query(date_from_value: date, date_to_value: date, warehouse_ids: list[int]) -> tuple[str, dict]:
     if date_from_value > date_to_value:
         date_from_value, date_to_value = date_to_value, date_from_value
     params: dict = {"date_from": date_from_value, "date_to": date_to_value}
     filters: list[str] = []
     _append_in_filter(filters, params, "sd.warehouse_id", warehouse_ids, "warehouse_id")
-    method_code = str(method_code or "all").upper()
     filter_clause = f"AND {' AND '.join(filters)}" if filters else ""
+    sql = f"""
+        SELECT
+          sd.id,
+          sd.sale_code,
+          COALESCE(sd.ticket_number, sd.sale_code) AS ticket_number,
+          DATE(sd.updated_at) AS sale_date,
+          sd.updated_at AS closed_at,
+          sd.payment_method_code,
+          sd.payment_method_name,
+          sd.payment_details,
+          sd.total_amount,
+          sd.amount_tendered,
+          sd.change_amount,
+          cr.register_code,
+          cr.register_name,
+          COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
+          cashier.username AS cashier_username,
+          cashier.first_name AS cashier_first_name,
+          cashier.last_name AS cashier_last_name
+        FROM sale_documents sd
+        LEFT JOIN cash_registers cr ON cr.id = sd.cash_register_id
+        LEFT JOIN warehouses w ON w.id = sd.warehouse_id
+        LEFT JOIN users cashier ON cashier.id = sd.closed_by_user_id
+        WHERE sd.status = 'CLOSED'
+          AND sd.deleted_at IS NULL
+          AND DATE(sd.updated_at) BETWEEN :date_from AND :date_to
+          {filter_clause}
+        ORDER BY sd.updated_at ASC, sd.id ASC
+    """
+    return sql, params
+
+
+def _cash_pos_collection_details(row: dict, method_code: str) -> list[dict]:
+    """Filas de detalle de una venta: una por componente si el pago es MIXED."""
+    details = _payment_details(row.get("payment_details"))
+    is_mixed = isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED"
+    if is_mixed:
+        payments = details.get("payments") or []
+    else:
+        payments = [{
+            "payment_method_code": row.get("payment_method_code"),
+            "payment_method_name": row.get("payment_method_name"),
+            "amount": row.get("total_amount"),
+        }]
+    out = []
+    for idx, payment in enumerate(payments):
+        amount = _money(
+            payment.get("clp_amount")
+            or payment.get("amount")
+            or payment.get("received_amount")
+            or row.get("total_amount")
+        )
+        code = str(payment.get("payment_method_code") or row.get("payment_method_code") or "").upper()
+        name = payment.get("payment_method_name") or row.get("payment_method_name")
+        if not code:
+            code = "NO_CHARGE"
+            name = "Sin cobro"
+        elif code in ("SIN_METODO", "NO_METHOD"):
+            code = "NO_CHARGE"
+            name = "Sin cobro"
+        else:
+            name = name or code
+        if method_code != "ALL" and code != method_code:
+            continue
+        out.append({
+            **row,
+            "id": f'{row.get("id")}-{idx}',
+            "sale_id": row.get("id"),
+            "sale_date": row["sale_date"] if isinstance(row.get("sale_date"), str) else row["sale_date"].isoformat(),
+            "closed_at": str(row.get("closed_at") or ""),
+            "payment_method_code": code,
+            "payment_method_name": name,
+            "total_amount": amount,
+            "sale_total_amount": _money(row.get("total_amount")),
+            "amount_tendered": _money(row.get("amount_tendered")),
+            "change_amount": _money(row.get("change_amount")),
+            "cashier_name": _person_name(row, "cashier"),
+            "is_mixed_component": is_mixed,
+        })
+    return out
+
+
+async def _cash_pos_collection_export_rows(date_from_value: date, date_to_value: date, warehouse_ids: list[int], method_code: str) -> AsyncIterator[dict]:
+    sql, params = _cash_pos_collection_query(date_from_value, date_to_value, warehouse_ids)
+    method_code = str(method_code or "all").upper()
+    async for row in _stream_rows(sql, params):
+        for detail in _cash_pos_collection_details(row, method_code):
+            detail.pop("payment_details", None)
+            yield detail
+
+
+async def _cash_pos_collection_payload(date_from_value: date, date_to_value: date, warehouse_ids: list[int], method_code: str) -> dict:
+    sql, params = _cash_pos_collection_query(date_from_value, date_to_value, warehouse_ids)
+    method_code = str(method_code or "all").upper()
     async with db_manager.get_async_session() as session:
-        sale_rows = _rows(await session.execute(text(f"""
-            SELECT
-              sd.id,
-              sd.sale_code,
-              COALESCE(sd.ticket_number, sd.sale_code) AS ticket_number,
-              DATE(sd.updated_at) AS sale_date,
-              sd.updated_at AS closed_at,
-              sd.payment_method_code,
-              sd.payment_method_name,
-              sd.payment_details,
-              sd.total_amount,
-              sd.amount_tendered,
-              sd.change_amount,
-              cr.register_code,
-              cr.register_name,
-              COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
-              cashier.username AS cashier_username,
-              cashier.first_name AS cashier_first_name,
-              cashier.last_name AS cashier_last_name
-            FROM sale_documents sd
-            LEFT JOIN cash_registers cr ON cr.id = sd.cash_register_id
-            LEFT JOIN warehouses w ON w.id = sd.warehouse_id
-            LEFT JOIN users cashier ON cashier.id = sd.closed_by_user_id
-            WHERE sd.status = 'CLOSED'
-              AND sd.deleted_at IS NULL
-              AND DATE(sd.updated_at) BETWEEN :date_from AND :date_to
-              {filter_clause}
-            ORDER BY sd.updated_at ASC, sd.id ASC
-        """), params))
+        sale_rows = _rows(await session.execute(text(sql), params))
         branch_label = await _cash_pos_branch_label(session, warehouse_ids)
     out_detail = []
     grouped: dict[str, dict] = {}
     for row in sale_rows:
-        details = _payment_details(row.get("payment_details"))
-        if isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED":
-            payments = details.get("payments") or []
-        else:
-            payments = [{
-                "payment_method_code": row.get("payment_method_code"),
-                "payment_method_name": row.get("payment_method_name"),
-                "amount": row.get("total_amount"),
-            }]
-        for idx, payment in enumerate(payments):
-            amount = _money(
-                payment.get("clp_amount")
-                or payment.get("amount")
-                or payment.get("received_amount")
-                or row.get("total_amount")
-            )
-            code = str(payment.get("payment_method_code") or row.get("payment_method_code") or "").upper()
-            name = payment.get("payment_method_name") or row.get("payment_method_name")
-            if not code:
-                code = "NO_CHARGE"
-                name = "Sin cobro"
-            elif code in ("SIN_METODO", "NO_METHOD"):
-                code = "NO_CHARGE"
-                name = "Sin cobro"
-            else:
-                name = name or code
-            if method_code != "ALL" and code != method_code:
-                continue
-            grouped.setdefault(code, {"payment_method_code": code, "payment_method_name": name, "count": 0, "total": 0.0})
+        for detail in _cash_pos_collection_details(row, method_code):
+            code = detail["payment_method_code"]
+            grouped.setdefault(code, {"payment_method_code": code, "payment_method_name": detail["payment_method_name"], "count": 0, "total": 0.0})
             grouped[code]["count"] += 1
-            grouped[code]["total"] += amount
-            out_detail.append({
-                **row,
-                "id": f'{row.get("id")}-{idx}',
-                "sale_id": row.get("id"),
-                "sale_date": row["sale_date"] if isinstance(row.get("sale_date"), str) else row["sale_date"].isoformat(),
-                "closed_at": str(row.get("closed_at") or ""),
-                "payment_method_code": code,
-                "payment_method_name": name,
-                "total_amount": amount,
-                "sale_total_amount": _money(row.get("total_amount")),
-                "amount_tendered": _money(row.get("amount_tendered")),
-                "change_amount": _money(row.get("change_amount")),
-                "cashier_name": _person_name(row, "cashier"),
-                "is_mixed_component": isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED",
-            })
+            grouped[code]["total"] += detail["total_amount"]
+            out_detail.append(detail)
     rows = sorted(grouped.values(), key=lambda item: -_money(item.get("total")))
     totals = {"count": len(out_detail), "total": sum(row["total_amount"] for row in out_detail), "methods": len(rows)}
     return {"rows": rows, "detail_rows": out_detail, "totals": totals, "branch_label": branch_label}
 
 
 @router.get("/cash-pos/sessions/data", response_class=JSONResponse)
-async def cash_pos_sessions_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), status: str = Query("all"), user: dict = Depends(get_current_user)):
+async def cash_pos_sessions_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), status: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _cash_pos_sessions_payload(date_from, date_to, selected_warehouse_ids, status))
+    return _json_or_export(await _cash_pos_sessions_payload(date_from, date_to, selected_warehouse_ids, status), export_format, "caja-pos-sesiones")
 
 
 @router.get("/cash-pos/discrepancies/data", response_class=JSONResponse)
-async def cash_pos_discrepancies_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), user: dict = Depends(get_current_user)):
+async def cash_pos_discrepancies_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _cash_pos_discrepancies_payload(date_from, date_to, selected_warehouse_ids))
+    return _json_or_export(await _cash_pos_discrepancies_payload(date_from, date_to, selected_warehouse_ids), export_format, "caja-pos-diferencias")
 
 
 @router.get("/cash-pos/extra-movements/data", response_class=JSONResponse)
-async def cash_pos_extra_movements_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), movement_type: str = Query("all"), user: dict = Depends(get_current_user)):
+async def cash_pos_extra_movements_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), movement_type: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _cash_pos_extra_movements_payload(date_from, date_to, selected_warehouse_ids, movement_type))
+    return _json_or_export(await _cash_pos_extra_movements_payload(date_from, date_to, selected_warehouse_ids, movement_type), export_format, "caja-pos-movimientos-extra")
 
 
 @router.get("/cash-pos/collection-by-method/data", response_class=JSONResponse)
-async def cash_pos_collection_by_method_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), method_code: str = Query("all"), user: dict = Depends(get_current_user)):
+async def cash_pos_collection_by_method_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), method_code: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+    if is_export_format(export_format):
+        rows = _cash_pos_collection_export_rows(date_from, date_to, selected_warehouse_ids, method_code)
+        return export_response(rows, export_format, "caja-pos-recaudacion-por-medio")
     return JSONResponse(await _cash_pos_collection_payload(date_from, date_to, selected_warehouse_ids, method_code))
 
 
@@ -3432,28 +3395,27 @@ async def _build_cash_pos_context(report_kind: str, date_from_str: str, date_to_
     }
 
 
+async def _cash_pos_html(report_kind: str, date_from: str, date_to: str, warehouse_id: str, filter_value: str, view_mode: str, chart_png: bytes | None) -> str:
+    ctx = await _build_cash_pos_context(report_kind, date_from, date_to, warehouse_id, filter_value, view_mode)
+    if chart_png:
+        b64 = base64.b64encode(chart_png).decode()
+        chart_page = (
+            '<section class="report-page">{{> _page_header}}'
+            '<div class="section-heading"><div class="section-label">Gráfico</div>'
+            f'<h2 class="section-title">{_escape(ctx.get("REPORT_TITLE", "Caja POS"))}</h2></div>'
+            '<div class="chart-card no-break"><div class="chart-section" style="min-height:0">'
+            f'<img src="data:image/png;base64,{b64}" style="width:100%;height:auto;display:block;" />'
+            '</div></div>{{> _page_footer}}</section>'
+        )
+        ctx["CHART_PAGE"] = _render_source(chart_page, ctx)
+    return _render("petty_cash_detail.html", ctx)
+
+
 async def _cash_pos_pdf(report_kind: str, date_from: str, date_to: str, warehouse_id: str, filter_value: str, view_mode: str, chart_bar: Optional[UploadFile]) -> Response:
     try:
-        ctx = await _build_cash_pos_context(report_kind, date_from, date_to, warehouse_id, filter_value, view_mode)
-        if chart_bar:
-            raw = await chart_bar.read()
-            if raw:
-                b64 = base64.b64encode(raw).decode()
-                chart_page = (
-                    '<section class="report-page">{{> _page_header}}'
-                    '<div class="section-heading"><div class="section-label">Gráfico</div>'
-                    f'<h2 class="section-title">{_escape(ctx.get("REPORT_TITLE", "Caja POS"))}</h2></div>'
-                    '<div class="chart-card no-break"><div class="chart-section" style="min-height:0">'
-                    f'<img src="data:image/png;base64,{b64}" style="width:100%;height:auto;display:block;" />'
-                    '</div></div>{{> _page_footer}}</section>'
-                )
-                chart_page = _resolve_partials(chart_page)
-                for key, value in ctx.items():
-                    chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
-                ctx["CHART_PAGE"] = chart_page
-        html_out = _render("petty_cash_detail.html", ctx)
-        loop = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(None, _call_gotenberg_sync, html_out.encode("utf-8"), settings.GOTENBERG_URL)
+        chart_png = await chart_bar.read() if chart_bar else None
+        html_out = await _cash_pos_html(report_kind, date_from, date_to, warehouse_id, filter_value, view_mode, chart_png)
+        pdf_bytes = await html_to_pdf(html_out)
     except Exception as exc:
         logger.error("Error generando PDF caja POS %s: %s", report_kind, exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -3481,21 +3443,7 @@ async def cash_pos_collection_by_method_pdf(date_from: str = Form(...), date_to:
     return await _cash_pos_pdf("collection_by_method", date_from, date_to, warehouse_id, method_code, view_mode, chart_bar)
 
 
-@router.get("/sales/category-sales/data", response_class=JSONResponse)
-async def category_sales_data(
-    date_from:     date       = Query(...),
-    date_to:       date       = Query(...),
-    warehouse_id:  int | None = Query(None),
-    warehouse_ids: str | None = Query(None),
-    group_by:      str        = Query("category"),
-    user:          dict       = Depends(get_current_user),
-):
-    if date_from > date_to:
-        date_from, date_to = date_to, date_from
-
-    group_by = group_by if group_by in ("category", "brand") else "category"
-
-    selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+async def _category_sales_payload(date_from: date, date_to: date, selected_warehouse_ids: list[int], group_by: str) -> dict:
     params: dict = {"date_from": date_from, "date_to": date_to}
     warehouse_filters: list[str] = []
     _append_in_filter(warehouse_filters, params, "sd.warehouse_id", selected_warehouse_ids, "warehouse_id")
@@ -3531,7 +3479,7 @@ async def category_sales_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sdl.paid_total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             GROUP BY {group_by_sql}
             ORDER BY total DESC
@@ -3549,7 +3497,7 @@ async def category_sales_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sdl.paid_total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
         """), params))
 
@@ -3561,7 +3509,7 @@ async def category_sales_data(
                 sd.sale_code,
                 COALESCE(sd.ticket_number, sd.sale_code)             AS folio,
                 COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
-                DATE(COALESCE(sd.updated_at, sd.created_at))         AS sale_date,
+                sd.business_date                                     AS sale_date,
                 sdl.quantity,
                 sdl.paid_total_amount                                 AS total
             FROM sale_document_lines sdl
@@ -3575,7 +3523,7 @@ async def category_sales_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sdl.paid_total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             ORDER BY sale_date ASC, sd.id ASC, sdl.id ASC
             LIMIT 3000
@@ -3612,7 +3560,7 @@ async def category_sales_data(
         for r in detail_db
     ]
 
-    return JSONResponse({
+    return {
         "rows":        rows_out,
         "detail_rows": detail_rows_out,
         "totals": {
@@ -3621,7 +3569,31 @@ async def category_sales_data(
             "txn_count": int(total_row.get("txn_count") or 0),
         },
         "group_by": group_by,
-    })
+    }
+
+
+@router.get("/sales/category-sales/data", response_class=JSONResponse)
+async def category_sales_data(
+    date_from:     date       = Query(...),
+    date_to:       date       = Query(...),
+    warehouse_id:  int | None = Query(None),
+    warehouse_ids: str | None = Query(None),
+    group_by:      str        = Query("category"),
+    export_format: str        = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN),
+    user:          dict       = Depends(get_current_user),
+):
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+
+    group_by = group_by if group_by in ("category", "brand") else "category"
+
+    selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+    payload = await report_cache_service.get_or_compute(
+        "category_sales", date_from, date_to, selected_warehouse_ids,
+        lambda: _category_sales_payload(date_from, date_to, selected_warehouse_ids, group_by),
+        group_by=group_by,
+    )
+    return _json_or_export(payload, export_format, "ventas-por-categoria")
 
 
 # ─── Category sales PDF ───────────────────────────────────────────────────────
@@ -3687,7 +3659,7 @@ async def _build_category_context(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sdl.paid_total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             GROUP BY {group_by_sql}
             ORDER BY total DESC
@@ -3705,7 +3677,7 @@ async def _build_category_context(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sdl.paid_total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
         """), params))
 
@@ -3796,15 +3768,8 @@ async def _build_category_context(
 def _build_category_table_pages(
     rows: list[dict], group_label: str, grand_total: float, ctx: dict,
 ) -> str:
-    def _partial(name: str) -> str:
-        path    = os.path.join(_PARTIALS_DIR, f"{name}.html")
-        content = _load_file(path)
-        for k, v in ctx.items():
-            content = content.replace(f"{{{{{k}}}}}", str(v))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
 
     chunks: list[list[dict]] = []
     if not rows:
@@ -3928,9 +3893,7 @@ async def category_sales_pdf(
                 '{{> _page_footer}}'
                 '</section>'
             )
-            chart_page = _resolve_partials(chart_page)
-            for key, value in ctx.items():
-                chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
+            chart_page = _render_source(chart_page, ctx)
             ctx["CHART_PAGE"] = chart_page
         html = _render("category_sales.html", ctx)
     except Exception as exc:
@@ -3940,10 +3903,7 @@ async def category_sales_pdf(
     filename = f"ventas-{group_by}_{date_from}_{date_to}.pdf"
 
     try:
-        loop      = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(
-            None, _call_gotenberg_sync, html.encode("utf-8"), settings.GOTENBERG_URL
-        )
+        pdf_bytes = await html_to_pdf(html)
     except Exception as exc:
         logger.error("Gotenberg error category_sales: %s", exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -3967,6 +3927,7 @@ async def customer_sales_data(
     date_to:       date       = Query(...),
     warehouse_id:  int | None = Query(None),
     warehouse_ids: str | None = Query(None),
+    export_format: str        = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN),
     user:          dict       = Depends(get_current_user),
 ):
     if date_from > date_to:
@@ -3990,7 +3951,7 @@ async def customer_sales_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             GROUP BY sd.customer_id
             ORDER BY total DESC
@@ -4007,7 +3968,7 @@ async def customer_sales_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
         """), params))
 
@@ -4017,7 +3978,7 @@ async def customer_sales_data(
                 COALESCE(sd.ticket_number, sd.sale_code)             AS folio,
                 sd.customer_id,
                 sd.customer_snapshot,
-                DATE(COALESCE(sd.updated_at, sd.created_at))         AS sale_date,
+                sd.business_date                                     AS sale_date,
                 COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
                 sd.payment_method_name,
                 ROUND(sd.total_amount, 0)                            AS total
@@ -4027,7 +3988,7 @@ async def customer_sales_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             ORDER BY sale_date ASC, sd.id ASC
             LIMIT 2000
@@ -4063,7 +4024,7 @@ async def customer_sales_data(
         for r in detail_db
     ]
 
-    return JSONResponse({
+    return _json_or_export({
         "rows":        rows_out,
         "detail_rows": detail_rows_out,
         "totals": {
@@ -4071,7 +4032,7 @@ async def customer_sales_data(
             "txn_count":    int(total_row.get("txn_count") or 0),
             "client_count": int(total_row.get("client_count") or 0),
         },
-    })
+    }, export_format, "ventas-por-cliente")
 
 
 # ─── Customer sales PDF ───────────────────────────────────────────────────────
@@ -4116,7 +4077,7 @@ async def _build_customer_context(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             GROUP BY sd.customer_id
             ORDER BY total DESC
@@ -4132,7 +4093,7 @@ async def _build_customer_context(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
         """), params))
 
@@ -4219,15 +4180,8 @@ async def _build_customer_context(
 
 
 def _build_client_table_pages(rows: list[dict], grand_total: float, ctx: dict) -> str:
-    def _partial(name: str) -> str:
-        path    = os.path.join(_PARTIALS_DIR, f"{name}.html")
-        content = _load_file(path)
-        for k, v in ctx.items():
-            content = content.replace(f"{{{{{k}}}}}", str(v))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
 
     chunks: list[list[dict]] = []
     if not rows:
@@ -4348,9 +4302,7 @@ async def customer_sales_pdf(
                 '{{> _page_footer}}'
                 '</section>'
             )
-            chart_page = _resolve_partials(chart_page)
-            for key, value in ctx.items():
-                chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
+            chart_page = _render_source(chart_page, ctx)
             ctx["CHART_PAGE"] = chart_page
         html = _render("client_sales.html", ctx)
     except Exception as exc:
@@ -4360,10 +4312,7 @@ async def customer_sales_pdf(
     filename = f"ventas-cliente_{date_from}_{date_to}.pdf"
 
     try:
-        loop      = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(
-            None, _call_gotenberg_sync, html.encode("utf-8"), settings.GOTENBERG_URL
-        )
+        pdf_bytes = await html_to_pdf(html)
     except Exception as exc:
         logger.error("Gotenberg error client_sales: %s", exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -4423,14 +4372,14 @@ async def _customers_ranking_payload(date_from_value: date, date_to_value: date,
               c.commercial_name,
               COUNT(DISTINCT sd.id) AS txn_count,
               ROUND(SUM(sd.total_amount), 0) AS total,
-              MAX(DATE(COALESCE(sd.updated_at, sd.created_at))) AS last_sale_date
+              MAX(sd.business_date) AS last_sale_date
             FROM sale_documents sd
             LEFT JOIN customers c ON c.id = sd.customer_id
             WHERE sd.deleted_at IS NULL
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             GROUP BY sd.customer_id, c.tax_id, c.legal_name, c.commercial_name
             ORDER BY total DESC
@@ -4444,7 +4393,7 @@ async def _customers_ranking_payload(date_from_value: date, date_to_value: date,
               c.tax_id,
               c.legal_name,
               c.commercial_name,
-              DATE(COALESCE(sd.updated_at, sd.created_at)) AS sale_date,
+              sd.business_date AS sale_date,
               COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
               COALESCE(sd.payment_method_name, sd.payment_method_code, '') AS payment_method_name,
               ROUND(sd.total_amount, 0) AS total
@@ -4455,7 +4404,7 @@ async def _customers_ranking_payload(date_from_value: date, date_to_value: date,
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             ORDER BY sale_date ASC, sd.id ASC
             LIMIT 2000
@@ -4470,7 +4419,7 @@ async def _customers_ranking_payload(date_from_value: date, date_to_value: date,
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
         """), params))
         branch_label = await _customer_branch_label(session, warehouse_ids)
@@ -4585,7 +4534,7 @@ async def _customers_credit_status_payload(date_from_value: date, date_to_value:
     return {"rows": rows, "detail_rows": details, "totals": totals, "branch_label": branch_label}
 
 
-async def _customers_payment_history_payload(date_from_value: date, date_to_value: date, warehouse_ids: list[int], method_id: int | None, status: str) -> dict:
+def _customers_payment_history_query(date_from_value: date, date_to_value: date, method_id: int | None, status: str, limit: int | None = 2000) -> tuple[str, dict]:
     if date_from_value > date_to_value:
         date_from_value, date_to_value = date_to_value, date_from_value
     params: dict = {"date_from": date_from_value, "date_to": date_to_value}
@@ -4597,37 +4546,75 @@ async def _customers_payment_history_payload(date_from_value: date, date_to_valu
     if str(status or "all").lower() != "all":
         status_filter = "AND ss.status_code = :status"
         params["status"] = str(status).upper()
+    limit_clause = ""
+    if limit:
+        limit_clause = "LIMIT :limit"
+        params["limit"] = limit
+    sql = f"""
+        SELECT
+          cp.id,
+          cp.payment_code,
+          cp.customer_id,
+          c.tax_id,
+          c.legal_name,
+          c.commercial_name,
+          cp.payment_date,
+          cp.payment_amount,
+          cp.allocated_amount,
+          cp.unallocated_amount,
+          cp.reference_number,
+          cp.bank_name,
+          cp.check_date,
+          cp.check_status,
+          pm.method_name AS payment_method_name,
+          COALESCE(ss.status_display_es, ss.status_name, ss.status_code, 'Sin estado') AS status_label,
+          ss.status_code
+        FROM customer_payments cp
+        JOIN customers c ON c.id = cp.customer_id
+        LEFT JOIN payment_methods pm ON pm.id = cp.payment_method_id
+        LEFT JOIN system_statuses ss ON ss.id = cp.status_id
+        WHERE c.deleted_at IS NULL
+          AND cp.payment_date BETWEEN :date_from AND :date_to
+          {method_filter}
+          {status_filter}
+        ORDER BY cp.payment_date ASC, cp.id ASC
+        {limit_clause}
+    """
+    return sql, params
+
+
+def _customer_payment_detail(row: dict) -> dict:
+    return {
+        "id": row.get("id"),
+        "payment_code": row.get("payment_code") or "",
+        "customer_id": row.get("customer_id"),
+        "customer_name": _customer_display_name(row),
+        "tax_id": row.get("tax_id") or "",
+        "payment_date": _customer_date_value(row.get("payment_date")),
+        "payment_method_name": row.get("payment_method_name") or "Sin método",
+        "payment_amount": _money(row.get("payment_amount")),
+        "allocated_amount": _money(row.get("allocated_amount")),
+        "unallocated_amount": _money(row.get("unallocated_amount")),
+        "reference_number": row.get("reference_number") or "",
+        "bank_name": row.get("bank_name") or "",
+        "check_date": _customer_date_value(row.get("check_date")),
+        "check_status": row.get("check_status") or "",
+        "status_label": row.get("status_label") or "Sin estado",
+        "status_code": row.get("status_code") or "",
+    }
+
+
+async def _customers_payment_history_export_rows(date_from_value: date, date_to_value: date, method_id: int | None, status: str) -> AsyncIterator[dict]:
+    # La exportacion no lleva el LIMIT de la vista: el cursor del servidor acota la memoria.
+    sql, params = _customers_payment_history_query(date_from_value, date_to_value, method_id, status, limit=None)
+    async for row in _stream_rows(sql, params):
+        yield _customer_payment_detail(row)
+
+
+async def _customers_payment_history_payload(date_from_value: date, date_to_value: date, warehouse_ids: list[int], method_id: int | None, status: str) -> dict:
+    sql, params = _customers_payment_history_query(date_from_value, date_to_value, method_id, status)
     async with db_manager.get_async_session() as session:
-        detail_rows = _rows(await session.execute(text(f"""
-            SELECT
-              cp.id,
-              cp.payment_code,
-              cp.customer_id,
-              c.tax_id,
-              c.legal_name,
-              c.commercial_name,
-              cp.payment_date,
-              cp.payment_amount,
-              cp.allocated_amount,
-              cp.unallocated_amount,
-              cp.reference_number,
-              cp.bank_name,
-              cp.check_date,
-              cp.check_status,
-              pm.method_name AS payment_method_name,
-              COALESCE(ss.status_display_es, ss.status_name, ss.status_code, 'Sin estado') AS status_label,
-              ss.status_code
-            FROM customer_payments cp
-            JOIN customers c ON c.id = cp.customer_id
-            LEFT JOIN payment_methods pm ON pm.id = cp.payment_method_id
-            LEFT JOIN system_statuses ss ON ss.id = cp.status_id
-            WHERE c.deleted_at IS NULL
-              AND cp.payment_date BETWEEN :date_from AND :date_to
-              {method_filter}
-              {status_filter}
-            ORDER BY cp.payment_date ASC, cp.id ASC
-            LIMIT 2000
-        """), params))
+        detail_rows = _rows(await session.execute(text(sql), params))
         method_options = _rows(await session.execute(text("""
             SELECT id, method_name
             FROM payment_methods
@@ -4644,33 +4631,14 @@ async def _customers_payment_history_payload(date_from_value: date, date_to_valu
     grouped: dict[str, dict] = {}
     details = []
     for row in detail_rows:
-        method = row.get("payment_method_name") or "Sin método"
-        amount = _money(row.get("payment_amount"))
-        allocated = _money(row.get("allocated_amount"))
-        unallocated = _money(row.get("unallocated_amount"))
+        detail = _customer_payment_detail(row)
+        method = detail["payment_method_name"]
         entry = grouped.setdefault(method, {"payment_method_name": method, "count": 0, "total": 0.0, "allocated": 0.0, "unallocated": 0.0})
         entry["count"] += 1
-        entry["total"] += amount
-        entry["allocated"] += allocated
-        entry["unallocated"] += unallocated
-        details.append({
-            "id": row.get("id"),
-            "payment_code": row.get("payment_code") or "",
-            "customer_id": row.get("customer_id"),
-            "customer_name": _customer_display_name(row),
-            "tax_id": row.get("tax_id") or "",
-            "payment_date": _customer_date_value(row.get("payment_date")),
-            "payment_method_name": method,
-            "payment_amount": amount,
-            "allocated_amount": allocated,
-            "unallocated_amount": unallocated,
-            "reference_number": row.get("reference_number") or "",
-            "bank_name": row.get("bank_name") or "",
-            "check_date": _customer_date_value(row.get("check_date")),
-            "check_status": row.get("check_status") or "",
-            "status_label": row.get("status_label") or "Sin estado",
-            "status_code": row.get("status_code") or "",
-        })
+        entry["total"] += detail["payment_amount"]
+        entry["allocated"] += detail["allocated_amount"]
+        entry["unallocated"] += detail["unallocated_amount"]
+        details.append(detail)
     rows = sorted(grouped.values(), key=lambda item: _money(item.get("total")), reverse=True)
     totals = {"count": len(details), "total": sum(row["payment_amount"] for row in details), "allocated": sum(row["allocated_amount"] for row in details), "unallocated": sum(row["unallocated_amount"] for row in details), "methods": len(rows)}
     return {
@@ -4825,33 +4793,36 @@ async def _customers_geography_payload(date_from_value: date, date_to_value: dat
 
 
 @router.get("/customers/ranking/data", response_class=JSONResponse)
-async def customers_ranking_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), user: dict = Depends(get_current_user)):
+async def customers_ranking_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _customers_ranking_payload(date_from, date_to, selected_warehouse_ids))
+    return _json_or_export(await _customers_ranking_payload(date_from, date_to, selected_warehouse_ids), export_format, "clientes-ranking")
 
 
 @router.get("/customers/credit-status/data", response_class=JSONResponse)
-async def customers_credit_status_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), risk_level: str = Query("all"), user: dict = Depends(get_current_user)):
+async def customers_credit_status_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), risk_level: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _customers_credit_status_payload(date_from, date_to, selected_warehouse_ids, risk_level))
+    return _json_or_export(await _customers_credit_status_payload(date_from, date_to, selected_warehouse_ids, risk_level), export_format, "clientes-estado-credito")
 
 
 @router.get("/customers/payment-history/data", response_class=JSONResponse)
-async def customers_payment_history_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), method_id: int | None = Query(None), status: str = Query("all"), user: dict = Depends(get_current_user)):
+async def customers_payment_history_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), method_id: int | None = Query(None), status: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+    if is_export_format(export_format):
+        rows = _customers_payment_history_export_rows(date_from, date_to, method_id, status)
+        return export_response(rows, export_format, "clientes-historial-pagos")
     return JSONResponse(await _customers_payment_history_payload(date_from, date_to, selected_warehouse_ids, method_id, status))
 
 
 @router.get("/customers/authorized-buyers/data", response_class=JSONResponse)
-async def customers_authorized_buyers_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), active: str = Query("all"), user: dict = Depends(get_current_user)):
+async def customers_authorized_buyers_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), active: str = Query("all"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _customers_authorized_buyers_payload(date_from, date_to, selected_warehouse_ids, active))
+    return _json_or_export(await _customers_authorized_buyers_payload(date_from, date_to, selected_warehouse_ids, active), export_format, "clientes-compradores-autorizados")
 
 
 @router.get("/customers/geography/data", response_class=JSONResponse)
-async def customers_geography_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), group_by: str = Query("region"), user: dict = Depends(get_current_user)):
+async def customers_geography_data(date_from: date = Query(...), date_to: date = Query(...), warehouse_id: int | None = Query(None), warehouse_ids: str | None = Query(None), group_by: str = Query("region"), export_format: str = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN), user: dict = Depends(get_current_user)):
     selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
-    return JSONResponse(await _customers_geography_payload(date_from, date_to, selected_warehouse_ids, group_by))
+    return _json_or_export(await _customers_geography_payload(date_from, date_to, selected_warehouse_ids, group_by), export_format, "clientes-geografia")
 
 
 async def _build_customers_context(report_kind: str, date_from_str: str, date_to_str: str, warehouse_id_str: str, filter_value: str, view_mode: str) -> dict:
@@ -4929,28 +4900,27 @@ async def _build_customers_context(report_kind: str, date_from_str: str, date_to
     }
 
 
+async def _customers_html(report_kind: str, date_from: str, date_to: str, warehouse_id: str, filter_value: str, view_mode: str, chart_png: bytes | None) -> str:
+    ctx = await _build_customers_context(report_kind, date_from, date_to, warehouse_id, filter_value, view_mode)
+    if chart_png:
+        b64 = base64.b64encode(chart_png).decode()
+        chart_page = (
+            '<section class="report-page">{{> _page_header}}'
+            '<div class="section-heading"><div class="section-label">Gráfico</div>'
+            f'<h2 class="section-title">{_escape(ctx.get("REPORT_TITLE", "Clientes"))}</h2></div>'
+            '<div class="chart-card no-break"><div class="chart-section" style="min-height:0">'
+            f'<img src="data:image/png;base64,{b64}" style="width:100%;height:auto;display:block;" />'
+            '</div></div>{{> _page_footer}}</section>'
+        )
+        ctx["CHART_PAGE"] = _render_source(chart_page, ctx)
+    return _render("petty_cash_detail.html", ctx)
+
+
 async def _customers_pdf(report_kind: str, date_from: str, date_to: str, warehouse_id: str, filter_value: str, view_mode: str, chart_bar: Optional[UploadFile]) -> Response:
     try:
-        ctx = await _build_customers_context(report_kind, date_from, date_to, warehouse_id, filter_value, view_mode)
-        if chart_bar:
-            raw = await chart_bar.read()
-            if raw:
-                b64 = base64.b64encode(raw).decode()
-                chart_page = (
-                    '<section class="report-page">{{> _page_header}}'
-                    '<div class="section-heading"><div class="section-label">Gráfico</div>'
-                    f'<h2 class="section-title">{_escape(ctx.get("REPORT_TITLE", "Clientes"))}</h2></div>'
-                    '<div class="chart-card no-break"><div class="chart-section" style="min-height:0">'
-                    f'<img src="data:image/png;base64,{b64}" style="width:100%;height:auto;display:block;" />'
-                    '</div></div>{{> _page_footer}}</section>'
-                )
-                chart_page = _resolve_partials(chart_page)
-                for key, value in ctx.items():
-                    chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
-                ctx["CHART_PAGE"] = chart_page
-        html_out = _render("petty_cash_detail.html", ctx)
-        loop = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(None, _call_gotenberg_sync, html_out.encode("utf-8"), settings.GOTENBERG_URL)
+        chart_png = await chart_bar.read() if chart_bar else None
+        html_out = await _customers_html(report_kind, date_from, date_to, warehouse_id, filter_value, view_mode, chart_png)
+        pdf_bytes = await html_to_pdf(html_out)
     except Exception as exc:
         logger.error("Error generando PDF clientes %s: %s", report_kind, exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -4989,18 +4959,7 @@ _SLR_ROWS_FIRST = 24
 _SLR_ROWS_REST  = 28
 
 
-@router.get("/sales/seller-ranking/data", response_class=JSONResponse)
-async def seller_ranking_data(
-    date_from:     date       = Query(...),
-    date_to:       date       = Query(...),
-    warehouse_id:  int | None = Query(None),
-    warehouse_ids: str | None = Query(None),
-    user:          dict       = Depends(get_current_user),
-):
-    if date_from > date_to:
-        date_from, date_to = date_to, date_from
-
-    selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+async def _seller_ranking_payload(date_from: date, date_to: date, selected_warehouse_ids: list[int]) -> dict:
     params: dict = {"date_from": date_from, "date_to": date_to}
     warehouse_filters: list[str] = []
     _append_in_filter(warehouse_filters, params, "sd.warehouse_id", selected_warehouse_ids, "warehouse_id")
@@ -5019,7 +4978,7 @@ async def seller_ranking_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             GROUP BY sd.closed_by_user_id, u.first_name, u.last_name
             ORDER BY total DESC
@@ -5035,7 +4994,7 @@ async def seller_ranking_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
         """), params))
 
@@ -5045,7 +5004,7 @@ async def seller_ranking_data(
                 COALESCE(sd.ticket_number, sd.sale_code)                    AS folio,
                 sd.closed_by_user_id                                        AS seller_id,
                 COALESCE(CONCAT(u.first_name, ' ', u.last_name), 'Sin vendedor') AS seller_name,
-                DATE(COALESCE(sd.updated_at, sd.created_at))                AS sale_date,
+                sd.business_date                                            AS sale_date,
                 COALESCE(w.warehouse_name, w.warehouse_code, 'Sin sucursal') AS warehouse_name,
                 sd.payment_method_name,
                 ROUND(sd.total_amount, 0)                                   AS total
@@ -5056,7 +5015,7 @@ async def seller_ranking_data(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             ORDER BY sale_date ASC, sd.id ASC
             LIMIT 2000
@@ -5090,7 +5049,7 @@ async def seller_ranking_data(
         for r in detail_db
     ]
 
-    return JSONResponse({
+    return {
         "rows":        rows_out,
         "detail_rows": detail_rows_out,
         "totals": {
@@ -5098,7 +5057,27 @@ async def seller_ranking_data(
             "txn_count":    int(total_row.get("txn_count") or 0),
             "seller_count": int(total_row.get("seller_count") or 0),
         },
-    })
+    }
+
+
+@router.get("/sales/seller-ranking/data", response_class=JSONResponse)
+async def seller_ranking_data(
+    date_from:     date       = Query(...),
+    date_to:       date       = Query(...),
+    warehouse_id:  int | None = Query(None),
+    warehouse_ids: str | None = Query(None),
+    export_format: str        = Query("json", alias="format", pattern=_EXPORT_FORMAT_PATTERN),
+    user:          dict       = Depends(get_current_user),
+):
+    if date_from > date_to:
+        date_from, date_to = date_to, date_from
+
+    selected_warehouse_ids = _parse_id_list(warehouse_ids) or ([warehouse_id] if warehouse_id else [])
+    payload = await report_cache_service.get_or_compute(
+        "seller_ranking", date_from, date_to, selected_warehouse_ids,
+        lambda: _seller_ranking_payload(date_from, date_to, selected_warehouse_ids),
+    )
+    return _json_or_export(payload, export_format, "ranking-vendedores")
 
 
 # ─── Seller ranking PDF ───────────────────────────────────────────────────────
@@ -5144,7 +5123,7 @@ async def _build_seller_context(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
             GROUP BY sd.closed_by_user_id, u.first_name, u.last_name
             ORDER BY total DESC
@@ -5159,7 +5138,7 @@ async def _build_seller_context(
               AND sd.status = 'CLOSED'
               AND sd.document_type_code NOT IN ('RETURN_TICKET', 'EXCHANGE_DRAFT')
               AND sd.total_amount > 0
-              AND DATE(COALESCE(sd.updated_at, sd.created_at)) BETWEEN :date_from AND :date_to
+              AND sd.business_date BETWEEN :date_from AND :date_to
               {warehouse_clause}
         """), params))
 
@@ -5246,15 +5225,8 @@ async def _build_seller_context(
 
 
 def _build_seller_table_pages(rows: list[dict], grand_total: float, ctx: dict) -> str:
-    def _partial(name: str) -> str:
-        path    = os.path.join(_PARTIALS_DIR, f"{name}.html")
-        content = _load_file(path)
-        for k, v in ctx.items():
-            content = content.replace(f"{{{{{k}}}}}", str(v))
-        return content
-
-    page_hdr = _partial("_page_header")
-    page_ftr = _partial("_page_footer")
+    page_hdr = _render_partial("_page_header", ctx)
+    page_ftr = _render_partial("_page_footer", ctx)
 
     chunks: list[list[dict]] = []
     if not rows:
@@ -5379,9 +5351,7 @@ async def seller_ranking_pdf(
                 '{{> _page_footer}}'
                 '</section>'
             )
-            chart_page = _resolve_partials(chart_page)
-            for key, value in ctx.items():
-                chart_page = chart_page.replace(f"{{{{{key}}}}}", str(value))
+            chart_page = _render_source(chart_page, ctx)
             ctx["CHART_PAGE"] = chart_page
         html = _render("seller_ranking.html", ctx)
     except Exception as exc:
@@ -5391,10 +5361,7 @@ async def seller_ranking_pdf(
     filename = f"ranking-vendedores_{date_from}_{date_to}.pdf"
 
     try:
-        loop      = asyncio.get_event_loop()
-        pdf_bytes = await loop.run_in_executor(
-            None, _call_gotenberg_sync, html.encode("utf-8"), settings.GOTENBERG_URL
-        )
+        pdf_bytes = await html_to_pdf(html)
     except Exception as exc:
         logger.error("Gotenberg error seller_ranking: %s", exc)
         return JSONResponse({"error": "Error generando PDF", "detail": str(exc)}, status_code=500)
@@ -5404,3 +5371,116 @@ async def seller_ranking_pdf(
         media_type="application/pdf",
         headers={"Content-Disposition": f'inline; filename="{filename}"'},
     )
+
+
+# ─── Report jobs (PDF en segundo plano) ───────────────────────────────────────
+
+_CASH_POS_JOB_KINDS  = ("sessions", "discrepancies", "extra_movements", "collection_by_method")
+_CUSTOMERS_JOB_KINDS = ("ranking", "credit_status", "payment_history", "authorized_buyers", "geography")
+
+
+async def _returns_exchanges_job(params: dict, chart_png: bytes | None) -> tuple[str, str]:
+    html_out = await _returns_exchanges_html(
+        params["date_from"], params["date_to"], params["warehouse_id"],
+        params["document_type"], params["status"], params["view_mode"], chart_png,
+    )
+    return html_out, f"cambios-devoluciones_{params['date_from']}_{params['date_to']}.pdf"
+
+
+def _kind_job(html_builder, report_kind: str, prefix: str):
+    async def _job(params: dict, chart_png: bytes | None) -> tuple[str, str]:
+        html_out = await html_builder(
+            report_kind, params["date_from"], params["date_to"], params["warehouse_id"],
+            params["filter_value"], params["view_mode"], chart_png,
+        )
+        return html_out, f"{prefix}-{report_kind}_{params['date_from']}_{params['date_to']}.pdf"
+    return _job
+
+
+register_report_builder("returns_exchanges", _returns_exchanges_job)
+for _kind in _CASH_POS_JOB_KINDS:
+    register_report_builder(f"cash_pos.{_kind}", _kind_job(_cash_pos_html, _kind, "caja-pos"))
+for _kind in _CUSTOMERS_JOB_KINDS:
+    register_report_builder(f"customers.{_kind}", _kind_job(_customers_html, _kind, "clientes"))
+
+
+def _job_user_id(user: dict) -> int | None:
+    raw_id = user.get("user_id") or user.get("id")
+    try:
+        return int(raw_id) if raw_id else None
+    except (TypeError, ValueError):
+        return None
+
+
+async def _owned_job(job_code: str, user: dict) -> dict | None:
+    job = await get_report_job(job_code, raw=True)
+    if not job or job.get("requested_by_user_id") != _job_user_id(user):
+        return None
+    return job
+
+
+@router.post("/jobs", response_class=JSONResponse)
+async def create_report_job(
+    report:        str                  = Form(..., description="returns_exchanges | cash_pos.<tipo> | customers.<tipo>"),
+    date_from:     str                  = Form(...),
+    date_to:       str                  = Form(...),
+    warehouse_id:  str                  = Form("all"),
+    filter_value:  str                  = Form("all"),
+    document_type: str                  = Form("all"),
+    status:        str                  = Form("CLOSED"),
+    view_mode:     str                  = Form("detail"),
+    chart_bar:     Optional[UploadFile] = File(None),
+    user:          dict                 = Depends(get_current_user),
+):
+    """Encola un reporte PDF; el avance llega por SSE (task.v1.*) y el resultado con document.v1.ready."""
+    if not has_report_builder(report):
+        return JSONResponse(status_code=400, content={"message": f"Reporte no soportado: {report}"})
+    try:
+        date.fromisoformat(date_from)
+        date.fromisoformat(date_to)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"message": "Fechas invalidas, formato esperado YYYY-MM-DD."})
+
+    params = {
+        "date_from": date_from, "date_to": date_to, "warehouse_id": warehouse_id,
+        "filter_value": filter_value, "document_type": document_type, "status": status, "view_mode": view_mode,
+    }
+    chart_png = await chart_bar.read() if chart_bar else None
+    try:
+        job = await enqueue_report_job(report, params, _job_user_id(user), chart_png or None)
+    except Exception as exc:
+        logger.error("Error encolando reporte %s: %s", report, exc)
+        return JSONResponse({"error": "Error encolando reporte", "detail": str(exc)}, status_code=500)
+    return JSONResponse(status_code=202, content={"data": job})
+
+
+@router.get("/jobs", response_class=JSONResponse)
+async def list_my_report_jobs(limit: int = Query(20, ge=1, le=100), user: dict = Depends(get_current_user)):
+    return JSONResponse(content={"data": await list_report_jobs(_job_user_id(user), limit)})
+
+
+@router.get("/jobs/{job_code}", response_class=JSONResponse)
+async def get_report_job_status(job_code: str, user: dict = Depends(get_current_user)):
+    job = await _owned_job(job_code, user)
+    if not job:
+        return JSONResponse(status_code=404, content={"message": "Job de reporte no encontrado."})
+    return JSONResponse(content={"data": job_to_dict(job)})
+
+
+@router.get("/jobs/{job_code}/download", response_class=Response)
+async def download_report_job(job_code: str, user: dict = Depends(get_current_user)):
+    job = await _owned_job(job_code, user)
+    if not job:
+        return JSONResponse(status_code=404, content={"message": "Job de reporte no encontrado."})
+    if job["status"] != "COMPLETED" or not job.get("object_key"):
+        return JSONResponse(status_code=409, content={"message": "El reporte aun no esta listo.", "status": job["status"]})
+    try:
+        pdf_bytes = await read_report_artifact(job)
+    except Exception as exc:
+        logger.error("Error leyendo reporte %s desde MinIO: %s", job_code, exc)
+        return JSONResponse({"error": "Error leyendo reporte", "detail": str(exc)}, status_code=503)
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'attachment; filename="{job["file_name"]}"'},
+    )
@@ -574,9 +574,9 @@ async def update_role_permissions_matrix(
             await session.commit()
 
             try:
-                from cache.services.user_cache import invalidate_user_permissions
-                for affected_user in affected_users:
-                    await invalidate_user_permissions(affected_user.id)
+                # Una versión nueva del rol invalida a todos sus usuarios de una vez
+                from cache.services.user_cache import invalidate_role_permissions
+                await invalidate_role_permissions(role.role_code)
             except Exception as cache_error:
                 logger.warning(f"No fue posible invalidar cache por cambio de permisos del rol {role_id}: {cache_error}")
 
@@ -10,9 +10,10 @@ from uuid import uuid4
 from fastapi import APIRouter, Depends, Path, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, EmailStr, Field, model_validator
-from sqlalchemy import and_, delete, select, text
+from sqlalchemy import and_, bindparam, delete, select, text
 from sqlalchemy.orm import selectinload
 
+from cache.services.report_cache import invalidate_sales_reports_on_commit
 from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
@@ -28,6 +29,8 @@ from database.models.cash_sessions import CashRegisterSession, CASH_SESSION_OPEN
 from database.models.print_jobs import PrintJob, PrintJobStatus, PrintTemplate, PrintTicketType
 from database.models.business_foundation import DteCompanyConfig
 from database.models.sales_operations import SalesPoint
+from services import stock_ledger
+from services.sales_rollup import apply_sale_to_rollup
 from utils.log_helper import setup_logger
 from utils.permissions_utils import get_current_user
 
@@ -363,6 +366,7 @@ def sale_to_dict(sale: SaleDocument, include_units: bool = False) -> dict:
         "document_type_code": sale.document_type_code,
         "document_type_name": sale.document_type_name,
         "ticket_number": sale.ticket_number,
+        "business_date": sale.business_date.isoformat() if sale.business_date else None,
         "warehouse_id": sale.warehouse_id,
         "sales_point_id": sale.sales_point_id,
         "cash_register_id": sale.cash_register_id,
@@ -661,33 +665,45 @@ def _clone_line(line: SaleDocumentLine, line_number: int) -> SaleDocumentLine:
     )
 
 
-async def get_variant_inventory_meta(session, product_variant_id: int) -> dict:
+async def get_variants_inventory_meta(session, product_variant_ids: set[int]) -> dict[int, dict]:
     result = await session.execute(
         text(
             "SELECT pv.id AS product_variant_id, pv.product_id, p.base_measurement_unit_id, p.cost_price "
             "FROM product_variants pv "
             "JOIN products p ON p.id = pv.product_id "
-            "WHERE pv.id = :product_variant_id AND pv.deleted_at IS NULL AND p.deleted_at IS NULL"
-        ),
-        {"product_variant_id": product_variant_id},
+            "WHERE pv.id IN :product_variant_ids AND pv.deleted_at IS NULL AND p.deleted_at IS NULL"
+        ).bindparams(bindparam("product_variant_ids", expanding=True)),
+        {"product_variant_ids": sorted(product_variant_ids)},
     )
-    row = result.mappings().first()
-    if not row:
-        raise ValueError("Producto/variante no encontrado para mover inventario")
-    return {
-        "product_variant_id": int(row["product_variant_id"]),
-        "measurement_unit_id": int(row["base_measurement_unit_id"]) if row["base_measurement_unit_id"] else None,
-        "unit_cost": money(row["cost_price"] or 0),
+    metas = {
+        int(row["product_variant_id"]): {
+            "product_variant_id": int(row["product_variant_id"]),
+            "measurement_unit_id": int(row["base_measurement_unit_id"]) if row["base_measurement_unit_id"] else None,
+            "unit_cost": money(row["cost_price"] or 0),
+        }
+        for row in result.mappings().all()
     }
+    if set(metas) != set(product_variant_ids):
+        raise ValueError("Producto/variante no encontrado para mover inventario")
+    return metas
+
+
+_STOCK_MOVEMENT_INSERT_SQL = text(
+    "INSERT INTO stock_movements (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
+    "movement_type, reference_type, reference_document_id, measurement_unit_id, movement_unit_quantity, "
+    "quantity, quantity_before, quantity_after, unit_cost, total_cost, batch_lot_number, expiry_date, serial_number, notes, created_by_user_id) "
+    "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :movement_type, :reference_type, :sale_document_id, "
+    ":measurement_unit_id, :movement_unit_quantity, :quantity, :quantity_before, :quantity_after, :unit_cost, :total_cost, "
+    ":batch_lot_number, :expiry_date, :serial_number, :notes, :user_id)"
+)
 
 
-async def insert_stock_movement(
-    session,
+def stock_movement_params(
     *,
     line: SaleDocumentLine,
     warehouse_id: int,
     measurement_unit_id: int | None,
-    stock_row: dict | None,
+    stock_row: dict,
     movement_type: str,
     reference_type: str,
     quantity: Decimal,
@@ -695,232 +711,156 @@ async def insert_stock_movement(
     quantity_after: Decimal,
     unit_cost: Decimal,
     user_id: int,
-) -> None:
-    await session.execute(
-        text(
-            "INSERT INTO stock_movements (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
-            "movement_type, reference_type, reference_document_id, measurement_unit_id, movement_unit_quantity, "
-            "quantity, quantity_before, quantity_after, unit_cost, total_cost, batch_lot_number, expiry_date, serial_number, notes, created_by_user_id) "
-            "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :movement_type, :reference_type, :sale_document_id, "
-            ":measurement_unit_id, :movement_unit_quantity, :quantity, :quantity_before, :quantity_after, :unit_cost, :total_cost, "
-            ":batch_lot_number, :expiry_date, :serial_number, :notes, :user_id)"
-        ),
-        {
-            "product_variant_id": line.product_variant_id,
-            "warehouse_id": warehouse_id,
-            "zone_id": stock_row.get("warehouse_zone_id") if stock_row else None,
-            "location_id": stock_row.get("warehouse_zone_location_id") if stock_row else None,
-            "movement_type": movement_type,
-            "reference_type": reference_type,
-            "sale_document_id": line.sale_document_id,
-            "measurement_unit_id": measurement_unit_id,
-            "movement_unit_quantity": abs(quantity),
-            "quantity": quantity,
-            "quantity_before": quantity_before,
-            "quantity_after": quantity_after,
-            "unit_cost": unit_cost,
-            "total_cost": abs(quantity) * unit_cost,
-            "batch_lot_number": stock_row.get("batch_lot_number") if stock_row else None,
-            "expiry_date": stock_row.get("expiry_date") if stock_row else None,
-            "serial_number": stock_row.get("serial_number") if stock_row else None,
-            "notes": f"{reference_type} caja documento {line.sale_document_id}: {line.product_name}",
-            "user_id": user_id,
-        },
-    )
-
-
-async def apply_unit_balance_delta(
-    session,
-    *,
-    product_variant_id: int,
-    warehouse_id: int,
-    stock_row: dict | None,
-    measurement_unit_id: int | None,
-    delta_quantity: Decimal,
-) -> None:
-    if not measurement_unit_id:
-        return
-    zone_id = stock_row.get("warehouse_zone_id") if stock_row else None
-    location_id = stock_row.get("warehouse_zone_location_id") if stock_row else None
-    batch_lot_number = stock_row.get("batch_lot_number") if stock_row else None
-    expiry_date = stock_row.get("expiry_date") if stock_row else None
-    serial_number = stock_row.get("serial_number") if stock_row else None
-    result = await session.execute(
-        text(
-            "SELECT * FROM stock_unit_balances "
-            "WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
-            "AND ((warehouse_zone_id = :zone_id) OR (warehouse_zone_id IS NULL AND :zone_id IS NULL)) "
-            "AND ((warehouse_zone_location_id = :location_id) OR (warehouse_zone_location_id IS NULL AND :location_id IS NULL)) "
-            "AND measurement_unit_id = :measurement_unit_id "
-            "AND ((batch_lot_number = :batch_lot_number) OR (batch_lot_number IS NULL AND :batch_lot_number IS NULL)) "
-            "AND ((expiry_date = :expiry_date) OR (expiry_date IS NULL AND :expiry_date IS NULL)) "
-            "AND ((serial_number = :serial_number) OR (serial_number IS NULL AND :serial_number IS NULL)) "
-            "LIMIT 1"
-        ),
-        {
-            "product_variant_id": product_variant_id,
-            "warehouse_id": warehouse_id,
-            "zone_id": zone_id,
-            "location_id": location_id,
-            "measurement_unit_id": measurement_unit_id,
-            "batch_lot_number": batch_lot_number,
-            "expiry_date": expiry_date,
-            "serial_number": serial_number,
-        },
-    )
-    balance = result.mappings().first()
-    quantity_before = Decimal(str(balance["current_quantity"])) if balance else Decimal("0")
-    quantity_after = quantity_before + delta_quantity
-    if balance:
-        await session.execute(
-            text("UPDATE stock_unit_balances SET current_quantity = :quantity_after WHERE id = :id"),
-            {"quantity_after": quantity_after, "id": balance["id"]},
-        )
-    else:
-        await session.execute(
-            text(
-                "INSERT INTO stock_unit_balances (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
-                "measurement_unit_id, batch_lot_number, expiry_date, serial_number, current_quantity) "
-                "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :measurement_unit_id, "
-                ":batch_lot_number, :expiry_date, :serial_number, :quantity_after)"
-            ),
-            {
-                "product_variant_id": product_variant_id,
-                "warehouse_id": warehouse_id,
-                "zone_id": zone_id,
-                "location_id": location_id,
-                "measurement_unit_id": measurement_unit_id,
-                "batch_lot_number": batch_lot_number,
-                "expiry_date": expiry_date,
-                "serial_number": serial_number,
-                "quantity_after": quantity_after,
-            },
-        )
-
-
-async def apply_inventory_in(session, line: SaleDocumentLine, warehouse_id: int, quantity: Decimal, user_id: int) -> None:
-    meta = await get_variant_inventory_meta(session, line.product_variant_id)
-    result = await session.execute(
-        text(
-            "SELECT * FROM stock WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
-            "AND warehouse_zone_id IS NULL AND warehouse_zone_location_id IS NULL "
-            "AND batch_lot_number IS NULL AND expiry_date IS NULL LIMIT 1"
-        ),
-        {"product_variant_id": line.product_variant_id, "warehouse_id": warehouse_id},
-    )
-    stock_row = result.mappings().first()
-    quantity_before = Decimal(str(stock_row["current_quantity"])) if stock_row else Decimal("0")
-    quantity_after = quantity_before + quantity
-    if stock_row:
-        await session.execute(
-            text(
-                "UPDATE stock SET current_quantity = :quantity_after, last_movement_date = CURRENT_TIMESTAMP, "
-                "last_movement_type = 'IN' WHERE id = :stock_id"
-            ),
-            {"quantity_after": quantity_after, "stock_id": stock_row["id"]},
-        )
-        movement_stock_row = dict(stock_row)
-    else:
-        await session.execute(
-            text(
-                "INSERT INTO stock (product_variant_id, warehouse_id, current_quantity, reserved_quantity, last_movement_date, last_movement_type) "
-                "VALUES (:product_variant_id, :warehouse_id, :quantity_after, 0, CURRENT_TIMESTAMP, 'IN')"
-            ),
-            {"product_variant_id": line.product_variant_id, "warehouse_id": warehouse_id, "quantity_after": quantity_after},
-        )
-        movement_stock_row = None
-    await apply_unit_balance_delta(
-        session,
-        product_variant_id=line.product_variant_id,
-        warehouse_id=warehouse_id,
-        stock_row=movement_stock_row,
-        measurement_unit_id=meta["measurement_unit_id"],
-        delta_quantity=quantity,
-    )
-    await insert_stock_movement(
-        session,
-        line=line,
-        warehouse_id=warehouse_id,
-        measurement_unit_id=meta["measurement_unit_id"],
-        stock_row=movement_stock_row,
-        movement_type="IN",
-        reference_type="RETURN",
-        quantity=quantity,
-        quantity_before=quantity_before,
-        quantity_after=quantity_after,
-        unit_cost=meta["unit_cost"],
-        user_id=user_id,
-    )
+) -> dict:
+    return {
+        "product_variant_id": line.product_variant_id,
+        "warehouse_id": warehouse_id,
+        "zone_id": stock_row.get("warehouse_zone_id"),
+        "location_id": stock_row.get("warehouse_zone_location_id"),
+        "movement_type": movement_type,
+        "reference_type": reference_type,
+        "sale_document_id": line.sale_document_id,
+        "measurement_unit_id": measurement_unit_id,
+        "movement_unit_quantity": abs(quantity),
+        "quantity": quantity,
+        "quantity_before": quantity_before,
+        "quantity_after": quantity_after,
+        "unit_cost": unit_cost,
+        "total_cost": abs(quantity) * unit_cost,
+        "batch_lot_number": stock_row.get("batch_lot_number"),
+        "expiry_date": stock_row.get("expiry_date"),
+        "serial_number": stock_row.get("serial_number"),
+        "notes": f"{reference_type} caja documento {line.sale_document_id}: {line.product_name}",
+        "user_id": user_id,
+    }
 
 
-async def apply_inventory_out(session, line: SaleDocumentLine, warehouse_id: int, quantity: Decimal, user_id: int) -> None:
-    meta = await get_variant_inventory_meta(session, line.product_variant_id)
-    remaining = quantity
-    result = await session.execute(
-        text(
-            "SELECT * FROM stock WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
-            "AND current_quantity > 0 "
-            "ORDER BY CASE WHEN expiry_date IS NULL THEN 1 ELSE 0 END, expiry_date, id"
-        ),
-        {"product_variant_id": line.product_variant_id, "warehouse_id": warehouse_id},
-    )
-    rows = [dict(row) for row in result.mappings().all()]
-    available = sum((Decimal(str(row["current_quantity"])) for row in rows), Decimal("0"))
-    if available < remaining:
-        raise ValueError(f"Stock insuficiente para {line.product_name}. Disponible: {available}, requerido: {remaining}")
-
-    for stock_row in rows:
-        if remaining <= 0:
-            break
-        quantity_before = Decimal(str(stock_row["current_quantity"]))
-        consumed = min(quantity_before, remaining)
-        quantity_after = quantity_before - consumed
-        await session.execute(
-            text(
-                "UPDATE stock SET current_quantity = :quantity_after, last_movement_date = CURRENT_TIMESTAMP, "
-                "last_movement_type = 'OUT' WHERE id = :stock_id"
-            ),
-            {"quantity_after": quantity_after, "stock_id": stock_row["id"]},
-        )
-        await apply_unit_balance_delta(
-            session,
-            product_variant_id=line.product_variant_id,
-            warehouse_id=warehouse_id,
-            stock_row=stock_row,
-            measurement_unit_id=meta["measurement_unit_id"],
-            delta_quantity=-consumed,
-        )
-        await insert_stock_movement(
-            session,
-            line=line,
-            warehouse_id=warehouse_id,
-            measurement_unit_id=meta["measurement_unit_id"],
-            stock_row=stock_row,
-            movement_type="OUT",
-            reference_type="SALE",
-            quantity=-consumed,
-            quantity_before=quantity_before,
-            quantity_after=quantity_after,
-            unit_cost=meta["unit_cost"],
-            user_id=user_id,
-        )
-        remaining -= consumed
+def _stock_dimensions(stock_row: dict) -> dict:
+    return {
+        "product_variant_id": stock_row["product_variant_id"],
+        "warehouse_id": stock_row["warehouse_id"],
+        "zone_id": stock_row.get("warehouse_zone_id"),
+        "location_id": stock_row.get("warehouse_zone_location_id"),
+        "batch_lot_number": stock_row.get("batch_lot_number"),
+        "expiry_date": stock_row.get("expiry_date"),
+        "serial_number": stock_row.get("serial_number"),
+    }
 
 
 async def apply_inventory_for_closed_sale(session, sale: SaleDocument, user_id: int) -> None:
+    """
+    Contabiliza el inventario de todas las lineas con un numero fijo de consultas:
+    metadatos y filas de stock (bloqueadas) se leen una vez, los saldos se calculan
+    en memoria en orden de linea y se escriben con sentencias multi-fila.
+    """
     if not sale.warehouse_id:
         raise ValueError("El documento no tiene bodega para mover inventario")
+    warehouse_id = int(sale.warehouse_id)
 
+    postings = []
     for line in sorted(sale.lines or [], key=lambda item: item.line_number):
         if not line.product_variant_id:
             continue
         quantity = Decimal(str(line.quantity or 0))
         if quantity <= 0:
             continue
-        if money(line.paid_total_amount) < 0 or money(line.unit_price) < 0:
-            await apply_inventory_in(session, line, int(sale.warehouse_id), quantity, user_id)
-        else:
-            await apply_inventory_out(session, line, int(sale.warehouse_id), quantity, user_id)
+        is_return = money(line.paid_total_amount) < 0 or money(line.unit_price) < 0
+        postings.append((line, quantity, is_return))
+    if not postings:
+        return
+
+    variant_ids = {int(line.product_variant_id) for line, _, _ in postings}
+    metas = await get_variants_inventory_meta(session, variant_ids)
+    # Las devoluciones en caja entran a la dimension sin ubicacion, lote ni serie.
+    return_keys = {
+        int(line.product_variant_id): stock_ledger.stock_dimension_key(int(line.product_variant_id), warehouse_id)
+        for line, _, is_return in postings
+        if is_return
+    }
+    # FOR UPDATE: dos cajas vendiendo el mismo SKU se serializan aqui y la segunda
+    # valida el disponible con el saldo ya descontado por la primera.
+    rows_by_variant = await stock_ledger.lock_stock_rows_for_variants(
+        session, variant_ids, warehouse_id, dimension_keys=return_keys.values()
+    )
+
+    touched_rows: dict[int, dict] = {}
+    new_rows: dict[int, dict] = {}
+    unit_deltas: dict[tuple, dict] = {}
+    movements: list[dict] = []
+
+    def post(line, meta, stock_row, delta, movement_type, reference_type):
+        quantity_before = Decimal(str(stock_row["current_quantity"]))
+        quantity_after = quantity_before + delta
+        stock_row["current_quantity"] = quantity_after
+        stock_row["last_movement_type"] = movement_type
+        if stock_row.get("id"):
+            touched_rows[stock_row["id"]] = stock_row
+        if meta["measurement_unit_id"]:
+            dimensions = {**_stock_dimensions(stock_row), "measurement_unit_id": meta["measurement_unit_id"]}
+            unit_key = tuple(dimensions.values())
+            unit_delta = unit_deltas.setdefault(unit_key, {**dimensions, "quantity": Decimal("0")})
+            unit_delta["quantity"] += delta
+        movements.append(
+            stock_movement_params(
+                line=line,
+                warehouse_id=warehouse_id,
+                measurement_unit_id=meta["measurement_unit_id"],
+                stock_row=stock_row,
+                movement_type=movement_type,
+                reference_type=reference_type,
+                quantity=delta,
+                quantity_before=quantity_before,
+                quantity_after=quantity_after,
+                unit_cost=meta["unit_cost"],
+                user_id=user_id,
+            )
+        )
+
+    for line, quantity, is_return in postings:
+        variant_id = int(line.product_variant_id)
+        meta = metas[variant_id]
+        rows = rows_by_variant[variant_id]
+        if is_return:
+            stock_row = next((row for row in rows if row["dimension_key"] == return_keys[variant_id]), None)
+            if stock_row is None:
+                stock_row = {
+                    "id": None,
+                    "product_variant_id": variant_id,
+                    "warehouse_id": warehouse_id,
+                    "dimension_key": return_keys[variant_id],
+                    "current_quantity": Decimal("0"),
+                }
+                rows.append(stock_row)
+                new_rows[variant_id] = stock_row
+            post(line, meta, stock_row, quantity, "IN", "RETURN")
+            continue
+
+        available = sum((Decimal(str(row["current_quantity"])) for row in rows), Decimal("0"))
+        if available < quantity:
+            raise ValueError(f"Stock insuficiente para {line.product_name}. Disponible: {available}, requerido: {quantity}")
+        remaining = quantity
+        for stock_row in rows:
+            if remaining <= 0:
+                break
+            consumed = min(Decimal(str(stock_row["current_quantity"])), remaining)
+            if consumed <= 0:
+                continue
+            post(line, meta, stock_row, -consumed, "OUT", "SALE")
+            remaining -= consumed
+
+    await stock_ledger.write_stock_quantities(
+        session, {stock_id: (row["current_quantity"], row["last_movement_type"]) for stock_id, row in touched_rows.items()}
+    )
+    await stock_ledger.add_stock_deltas(
+        session,
+        [
+            {**_stock_dimensions(row), "quantity": row["current_quantity"], "movement_type": row["last_movement_type"]}
+            for row in new_rows.values()
+        ],
+    )
+    await stock_ledger.add_unit_balance_deltas(session, [delta for delta in unit_deltas.values() if delta["quantity"] != 0])
+    if movements:
+        await session.execute(_STOCK_MOVEMENT_INSERT_SQL, movements)
 
 
 async def _enqueue_sale_print_job(session, sale: SaleDocument, user_id: int | None) -> None:
@@ -1353,6 +1293,7 @@ async def close_sale_document(payload: CloseSalePayload, request: Request, sale_
             return ResponseManager.error(message="Usuario no identificado para contabilizar inventario", status_code=HTTPStatus.BAD_REQUEST, error_code=ErrorCode.VALIDATION_FIELD_FORMAT, error_type=ErrorType.VALIDATION_ERROR, request=request)
 
         sale.closed_by_user_id = user_id
+        sale.business_date = datetime.now(timezone.utc).date()
         sale.payment_method_code = payload.payment_method_code
         sale.payment_method_name = payload.payment_method_name
         sale.amount_tendered = payload.amount_tendered
@@ -1410,6 +1351,8 @@ async def close_sale_document(payload: CloseSalePayload, request: Request, sale_
                 request=request,
             )
         await session.flush()
+        await apply_sale_to_rollup(session, sale)
+        invalidate_sales_reports_on_commit(session, sale.business_date, sale.warehouse_id)
 
         try:
             await _enqueue_sale_print_job(session, sale, user_id)
@@ -1492,6 +1435,8 @@ async def register_sale_return(payload: RegisterReturnPayload, request: Request,
         session.add(draft)
         await session.flush()
         await session.refresh(draft, attribute_names=["lines"])
+        source_date = source_sale.business_date or (source_sale.updated_at.date() if source_sale.updated_at else None)
+        invalidate_sales_reports_on_commit(session, source_date, source_sale.warehouse_id)
         action_url = f"/cash/pos?saleId={draft.sale_code}" if payload.action_type == "RETURN" else f"/sales/new?edit={draft.sale_code}"
         return ResponseManager.success(
             data={
@@ -27,18 +27,13 @@ from database.schemas.sales_operations import (
 from utils.auth_helpers import get_client_ip
 from utils.code_generator import generate_sequential_code
 from utils.log_helper import setup_logger
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 logger = setup_logger(__name__)
 
 router = APIRouter(tags=["Sales Operations"])
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 def _raise_forbidden(request: Request, user: dict, details: str):
     logger.warning(
         "ACCESO DENEGADO - Usuario: %s sin permisos en %s %s - IP: %s",
@@ -63,14 +58,14 @@ def _raise_forbidden(request: Request, user: dict, details: str):
 
 async def require_sales_ops_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["SALES_POINTS_ACCESS", "SALES_POINTS_MANAGE", "OPERATOR_ASSIGNMENTS_ACCESS", "OPERATOR_ASSIGNMENTS_MANAGE", "CASH_POS_ADMIN_ACCESS", "CASH_SETTINGS_MANAGE"]):
+    if has_any_permission(user, ["SALES_POINTS_ACCESS", "SALES_POINTS_MANAGE", "OPERATOR_ASSIGNMENTS_ACCESS", "OPERATOR_ASSIGNMENTS_MANAGE", "CASH_POS_ADMIN_ACCESS", "CASH_SETTINGS_MANAGE"]):
         return user
     _raise_forbidden(request, user, "Se requiere permiso para ver configuracion operativa de ventas")
 
 
 async def require_sales_ops_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, ["SALES_POINTS_MANAGE", "OPERATOR_ASSIGNMENTS_MANAGE", "CASH_SETTINGS_MANAGE"]):
+    if has_any_permission(user, ["SALES_POINTS_MANAGE", "OPERATOR_ASSIGNMENTS_MANAGE", "CASH_SETTINGS_MANAGE"]):
         return user
     _raise_forbidden(request, user, "Se requiere permiso para gestionar configuracion operativa de ventas")
 
@@ -342,7 +337,7 @@ async def get_sales_session_context(request: Request, user: dict = Depends(get_c
                     for assignment in sales_point_result.scalars().all()
                     if assignment.sales_point
                 ]
-                if _has_any_permission(user, ["SALES_POINTS_MANAGE", "OPERATOR_ASSIGNMENTS_MANAGE", "CASH_SETTINGS_MANAGE"]):
+                if has_any_permission(user, ["SALES_POINTS_MANAGE", "OPERATOR_ASSIGNMENTS_MANAGE", "CASH_SETTINGS_MANAGE"]):
                     existing_sales_point_ids = {item["id"] for item in sales_points}
                     admin_sales_point_result = await session.execute(
                         select(SalesPoint)
@@ -13,10 +13,12 @@ from sqlalchemy import text
 from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
+from services import stock_ledger
 from services.inventory_expiry_alerts import emit_expiring_lot_alerts as emit_expiring_lot_notifications
+from services.stock_ledger import InsufficientStockError
 from utils.inventory_tracking import validate_serial_quantity, validate_tracking_dimensions
 from utils.product_feature_flags import product_flag_visibility
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 
 router = APIRouter(tags=["Stock Movements"])
 
@@ -79,11 +81,6 @@ def _row(row) -> dict | None:
     return {key: _json_value(value) for key, value in row.items()} if row else None
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 def _permission_error(request: Request):
     response = ResponseManager.error(
         message="Acceso denegado",
@@ -107,28 +104,28 @@ def _validation_response(message: str, request: Request):
 
 async def require_stock_movements_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, READ_PERMISSIONS):
+    if has_any_permission(user, READ_PERMISSIONS):
         return user
     _permission_error(request)
 
 
 async def require_stock_movements_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, WRITE_PERMISSIONS):
+    if has_any_permission(user, WRITE_PERMISSIONS):
         return user
     _permission_error(request)
 
 
 async def require_stock_conversions_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, CONVERSION_READ_PERMISSIONS):
+    if has_any_permission(user, CONVERSION_READ_PERMISSIONS):
         return user
     _permission_error(request)
 
 
 async def require_stock_conversions_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, CONVERSION_WRITE_PERMISSIONS):
+    if has_any_permission(user, CONVERSION_WRITE_PERMISSIONS):
         return user
     _permission_error(request)
 
@@ -212,70 +209,6 @@ async def _validate_variant_unit(session, product_variant_id: int, measurement_u
     }
 
 
-async def _stock_row(
-    session,
-    product_variant_id: int,
-    warehouse_id: int,
-    zone_id: int | None,
-    location_id: int | None,
-    batch_lot_number: str | None,
-    expiry_date: date | None,
-    serial_number: str | None,
-) -> dict | None:
-    result = await session.execute(
-        text(
-            "SELECT * FROM stock WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
-            "AND warehouse_zone_id <=> :zone_id AND warehouse_zone_location_id <=> :location_id "
-            "AND batch_lot_number <=> :batch_lot_number AND expiry_date <=> :expiry_date "
-            "AND serial_number <=> :serial_number LIMIT 1"
-        ),
-        {
-            "product_variant_id": product_variant_id,
-            "warehouse_id": warehouse_id,
-            "zone_id": zone_id,
-            "location_id": location_id,
-            "batch_lot_number": batch_lot_number,
-            "expiry_date": expiry_date,
-            "serial_number": serial_number,
-        },
-    )
-    return _row(result.mappings().first())
-
-
-async def _unit_balance_row(
-    session,
-    product_variant_id: int,
-    warehouse_id: int,
-    zone_id: int | None,
-    location_id: int | None,
-    measurement_unit_id: int,
-    batch_lot_number: str | None,
-    expiry_date: date | None,
-    serial_number: str | None,
-) -> dict | None:
-    result = await session.execute(
-        text(
-            "SELECT * FROM stock_unit_balances "
-            "WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
-            "AND warehouse_zone_id <=> :zone_id AND warehouse_zone_location_id <=> :location_id "
-            "AND measurement_unit_id = :measurement_unit_id "
-            "AND batch_lot_number <=> :batch_lot_number AND expiry_date <=> :expiry_date "
-            "AND serial_number <=> :serial_number LIMIT 1"
-        ),
-        {
-            "product_variant_id": product_variant_id,
-            "warehouse_id": warehouse_id,
-            "zone_id": zone_id,
-            "location_id": location_id,
-            "measurement_unit_id": measurement_unit_id,
-            "batch_lot_number": batch_lot_number,
-            "expiry_date": expiry_date,
-            "serial_number": serial_number,
-        },
-    )
-    return _row(result.mappings().first())
-
-
 async def _apply_unit_balance_delta(
     session,
     product_variant_id: int,
@@ -290,49 +223,24 @@ async def _apply_unit_balance_delta(
     *,
     allow_negative: bool,
 ) -> tuple[Decimal, Decimal]:
-    balance = await _unit_balance_row(
-        session,
-        product_variant_id,
-        warehouse_id,
-        zone_id,
-        location_id,
-        measurement_unit_id,
-        batch_lot_number,
-        expiry_date,
-        serial_number,
-    )
-    quantity_before = Decimal(str(balance["current_quantity"])) if balance else Decimal("0")
-    quantity_after = quantity_before + Decimal(str(delta_quantity))
-    if not allow_negative and quantity_after < 0:
-        raise ValueError(
-            f"Saldo insuficiente en la unidad seleccionada. Disponible: {quantity_before}, requerido: {abs(delta_quantity)}"
-        )
-    if balance:
-        await session.execute(
-            text("UPDATE stock_unit_balances SET current_quantity = :quantity_after WHERE id = :id"),
-            {"quantity_after": quantity_after, "id": balance["id"]},
-        )
-    else:
-        await session.execute(
-            text(
-                "INSERT INTO stock_unit_balances (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
-                "measurement_unit_id, batch_lot_number, expiry_date, serial_number, current_quantity) "
-                "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :measurement_unit_id, "
-                ":batch_lot_number, :expiry_date, :serial_number, :quantity_after)"
-            ),
-            {
-                "product_variant_id": product_variant_id,
-                "warehouse_id": warehouse_id,
-                "zone_id": zone_id,
-                "location_id": location_id,
-                "measurement_unit_id": measurement_unit_id,
-                "batch_lot_number": batch_lot_number,
-                "expiry_date": expiry_date,
-                "serial_number": serial_number,
-                "quantity_after": quantity_after,
-            },
+    try:
+        return await stock_ledger.apply_unit_balance_delta(
+            session,
+            product_variant_id=product_variant_id,
+            warehouse_id=warehouse_id,
+            zone_id=zone_id,
+            location_id=location_id,
+            measurement_unit_id=measurement_unit_id,
+            batch_lot_number=batch_lot_number,
+            expiry_date=expiry_date,
+            serial_number=serial_number,
+            delta=delta_quantity,
+            allow_negative=allow_negative,
         )
-    return quantity_before, quantity_after
+    except InsufficientStockError as exc:
+        raise ValueError(
+            f"Saldo insuficiente en la unidad seleccionada. Disponible: {exc.available}, requerido: {exc.required}"
+        ) from exc
 
 
 async def _apply_stock_delta(
@@ -347,40 +255,21 @@ async def _apply_stock_delta(
     signed_quantity: Decimal,
     movement_type: str,
 ) -> tuple[Decimal, Decimal]:
-    stock = await _stock_row(session, product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number)
-    quantity_before = Decimal(str(stock["current_quantity"])) if stock else Decimal("0")
-    quantity_after = quantity_before + signed_quantity
-    if quantity_after < 0:
-        raise ValueError(f"Stock insuficiente en la ubicacion seleccionada. Disponible: {quantity_before}, requerido: {abs(signed_quantity)}")
-
-    if stock:
-        await session.execute(
-            text(
-                "UPDATE stock SET current_quantity = :quantity_after, last_movement_date = CURRENT_TIMESTAMP, "
-                "last_movement_type = :movement_type WHERE id = :id"
-            ),
-            {"quantity_after": quantity_after, "movement_type": movement_type, "id": stock["id"]},
-        )
-    else:
-        await session.execute(
-            text(
-                "INSERT INTO stock (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, batch_lot_number, expiry_date, serial_number, "
-                "current_quantity, reserved_quantity, last_movement_date, last_movement_type) "
-                "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :batch_lot_number, :expiry_date, :serial_number, :quantity_after, 0, CURRENT_TIMESTAMP, :movement_type)"
-            ),
-            {
-                "product_variant_id": product_variant_id,
-                "warehouse_id": warehouse_id,
-                "zone_id": zone_id,
-                "location_id": location_id,
-                "batch_lot_number": batch_lot_number,
-                "expiry_date": expiry_date,
-                "serial_number": serial_number,
-                "quantity_after": quantity_after,
-                "movement_type": movement_type,
-            },
+    try:
+        return await stock_ledger.apply_stock_delta(
+            session,
+            product_variant_id=product_variant_id,
+            warehouse_id=warehouse_id,
+            zone_id=zone_id,
+            location_id=location_id,
+            batch_lot_number=batch_lot_number,
+            expiry_date=expiry_date,
+            serial_number=serial_number,
+            delta=signed_quantity,
+            movement_type=movement_type,
         )
-    return quantity_before, quantity_after
+    except InsufficientStockError as exc:
+        raise ValueError(f"Stock insuficiente en la ubicacion seleccionada. Disponible: {exc.available}, requerido: {exc.required}") from exc
 
 
 async def _apply_manual_movement(session, data: StockMovementCreate, user_id: int) -> int:
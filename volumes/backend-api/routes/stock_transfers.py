@@ -13,8 +13,10 @@ from sqlalchemy import text
 from core.constants import ErrorCode, ErrorType, HTTPStatus
 from core.response import ResponseManager
 from database.database import db_manager
+from services import stock_ledger
+from services.stock_ledger import InsufficientStockError
 from utils.inventory_tracking import get_variant_tracking, normalize_batch_lot, normalize_serial, validate_serial_quantity, validate_tracking_dimensions
-from utils.permissions_utils import get_current_user
+from utils.permissions_utils import get_current_user, has_any_permission
 from utils.product_feature_flags import product_flag_visibility
 
 router = APIRouter(tags=["Stock Transfers"])
@@ -86,11 +88,6 @@ def _row(row) -> dict | None:
     return {key: _json_value(value) for key, value in row.items()} if row else None
 
 
-def _has_any_permission(user: dict, permissions: list[str]) -> bool:
-    user_permissions = {str(permission).upper() for permission in user.get("permissions", [])}
-    return any(permission.upper() in user_permissions for permission in permissions)
-
-
 def _permission_error(request: Request):
     response = ResponseManager.error(
         message="Acceso denegado",
@@ -114,14 +111,14 @@ def _validation_response(message: str, request: Request):
 
 async def require_transfer_read(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, READ_PERMISSIONS):
+    if has_any_permission(user, READ_PERMISSIONS):
         return user
     _permission_error(request)
 
 
 async def require_transfer_write(request: Request) -> dict:
     user = await get_current_user(request)
-    if _has_any_permission(user, WRITE_PERMISSIONS):
+    if has_any_permission(user, WRITE_PERMISSIONS):
         return user
     _permission_error(request)
 
@@ -284,18 +281,11 @@ async def _stock_row(
     serial_number: str | None,
 ) -> dict | None:
     result = await session.execute(
-        text(
-            "SELECT * FROM stock WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
-            "AND warehouse_zone_id <=> :zone_id AND warehouse_zone_location_id <=> :location_id "
-            "AND batch_lot_number <=> :batch_lot_number AND expiry_date <=> :expiry_date LIMIT 1"
-        ),
+        text("SELECT * FROM stock WHERE dimension_key = :dimension_key"),
         {
-            "product_variant_id": product_variant_id,
-            "warehouse_id": warehouse_id,
-            "zone_id": zone_id,
-            "location_id": location_id,
-            "batch_lot_number": batch_lot_number,
-            "expiry_date": expiry_date,
+            "dimension_key": stock_ledger.stock_dimension_key(
+                product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number
+            ),
         },
     )
     return _row(result.mappings().first())
@@ -335,34 +325,21 @@ async def _apply_stock_delta(
     notes: str,
     unit_cost: Decimal | None = None,
 ):
-    stock = await _stock_row(session, product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number)
-    before = Decimal(str(stock["current_quantity"])) if stock else Decimal("0")
-    after = before + Decimal(str(delta))
-    if after < 0:
-        required = abs(Decimal(str(delta)))
-        raise ValueError(f"Stock insuficiente para despachar desde la ubicacion indicada. Disponible: {before}, requerido: {required}")
-    if stock:
-        await session.execute(
-            text("UPDATE stock SET current_quantity = :qty, last_movement_date = CURRENT_TIMESTAMP, last_movement_type = :movement_type WHERE id = :id"),
-            {"qty": after, "movement_type": movement_type, "id": stock["id"]},
-        )
-    else:
-        await session.execute(
-            text(
-                "INSERT INTO stock (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, batch_lot_number, expiry_date, current_quantity, reserved_quantity, last_movement_date, last_movement_type) "
-                "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :batch_lot_number, :expiry_date, :qty, 0, CURRENT_TIMESTAMP, :movement_type)"
-            ),
-            {
-                "product_variant_id": product_variant_id,
-                "warehouse_id": warehouse_id,
-                "zone_id": zone_id,
-                "location_id": location_id,
-                "batch_lot_number": batch_lot_number,
-                "expiry_date": expiry_date,
-                "qty": after,
-                "movement_type": movement_type,
-            },
+    try:
+        before, after = await stock_ledger.apply_stock_delta(
+            session,
+            product_variant_id=product_variant_id,
+            warehouse_id=warehouse_id,
+            zone_id=zone_id,
+            location_id=location_id,
+            batch_lot_number=batch_lot_number,
+            expiry_date=expiry_date,
+            serial_number=serial_number,
+            delta=delta,
+            movement_type=movement_type,
         )
+    except InsufficientStockError as exc:
+        raise ValueError(f"Stock insuficiente para despachar desde la ubicacion indicada. Disponible: {exc.available}, requerido: {exc.required}") from exc
     await session.execute(
         text(
             "INSERT INTO stock_movements (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, movement_type, reference_type, quantity, quantity_before, quantity_after, unit_cost, total_cost, batch_lot_number, expiry_date, serial_number, notes, created_by_user_id) "
@@ -166,6 +166,110 @@ async def system_status(request: Request):
         }
         overall_healthy = False
     
+    # Cache de reportes: contadores de este proceso
+    try:
+        from cache.services.report_cache import get_report_cache_stats
+        report_cache_stats = get_report_cache_stats()
+        components["report_cache"] = {
+            "status": "enabled" if report_cache_stats["enabled"] else "disabled",
+            **report_cache_stats
+        }
+    except Exception as e:
+        components["report_cache"] = {
+            "status": "unavailable",
+            "error": str(e)
+        }
+
+    # Cache L1 en proceso: contadores de este worker
+    try:
+        from cache.local_cache import get_local_cache_stats
+        local_cache_stats = get_local_cache_stats()
+        components["local_cache"] = {
+            "status": "active" if local_cache_stats["active"] else ("disabled" if not local_cache_stats["enabled"] else "bypassed"),
+            **local_cache_stats
+        }
+    except Exception as e:
+        components["local_cache"] = {
+            "status": "unavailable",
+            "error": str(e)
+        }
+
+    # Rate limiting: modo (redis/local) y decisiones de este worker
+    try:
+        from cache.services.rate_limit_service import get_rate_limit_stats
+        rate_limit_stats = get_rate_limit_stats()
+        components["rate_limit"] = {
+            "status": "degraded" if rate_limit_stats["mode"] != "redis" else "healthy",
+            **rate_limit_stats
+        }
+    except Exception as e:
+        components["rate_limit"] = {
+            "status": "unavailable",
+            "error": str(e)
+        }
+
+    # Pool de procesos de bcrypt de este worker
+    try:
+        from core.password_pool import get_password_pool_stats
+        password_pool_stats = get_password_pool_stats()
+        components["password_pool"] = {
+            "status": "saturated" if password_pool_stats["pending"] >= password_pool_stats["max_pending"] else "healthy",
+            **password_pool_stats
+        }
+    except Exception as e:
+        components["password_pool"] = {
+            "status": "unavailable",
+            "error": str(e)
+        }
+
+    # Actividad de sesiones pendiente de volcar en este worker
+    try:
+        from services.session_activity import get_session_activity_stats
+        session_activity_stats = get_session_activity_stats()
+        components["session_activity"] = {
+            "status": "healthy" if session_activity_stats["running"] else "stopped",
+            **session_activity_stats
+        }
+    except Exception as e:
+        components["session_activity"] = {
+            "status": "unavailable",
+            "error": str(e)
+        }
+
+    # Cola de accesos a menús pendiente de escribir
+    try:
+        from services.menu_access_recorder import get_menu_access_stats
+        menu_access_stats = get_menu_access_stats()
+        components["menu_access_log"] = {
+            "status": "healthy" if menu_access_stats["running"] else "stopped",
+            **menu_access_stats
+        }
+    except Exception as e:
+        components["menu_access_log"] = {
+            "status": "unavailable",
+            "error": str(e)
+        }
+
+    # Buffer de eventos SSE hacia el orquestador
+    try:
+        from services.event_publisher import get_event_publisher_stats
+        event_publisher_stats = get_event_publisher_stats()
+        if not event_publisher_stats["running"]:
+            event_publisher_status = "stopped"
+        elif event_publisher_stats["retry_pending"]:
+            event_publisher_status = "degraded"
+        else:
+            event_publisher_status = "healthy"
+        components["event_publisher"] = {
+            "status": event_publisher_status,
+            **event_publisher_stats
+        }
+    except Exception as e:
+        components["event_publisher"] = {
+            "status": "unavailable",
+            "error": str(e)
+        }
+
     # 3. Estado de ResponseManager
     components["response_manager"] = {
         "status": "healthy" if RESPONSE_MANAGER_AVAILABLE else "unavailable",
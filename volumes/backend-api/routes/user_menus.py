@@ -32,6 +32,7 @@ from core.constants import ErrorCode, ErrorType
 
 # Service imports
 from services.menu_service import MenuService
+from services.menu_access_recorder import menu_access_recorder
 
 # Utils imports
 from utils.permissions_utils import get_current_user, require_permission
@@ -622,10 +623,10 @@ async def get_recent_menus(
             ).limit(limit)
             
             result = await session.execute(stmt)
-            recent_menus = []
+            recent_by_menu = {}
             
             for row in result:
-                recent_menus.append({
+                recent_by_menu[row.menu_item_id] = {
                     "menu_item_id": row.menu_item_id,
                     "menu_code": row.menu_code,
                     "menu_name": row.menu_name,
@@ -634,7 +635,58 @@ async def get_recent_menus(
                     "menu_url": row.menu_url,
                     "last_access": row.last_access,
                     "access_count": row.access_count
-                })
+                }
+            
+            # Sumar los accesos aún en la cola de escritura
+            pending = await menu_access_recorder.pending_for_user(user_id, since=cutoff_date)
+            if pending:
+                menus = await menu_access_recorder.get_menus()
+                pending_ids = {event["menu_item_id"] for event in pending}
+                
+                # Menús de la cola fuera del top de BD: traer su conteo ya escrito
+                missing_ids = [menu_id for menu_id in pending_ids if menu_id not in recent_by_menu]
+                if missing_ids:
+                    counts_result = await session.execute(
+                        select(
+                            MenuAccessLog.menu_item_id,
+                            func.max(MenuAccessLog.access_timestamp).label('last_access'),
+                            func.count(MenuAccessLog.id).label('access_count')
+                        ).where(
+                            MenuAccessLog.user_id == user_id,
+                            MenuAccessLog.access_timestamp >= cutoff_date,
+                            MenuAccessLog.menu_item_id.in_(missing_ids)
+                        ).group_by(MenuAccessLog.menu_item_id)
+                    )
+                    written = {row.menu_item_id: row for row in counts_result}
+                    for menu_id in missing_ids:
+                        menu = menus.get(menu_id)
+                        if not menu or not menu["is_active"] or not menu["is_visible"]:
+                            continue
+                        row = written.get(menu_id)
+                        recent_by_menu[menu_id] = {
+                            "menu_item_id": menu_id,
+                            "menu_code": menu["menu_code"],
+                            "menu_name": menu["menu_name"],
+                            "icon_name": menu["icon_name"],
+                            "icon_color": menu["icon_color"],
+                            "menu_url": menu["menu_url"],
+                            "last_access": row.last_access if row else None,
+                            "access_count": row.access_count if row else 0
+                        }
+                
+                for event in pending:
+                    entry = recent_by_menu.get(event["menu_item_id"])
+                    if entry is None:
+                        continue
+                    entry["access_count"] += 1
+                    if entry["last_access"] is None or event["access_timestamp"] > entry["last_access"]:
+                        entry["last_access"] = event["access_timestamp"]
+            
+            recent_menus = sorted(
+                recent_by_menu.values(),
+                key=lambda item: item["last_access"],
+                reverse=True
+            )[:limit]
             
             logger.info(f"Usuario {user['username']} consultó {len(recent_menus)} menús recientes")
             
@@ -663,51 +715,42 @@ async def log_menu_access(
     menu_id: int = Query(..., gt=0, description="ID del menú accedido"),
     user: dict = Depends(require_user_access)
 ):
-    """Registrar acceso a un menú"""
+    """Registrar acceso a un menú (se encola y se escribe en lote)"""
     
     try:
         user_id = user['user_id']
         
-        async with db_manager.get_async_session() as session:
-            # Verificar que el menú existe
-            menu_stmt = select(MenuItem).where(
-                MenuItem.id == menu_id,
-                MenuItem.deleted_at.is_(None)
-            )
-            menu_result = await session.execute(menu_stmt)
-            menu = menu_result.scalar_one_or_none()
-            
-            if not menu:
-                return ResponseManager.error(
-                    error_code=ErrorCode.NOT_FOUND,
-                    error_type=ErrorType.RESOURCE_NOT_FOUND,
-                    message="Menú no encontrado",
-                    request=request
-                )
-            
-            # Registrar acceso
-            access_log = MenuAccessLog(
-                user_id=user_id,
-                menu_item_id=menu_id,
-                ip_address=getattr(request.client, 'host', None),
-                user_agent=request.headers.get('user-agent'),
-                session_id=None  # Se podría obtener del token JWT
-            )
-            
-            session.add(access_log)
-            await session.commit()
-            
-            logger.info(f"Usuario {user['username']} accedió al menú {menu.menu_code}")
-            
-            return ResponseManager.success(
-                data={
-                    "menu_id": menu_id,
-                    "menu_code": menu.menu_code,
-                    "accessed_at": access_log.access_timestamp
-                },
-                message="Acceso registrado exitosamente",
+        # Verificar que el menú existe contra el catálogo en memoria
+        menu = await menu_access_recorder.get_menu(menu_id)
+        
+        if not menu:
+            return ResponseManager.error(
+                error_code=ErrorCode.NOT_FOUND,
+                error_type=ErrorType.RESOURCE_NOT_FOUND,
+                message="Menú no encontrado",
                 request=request
             )
+        
+        # Registrar acceso
+        accessed_at = await menu_access_recorder.record(
+            user_id=user_id,
+            menu_item_id=menu_id,
+            ip_address=getattr(request.client, 'host', None),
+            user_agent=request.headers.get('user-agent'),
+            session_id=user.get('session_id')
+        )
+        
+        logger.debug(f"Usuario {user['username']} accedió al menú {menu['menu_code']}")
+        
+        return ResponseManager.success(
+            data={
+                "menu_id": menu_id,
+                "menu_code": menu['menu_code'],
+                "accessed_at": accessed_at
+            },
+            message="Acceso registrado exitosamente",
+            request=request
+        )
     
     except Exception as e:
         logger.error(f"Error al registrar acceso al menú {menu_id}: {e}")
@@ -931,13 +974,19 @@ async def get_user_menu_stats(
             access_count_result = await session.execute(access_count_stmt)
             recent_accesses = access_count_result.scalar()
             
-            # Menús únicos accedidos
-            unique_menus_stmt = select(func.count(func.distinct(MenuAccessLog.menu_item_id))).where(
+            # Menús únicos accedidos (ids, para unirlos con los de la cola)
+            unique_menus_stmt = select(MenuAccessLog.menu_item_id).where(
                 MenuAccessLog.user_id == user_id,
                 MenuAccessLog.access_timestamp >= cutoff_date
-            )
+            ).distinct()
             unique_menus_result = await session.execute(unique_menus_stmt)
-            unique_menus = unique_menus_result.scalar()
+            unique_menu_ids = set(unique_menus_result.scalars().all())
+            
+            # Accesos aún en la cola de escritura
+            pending = await menu_access_recorder.pending_for_user(user_id, since=cutoff_date)
+            recent_accesses += len(pending)
+            unique_menu_ids.update(event["menu_item_id"] for event in pending)
+            unique_menus = len(unique_menu_ids)
             
             stats = {
                 "user_id": user_id,
@@ -38,6 +38,7 @@ from utils.permissions_utils import get_current_user, require_permission
 from utils.profile_helpers import ProfileHelper 
 from utils.audit_utils import record_audit_log
 from core.password_manager import PasswordManager
+from core.exceptions import ServiceUnavailableException
 from services.media_storage import media_storage
 
 # ==========================================
@@ -425,7 +426,7 @@ async def create_user(
                 )
             
             # Crear el usuario (sin contraseña - se asigna después)
-            password_hash = PasswordManager.hash_password(user_data.password)
+            password_hash = await PasswordManager.hash_password_async(user_data.password)
 
             new_user = User(
                 username=user_data.username.lower(),
@@ -487,6 +488,8 @@ async def create_user(
                 request=request
             )
         
+    except ServiceUnavailableException:
+        raise
     except Exception as e:
         logger.error(f"Error al crear usuario: {e}")
         import traceback
@@ -1,17 +1,35 @@
+"""
+Publicacion de eventos SSE hacia el events-orchestrator.
+
+- publish_event() solo encola: un buffer por worker se envia en lotes a
+  /events/publish/batch con un httpx.AsyncClient de keep-alive, cada
+  EVENTS_PUBLISH_FLUSH_MS o al llegar a EVENTS_PUBLISH_BATCH_SIZE.
+- Contrapresion: con EVENTS_PUBLISH_MAX_PENDING eventos en el buffer el productor
+  espera hasta EVENTS_PUBLISH_ENQUEUE_TIMEOUT_MS y, si sigue lleno, el evento se descarta.
+- Con el orquestador caido los lotes pasan a una cola de reintento acotada
+  (EVENTS_PUBLISH_RETRY_MAX, se descartan los mas antiguos) con backoff exponencial;
+  los eventos con mas de EVENTS_PUBLISH_RETRY_MAX_AGE_SECONDS ya no se reenvian.
+"""
 import asyncio
 import json
 import os
-import urllib.error
-import urllib.request
+import time
+from collections import deque
 from functools import partial
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import httpx
 
+from core.config import settings
 from utils.log_helper import setup_logger
 
 logger = setup_logger(__name__)
 
 DEFAULT_ORCHESTRATOR_URL = "http://events-orchestrator:8040"
 
+_RETRY_BACKOFF_MIN_SECONDS = 0.5
+_RETRY_BACKOFF_MAX_SECONDS = 30.0
+
 
 def _setting(name: str, default: str = "") -> str:
     value = os.getenv(name, default)
@@ -24,21 +42,280 @@ def _orchestrator_url() -> str:
     return _setting("EVENTS_ORCHESTRATOR_URL", DEFAULT_ORCHESTRATOR_URL).rstrip("/")
 
 
-def _post_json(url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-    data = json.dumps(payload).encode("utf-8")
-    request = urllib.request.Request(
-        url,
-        data=data,
-        headers={
-            "Content-Type": "application/json",
-            **(headers or {}),
-        },
-        method="POST",
-    )
+class _RetryableError(Exception):
+    """El lote no llego al orquestador y puede reintentarse."""
+
+
+class EventPublisher:
+    """
+    Buffer de eventos SSE con envio en lote al orquestador
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_ms: int,
+        max_pending: int,
+        enqueue_timeout_ms: int,
+        retry_max: int,
+        retry_max_age_seconds: int,
+    ):
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = max(1, flush_ms) / 1000
+        self.max_pending = max(self.batch_size, max_pending)
+        self.enqueue_timeout_seconds = max(0, enqueue_timeout_ms) / 1000
+        self.retry_max = max(0, retry_max)
+        self.retry_max_age_seconds = max(1, retry_max_age_seconds)
+
+        # (instante de encolado, evento) para descartar lo viejo al reintentar
+        self._pending: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self._retry: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self._retry_at = 0.0
+        self._backoff = _RETRY_BACKOFF_MIN_SECONDS
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        # Contadores expuestos en /system/status
+        self.queued = 0
+        self.sent = 0
+        self.batches = 0
+        self.rejected = 0
+        self.invalid = 0
+        self.dropped_full = 0
+        self.dropped_retry = 0
+        self.dropped_expired = 0
+        self.send_errors = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {}
+            publish_token = _setting("EVENTS_PUBLISH_TOKEN")
+            if publish_token:
+                headers["X-Events-Token"] = publish_token
+            self._client = httpx.AsyncClient(
+                base_url=_orchestrator_url(),
+                headers=headers,
+                timeout=httpx.Timeout(settings.EVENTS_PUBLISH_TIMEOUT_SECONDS, connect=1.0),
+                limits=httpx.Limits(max_connections=2, max_keepalive_connections=2),
+            )
+        return self._client
+
+    # ==========================================
+    # ENCOLADO
+    # ==========================================
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def publish(self, event: Dict[str, Any]) -> bool:
+        """Encola un evento; False si no es serializable o se descarto por buffer lleno"""
+        try:
+            # Mismas opciones que httpx al enviar: un evento invalido no debe tumbar el lote
+            json.dumps(event, ensure_ascii=False, allow_nan=False)
+        except (TypeError, ValueError) as error:
+            self.invalid += 1
+            logger.warning(f"Evento SSE {event.get('type')} no serializable a JSON; se descarta: {error}")
+            return False
+
+        if not self.running:
+            # Fuera de la app (scripts, tests): envio directo de un lote de uno
+            try:
+                await self._send([(time.monotonic(), event)])
+            except _RetryableError as error:
+                logger.warning(f"No fue posible publicar evento SSE {event.get('type')}: {error}")
+                return False
+            return True
+
+        if len(self._pending) >= self.max_pending:
+            self._space.clear()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=self.enqueue_timeout_seconds)
+            except asyncio.TimeoutError:
+                pass
+            if len(self._pending) >= self.max_pending:
+                self.dropped_full += 1
+                logger.warning(f"Buffer de eventos SSE lleno; se descarta {event.get('type')}")
+                return False
+
+        self._pending.append((time.monotonic(), event))
+        self.queued += 1
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    # ==========================================
+    # ENVIO
+    # ==========================================
+
+    def start(self) -> None:
+        if not self.running:
+            self._wake = asyncio.Event()
+            self._space = asyncio.Event()
+            self._space.set()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Ultimo intento sin esperar el backoff; lo que no salga se pierde
+        self._retry_at = 0.0
+        try:
+            await self.flush()
+        except Exception as error:
+            logger.warning(f"Error enviando eventos SSE pendientes al cerrar: {error}")
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning(f"Error enviando lote de eventos SSE: {error}")
+
+    async def flush(self) -> int:
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            return await self._flush()
+
+    async def _flush(self) -> int:
+        sent = 0
+        if self._retry and time.monotonic() < self._retry_at:
+            # Orquestador caido: lo nuevo espera en la cola de reintento, no en el buffer
+            self._set_retry(list(self._retry) + self._drain(self._pending, len(self._pending)))
+            return sent
+
+        while self._retry or self._pending:
+            batch = self._drain(self._retry, self.batch_size)
+            batch.extend(self._drain(self._pending, self.batch_size - len(batch)))
+            if not batch:
+                break
+            try:
+                await self._send(batch)
+            except _RetryableError as error:
+                self.send_errors += 1
+                logger.warning(f"Orquestador de eventos no disponible, {len(batch)} eventos a reintento: {error}")
+                # El lote sale del frente del reintento: va antes de lo que quede en esa cola
+                self._set_retry(batch + list(self._retry) + self._drain(self._pending, len(self._pending)))
+                self._retry_at = time.monotonic() + self._backoff
+                self._backoff = min(self._backoff * 2, _RETRY_BACKOFF_MAX_SECONDS)
+                break
+            self._backoff = _RETRY_BACKOFF_MIN_SECONDS
+            sent += len(batch)
+        return sent
+
+    def _drain(self, queue: Deque[Tuple[float, Dict[str, Any]]], limit: int) -> List[Tuple[float, Dict[str, Any]]]:
+        items = []
+        cutoff = time.monotonic() - self.retry_max_age_seconds
+        while queue and len(items) < limit:
+            item = queue.popleft()
+            if item[0] < cutoff:
+                self.dropped_expired += 1
+                continue
+            items.append(item)
+        if queue is self._pending and self._space is not None and len(self._pending) < self.max_pending:
+            self._space.set()
+        return items
+
+    def _set_retry(self, items: List[Tuple[float, Dict[str, Any]]]) -> None:
+        overflow = len(items) - self.retry_max
+        if overflow > 0:
+            # Se descartan los mas antiguos: son los primeros en perder vigencia
+            self.dropped_retry += overflow
+            items = items[overflow:]
+        self._retry = deque(items)
+
+    async def _send(self, batch: List[Tuple[float, Dict[str, Any]]]) -> None:
+        try:
+            response = await self._get_client().post(
+                "/events/publish/batch",
+                json={"events": [event for _, event in batch]},
+            )
+        except httpx.TransportError as error:
+            raise _RetryableError(str(error) or type(error).__name__) from error
+
+        if response.status_code >= 500:
+            raise _RetryableError(f"HTTP {response.status_code}")
 
-    with urllib.request.urlopen(request, timeout=2) as response:
-        response_payload = response.read().decode("utf-8")
-        return json.loads(response_payload) if response_payload else {}
+        self.batches += 1
+        if response.status_code >= 400:
+            # Token, limites o esquema: reintentar no cambia el resultado
+            self.rejected += len(batch)
+            logger.warning(
+                f"Orquestador rechazo lote de {len(batch)} eventos SSE: "
+                f"HTTP {response.status_code} {response.text[:200]}"
+            )
+            return
+
+        try:
+            data = (response.json() or {}).get("data") or {}
+        except ValueError:
+            data = {}
+        rejected = int(data.get("rejected") or 0)
+        self.sent += len(batch) - rejected
+        if rejected:
+            self.rejected += rejected
+            for result in data.get("results") or []:
+                if result.get("error"):
+                    event = batch[result["index"]][1]
+                    logger.warning(f"Evento SSE {event.get('type')} rechazado: {result['error']}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_size,
+            "flush_ms": int(self.flush_seconds * 1000),
+            "pending": len(self._pending),
+            "retry_pending": len(self._retry),
+            "retry_in_seconds": round(max(0.0, self._retry_at - time.monotonic()), 2) if self._retry else 0,
+            "queued": self.queued,
+            "sent": self.sent,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "invalid": self.invalid,
+            "dropped_full": self.dropped_full,
+            "dropped_retry": self.dropped_retry,
+            "dropped_expired": self.dropped_expired,
+            "send_errors": self.send_errors,
+            "running": self.running,
+        }
+
+
+# ==========================================
+# INSTANCIA GLOBAL (POR WORKER)
+# ==========================================
+
+event_publisher = EventPublisher(
+    settings.EVENTS_PUBLISH_BATCH_SIZE,
+    settings.EVENTS_PUBLISH_FLUSH_MS,
+    settings.EVENTS_PUBLISH_MAX_PENDING,
+    settings.EVENTS_PUBLISH_ENQUEUE_TIMEOUT_MS,
+    settings.EVENTS_PUBLISH_RETRY_MAX,
+    settings.EVENTS_PUBLISH_RETRY_MAX_AGE_SECONDS,
+)
+
+
+def get_event_publisher_stats() -> Dict[str, Any]:
+    return event_publisher.stats()
 
 
 async def publish_event(
@@ -69,21 +346,9 @@ async def publish_event(
     if dedupe_key:
         event_payload["dedupe_key"] = dedupe_key
 
-    headers = {}
-    publish_token = _setting("EVENTS_PUBLISH_TOKEN")
-    if publish_token:
-        headers["X-Events-Token"] = publish_token
-
-    try:
-        return await asyncio.to_thread(
-            _post_json,
-            f"{_orchestrator_url()}/events/publish",
-            event_payload,
-            headers,
-        )
-    except (urllib.error.URLError, TimeoutError, OSError, json.JSONDecodeError) as error:
-        logger.warning(f"No fue posible publicar evento SSE {event_type}: {error}")
-        return None
+    if await event_publisher.publish(event_payload):
+        return {"queued": True, "type": event_type}
+    return None
 
 
 async def publish_permissions_refresh(user_ids: Iterable[int], reason: str, payload: Optional[Dict[str, Any]] = None):
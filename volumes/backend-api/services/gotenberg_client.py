@@ -0,0 +1,219 @@
+"""
+Cliente async de Gotenberg (HTML -> PDF).
+
+- Un httpx.AsyncClient compartido con keep-alive en lugar de una conexion urllib por PDF.
+- Semaforo que acota las conversiones en vuelo (GOTENBERG_MAX_CONCURRENCY); si no hay
+  cupo dentro de GOTENBERG_QUEUE_TIMEOUT_SECONDS se responde como servicio no disponible.
+- El multipart se envia en streaming, sin concatenar el HTML en un nuevo buffer.
+- Cache por contenido: sha256 del HTML renderizado -> PDF, acotado por bytes y TTL.
+  Dos exportaciones identicas concurrentes comparten la misma conversion.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from core.config import settings
+
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class GotenbergError(Exception):
+    """Gotenberg respondio con error al convertir."""
+
+
+class GotenbergUnavailable(GotenbergError):
+    """Gotenberg no responde o todas las conversiones estan ocupadas."""
+
+
+def _consume_exception(task: asyncio.Task) -> None:
+    # Evita el warning de "exception never retrieved" si nadie mas esperaba.
+    if not task.cancelled():
+        task.exception()
+
+
+class _PdfCache:
+    """LRU en memoria acotado por bytes totales, con expiracion por entrada."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._size = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, pdf = item
+        if expires_at < time.monotonic():
+            self._drop(key)
+            return None
+        self._items.move_to_end(key)
+        return pdf
+
+    def set(self, key: str, pdf: bytes) -> None:
+        if self.max_bytes <= 0 or len(pdf) > self.max_bytes:
+            return
+        self._drop(key)
+        self._items[key] = (time.monotonic() + self.ttl_seconds, pdf)
+        self._size += len(pdf)
+        while self._size > self.max_bytes:
+            oldest = next(iter(self._items))
+            self._drop(oldest)
+
+    def _drop(self, key: str) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._size -= len(item[1])
+
+    def stats(self) -> dict:
+        return {"entries": len(self._items), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+class GotenbergClient:
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = settings.GOTENBERG_URL.rstrip("/")
+        # Solo para pruebas (httpx.MockTransport); en la app httpx usa su pool HTTP
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # clave -> [tarea de conversion, cantidad de requests esperandola]
+        self._inflight: dict[str, list] = {}
+        self._cache = _PdfCache(
+            settings.GOTENBERG_PDF_CACHE_MAX_MB * 1024 * 1024,
+            settings.GOTENBERG_PDF_CACHE_TTL_SECONDS,
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Se crea perezosamente para quedar ligado al event loop de la app.
+        if self._client is None or self._client.is_closed:
+            max_connections = max(settings.GOTENBERG_MAX_CONCURRENCY, 1)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self._transport,
+                timeout=httpx.Timeout(settings.GOTENBERG_TIMEOUT_SECONDS, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections,
+                ),
+            )
+            self._semaphore = asyncio.Semaphore(max_connections)
+        return self._client
+
+    async def html_to_pdf(self, html: str) -> bytes:
+        html_bytes = html.encode("utf-8")
+        key = hashlib.sha256(html_bytes).hexdigest()
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        entry = self._inflight.get(key)
+        if entry is None:
+            self.misses += 1
+            # La conversion vive en su propia tarea: cancelar a quien la inicio no la corta
+            # para los demas que esperan el mismo PDF.
+            task = asyncio.create_task(self._render(key, html_bytes))
+            task.add_done_callback(_consume_exception)
+            entry = self._inflight[key] = [task, 0]
+        else:
+            self.hits += 1
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Solo el ultimo en abandonar cancela la conversion
+            if entry[1] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    async def _render(self, key: str, html_bytes: bytes) -> bytes:
+        try:
+            pdf = await self._convert(html_bytes)
+            self._cache.set(key, pdf)
+            return pdf
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _convert(self, html_bytes: bytes) -> bytes:
+        client = self._get_client()
+        semaphore = self._semaphore
+        try:
+            await asyncio.wait_for(semaphore.acquire(), settings.GOTENBERG_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError as exc:
+            raise GotenbergUnavailable("Todas las conversiones PDF estan ocupadas") from exc
+
+        boundary = uuid.uuid4().hex
+        head = (
+            f"--{boundary}\r\n"
+            'Content-Disposition: form-data; name="files"; filename="index.html"\r\n'
+            "Content-Type: text/html; charset=utf-8\r\n"
+            "\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+
+        async def _body() -> AsyncIterator[bytes]:
+            yield head
+            view = memoryview(html_bytes)
+            for start in range(0, len(view), _STREAM_CHUNK_SIZE):
+                yield bytes(view[start:start + _STREAM_CHUNK_SIZE])
+            yield tail
+
+        try:
+            response = await client.post(
+                "/forms/chromium/convert/html",
+                content=_body(),
+                headers={
+                    "Content-Type": f"multipart/form-data; boundary={boundary}",
+                    "Content-Length": str(len(head) + len(html_bytes) + len(tail)),
+                },
+            )
+        except httpx.TransportError as exc:
+            raise GotenbergUnavailable(f"Gotenberg no responde en {self.base_url}: {exc}") from exc
+        finally:
+            semaphore.release()
+
+        if response.status_code >= 500:
+            # Gotenberg caido o reiniciando: reintentable igual que un error de red
+            raise GotenbergUnavailable(f"Gotenberg respondio {response.status_code}: {response.text[:200]}")
+        if response.status_code >= 400:
+            raise GotenbergError(f"Gotenberg respondio {response.status_code}: {response.text[:200]}")
+        return response.content
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight": len(self._inflight),
+            "cache": self._cache.stats(),
+        }
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+gotenberg_client = GotenbergClient()
+
+
+async def html_to_pdf(html: str) -> bytes:
+    return await gotenberg_client.html_to_pdf(html)
+
+
+async def close_gotenberg() -> None:
+    await gotenberg_client.close()
@@ -0,0 +1,365 @@
+"""
+volumes/backend-api/services/menu_access_recorder.py
+Log de accesos a menús con escritura diferida (write-behind)
+
+- record() valida el menú contra un catálogo en memoria y hace un RPUSH a
+  menu_access:pending: el endpoint no toca la BD.
+- Cada worker vacía la cola con LPOP <batch> (atómico entre workers) y un INSERT
+  multi-fila, cada MENU_ACCESS_FLUSH_SECONDS o al llegar a MENU_ACCESS_BATCH_SIZE.
+- Cada acceso encolado tambien queda en un hash por usuario
+  (menu_access:pending:user:{id}, field = event_id) hasta que se escribe o se
+  descarta; pending_for_user() lee solo ese hash para que /recent y /stats lo sumen
+  a lo ya escrito. El hash vence solo si nadie lo limpia (caida entre el INSERT y el HDEL).
+- Sin Redis se inserta directo, como antes.
+- Un lote que falla por integridad (menú o usuario borrado) se parte en mitades
+  hasta aislar las filas malas, que van a menu_access:dead; ante un error
+  transitorio vuelve a la cola solo lo que aun no se inserto. La cola se recorta a
+  MENU_ACCESS_MAX_QUEUE.
+"""
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from cache.redis_client import deserialize_value, redis_client, serialize_value
+from core.config import settings
+from utils.log_helper import setup_logger
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+MENU_ACCESS_QUEUE_KEY = "menu_access:pending"
+MENU_ACCESS_DEAD_KEY = "menu_access:dead"
+MENU_ACCESS_USER_PENDING_PREFIX = "menu_access:pending:user:"
+_DEAD_LETTER_MAX = 1000
+
+# Catálogo de menús: refresco periódico y, ante un id desconocido, como máximo cada N segundos
+_MENU_CATALOG_TTL_SECONDS = 300
+_MENU_CATALOG_MISS_REFRESH_SECONDS = 5
+
+
+class _PartialBatchError(Exception):
+    """
+    Error transitorio a mitad de un lote: cuantas filas ya quedaron escritas y
+    cuales faltan
+    """
+
+    def __init__(self, inserted: List[Dict[str, Any]], remaining: List[Dict[str, Any]]):
+        super().__init__(f"{len(remaining)} accesos sin insertar")
+        self.inserted = inserted
+        self.remaining = remaining
+
+
+def _is_integrity_error(error: BaseException) -> bool:
+    # get_async_session envuelve el error del driver en DatabaseException
+    while error is not None:
+        if isinstance(error, IntegrityError):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class MenuAccessRecorder:
+    """
+    Cola de accesos a menús en Redis con volcado en lote a menu_access_log
+    """
+
+    def __init__(self, flush_seconds: int, batch_size: int, max_queue: int):
+        self.flush_seconds = max(1, flush_seconds)
+        self.batch_size = max(1, batch_size)
+        self.max_queue = max(self.batch_size, max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        # Lo que no se limpie del indice por usuario (p. ej. descartado por el recorte) vence solo
+        self.user_index_ttl = max(60, self.flush_seconds * 6)
+
+        self._menus: Dict[int, Dict[str, Any]] = {}
+        self._menus_loaded_at = 0.0
+        self._menus_lock = asyncio.Lock()
+
+        # Contadores expuestos en /system/status
+        self.queued = 0
+        self.direct_writes = 0
+        self.flushed_rows = 0
+        self.flush_errors = 0
+        self.dead_lettered = 0
+        self.dropped = 0
+
+    # ==========================================
+    # CATÁLOGO DE MENÚS
+    # ==========================================
+
+    async def get_menu(self, menu_id: int) -> Optional[Dict[str, Any]]:
+        """Datos de un menú no eliminado, o None si no existe"""
+        age = time.monotonic() - self._menus_loaded_at
+        menu = self._menus.get(menu_id)
+        if age > _MENU_CATALOG_TTL_SECONDS or (menu is None and age > _MENU_CATALOG_MISS_REFRESH_SECONDS):
+            await self._load_menus()
+            menu = self._menus.get(menu_id)
+        return menu
+
+    async def get_menus(self) -> Dict[int, Dict[str, Any]]:
+        if time.monotonic() - self._menus_loaded_at > _MENU_CATALOG_TTL_SECONDS:
+            await self._load_menus()
+        return self._menus
+
+    async def _load_menus(self) -> None:
+        async with self._menus_lock:
+            # Otra corrutina pudo recargarlo mientras se esperaba el lock
+            if time.monotonic() - self._menus_loaded_at <= _MENU_CATALOG_MISS_REFRESH_SECONDS:
+                return
+
+            from database.database import db_manager
+            from database.models.menu_items import MenuItem
+
+            stmt = select(
+                MenuItem.id,
+                MenuItem.menu_code,
+                MenuItem.menu_name,
+                MenuItem.icon_name,
+                MenuItem.icon_color,
+                MenuItem.menu_url,
+                MenuItem.is_active,
+                MenuItem.is_visible,
+            ).where(MenuItem.deleted_at.is_(None))
+
+            async with db_manager.get_async_session() as session:
+                rows = (await session.execute(stmt)).mappings().all()
+
+            self._menus = {row["id"]: dict(row) for row in rows}
+            self._menus_loaded_at = time.monotonic()
+
+    # ==========================================
+    # ENCOLADO Y LECTURA
+    # ==========================================
+
+    async def record(
+        self,
+        user_id: int,
+        menu_item_id: int,
+        ip_address: Optional[str],
+        user_agent: Optional[str],
+        session_id: Optional[str],
+    ) -> datetime:
+        accessed_at = datetime.now(timezone.utc)
+        event = {
+            "event_id": uuid.uuid4().hex,
+            "user_id": int(user_id),
+            "menu_item_id": int(menu_item_id),
+            # UTC naive, igual que lo devuelve la BD, para poder mezclar ambos orígenes
+            "access_timestamp": accessed_at.replace(tzinfo=None).isoformat(),
+            "ip_address": (ip_address or "")[:45] or None,
+            "user_agent": (user_agent or "")[:1000] or None,
+            "session_id": (session_id or "")[:255] or None,
+        }
+
+        user_key = f"{MENU_ACCESS_USER_PENDING_PREFIX}{event['user_id']}"
+
+        def _build(pipe):
+            pipe.rpush(MENU_ACCESS_QUEUE_KEY, serialize_value(event))
+            pipe.hset(user_key, event["event_id"], serialize_value(event))
+            pipe.expire(user_key, self.user_index_ttl)
+
+        results = await redis_client.pipeline_execute(_build, transaction=True)
+        length = results[0] if results else None
+        if length is None:
+            self.direct_writes += 1
+            await self._insert_events([event])
+            return accessed_at
+
+        self.queued += 1
+        await self._trim_queue(length)
+        if length >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return accessed_at
+
+    async def _trim_queue(self, length: Optional[int]) -> None:
+        # Con la BD caída la cola no crece sin límite: se descartan los accesos más antiguos
+        if length is None or length <= self.max_queue:
+            return
+        await redis_client.ltrim(MENU_ACCESS_QUEUE_KEY, -self.max_queue, -1)
+        self.dropped += length - self.max_queue
+        logger.warning(f"Cola de accesos a menús sobre {self.max_queue}: se descartan {length - self.max_queue}")
+
+    async def pending_for_user(self, user_id: int, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """
+        Accesos del usuario todavía sin escribir, desde su indice (no recorre la cola)
+        """
+        cutoff = since.replace(tzinfo=None) if since is not None else None
+
+        def _build(pipe):
+            pipe.hvals(f"{MENU_ACCESS_USER_PENDING_PREFIX}{int(user_id)}")
+
+        results = await redis_client.pipeline_execute(_build)
+        pending = []
+        for value in (results[0] if results else []):
+            event = deserialize_value(value)
+            if not isinstance(event, dict):
+                continue
+            accessed_at = datetime.fromisoformat(event["access_timestamp"])
+            if cutoff is not None and accessed_at < cutoff:
+                continue
+            pending.append({**event, "access_timestamp": accessed_at})
+        return pending
+
+    async def _forget_pending(self, events: List[Dict[str, Any]]) -> None:
+        """Quitar del indice por usuario los accesos ya escritos o descartados"""
+        by_user: Dict[str, List[str]] = {}
+        for event in events:
+            if isinstance(event, dict) and event.get("event_id"):
+                by_user.setdefault(f"{MENU_ACCESS_USER_PENDING_PREFIX}{event.get('user_id')}", []).append(event["event_id"])
+        if not by_user:
+            return
+
+        def _build(pipe):
+            for user_key, event_ids in by_user.items():
+                pipe.hdel(user_key, *event_ids)
+
+        try:
+            await redis_client.pipeline_execute(_build)
+        except Exception as e:
+            logger.warning(f"No se pudo limpiar el indice de accesos pendientes: {e}")
+
+    # ==========================================
+    # VOLCADO
+    # ==========================================
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error volcando accesos a menús: {e}")
+
+    async def flush(self) -> int:
+        written = 0
+        while True:
+            events = await redis_client.lpop(MENU_ACCESS_QUEUE_KEY, self.batch_size)
+            if not events:
+                return written
+            try:
+                inserted = await self._insert_batch(events)
+            except _PartialBatchError as e:
+                self.flush_errors += 1
+                written += len(e.inserted)
+                self.flushed_rows += len(e.inserted)
+                # Lo insertado y lo descartado por integridad ya no esta pendiente
+                remaining_ids = {id(event) for event in e.remaining}
+                await self._forget_pending([event for event in events if id(event) not in remaining_ids])
+                logger.warning(f"No se pudieron insertar {len(e.remaining)} accesos a menús: {e.__cause__}")
+                # Error transitorio: devolver a la cola solo lo que falta, para el siguiente intento
+                await self._trim_queue(await redis_client.rpush(MENU_ACCESS_QUEUE_KEY, *e.remaining))
+                return written
+            await self._forget_pending(events)
+            written += len(inserted)
+            self.flushed_rows += len(inserted)
+            if len(events) < self.batch_size:
+                return written
+
+    async def _insert_batch(self, events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Insertar el lote; ante un error de integridad partirlo hasta aislar las filas
+        que nunca van a entrar. Devuelve las filas insertadas. Un error transitorio
+        sale como _PartialBatchError con lo ya insertado y lo que falta.
+        """
+        try:
+            await self._insert_events(events)
+            return events
+        except Exception as e:
+            if not _is_integrity_error(e):
+                raise _PartialBatchError([], events) from e
+            if len(events) == 1:
+                self.dead_lettered += 1
+                logger.warning(f"Acceso a menú descartado por integridad: {events[0]} ({e})")
+                await redis_client.rpush(MENU_ACCESS_DEAD_KEY, events[0])
+                await redis_client.ltrim(MENU_ACCESS_DEAD_KEY, -_DEAD_LETTER_MAX, -1)
+                return []
+        middle = len(events) // 2
+        try:
+            first = await self._insert_batch(events[:middle])
+        except _PartialBatchError as e:
+            raise _PartialBatchError(e.inserted, e.remaining + events[middle:]) from e.__cause__
+        try:
+            return first + await self._insert_batch(events[middle:])
+        except _PartialBatchError as e:
+            raise _PartialBatchError(first + e.inserted, e.remaining) from e.__cause__
+
+    async def _insert_events(self, events: List[Dict[str, Any]]) -> None:
+        from database.database import db_manager
+        from database.models.menu_access_log import MenuAccessLog
+
+        rows = [
+            {
+                **{key: value for key, value in event.items() if key != "event_id"},
+                "access_timestamp": datetime.fromisoformat(event["access_timestamp"]),
+            }
+            for event in events
+            if isinstance(event, dict)
+        ]
+        if not rows:
+            return
+
+        async with db_manager.get_async_session() as session:
+            # executemany de Core: un INSERT multi-fila, sin instanciar modelos
+            await session.execute(insert(MenuAccessLog), rows)
+            await session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "flush_seconds": self.flush_seconds,
+            "batch_size": self.batch_size,
+            "queued": self.queued,
+            "direct_writes": self.direct_writes,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+            "dead_lettered": self.dead_lettered,
+            "dropped": self.dropped,
+            "max_queue": self.max_queue,
+            "menus_cached": len(self._menus),
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+# ==========================================
+# INSTANCIA GLOBAL (POR WORKER)
+# ==========================================
+
+menu_access_recorder = MenuAccessRecorder(
+    settings.MENU_ACCESS_FLUSH_SECONDS,
+    settings.MENU_ACCESS_BATCH_SIZE,
+    settings.MENU_ACCESS_MAX_QUEUE,
+)
+
+
+# ==========================================
+# FUNCIONES DE CONVENIENCIA
+# ==========================================
+
+def get_menu_access_stats() -> Dict[str, Any]:
+    return menu_access_recorder.stats()
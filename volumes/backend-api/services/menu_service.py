@@ -6,6 +6,7 @@ CRUD básico + jerarquías + operaciones esenciales
 from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func, desc
 
 # Database imports
@@ -617,4 +618,26 @@ class MenuService:
         except Exception as e:
             self.session.rollback()
             logger.error(f"Error en operación masiva: {e}")
-            raise
\ No newline at end of file
+            raise
+
+class AsyncMenuService:
+    """
+    MenuService sobre AsyncSession para rutas async.
+    
+    Cada método corre dentro de session.run_sync: el ORM síncrono de MenuService usa
+    el driver async (aiomysql) por greenlet y no bloquea el event loop.
+    """
+    
+    def __init__(self, session: AsyncSession):
+        self.session = session
+    
+    def __getattr__(self, name: str):
+        if name.startswith("_") or not callable(getattr(MenuService, name, None)):
+            raise AttributeError(name)
+        
+        async def _call(*args, **kwargs):
+            return await self.session.run_sync(
+                lambda sync_session: getattr(MenuService(sync_session), name)(*args, **kwargs)
+            )
+        
+        return _call
@@ -3,8 +3,8 @@ volumes/backend-api/services/permissions_service.py
 Servicio centralizado de permisos y roles - USANDO ORM Y LÓGICA SEPARADA
 """
 from datetime import datetime, timezone
-from typing import List, Dict
-from sqlalchemy import select, and_, or_
+from typing import List, Dict, Iterable
+from sqlalchemy import select, and_, or_, union, literal
 from database.database import db_manager
 from utils.log_helper import setup_logger
 
@@ -15,24 +15,24 @@ class PermissionsService:
     
     async def get_user_permissions(self, user_id: int) -> Dict[str, List[str]]:
         """
-        Obtener roles y permisos de usuario - LÓGICA SEPARADA CON ORM
+        Obtener roles y permisos de usuario en una sola consulta (UNION de roles,
+        permisos directos y permisos por rol) sobre AsyncSession
         """
         try:
+            stmt = union(
+                self._user_roles_stmt(user_id).add_columns(literal("role").label("kind")),
+                self._user_direct_permissions_stmt(user_id).add_columns(literal("permission").label("kind")),
+                self._role_permissions_stmt(user_id).add_columns(literal("permission").label("kind")),
+            )
+            
+            async with db_manager.get_async_session() as session:
+                rows = (await session.execute(stmt)).all()
             
-            async with db_manager.get_session() as session:
-                # Obtener datos por separado
-                user_roles = await self._get_user_roles(session, user_id)
-                direct_permissions = await self._get_user_direct_permissions(session, user_id)
-                role_permissions = await self._get_permissions_from_roles(session, user_id, user_roles)
-                
-                # Combinar todos los permisos
-                all_permissions = direct_permissions + role_permissions
-                unique_permissions = list(set(all_permissions))  # Deduplicar
-                
-                return {
-                    "roles": user_roles,
-                    "permissions": unique_permissions
-                }
+            # UNION ya deduplica (code, kind)
+            return {
+                "roles": [row[0] for row in rows if row[1] == "role"],
+                "permissions": [row[0] for row in rows if row[1] == "permission"]
+            }
 
         except Exception as e:
             logger.error(f"Error en PermissionsService: {e}")
@@ -43,98 +43,140 @@ class PermissionsService:
                 "permissions": []
             }
     
-    async def _get_user_roles(self, session, user_id: int) -> List[str]:
-        """Obtener roles del usuario usando ORM"""
+    async def get_user_grants(self, user_id: int) -> Dict[str, List[str]]:
+        """
+        Roles activos y permisos directos del usuario (sin expandir los roles).
+        Los permisos de cada rol se resuelven aparte con get_roles_permissions.
+        """
         try:
-            from database.models.user_roles import UserRole
-            from database.models.roles import Role
-                        
-            # Query ORM para roles
-            stmt = select(Role.role_code).select_from(
-                UserRole.__table__.join(Role.__table__, UserRole.role_id == Role.id)
-            ).where(
-                and_(
-                    UserRole.user_id == user_id,
-                    UserRole.deleted_at.is_(None),
-                    Role.is_active == True,
-                    Role.deleted_at.is_(None)
-                )
+            stmt = union(
+                self._user_roles_stmt(user_id).add_columns(literal("role").label("kind")),
+                self._user_direct_permissions_stmt(user_id).add_columns(literal("permission").label("kind")),
             )
             
-            result = session.execute(stmt)
-            roles = [row[0] for row in result.fetchall()]
-            
-            return roles
+            async with db_manager.get_async_session() as session:
+                rows = (await session.execute(stmt)).all()
             
+            return {
+                "roles": [row[0] for row in rows if row[1] == "role"],
+                "direct_permissions": [row[0] for row in rows if row[1] == "permission"]
+            }
+
         except Exception as e:
-            logger.error(f"Error obteniendo roles: {e}")
-            return []
+            logger.error(f"Error getting grants for {user_id}: {e}")
+            return {
+                "roles": [],
+                "direct_permissions": []
+            }
     
-    async def _get_user_direct_permissions(self, session, user_id: int) -> List[str]:
-        """Obtener permisos directos del usuario usando ORM"""
-        try:
-            from database.models.user_permissions import UserPermission
-            from database.models.permissions import Permission
-            
-            # Query ORM para permisos directos
-            stmt = select(Permission.permission_code).select_from(
-                UserPermission.__table__.join(Permission.__table__, UserPermission.permission_id == Permission.id)
-            ).where(
-                and_(
-                    UserPermission.user_id == user_id,
-                    UserPermission.deleted_at.is_(None),
-                    Permission.is_active == True,
-                    Permission.deleted_at.is_(None),
-                    or_(UserPermission.expires_at.is_(None), UserPermission.expires_at > datetime.now(timezone.utc)),
-                    UserPermission.permission_type == 'GRANT'
-                )
+    async def get_roles_permissions(self, role_codes: Iterable[str]) -> Dict[str, List[str]]:
+        """
+        Permisos de varios roles en una consulta. Todo rol pedido aparece en el
+        resultado; uno inactivo, eliminado o sin permisos queda con lista vacía.
+        """
+        role_codes = list(role_codes)
+        snapshots: Dict[str, List[str]] = {role_code: [] for role_code in role_codes}
+        if not role_codes:
+            return snapshots
+        
+        from database.models.roles import Role
+        from database.models.role_permissions import RolePermission
+        from database.models.permissions import Permission
+        
+        stmt = select(Role.role_code, Permission.permission_code).select_from(
+            Role.__table__
+            .join(RolePermission.__table__, Role.id == RolePermission.role_id)
+            .join(Permission.__table__, RolePermission.permission_id == Permission.id)
+        ).where(
+            and_(
+                Role.role_code.in_(role_codes),
+                Role.is_active == True,
+                Role.deleted_at.is_(None),
+                RolePermission.deleted_at.is_(None),
+                Permission.is_active == True,
+                Permission.deleted_at.is_(None)
             )
-            
-            result = session.execute(stmt)
-            permissions = [row[0] for row in result.fetchall()]
-            
-            return permissions
-            
-        except Exception as e:
-            return []
+        ).distinct()
+        
+        async with db_manager.get_async_session() as session:
+            rows = (await session.execute(stmt)).all()
+        
+        for role_code, permission_code in rows:
+            snapshots[role_code].append(permission_code)
+        return snapshots
     
-    async def _get_permissions_from_roles(self, session, user_id: int, user_roles: List[str]) -> List[str]:
-        """Obtener permisos que vienen de los roles del usuario usando ORM"""
+    # ===============================================
+    # CONSULTAS
+    # ===============================================
+    
+    @staticmethod
+    def _user_roles_stmt(user_id: int):
+        """Roles activos del usuario"""
+        from database.models.user_roles import UserRole
+        from database.models.roles import Role
+        
+        return select(Role.role_code).select_from(
+            UserRole.__table__.join(Role.__table__, UserRole.role_id == Role.id)
+        ).where(
+            and_(
+                UserRole.user_id == user_id,
+                UserRole.deleted_at.is_(None),
+                Role.is_active == True,
+                Role.deleted_at.is_(None)
+            )
+        )
+    
+    @staticmethod
+    def _user_direct_permissions_stmt(user_id: int):
+        """Permisos GRANT asignados directamente al usuario y vigentes"""
+        from database.models.user_permissions import UserPermission
+        from database.models.permissions import Permission
+        
+        return select(Permission.permission_code).select_from(
+            UserPermission.__table__.join(Permission.__table__, UserPermission.permission_id == Permission.id)
+        ).where(
+            and_(
+                UserPermission.user_id == user_id,
+                UserPermission.deleted_at.is_(None),
+                Permission.is_active == True,
+                Permission.deleted_at.is_(None),
+                or_(UserPermission.expires_at.is_(None), UserPermission.expires_at > datetime.now(timezone.utc)),
+                UserPermission.permission_type == 'GRANT'
+            )
+        )
+    
+    @staticmethod
+    def _role_permissions_stmt(user_id: int):
+        """Permisos que vienen de los roles activos del usuario"""
+        from database.models.user_roles import UserRole
+        from database.models.roles import Role
+        from database.models.role_permissions import RolePermission
+        from database.models.permissions import Permission
+        
+        return select(Permission.permission_code).select_from(
+            UserRole.__table__
+            .join(Role.__table__, UserRole.role_id == Role.id)
+            .join(RolePermission.__table__, Role.id == RolePermission.role_id)
+            .join(Permission.__table__, RolePermission.permission_id == Permission.id)
+        ).where(
+            and_(
+                UserRole.user_id == user_id,
+                UserRole.deleted_at.is_(None),
+                Role.is_active == True,
+                Role.deleted_at.is_(None),
+                RolePermission.deleted_at.is_(None),
+                Permission.is_active == True,
+                Permission.deleted_at.is_(None)
+            )
+        )
+    
+    async def _fetch_codes(self, stmt, user_id: int, what: str) -> List[str]:
         try:
-            if not user_roles:
-                logger.warning(f"🔄 Usuario no tiene roles, sin permisos por roles")
-                return []
-            
-            from database.models.user_roles import UserRole
-            from database.models.roles import Role
-            from database.models.role_permissions import RolePermission
-            from database.models.permissions import Permission
-            
-            # Query ORM para permisos por roles
-            stmt = select(Permission.permission_code).select_from(
-                UserRole.__table__
-                .join(Role.__table__, UserRole.role_id == Role.id)
-                .join(RolePermission.__table__, Role.id == RolePermission.role_id)
-                .join(Permission.__table__, RolePermission.permission_id == Permission.id)
-            ).where(
-                and_(
-                    UserRole.user_id == user_id,
-                    UserRole.deleted_at.is_(None),
-                    Role.is_active == True,
-                    Role.deleted_at.is_(None),
-                    RolePermission.deleted_at.is_(None),
-                    Permission.is_active == True,
-                    Permission.deleted_at.is_(None)
-                )
-            ).distinct()
-            
-            result = session.execute(stmt)
-            permissions = [row[0] for row in result.fetchall()]
-            
-            return permissions
-            
+            async with db_manager.get_async_session() as session:
+                result = await session.execute(stmt.distinct())
+                return [row[0] for row in result.all()]
         except Exception as e:
-            logger.error(f"Error obteniendo permisos por roles: {e}")
+            logger.error(f"Error getting {what} for {user_id}: {e}")
             return []
     
     # ===============================================
@@ -143,31 +185,15 @@ class PermissionsService:
     
     async def get_user_roles_only(self, user_id: int) -> List[str]:
         """Obtener solo los roles del usuario"""
-        try:
-            async with db_manager.get_session() as session:
-                return await self._get_user_roles(session, user_id)
-        except Exception as e:
-            logger.error(f"Error getting user roles for {user_id}: {e}")
-            return []
+        return await self._fetch_codes(self._user_roles_stmt(user_id), user_id, "user roles")
     
     async def get_user_direct_permissions_only(self, user_id: int) -> List[str]:
         """Obtener solo los permisos directos del usuario"""
-        try:
-            async with db_manager.get_session() as session:
-                return await self._get_user_direct_permissions(session, user_id)
-        except Exception as e:
-            logger.error(f"Error getting user direct permissions for {user_id}: {e}")
-            return []
+        return await self._fetch_codes(self._user_direct_permissions_stmt(user_id), user_id, "user direct permissions")
     
     async def get_permissions_from_roles_only(self, user_id: int) -> List[str]:
         """Obtener solo los permisos que vienen de roles"""
-        try:
-            async with db_manager.get_session() as session:
-                user_roles = await self._get_user_roles(session, user_id)
-                return await self._get_permissions_from_roles(session, user_id, user_roles)
-        except Exception as e:
-            logger.error(f"Error getting role permissions for {user_id}: {e}")
-            return []
+        return await self._fetch_codes(self._role_permissions_stmt(user_id), user_id, "role permissions")
     
     async def has_permission(self, user_id: int, permission_code: str) -> bool:
         """Verificar si un usuario tiene un permiso específico"""
@@ -0,0 +1,343 @@
+"""
+Cola persistida de reportes PDF generados en segundo plano.
+
+enqueue -> fila PENDING en report_jobs -> el runner la toma con FOR UPDATE SKIP LOCKED
+(seguro con varios procesos de la API) -> el builder registrado por routes/reports.py
+arma el HTML -> Gotenberg -> PDF en MinIO (bucket de reportes) -> task.v1.* y
+document.v1.ready al usuario que lo pidio.
+
+Un job RUNNING cuyo proceso murio se reintenta tras REPORT_JOBS_STALE_SECONDS, hasta
+REPORT_JOBS_MAX_ATTEMPTS intentos. Con Gotenberg caido el job vuelve a PENDING con
+next_attempt_at en backoff exponencial, para no gastar los intentos en segundos.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import Awaitable, Callable, Optional
+from uuid import uuid4
+
+from minio import Minio
+from sqlalchemy import text
+
+from core.config import settings
+from database.database import db_manager
+from services.event_publisher import publish_event
+from services.gotenberg_client import GotenbergUnavailable, html_to_pdf
+
+logger = logging.getLogger(__name__)
+
+# builder(params, chart_png) -> (html, file_name)
+ReportBuilder = Callable[[dict, Optional[bytes]], Awaitable[tuple[str, str]]]
+
+_BUILDERS: dict[str, ReportBuilder] = {}
+_tasks: list[asyncio.Task] = []
+_wakeup: asyncio.Event | None = None
+
+_JOB_COLUMNS = """
+    job_code, report_key, params, status, progress, attempts, requested_by_user_id,
+    chart_object_key, bucket_name, object_key, file_name, size_bytes, error_message,
+    started_at, completed_at, created_at, updated_at
+"""
+
+
+def register_report_builder(report_key: str, builder: ReportBuilder) -> None:
+    _BUILDERS[report_key] = builder
+
+
+def has_report_builder(report_key: str) -> bool:
+    return report_key in _BUILDERS
+
+
+class ReportArtifactStorage:
+    def __init__(self):
+        self.bucket = settings.MINIO_REPORTS_BUCKET
+        self.client = Minio(
+            f"{settings.MINIO_HOST}:{settings.MINIO_PORT}",
+            access_key=settings.MINIO_ROOT_USER,
+            secret_key=settings.MINIO_ROOT_PASSWORD,
+            secure=settings.MINIO_SECURE,
+            region=settings.MINIO_REGION,
+        )
+        self._bucket_checked = False
+
+    def ensure_bucket(self) -> None:
+        if self._bucket_checked:
+            return
+        if not self.client.bucket_exists(self.bucket):
+            self.client.make_bucket(self.bucket)
+        self._bucket_checked = True
+
+    def put_bytes(self, object_key: str, content: bytes, content_type: str) -> None:
+        self.ensure_bucket()
+        self.client.put_object(self.bucket, object_key, BytesIO(content), len(content), content_type=content_type)
+
+    def get_bytes(self, object_key: str) -> bytes:
+        response = self.client.get_object(self.bucket, object_key)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+
+report_storage = ReportArtifactStorage()
+
+
+def job_to_dict(row) -> dict:
+    data = dict(row)
+    params = data.get("params")
+    if isinstance(params, str):
+        try:
+            data["params"] = json.loads(params)
+        except json.JSONDecodeError:
+            data["params"] = {}
+    for key in ("started_at", "completed_at", "created_at", "updated_at"):
+        if isinstance(data.get(key), datetime):
+            data[key] = data[key].isoformat()
+    data.pop("chart_object_key", None)
+    data.pop("bucket_name", None)
+    data.pop("object_key", None)
+    data["download_url"] = _download_url(data["job_code"]) if data.get("status") == "COMPLETED" else None
+    return data
+
+
+def _download_url(job_code: str) -> str:
+    return f"/api/reports/jobs/{job_code}/download"
+
+
+async def enqueue_report_job(report_key: str, params: dict, user_id: int | None, chart_png: bytes | None = None) -> dict:
+    if not has_report_builder(report_key):
+        raise ValueError(f"Reporte no soportado: {report_key}")
+    job_code = str(uuid4())
+    chart_object_key = None
+    if chart_png:
+        chart_object_key = f"jobs/{job_code}/chart.png"
+        await asyncio.to_thread(report_storage.put_bytes, chart_object_key, chart_png, "image/png")
+
+    async with db_manager.get_async_session() as session:
+        await session.execute(
+            text("""
+                INSERT INTO report_jobs (job_code, report_key, params, requested_by_user_id, chart_object_key)
+                VALUES (:job_code, :report_key, :params, :user_id, :chart_object_key)
+            """),
+            {
+                "job_code": job_code,
+                "report_key": report_key,
+                "params": json.dumps(params),
+                "user_id": user_id,
+                "chart_object_key": chart_object_key,
+            },
+        )
+    if _wakeup is not None:
+        _wakeup.set()
+    return await get_report_job(job_code)
+
+
+async def get_report_job(job_code: str, *, raw: bool = False) -> dict | None:
+    async with db_manager.get_async_session() as session:
+        row = (await session.execute(
+            text(f"SELECT {_JOB_COLUMNS} FROM report_jobs WHERE job_code = :job_code"),
+            {"job_code": job_code},
+        )).mappings().first()
+    if not row:
+        return None
+    return dict(row) if raw else job_to_dict(row)
+
+
+async def list_report_jobs(user_id: int | None, limit: int = 20) -> list[dict]:
+    async with db_manager.get_async_session() as session:
+        rows = (await session.execute(
+            text(f"""
+                SELECT {_JOB_COLUMNS} FROM report_jobs
+                WHERE requested_by_user_id = :user_id
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """),
+            {"user_id": user_id, "limit": limit},
+        )).mappings().all()
+    return [job_to_dict(row) for row in rows]
+
+
+async def read_report_artifact(job: dict) -> bytes:
+    return await asyncio.to_thread(report_storage.get_bytes, job["object_key"])
+
+
+# ─── Runner ─────────────────────────────────────────────────────────────────
+
+def start_report_job_runner() -> None:
+    global _wakeup
+    if not settings.REPORT_JOBS_ENABLED:
+        logger.info("Runner de reportes en segundo plano deshabilitado")
+        return
+    if any(not task.done() for task in _tasks):
+        return
+    _wakeup = asyncio.Event()
+    _tasks.clear()
+    for _ in range(max(1, settings.REPORT_JOBS_CONCURRENCY)):
+        _tasks.append(asyncio.create_task(_runner_loop()))
+    logger.info("Runner de reportes iniciado (%s workers)", len(_tasks))
+
+
+async def stop_report_job_runner() -> None:
+    if not _tasks:
+        return
+    for task in _tasks:
+        task.cancel()
+    for task in _tasks:
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+    _tasks.clear()
+    logger.info("Runner de reportes detenido")
+
+
+async def _runner_loop() -> None:
+    poll_seconds = max(1, settings.REPORT_JOBS_POLL_SECONDS)
+    while True:
+        job = None
+        try:
+            job = await _claim_next_job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.warning("Error tomando job de reporte: %s", exc)
+        if job:
+            # Un fallo al registrar el estado no debe matar el runner; el job queda
+            # RUNNING y se retoma al vencer REPORT_JOBS_STALE_SECONDS.
+            try:
+                await _run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("Error ejecutando job de reporte %s: %s", job.get("job_code"), exc)
+            continue
+        _wakeup.clear()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(_wakeup.wait(), poll_seconds)
+
+
+async def _claim_next_job() -> dict | None:
+    params = {
+        "stale_seconds": settings.REPORT_JOBS_STALE_SECONDS,
+        "max_attempts": settings.REPORT_JOBS_MAX_ATTEMPTS,
+    }
+    async with db_manager.get_async_session() as session:
+        await session.execute(
+            text("""
+                UPDATE report_jobs
+                SET status = 'FAILED', error_message = 'Job abandonado tras agotar los reintentos',
+                    completed_at = CURRENT_TIMESTAMP
+                WHERE status = 'RUNNING'
+                  AND started_at < CURRENT_TIMESTAMP - INTERVAL :stale_seconds SECOND
+                  AND attempts >= :max_attempts
+            """),
+            params,
+        )
+        row = (await session.execute(
+            text("""
+                SELECT id, job_code, report_key, params, attempts, requested_by_user_id, chart_object_key
+                FROM report_jobs
+                WHERE attempts < :max_attempts
+                  AND ((status = 'PENDING'
+                        AND (next_attempt_at IS NULL OR next_attempt_at <= CURRENT_TIMESTAMP))
+                       OR (status = 'RUNNING' AND started_at < CURRENT_TIMESTAMP - INTERVAL :stale_seconds SECOND))
+                ORDER BY created_at, id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            """),
+            params,
+        )).mappings().first()
+        if not row:
+            return None
+        await session.execute(
+            text("""
+                UPDATE report_jobs
+                SET status = 'RUNNING', progress = 5, attempts = attempts + 1,
+                    started_at = CURRENT_TIMESTAMP, next_attempt_at = NULL, error_message = NULL
+                WHERE id = :id
+            """),
+            {"id": row["id"]},
+        )
+    job = dict(row)
+    job["attempts"] += 1
+    return job
+
+
+def _retry_delay_seconds(attempts: int) -> int:
+    base = max(1, settings.REPORT_JOBS_RETRY_BASE_SECONDS)
+    return min(base * 2 ** max(0, attempts - 1), max(base, settings.REPORT_JOBS_RETRY_MAX_SECONDS))
+
+
+async def _update_job(job_id: int, **fields) -> None:
+    assignments = ", ".join(f"{key} = :{key}" for key in fields)
+    async with db_manager.get_async_session() as session:
+        await session.execute(text(f"UPDATE report_jobs SET {assignments} WHERE id = :id"), {"id": job_id, **fields})
+
+
+async def _notify(job: dict, event_type: str, payload: dict, stage: str | None = None) -> None:
+    user_id = job.get("requested_by_user_id")
+    if not user_id:
+        return
+    await publish_event(
+        event_type,
+        user_ids=[user_id],
+        dedupe_key=f"report-job:{job['job_code']}:{stage}" if stage else None,
+        payload={"task_id": job["job_code"], "task_type": "report", "report_key": job["report_key"], **payload},
+    )
+
+
+async def _run_job(job: dict) -> None:
+    job_code = job["job_code"]
+    await _notify(job, "task.v1.started", {"progress": 5}, stage="started")
+    try:
+        builder = _BUILDERS.get(job["report_key"])
+        if builder is None:
+            raise ValueError(f"Reporte no soportado: {job['report_key']}")
+        params = json.loads(job["params"]) if isinstance(job["params"], str) else (job["params"] or {})
+        chart_png = None
+        if job.get("chart_object_key"):
+            chart_png = await asyncio.to_thread(report_storage.get_bytes, job["chart_object_key"])
+
+        html, file_name = await builder(params, chart_png)
+        await _update_job(job["id"], progress=50)
+        await _notify(job, "task.v1.progress", {"progress": 50}, stage="rendered")
+
+        pdf_bytes = await html_to_pdf(html)
+        period = datetime.now(timezone.utc).strftime("%Y/%m")
+        object_key = f"{job['report_key'].replace('.', '/')}/{period}/{job_code}.pdf"
+        await asyncio.to_thread(report_storage.put_bytes, object_key, pdf_bytes, "application/pdf")
+        await _update_job(
+            job["id"],
+            status="COMPLETED",
+            progress=100,
+            bucket_name=report_storage.bucket,
+            object_key=object_key,
+            file_name=file_name,
+            size_bytes=len(pdf_bytes),
+            completed_at=datetime.now(timezone.utc).replace(tzinfo=None),
+        )
+    except asyncio.CancelledError:
+        # Queda RUNNING; otro proceso lo retoma al vencer REPORT_JOBS_STALE_SECONDS.
+        raise
+    except Exception as exc:
+        retry = isinstance(exc, GotenbergUnavailable) and job["attempts"] < settings.REPORT_JOBS_MAX_ATTEMPTS
+        logger.error("Error generando reporte %s (%s): %s", job_code, job["report_key"], exc)
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        await _update_job(
+            job["id"],
+            status="PENDING" if retry else "FAILED",
+            error_message=str(exc)[:1000],
+            next_attempt_at=now + timedelta(seconds=_retry_delay_seconds(job["attempts"])) if retry else None,
+            completed_at=None if retry else now,
+        )
+        if not retry:
+            await _notify(job, "task.v1.failed", {"error": str(exc)[:300]})
+        return
+
+    result = {"file_name": file_name, "size_bytes": len(pdf_bytes), "download_url": _download_url(job_code)}
+    await _notify(job, "task.v1.completed", {"progress": 100, **result})
+    await _notify(job, "document.v1.ready", {"mime_type": "application/pdf", **result})
@@ -0,0 +1,323 @@
+"""
+Rollup diario de ventas (sale_daily_rollups).
+
+Cada venta cerrada o anulada aporta contadores a la fila
+(dia x sucursal x estado x tipo de documento x medio de pago). Los reportes de
+ventas diarias y el dashboard leen esta tabla en lugar de re-agregar
+sale_documents, por lo que su costo depende de los dias del rango y no de la
+cantidad de tickets.
+
+- document_count / total_amount se imputan al medio de pago principal del documento.
+- payment_count / payment_amount se reparten por medio de pago efectivo
+  (los pagos MIXED aportan una fila por cada componente).
+
+Reconstruccion manual:
+    python -m services.sales_rollup [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = "sale_daily_rollups"
+ROLLUP_STATUSES = ("CLOSED", "CANCELLED")
+
+_CHUNK_SIZE = 2000
+_REBUILD_LOCK_NAME = "gestioncom_sales_rollup_rebuild"
+
+_UPSERT_SQL = text(f"""
+    INSERT INTO {ROLLUP_TABLE} (
+      sale_date, warehouse_id, status, document_type_code, payment_method_code,
+      payment_method_name, document_count, total_amount, payment_count, payment_amount
+    ) VALUES (
+      :sale_date, :warehouse_id, :status, :document_type_code, :payment_method_code,
+      :payment_method_name, :document_count, :total_amount, :payment_count, :payment_amount
+    )
+    ON DUPLICATE KEY UPDATE
+      payment_method_name = COALESCE(VALUES(payment_method_name), payment_method_name),
+      document_count = document_count + VALUES(document_count),
+      total_amount = total_amount + VALUES(total_amount),
+      payment_count = payment_count + VALUES(payment_count),
+      payment_amount = payment_amount + VALUES(payment_amount)
+""")
+
+
+def _money(value) -> Decimal:
+    if value is None:
+        return Decimal("0.00")
+    try:
+        return Decimal(str(value))
+    except (ArithmeticError, ValueError):
+        return Decimal("0.00")
+
+
+def _payment_details(value):
+    if isinstance(value, (dict, list)):
+        return value
+    if isinstance(value, str) and value.strip():
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            return None
+    return None
+
+
+def _payment_amount(payment: dict) -> Decimal:
+    foreign = payment.get("foreign_currency") if isinstance(payment.get("foreign_currency"), dict) else {}
+    agreement = payment.get("agreement") if isinstance(payment.get("agreement"), dict) else {}
+    check = payment.get("check") if isinstance(payment.get("check"), dict) else {}
+    return _money(
+        payment.get("clp_amount")
+        or payment.get("amount")
+        or foreign.get("clp_amount")
+        or agreement.get("amount")
+        or check.get("amount")
+        or payment.get("received_amount")
+    )
+
+
+def _value(sale, key: str):
+    if isinstance(sale, dict):
+        return sale.get(key)
+    value = getattr(sale, key, None)
+    return getattr(value, "value", value)
+
+
+def rollup_entries(sale, sale_date: date) -> list[dict]:
+    """Contribuciones de una venta (ORM o fila mapeada) a sale_daily_rollups."""
+    status = str(_value(sale, "status") or "").upper()
+    if status not in ROLLUP_STATUSES:
+        return []
+
+    base = {
+        "sale_date": sale_date,
+        "warehouse_id": int(_value(sale, "warehouse_id") or 0),
+        "status": status,
+        "document_type_code": str(_value(sale, "document_type_code") or ""),
+    }
+    entries: dict[str, dict] = {}
+
+    def _entry(code, name) -> dict:
+        method_code = str(code or "").upper()[:20]
+        entry = entries.setdefault(method_code, {
+            **base,
+            "payment_method_code": method_code,
+            "payment_method_name": None,
+            "document_count": 0,
+            "total_amount": Decimal("0.00"),
+            "payment_count": 0,
+            "payment_amount": Decimal("0.00"),
+        })
+        entry["payment_method_name"] = name or entry["payment_method_name"]
+        return entry
+
+    primary = _entry(_value(sale, "payment_method_code"), _value(sale, "payment_method_name"))
+    primary["document_count"] = 1
+    primary["total_amount"] = _money(_value(sale, "total_amount"))
+
+    if status == "CLOSED":
+        paid: dict[str, dict] = {}
+
+        def _add(code, name, amount: Decimal) -> None:
+            if amount <= 0:
+                return
+            entry = _entry(code, name)
+            entry["payment_amount"] += amount
+            paid[entry["payment_method_code"]] = entry
+
+        details = _payment_details(_value(sale, "payment_details"))
+        if isinstance(details, dict) and str(details.get("type") or "").upper() == "MIXED":
+            for payment in details.get("payments") or []:
+                if isinstance(payment, dict):
+                    _add(payment.get("payment_method_code"), payment.get("payment_method_name"), _payment_amount(payment))
+        else:
+            received = _money(_value(sale, "amount_tendered") or _value(sale, "total_amount")) - _money(_value(sale, "change_amount"))
+            _add(_value(sale, "payment_method_code"), _value(sale, "payment_method_name"), received)
+        for entry in paid.values():
+            entry["payment_count"] = 1
+
+    return list(entries.values())
+
+
+async def apply_sale_to_rollup(session, sale, sale_date: date | None = None) -> None:
+    """Suma la venta al rollup dentro de la transaccion que la cierra."""
+    sale_date = sale_date or _value(sale, "business_date") or datetime.now(timezone.utc).date()
+    entries = rollup_entries(sale, sale_date)
+    if entries:
+        await session.execute(_UPSERT_SQL, entries)
+
+
+def _merge_entry(acc: dict, entry: dict) -> None:
+    key = (
+        entry["sale_date"], entry["warehouse_id"], entry["status"],
+        entry["document_type_code"], entry["payment_method_code"],
+    )
+    current = acc.get(key)
+    if current is None:
+        acc[key] = dict(entry)
+        return
+    current["payment_method_name"] = entry["payment_method_name"] or current["payment_method_name"]
+    for field in ("document_count", "total_amount", "payment_count", "payment_amount"):
+        current[field] += entry[field]
+
+
+async def rebuild_sales_rollup(session, date_from: date | None = None, date_to: date | None = None) -> dict:
+    """
+    Recalcula el rollup desde sale_documents para el rango indicado (o completo).
+    Recorre las ventas por id en bloques; la memoria queda acotada por dias x dimensiones.
+
+    Debe ser lo primero que ejecuta la transaccion: el DELETE va antes de leer, asi el
+    snapshot de lectura se toma despues de el. Una venta que se cierra en paralelo o ya
+    esta en ese snapshot, o su upsert espera el lock del DELETE y suma sobre lo
+    reconstruido tras el commit.
+    Quien la llama invalida el cache de reportes (invalidate_all) despues del commit.
+    """
+    delete_filters: list[str] = []
+    delete_params: dict = {}
+    if date_from:
+        delete_filters.append("sale_date >= :date_from")
+        delete_params["date_from"] = date_from
+    if date_to:
+        delete_filters.append("sale_date <= :date_to")
+        delete_params["date_to"] = date_to
+    where = f"WHERE {' AND '.join(delete_filters)}" if delete_filters else ""
+    await session.execute(text(f"DELETE FROM {ROLLUP_TABLE} {where}"), delete_params)
+
+    filters = [
+        "sd.deleted_at IS NULL",
+        "sd.status IN ('CLOSED', 'CANCELLED')",
+        "sd.business_date IS NOT NULL",
+        "sd.id > :last_id",
+    ]
+    params: dict = {"chunk_size": _CHUNK_SIZE}
+    if date_from:
+        filters.append("sd.business_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        filters.append("sd.business_date <= :date_to")
+        params["date_to"] = date_to
+
+    chunk_sql = text(f"""
+        SELECT
+          sd.id,
+          sd.business_date AS sale_date,
+          sd.status, sd.warehouse_id, sd.document_type_code,
+          sd.payment_method_code, sd.payment_method_name,
+          sd.amount_tendered, sd.change_amount, sd.payment_details, sd.total_amount
+        FROM sale_documents sd
+        WHERE {' AND '.join(filters)}
+        ORDER BY sd.id
+        LIMIT :chunk_size
+    """)
+
+    acc: dict[tuple, dict] = {}
+    last_id = 0
+    sales = 0
+    while True:
+        rows = (await session.execute(chunk_sql, {**params, "last_id": last_id})).mappings().all()
+        if not rows:
+            break
+        for row in rows:
+            for entry in rollup_entries(dict(row), row["sale_date"]):
+                _merge_entry(acc, entry)
+        sales += len(rows)
+        last_id = rows[-1]["id"]
+
+    entries = list(acc.values())
+    for start in range(0, len(entries), _CHUNK_SIZE):
+        await session.execute(_UPSERT_SQL, entries[start:start + _CHUNK_SIZE])
+
+    return {"sales": sales, "rollup_rows": len(entries)}
+
+
+@asynccontextmanager
+async def _rebuild_lock(timeout_seconds: int = 10):
+    """
+    GET_LOCK en una conexion propia: sigue tomado mientras la sesion que reconstruye
+    hace commit y se libera recien despues.
+    """
+    from database.database import db_manager
+
+    async with db_manager.async_engine.connect() as connection:
+        acquired = (await connection.execute(
+            text("SELECT GET_LOCK(:name, :timeout)"),
+            {"name": _REBUILD_LOCK_NAME, "timeout": timeout_seconds},
+        )).scalar_one_or_none() == 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": _REBUILD_LOCK_NAME})
+
+
+async def _needs_backfill(session) -> bool:
+    has_rollup = (await session.execute(text(f"SELECT 1 FROM {ROLLUP_TABLE} LIMIT 1"))).scalar_one_or_none()
+    if has_rollup:
+        return False
+    has_sales = (await session.execute(text(
+        "SELECT 1 FROM sale_documents WHERE deleted_at IS NULL AND status IN ('CLOSED', 'CANCELLED') LIMIT 1"
+    ))).scalar_one_or_none()
+    return bool(has_sales)
+
+
+async def ensure_sales_rollup_backfilled() -> dict | None:
+    """
+    Backfill inicial: solo corre si el rollup esta vacio y existen ventas cerradas.
+    Con varias instancias arrancando a la vez, solo la que toma el lock reconstruye;
+    el upsert es aditivo y dos backfills duplicarian los totales.
+    """
+    from database.database import db_manager
+
+    async with db_manager.get_async_session() as session:
+        if not await _needs_backfill(session):
+            return None
+
+    async with _rebuild_lock() as acquired:
+        if not acquired:
+            logger.info("Otra instancia esta reconstruyendo el rollup de ventas")
+            return None
+        # Otra instancia pudo completar el backfill mientras se esperaba el lock
+        async with db_manager.get_async_session() as session:
+            if not await _needs_backfill(session):
+                return None
+        async with db_manager.get_async_session() as session:
+            return await rebuild_sales_rollup(session)
+
+
+async def _main(date_from: date | None, date_to: date | None) -> None:
+    from database.database import db_manager
+
+    async with _rebuild_lock() as acquired:
+        if not acquired:
+            print("⚠️  Otro proceso esta reconstruyendo el rollup de ventas")
+            return
+        async with db_manager.get_async_session() as session:
+            result = await rebuild_sales_rollup(session, date_from, date_to)
+
+    # Tras el commit: descartar reportes cacheados con el rollup anterior
+    from cache.redis_client import close_redis, initialize_redis
+    from cache.services.report_cache import report_cache_service
+
+    if await initialize_redis():
+        await report_cache_service.invalidate_all()
+        await close_redis()
+    else:
+        print("⚠️  Redis no disponible: el cache de reportes expirara por TTL")
+    print(f"✅ Rollup de ventas reconstruido: {result}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruye sale_daily_rollups desde sale_documents")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+    asyncio.run(_main(args.date_from, args.date_to))
@@ -0,0 +1,212 @@
+"""
+volumes/backend-api/services/session_activity.py
+Ultima actividad de sesiones acumulada en memoria y escrita en lote
+
+- touch() solo actualiza un dict por (user_id, session_id): la request no escribe en BD.
+- Cada SESSION_ACTIVITY_FLUSH_SECONDS se vuelca todo con un UPDATE ... JOIN por lote.
+- Los campos None no pisan valores previos (misma semantica COALESCE que antes).
+- Un buffer por worker: /profile/sessions queda desfasado como maximo un intervalo.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from core.config import settings
+from utils.log_helper import setup_logger
+
+# Configurar logger
+logger = setup_logger(__name__)
+
+# Columnas que se actualizan con COALESCE(nuevo, actual)
+_CONTEXT_COLUMNS = (
+    "ip_address",
+    "user_agent",
+    "browser_name",
+    "browser_version",
+    "os_name",
+    "device_type",
+    "client_timezone",
+    "client_language",
+    "client_platform",
+    "client_vendor",
+    "hardware_concurrency",
+)
+
+# Filas por sentencia: acota el numero de parametros enlazados
+_FLUSH_CHUNK_SIZE = 200
+
+SessionKey = Tuple[int, str]
+
+
+def _build_flush_statement(size: int):
+    """UPDATE multi-fila: JOIN contra una tabla derivada con una fila por sesion"""
+    rows = []
+    for index in range(size):
+        columns = [
+            f":session_id_{index} AS session_id",
+            f":user_id_{index} AS user_id",
+            f"CAST(:last_seen_at_{index} AS DATETIME) AS last_seen_at",
+        ] + [f":{column}_{index} AS {column}" for column in _CONTEXT_COLUMNS]
+        rows.append("SELECT " + ", ".join(columns))
+
+    assignments = [
+        # Un logout posterior ya dejo last_seen_at = ahora: no retroceder
+        "h.last_seen_at = GREATEST(COALESCE(h.last_seen_at, t.last_seen_at), t.last_seen_at)"
+    ] + [f"h.{column} = COALESCE(t.{column}, h.{column})" for column in _CONTEXT_COLUMNS]
+
+    return text(
+        "UPDATE user_session_history h JOIN ("
+        + " UNION ALL ".join(rows)
+        + ") t ON h.user_id = t.user_id AND h.session_id = t.session_id SET "
+        + ", ".join(assignments)
+    )
+
+
+class SessionActivityBuffer:
+    """
+    Coalesce las marcas de actividad por sesion y las escribe en segundo plano
+    """
+
+    def __init__(self, flush_seconds: int, max_pending: int):
+        self.flush_seconds = max(1, flush_seconds)
+        self.max_pending = max(1, max_pending)
+        self._pending: Dict[SessionKey, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+        # Contadores expuestos en /system/status
+        self.touches = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.dropped = 0
+
+    def touch(self, user_id: int, session_id: str, **fields: Any) -> None:
+        key = (int(user_id), str(session_id))
+        entry = self._pending.get(key)
+        if entry is None:
+            if len(self._pending) >= self.max_pending:
+                # Sin volcado posible (BD caída o loop detenido) no crecer sin límite
+                self.dropped += 1
+                if self._wake is not None:
+                    self._wake.set()
+                return
+            entry = self._pending[key] = {}
+        entry.update({name: value for name, value in fields.items() if value is not None})
+        entry["last_seen_at"] = datetime.now(timezone.utc)
+        self.touches += 1
+
+        if len(self._pending) >= self.max_pending and self._wake is not None:
+            self._wake.set()
+
+    def discard(self, user_id: int, session_id: Optional[str]) -> None:
+        """El logout escribe su propio last_seen_at: la marca pendiente sobra"""
+        if session_id:
+            self._pending.pop((int(user_id), str(session_id)), None)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Ultimo volcado para no perder la actividad del intervalo en curso
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+
+        batch, self._pending = self._pending, {}
+        items = list(batch.items())
+        written = 0
+        for start in range(0, len(items), _FLUSH_CHUNK_SIZE):
+            chunk = items[start:start + _FLUSH_CHUNK_SIZE]
+            try:
+                await self._write_chunk(chunk)
+                written += len(chunk)
+            except asyncio.CancelledError:
+                self._requeue(items[start:])
+                raise
+            except Exception as e:
+                self.flush_errors += 1
+                logger.warning(f"No se pudo volcar actividad de {len(chunk)} sesiones: {e}")
+                self._requeue(chunk)
+
+        self.flushes += 1
+        self.flushed_rows += written
+        return written
+
+    def _requeue(self, items: List[Tuple[SessionKey, Dict[str, Any]]]) -> None:
+        """Devolver al buffer lo no escrito sin pisar marcas mas nuevas"""
+        for key, entry in items:
+            if key in self._pending:
+                self._pending[key] = {**entry, **self._pending[key]}
+            elif len(self._pending) < self.max_pending:
+                self._pending[key] = entry
+            else:
+                self.dropped += 1
+
+    async def _write_chunk(self, chunk: List[Tuple[SessionKey, Dict[str, Any]]]) -> None:
+        from database.database import db_manager
+
+        params: Dict[str, Any] = {}
+        for index, ((user_id, session_id), entry) in enumerate(chunk):
+            params[f"session_id_{index}"] = session_id
+            params[f"user_id_{index}"] = user_id
+            params[f"last_seen_at_{index}"] = entry["last_seen_at"]
+            for column in _CONTEXT_COLUMNS:
+                params[f"{column}_{index}"] = entry.get(column)
+
+        async with db_manager.get_async_session() as session:
+            await session.execute(_build_flush_statement(len(chunk)), params)
+            await session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "flush_seconds": self.flush_seconds,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "touches": self.touches,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "flush_errors": self.flush_errors,
+            "dropped": self.dropped,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+# ==========================================
+# INSTANCIA GLOBAL (POR WORKER)
+# ==========================================
+
+session_activity_buffer = SessionActivityBuffer(
+    settings.SESSION_ACTIVITY_FLUSH_SECONDS,
+    settings.SESSION_ACTIVITY_MAX_PENDING,
+)
+
+
+# ==========================================
+# FUNCIONES DE CONVENIENCIA
+# ==========================================
+
+def get_session_activity_stats() -> Dict[str, Any]:
+    return session_activity_buffer.stats()
@@ -0,0 +1,320 @@
+"""
+Libro de stock: aplica deltas sobre stock y stock_unit_balances de forma atomica.
+
+Cada fila se ubica por dimension_key, columna generada PERSISTENT con indice UNIQUE
+(ver 20261016_0930_stock_dimension_keys.sql). La lectura se hace con SELECT ... FOR UPDATE
+sobre ese indice, por lo que dos cajas vendiendo el mismo SKU se serializan en la fila
+en lugar de pisarse el saldo.
+
+Antes de bloquear, la fila se asegura con un INSERT ... ON DUPLICATE KEY UPDATE en cero:
+un SELECT ... FOR UPDATE sobre una clave inexistente toma un gap lock en REPEATABLE READ,
+y dos transacciones que crean la misma dimension nueva se bloquean mutuamente en el
+INSERT siguiente (deadlock). Con la fila ya creada, ambas esperan en el mismo lock de fila.
+
+Todas las funciones trabajan dentro de la transaccion del llamador: un ValueError
+(InsufficientStockError) no escribe nada y el llamador hace rollback como hasta ahora.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import bindparam, text
+
+# Marca para NULL en dimension_key; debe coincidir con la expresion de la columna generada.
+NULL_TOKEN = "~"
+
+# VALUES solo con parametros: si lleva literales, aiomysql no reconoce el INSERT
+# (RE_INSERT_VALUES) y el executemany se envia fila por fila. reserved_quantity usa
+# su DEFAULT 0 y last_movement_date viaja como parametro.
+_STOCK_INSERT_SQL = text(
+    "INSERT INTO stock (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
+    "batch_lot_number, expiry_date, serial_number, current_quantity, last_movement_date, last_movement_type) "
+    "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :batch_lot_number, :expiry_date, :serial_number, "
+    ":quantity, :movement_date, :movement_type) "
+    "ON DUPLICATE KEY UPDATE current_quantity = current_quantity + VALUES(current_quantity), "
+    "last_movement_date = VALUES(last_movement_date), last_movement_type = VALUES(last_movement_type)"
+)
+
+# Crea la fila en cero si no existe; si existe solo la bloquea (id = id no modifica nada)
+_STOCK_ENSURE_SQL = text(
+    "INSERT INTO stock (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
+    "batch_lot_number, expiry_date, serial_number, current_quantity) "
+    "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :batch_lot_number, :expiry_date, :serial_number, 0) "
+    "ON DUPLICATE KEY UPDATE id = id"
+)
+
+_UNIT_BALANCE_ENSURE_SQL = text(
+    "INSERT INTO stock_unit_balances (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
+    "measurement_unit_id, batch_lot_number, expiry_date, serial_number, current_quantity) "
+    "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :measurement_unit_id, "
+    ":batch_lot_number, :expiry_date, :serial_number, 0) "
+    "ON DUPLICATE KEY UPDATE id = id"
+)
+
+_UNIT_BALANCE_INSERT_SQL = text(
+    "INSERT INTO stock_unit_balances (product_variant_id, warehouse_id, warehouse_zone_id, warehouse_zone_location_id, "
+    "measurement_unit_id, batch_lot_number, expiry_date, serial_number, current_quantity) "
+    "VALUES (:product_variant_id, :warehouse_id, :zone_id, :location_id, :measurement_unit_id, "
+    ":batch_lot_number, :expiry_date, :serial_number, :quantity) "
+    "ON DUPLICATE KEY UPDATE current_quantity = current_quantity + VALUES(current_quantity)"
+)
+
+
+class InsufficientStockError(ValueError):
+    def __init__(self, available: Decimal, required: Decimal):
+        self.available = available
+        self.required = required
+        super().__init__(f"Stock insuficiente. Disponible: {available}, requerido: {required}")
+
+
+def _key_part(value) -> str:
+    if value is None:
+        return NULL_TOKEN
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def stock_dimension_key(
+    product_variant_id: int,
+    warehouse_id: int,
+    zone_id: int | None = None,
+    location_id: int | None = None,
+    batch_lot_number: str | None = None,
+    expiry_date: date | None = None,
+    serial_number: str | None = None,
+) -> str:
+    parts = (product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number)
+    return "|".join(_key_part(part) for part in parts)
+
+
+def unit_balance_dimension_key(
+    product_variant_id: int,
+    warehouse_id: int,
+    zone_id: int | None,
+    location_id: int | None,
+    measurement_unit_id: int,
+    batch_lot_number: str | None = None,
+    expiry_date: date | None = None,
+    serial_number: str | None = None,
+) -> str:
+    parts = (product_variant_id, warehouse_id, zone_id, location_id, measurement_unit_id, batch_lot_number, expiry_date, serial_number)
+    return "|".join(_key_part(part) for part in parts)
+
+
+async def lock_stock_row(session, dimension_key: str) -> dict | None:
+    result = await session.execute(
+        text("SELECT * FROM stock WHERE dimension_key = :dimension_key FOR UPDATE"),
+        {"dimension_key": dimension_key},
+    )
+    row = result.mappings().first()
+    return dict(row) if row else None
+
+
+async def lock_stock_rows_for_variant(session, product_variant_id: int, warehouse_id: int) -> list[dict]:
+    """Filas con saldo de la variante en la bodega, bloqueadas, en orden FEFO."""
+    result = await session.execute(
+        text(
+            "SELECT * FROM stock WHERE product_variant_id = :product_variant_id AND warehouse_id = :warehouse_id "
+            "AND current_quantity > 0 "
+            "ORDER BY CASE WHEN expiry_date IS NULL THEN 1 ELSE 0 END, expiry_date, id "
+            "FOR UPDATE"
+        ),
+        {"product_variant_id": product_variant_id, "warehouse_id": warehouse_id},
+    )
+    return [dict(row) for row in result.mappings().all()]
+
+
+async def lock_stock_rows_for_variants(
+    session,
+    product_variant_ids,
+    warehouse_id: int,
+    *,
+    dimension_keys=(),
+) -> dict[int, list[dict]]:
+    """
+    Como lock_stock_rows_for_variant, para varias variantes en una sola consulta.
+    dimension_keys agrega filas de esas dimensiones aunque esten en cero.
+    """
+    variant_ids = sorted({int(variant_id) for variant_id in product_variant_ids})
+    rows_by_variant: dict[int, list[dict]] = {variant_id: [] for variant_id in variant_ids}
+    if not variant_ids:
+        return rows_by_variant
+    result = await session.execute(
+        text(
+            "SELECT * FROM stock WHERE warehouse_id = :warehouse_id AND product_variant_id IN :product_variant_ids "
+            "AND (current_quantity > 0 OR dimension_key IN :dimension_keys) "
+            "ORDER BY product_variant_id, CASE WHEN expiry_date IS NULL THEN 1 ELSE 0 END, expiry_date, id "
+            "FOR UPDATE"
+        ).bindparams(bindparam("product_variant_ids", expanding=True), bindparam("dimension_keys", expanding=True)),
+        {
+            "warehouse_id": warehouse_id,
+            "product_variant_ids": variant_ids,
+            # IN () no es SQL valido; "" nunca coincide con una dimension_key.
+            "dimension_keys": sorted(set(dimension_keys)) or [""],
+        },
+    )
+    for row in result.mappings().all():
+        rows_by_variant[int(row["product_variant_id"])].append(dict(row))
+    return rows_by_variant
+
+
+async def write_stock_quantities(session, quantities: dict[int, tuple[Decimal, str]]) -> None:
+    """Fija current_quantity y last_movement_type de varias filas ya bloqueadas en un solo UPDATE."""
+    if not quantities:
+        return
+    params: dict = {}
+    quantity_cases: list[str] = []
+    type_cases: list[str] = []
+    for index, (stock_id, (quantity, movement_type)) in enumerate(quantities.items()):
+        quantity_cases.append(f"WHEN :id_{index} THEN :quantity_{index}")
+        type_cases.append(f"WHEN :id_{index} THEN :movement_type_{index}")
+        params.update({f"id_{index}": stock_id, f"quantity_{index}": quantity, f"movement_type_{index}": movement_type})
+    id_list = ", ".join(f":id_{index}" for index in range(len(quantities)))
+    await session.execute(
+        text(
+            f"UPDATE stock SET current_quantity = CASE id {' '.join(quantity_cases)} END, "
+            f"last_movement_type = CASE id {' '.join(type_cases)} END, "
+            f"last_movement_date = CURRENT_TIMESTAMP WHERE id IN ({id_list})"
+        ),
+        params,
+    )
+
+
+async def add_stock_deltas(session, deltas: list[dict]) -> None:
+    """
+    Suma deltas creando la fila si no existe. Cada item lleva product_variant_id,
+    warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number,
+    quantity y movement_type. El driver agrupa el executemany en un INSERT multi-fila.
+    """
+    if deltas:
+        # UTC naive, igual que CURRENT_TIMESTAMP con time_zone = '+00:00'
+        movement_date = datetime.now(timezone.utc).replace(tzinfo=None)
+        await session.execute(_STOCK_INSERT_SQL, [{**delta, "movement_date": movement_date} for delta in deltas])
+
+
+async def add_unit_balance_deltas(session, deltas: list[dict]) -> None:
+    """Igual que add_stock_deltas para stock_unit_balances (item con measurement_unit_id, sin movement_type)."""
+    if deltas:
+        await session.execute(_UNIT_BALANCE_INSERT_SQL, deltas)
+
+
+def _stock_params(product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number) -> dict:
+    return {
+        "product_variant_id": product_variant_id,
+        "warehouse_id": warehouse_id,
+        "zone_id": zone_id,
+        "location_id": location_id,
+        "batch_lot_number": batch_lot_number,
+        "expiry_date": expiry_date,
+        "serial_number": serial_number,
+    }
+
+
+async def _ensure_and_lock_stock_row(session, params: dict) -> dict:
+    await session.execute(_STOCK_ENSURE_SQL, params)
+    return await lock_stock_row(session, stock_dimension_key(**params))
+
+
+async def apply_stock_delta(
+    session,
+    *,
+    product_variant_id: int,
+    warehouse_id: int,
+    zone_id: int | None = None,
+    location_id: int | None = None,
+    batch_lot_number: str | None = None,
+    expiry_date: date | None = None,
+    serial_number: str | None = None,
+    delta: Decimal,
+    movement_type: str,
+    allow_negative: bool = False,
+) -> tuple[Decimal, Decimal]:
+    """Suma delta al saldo de la dimension y devuelve (antes, despues)."""
+    delta = Decimal(str(delta))
+    params = _stock_params(product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number)
+    stock = await _ensure_and_lock_stock_row(session, params)
+    before = Decimal(str(stock["current_quantity"]))
+    after = before + delta
+    if after < 0 and not allow_negative:
+        # La fila en cero que se haya creado se descarta con el rollback del llamador
+        raise InsufficientStockError(before, abs(delta))
+
+    await session.execute(
+        text(
+            "UPDATE stock SET current_quantity = :quantity_after, last_movement_date = CURRENT_TIMESTAMP, "
+            "last_movement_type = :movement_type WHERE id = :id"
+        ),
+        {"quantity_after": after, "movement_type": movement_type, "id": stock["id"]},
+    )
+    return before, after
+
+
+async def set_stock_quantity(
+    session,
+    *,
+    product_variant_id: int,
+    warehouse_id: int,
+    zone_id: int | None = None,
+    location_id: int | None = None,
+    batch_lot_number: str | None = None,
+    expiry_date: date | None = None,
+    serial_number: str | None = None,
+    quantity: Decimal,
+    movement_type: str,
+) -> tuple[Decimal, Decimal]:
+    """Fija el saldo (p. ej. inventario fisico) con la fila bloqueada; devuelve (antes, despues)."""
+    params = _stock_params(product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number)
+    stock = await _ensure_and_lock_stock_row(session, params)
+    before = Decimal(str(stock["current_quantity"]))
+    after = Decimal(str(quantity))
+    await session.execute(
+        text(
+            "UPDATE stock SET current_quantity = :quantity_after, last_movement_date = CURRENT_TIMESTAMP, "
+            "last_movement_type = :movement_type WHERE id = :id"
+        ),
+        {"quantity_after": after, "movement_type": movement_type, "id": stock["id"]},
+    )
+    return before, after
+
+
+async def apply_unit_balance_delta(
+    session,
+    *,
+    product_variant_id: int,
+    warehouse_id: int,
+    zone_id: int | None = None,
+    location_id: int | None = None,
+    measurement_unit_id: int,
+    batch_lot_number: str | None = None,
+    expiry_date: date | None = None,
+    serial_number: str | None = None,
+    delta: Decimal,
+    allow_negative: bool = True,
+) -> tuple[Decimal, Decimal]:
+    """Suma delta al saldo por unidad de medida y devuelve (antes, despues)."""
+    delta = Decimal(str(delta))
+    params = {
+        **_stock_params(product_variant_id, warehouse_id, zone_id, location_id, batch_lot_number, expiry_date, serial_number),
+        "measurement_unit_id": measurement_unit_id,
+    }
+    await session.execute(_UNIT_BALANCE_ENSURE_SQL, params)
+    dimension_key = unit_balance_dimension_key(
+        product_variant_id, warehouse_id, zone_id, location_id, measurement_unit_id, batch_lot_number, expiry_date, serial_number
+    )
+    result = await session.execute(
+        text("SELECT id, current_quantity FROM stock_unit_balances WHERE dimension_key = :dimension_key FOR UPDATE"),
+        {"dimension_key": dimension_key},
+    )
+    balance = result.mappings().one()
+    before = Decimal(str(balance["current_quantity"]))
+    after = before + delta
+    if after < 0 and not allow_negative:
+        raise InsufficientStockError(before, abs(delta))
+
+    await session.execute(
+        text("UPDATE stock_unit_balances SET current_quantity = :quantity_after WHERE id = :id"),
+        {"quantity_after": after, "id": balance["id"]},
+    )
+    return before, after
@@ -14,6 +14,7 @@ from fastapi.responses import JSONResponse
 from core.response import ResponseManager
 from core.config import settings
 from core.constants import ErrorCode, HTTPStatus
+from core.exceptions import ServiceUnavailableException
 
 # Imports para typing - evita problemas de import circular
 if TYPE_CHECKING:
@@ -381,6 +382,16 @@ class AuthHelper:
                         "permissions": permissions
                     }
                     
+            except ServiceUnavailableException as e:
+                # Pool de bcrypt saturado: 503 con Retry-After, no "credenciales inválidas"
+                logger.warning(f"Verificación de contraseña rechazada por saturación para usuario {username}")
+                response = ResponseManager.service_unavailable(
+                    message=e.message,
+                    details=e.details,
+                    request=request
+                )
+                response.headers["Retry-After"] = str(e.extra_data.get("retry_after", 1))
+                return response
             except Exception as e:
                 logger.error(f"Error crítico en autenticación de BD para usuario {username}: {str(e)}")
                 logger.error(f"Tipo de error: {type(e).__name__}")
@@ -392,17 +403,19 @@ class AuthHelper:
                 )
   
     async def _verify_password(self, password: str, password_hash: str) -> bool:
-        """Verificar contraseña usando el método disponible"""
+        """Verificar contraseña usando el método disponible (bcrypt en el pool de procesos)"""
         try:
             if self.modules['password_manager']:
-                from core.password_manager import verify_user_password
-                return verify_user_password(password, password_hash)
+                from core.password_manager import verify_user_password_async
+                return await verify_user_password_async(password, password_hash)
             else:
-                import bcrypt
-                return bcrypt.checkpw(
+                from core.password_pool import check_password_bytes
+                return await check_password_bytes(
                     password.encode('utf-8'),
                     password_hash.encode('utf-8')
                 )
+        except ServiceUnavailableException:
+            raise
         except Exception as e:
             logger.error(f"Error en verificación de contraseña: {e}")
             return False
@@ -639,47 +652,23 @@ class AuthHelper:
             logger.warning(f"No se pudo registrar historial de login: {e}")
 
     async def touch_session_history(self, user_id: int, session_id: str | None, client_ip: str, user_agent: str, request: Request | None = None):
-        """Actualizar ultima actividad de una sesion conocida."""
+        """Registrar ultima actividad de una sesion conocida (se escribe en lote, fuera de la request)."""
         try:
             if not self.modules['database'] or not user_id or not session_id:
                 return
 
-            from database.database import db_manager
-            from sqlalchemy import text
+            from services.session_activity import session_activity_buffer
 
             parsed_agent = parse_user_agent(user_agent)
             context = get_client_context(request) if request else {}
-            params = {
-                "session_id": str(session_id),
-                "user_id": int(user_id),
-                "ip_address": (client_ip or "")[:45],
-                "user_agent": (user_agent or "")[:1000],
+            session_activity_buffer.touch(
+                int(user_id),
+                str(session_id),
+                ip_address=(client_ip or "")[:45],
+                user_agent=(user_agent or "")[:1000],
                 **parsed_agent,
                 **context,
-            }
-            async with db_manager.get_async_session() as session:
-                await session.execute(
-                    text(
-                        """
-                        UPDATE user_session_history
-                        SET last_seen_at = CURRENT_TIMESTAMP,
-                            ip_address = COALESCE(:ip_address, ip_address),
-                            user_agent = COALESCE(:user_agent, user_agent),
-                            browser_name = COALESCE(:browser_name, browser_name),
-                            browser_version = COALESCE(:browser_version, browser_version),
-                            os_name = COALESCE(:os_name, os_name),
-                            device_type = COALESCE(:device_type, device_type),
-                            client_timezone = COALESCE(:client_timezone, client_timezone),
-                            client_language = COALESCE(:client_language, client_language),
-                            client_platform = COALESCE(:client_platform, client_platform),
-                            client_vendor = COALESCE(:client_vendor, client_vendor),
-                            hardware_concurrency = COALESCE(:hardware_concurrency, hardware_concurrency)
-                        WHERE user_id = :user_id AND session_id = :session_id
-                        """
-                    ),
-                    params,
-                )
-                await session.commit()
+            )
         except Exception as e:
             logger.warning(f"No se pudo actualizar historial de sesion: {e}")
 
@@ -692,6 +681,9 @@ class AuthHelper:
             from database.database import db_manager
             from sqlalchemy import text
 
+            from services.session_activity import session_activity_buffer
+            session_activity_buffer.discard(user_id, session_id)
+
             params = {
                 "user_id": int(user_id),
                 "session_id": str(session_id) if session_id else None,
@@ -3,10 +3,14 @@ volumes/backend-api/utils/permissions_utils.py
 Utilidades centralizadas para manejo de permisos y autenticación
 """
 import json
+from contextvars import ContextVar
+from typing import Iterable, Optional, Tuple
+
 from fastapi import Request, HTTPException
 from utils.log_helper import setup_logger
 from utils.auth_helpers import AuthHelper, extract_bearer_token, get_client_ip
 from core.response import ResponseManager
+from middleware.auth_middleware import AuthContext, get_auth_context
 from core.constants import ErrorCode, ErrorType, HTTPStatus
 
 logger = setup_logger(__name__)
@@ -14,6 +18,9 @@ logger = setup_logger(__name__)
 # Inicializar helper de autenticación
 auth_helper = AuthHelper()
 
+# (lista de permisos del payload, frozenset en mayúsculas) de la request en curso
+_permission_set_cache: ContextVar[Optional[Tuple[list, frozenset]]] = ContextVar("permission_set_cache", default=None)
+
 
 async def get_current_user(request: Request) -> dict:
     """
@@ -29,6 +36,12 @@ async def get_current_user(request: Request) -> dict:
         HTTPException: 401 si no hay token o es inválido
     """
     token = extract_bearer_token(request)
+
+    # El middleware ya verificó este token: se reutiliza su principal
+    auth_context = get_auth_context(request)
+    if auth_context is not None and token and auth_context.token == token:
+        return auth_context.payload
+
     if not token:
         logger.warning(f"Acceso sin token - {request.method} {request.url.path} - IP: {get_client_ip(request)}")
         
@@ -59,6 +72,8 @@ async def get_current_user(request: Request) -> dict:
         response_body = json.loads(error_response.body.decode('utf-8'))
         raise HTTPException(status_code=HTTPStatus.UNAUTHORIZED, detail=response_body)
     
+    # Rutas fuera del middleware: se valida una vez y el resto de dependencias lo reutiliza
+    request.state.auth = AuthContext(token=token, payload=validation_result["payload"])
     return validation_result["payload"]
 
 
@@ -149,7 +164,7 @@ async def require_permission(module: str, actions, request: Request) -> dict:
     user_roles = [str(role).upper() for role in user_payload.get("roles", [])]
     username = user_payload.get("username", "unknown")
     user_id = user_payload.get("user_id", "unknown")
-    user_permissions = [str(permission).upper() for permission in user_payload.get("permissions", [])]
+    user_permissions = user_permission_set(user_payload)
     
     # Crear lista de permisos válidos para este módulo y acciones
     valid_permissions = []
@@ -194,6 +209,33 @@ async def require_permission(module: str, actions, request: Request) -> dict:
     return user_payload
 
 
+# ==========================================
+# VERIFICACIÓN DE PERMISOS EN MEMORIA
+# ==========================================
+
+def user_permission_set(user_payload: dict) -> frozenset:
+    """
+    Permisos del usuario normalizados a mayúsculas en un frozenset.
+    Se construye una vez por request: las comprobaciones siguientes son O(1).
+    """
+    permissions = user_payload.get("permissions") or []
+    cached = _permission_set_cache.get()
+    if cached is not None and cached[0] is permissions:
+        return cached[1]
+    
+    permission_set = frozenset(str(permission).upper() for permission in permissions)
+    _permission_set_cache.set((permissions, permission_set))
+    return permission_set
+
+
+def has_any_permission(user_payload: dict, permissions: Iterable[str]) -> bool:
+    """
+    Verificar si el usuario tiene al menos uno de los permisos indicados
+    """
+    permission_set = user_permission_set(user_payload)
+    return any(permission.upper() in permission_set for permission in permissions)
+
+
 # ==========================================
 # FUNCIÓN ADICIONAL: VERIFICAR SI ES ADMIN
 # ==========================================
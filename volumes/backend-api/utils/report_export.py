@@ -0,0 +1,219 @@
+"""
+Exportacion en streaming de filas de reportes a CSV, XLSX o NDJSON.
+
+Las filas se consumen de a una (iterable o async iterable) y se escriben en bloques,
+por lo que la memoria no depende de la cantidad de filas. El XLSX se arma con
+zipfile sobre un destino no seekable (descriptores de datos) y celdas inlineStr,
+sin sharedStrings ni dependencias externas.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import AsyncIterable, AsyncIterator, Iterable, Optional, Union
+from xml.sax.saxutils import escape
+
+from fastapi.responses import StreamingResponse
+
+EXPORT_FORMATS = ("csv", "xlsx", "ndjson")
+
+_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ndjson": "application/x-ndjson",
+}
+_FLUSH_BYTES = 64 * 1024
+_XML_ILLEGAL = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+Rows = Union[Iterable[dict], AsyncIterable[dict]]
+
+
+def is_export_format(fmt: str | None) -> bool:
+    return str(fmt or "").lower() in EXPORT_FORMATS
+
+
+def _cell_text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+async def _aiter(rows: Rows, first: Optional[dict] = None) -> AsyncIterator[dict]:
+    if first is not None:
+        yield first
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+async def _csv_chunks(rows: AsyncIterator[dict], columns: list[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel detecte UTF-8 al abrir el CSV directamente.
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    async for row in rows:
+        writer.writerow([_cell_text(row.get(column)) for column in columns])
+        if buffer.tell() >= _FLUSH_BYTES:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+async def _ndjson_chunks(rows: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    parts: list[str] = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(row, ensure_ascii=False, default=_json_default) + "\n"
+        parts.append(line)
+        size += len(line)
+        if size >= _FLUSH_BYTES:
+            yield "".join(parts).encode("utf-8")
+            parts.clear()
+            size = 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino no seekable para zipfile: acumula lo escrito hasta que se drena."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.pending = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        self.pending += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.pending = 0
+        return data
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Reporte" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, bool) or value is None:
+        text_value = "" if value is None else ("SI" if value else "NO")
+    elif isinstance(value, (int, float, Decimal)):
+        return f"<c><v>{value}</v></c>"
+    else:
+        text_value = _cell_text(value)
+    text_value = _XML_ILLEGAL.sub("", text_value)
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text_value)}</t></is></c>'
+
+
+def _xlsx_row(values: Iterable) -> bytes:
+    return ("<row>" + "".join(_xlsx_cell(value) for value in values) + "</row>").encode("utf-8")
+
+
+async def _xlsx_chunks(rows: AsyncIterator[dict], columns: list[str]) -> AsyncIterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(columns))
+            async for row in rows:
+                sheet.write(_xlsx_row(row.get(column) for column in columns))
+                if sink.pending >= _FLUSH_BYTES:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
+
+
+async def _export_chunks(fmt: str, rows: Rows, columns: Optional[list[str]]) -> AsyncIterator[bytes]:
+    iterator = _aiter(rows)
+    if columns is None and fmt != "ndjson":
+        # Sin columnas explicitas se toman de la primera fila, que luego se reinyecta.
+        first = await anext(iterator, None)
+        columns = list(first.keys()) if first else []
+        iterator = _aiter(iterator, first)
+    if fmt == "csv":
+        chunks = _csv_chunks(iterator, columns)
+    elif fmt == "xlsx":
+        chunks = _xlsx_chunks(iterator, columns)
+    else:
+        chunks = _ndjson_chunks(iterator)
+    async for chunk in chunks:
+        yield chunk
+
+
+def export_response(rows: Rows, fmt: str, filename: str, columns: Optional[list[str]] = None) -> StreamingResponse:
+    """StreamingResponse con las filas en el formato pedido (csv | xlsx | ndjson)."""
+    fmt = fmt.lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportacion no soportado: {fmt}")
+    return StreamingResponse(
+        _export_chunks(fmt, rows, columns),
+        media_type=_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,120 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+
+class BackendAuthClient:
+    """
+    Validacion de credenciales SSE contra el backend con:
+
+    - un cliente HTTP de larga vida (keep-alive) en lugar de uno por conexion,
+    - cache corta de resultados validos por hash de la credencial,
+    - single-flight: validaciones concurrentes de la misma credencial comparten
+      una sola llamada (una ola de reconexiones tras un deploy no se multiplica).
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        cache_ttl_seconds: int,
+        cache_max_entries: int,
+        max_connections: int,
+        timeout_seconds: float = 10.0,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.cache_max_entries = max(1, cache_max_entries)
+        self.max_connections = max_connections
+        self.timeout_seconds = timeout_seconds
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def start(self) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def validate(self, path: str, credential: str) -> Dict[str, Any]:
+        """Payload `data` de la respuesta del backend (valido o no)"""
+        key = hashlib.sha256(f"{path}:{credential}".encode("utf-8")).hexdigest()
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            del self._cache[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            self.misses += 1
+            inflight = asyncio.ensure_future(self._fetch(path, credential, key))
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+
+        # shield: si una conexion se cancela, la llamada sigue para las demas
+        return await asyncio.shield(inflight)
+
+    def _finish(self, key: str, done: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        # Marcar la excepcion como recuperada aunque todas las conexiones se hayan ido
+        if not done.cancelled():
+            done.exception()
+
+    async def _fetch(self, path: str, credential: str, key: str) -> Dict[str, Any]:
+        self.start()
+        result = await self._client.post(path, json={"token": credential})
+        result.raise_for_status()
+        payload = result.json().get("data") or {}
+
+        if payload.get("valid"):
+            self._store(key, payload)
+        return payload
+
+    def _store(self, key: str, payload: Dict[str, Any]) -> None:
+        ttl_seconds = float(self.cache_ttl_seconds)
+        expires_at = payload.get("expires_at")
+        if isinstance(expires_at, (int, float)):
+            # Nunca mas alla del vencimiento de la propia credencial
+            ttl_seconds = min(ttl_seconds, expires_at - time.time())
+        if ttl_seconds <= 0:
+            return
+
+        self._cache[key] = (time.monotonic() + ttl_seconds, payload)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_max_entries:
+            self._cache.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cache_size": len(self._cache),
+            "cache_ttl_seconds": self.cache_ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
@@ -28,17 +28,30 @@ class Settings:
 
     ENVIRONMENT = os.getenv("ENVIRONMENT", os.getenv("ENV", "development")).lower()
     BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://backend-api:8000")
+    # Validacion de tickets/tokens: cache corta por hash y conexiones HTTP reutilizadas
+    AUTH_CACHE_TTL_SECONDS = int(os.getenv("EVENTS_AUTH_CACHE_TTL_SECONDS", "15"))
+    AUTH_CACHE_MAX_ENTRIES = int(os.getenv("EVENTS_AUTH_CACHE_MAX_ENTRIES", "10000"))
+    AUTH_HTTP_MAX_CONNECTIONS = int(os.getenv("EVENTS_AUTH_HTTP_MAX_CONNECTIONS", "20"))
     STREAM_NAME = os.getenv("EVENTS_STREAM_NAME", "gestioncom:events:v1")
     STREAM_PREFIX = os.getenv("EVENTS_STREAM_PREFIX", "gestioncom:events:v1")
     STREAM_MAXLEN = int(os.getenv("EVENTS_STREAM_MAXLEN", "1000"))
     STREAM_IDLE_TTL_SECONDS = int(os.getenv("EVENTS_STREAM_IDLE_TTL_SECONDS", "300"))
     MAX_TARGETS_PER_EVENT = int(os.getenv("EVENTS_MAX_TARGETS_PER_EVENT", "1000"))
+    MAX_EVENTS_PER_BATCH = int(os.getenv("EVENTS_MAX_EVENTS_PER_BATCH", "500"))
     MAX_STREAMS_PER_CONNECTION = int(os.getenv("EVENTS_MAX_STREAMS_PER_CONNECTION", "16"))
     MAX_CONNECTIONS_PER_USER = int(os.getenv("EVENTS_MAX_CONNECTIONS_PER_USER", "3"))
     CONNECTION_TTL_SECONDS = int(os.getenv("EVENTS_CONNECTION_TTL_SECONDS", "90"))
     MAX_PAYLOAD_BYTES = int(os.getenv("EVENTS_MAX_PAYLOAD_BYTES", "16384"))
     READ_BLOCK_MS = int(os.getenv("EVENTS_READ_BLOCK_MS", "25000"))
     HEARTBEAT_SECONDS = int(os.getenv("EVENTS_HEARTBEAT_SECONDS", "20"))
+    # Hub por proceso: un XREAD compartido; los streams nuevos se leen a mas tardar en HUB_READ_BLOCK_MS
+    HUB_READ_BLOCK_MS = int(os.getenv("EVENTS_HUB_READ_BLOCK_MS", "2000"))
+    HUB_READ_COUNT = int(os.getenv("EVENTS_HUB_READ_COUNT", "200"))
+    CLIENT_BUFFER_SIZE = int(os.getenv("EVENTS_CLIENT_BUFFER_SIZE", "100"))
+    SLOW_CONSUMER_POLICY = os.getenv("EVENTS_SLOW_CONSUMER_POLICY", "disconnect").lower()
+    # Reanudacion con Last-Event-ID: como maximo N eventos por stream y no mas antiguos que la ventana
+    REPLAY_MAX_EVENTS_PER_STREAM = int(os.getenv("EVENTS_REPLAY_MAX_EVENTS_PER_STREAM", "100"))
+    REPLAY_WINDOW_SECONDS = int(os.getenv("EVENTS_REPLAY_WINDOW_SECONDS", "300"))
     DEFAULT_TTL_SECONDS = int(os.getenv("EVENTS_DEFAULT_TTL_SECONDS", "60"))
     PUBLISH_TOKEN = read_secret("EVENTS_PUBLISH_TOKEN")
     REQUIRE_PUBLISH_TOKEN = os.getenv("EVENTS_REQUIRE_PUBLISH_TOKEN", "true").lower() != "false"
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Optional
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+# KEYS[1] = ZSET de conexiones del usuario (member = client_id, score = vencimiento en ms)
+# ARGV = client_id, ttl_ms, max_connections
+# Reaper + admision en una sola operacion atomica: O(log n) sobre las conexiones del usuario
+ADMIT_CONNECTION_LUA = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local ttl_ms = tonumber(ARGV[2])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now_ms)
+local existed = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not existed and redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+
+redis.call('ZADD', KEYS[1], now_ms + ttl_ms, ARGV[1])
+redis.call('PEXPIRE', KEYS[1], ttl_ms)
+return 1
+"""
+
+# KEYS = ZSETs de usuarios con conexiones en este proceso
+# ARGV = ttl_ms, luego por cada KEY: cantidad de miembros seguida de los client_id
+REFRESH_CONNECTIONS_LUA = """
+local now = redis.call('TIME')
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local ttl_ms = tonumber(ARGV[1])
+local index = 2
+
+for _, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now_ms)
+    local members = tonumber(ARGV[index])
+    for offset = 1, members do
+        redis.call('ZADD', key, now_ms + ttl_ms, ARGV[index + offset])
+    end
+    redis.call('PEXPIRE', key, ttl_ms)
+    index = index + members + 1
+end
+return #KEYS
+"""
+
+
+class ConnectionRegistry:
+    """
+    Cupos de conexiones SSE por usuario en un ZSET por usuario.
+
+    El alta y la baja tocan solo el ZSET del usuario; la renovacion de todas las
+    conexiones de este proceso sale en un solo script por tick.
+    """
+
+    def __init__(
+        self,
+        key_for_user: Callable[[int], str],
+        ttl_seconds: int,
+        max_per_user: int,
+        refresh_batch: int = 500,
+    ):
+        self.key_for_user = key_for_user
+        self.ttl_ms = max(1, ttl_seconds) * 1000
+        self.max_per_user = max_per_user
+        self.refresh_batch = refresh_batch
+        # Renovar con margen: tres ticks por TTL
+        self.refresh_seconds = max(1, ttl_seconds // 3)
+
+        self._redis: Optional[redis.Redis] = None
+        self._admit_script = None
+        self._refresh_script = None
+        self._task: Optional[asyncio.Task] = None
+        self._local: Dict[int, Dict[str, int]] = {}
+
+        self.admitted = 0
+        self.rejected = 0
+        self.refreshes = 0
+
+    def start(self, redis_client: redis.Redis) -> None:
+        self._redis = redis_client
+        self._admit_script = redis_client.register_script(ADMIT_CONNECTION_LUA)
+        self._refresh_script = redis_client.register_script(REFRESH_CONNECTIONS_LUA)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def admit(self, user_id: int, client_id: str) -> bool:
+        allowed = await self._admit_script(
+            keys=[self.key_for_user(user_id)],
+            args=[client_id, self.ttl_ms, self.max_per_user],
+        )
+        if not int(allowed):
+            self.rejected += 1
+            return False
+
+        # Una misma pestaña puede reconectar antes de que se libere la anterior
+        clients = self._local.setdefault(int(user_id), {})
+        clients[client_id] = clients.get(client_id, 0) + 1
+        self.admitted += 1
+        return True
+
+    async def release(self, user_id: int, client_id: str) -> None:
+        clients = self._local.get(int(user_id), {})
+        remaining = clients.get(client_id, 0) - 1
+        if remaining > 0:
+            clients[client_id] = remaining
+            return
+
+        clients.pop(client_id, None)
+        if not clients:
+            self._local.pop(int(user_id), None)
+        await self._redis.zrem(self.key_for_user(user_id), client_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("No se pudieron renovar las conexiones SSE: %s", exc)
+
+    async def refresh(self) -> None:
+        entries = [
+            (user_id, list(clients))
+            for user_id, clients in self._local.items()
+            if clients
+        ]
+        for start in range(0, len(entries), self.refresh_batch):
+            await self._refresh_chunk(entries[start:start + self.refresh_batch])
+        self.refreshes += 1
+
+    async def _refresh_chunk(self, entries: list) -> None:
+        if not entries:
+            return
+        keys = []
+        args: list = [self.ttl_ms]
+        for user_id, client_ids in entries:
+            keys.append(self.key_for_user(user_id))
+            args.append(len(client_ids))
+            args.extend(client_ids)
+        await self._refresh_script(keys=keys, args=args)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._local),
+            "connections": sum(len(clients) for clients in self._local.values()),
+            "max_per_user": self.max_per_user,
+            "refresh_seconds": self.refresh_seconds,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "refreshes": self.refreshes,
+        }
@@ -6,6 +6,11 @@ EVENT_CATALOG = {
         "default_ttl_seconds": 60,
         "coalesce_window_ms": 0,
     },
+    "system.v1.replay_gap": {
+        "description": "Replay incompleto al reconectar: el frontend debe resincronizar su estado.",
+        "default_ttl_seconds": 60,
+        "coalesce_window_ms": 0,
+    },
     "notification.v1.toast": {
         "description": "Muestra un toast al usuario.",
         "default_ttl_seconds": 60,
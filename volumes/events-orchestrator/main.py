@@ -1,19 +1,25 @@
 import asyncio
+import base64
 import hashlib
 import json
 import re
+import time
 from datetime import datetime, timezone
-from typing import AsyncGenerator, Dict, List, Optional
+from typing import AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
 
-import httpx
 import redis.asyncio as redis
 from fastapi import FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.types import Receive, Scope, Send
 
+from auth_client import BackendAuthClient
 from config import settings
 from event_catalog import EVENT_SCHEMA, get_event_defaults, is_known_event_type, requires_dedupe_key
-from schemas import AuthenticatedUser, EventEnvelope, PublishEventRequest
+from schemas import AuthenticatedUser, EventEnvelope, PublishEventBatchRequest, PublishEventRequest
+from connection_registry import ConnectionRegistry
+from stream_hub import StreamHub
 
 app = FastAPI(title="GestionCom Events Orchestrator", version="1.0.0")
 
@@ -28,17 +34,45 @@ app.add_middleware(
 )
 
 redis_client: Optional[redis.Redis] = None
+auth_client = BackendAuthClient(
+    settings.BACKEND_API_URL,
+    cache_ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+    cache_max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    max_connections=settings.AUTH_HTTP_MAX_CONNECTIONS,
+)
+stream_hub: Optional[StreamHub] = None
+connection_registry: Optional[ConnectionRegistry] = None
 
 
 @app.on_event("startup")
 async def startup_event():
-    global redis_client
+    global redis_client, stream_hub, connection_registry
     redis_client = redis.from_url(settings.redis_url, decode_responses=True)
     await redis_client.ping()
+    auth_client.start()
+    stream_hub = StreamHub(
+        prepare_stream_message,
+        block_ms=settings.HUB_READ_BLOCK_MS,
+        read_count=settings.HUB_READ_COUNT,
+        client_buffer=settings.CLIENT_BUFFER_SIZE,
+        slow_consumer_policy=settings.SLOW_CONSUMER_POLICY,
+    )
+    stream_hub.start(redis_client)
+    connection_registry = ConnectionRegistry(
+        connection_key,
+        ttl_seconds=settings.CONNECTION_TTL_SECONDS,
+        max_per_user=settings.MAX_CONNECTIONS_PER_USER,
+    )
+    connection_registry.start(redis_client)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if stream_hub:
+        await stream_hub.stop()
+    if connection_registry:
+        await connection_registry.stop()
+    await auth_client.close()
     if redis_client:
         await redis_client.aclose()
 
@@ -97,6 +131,24 @@ def is_event_expired(event: dict) -> bool:
     return age_seconds > ttl_seconds
 
 
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que ejecuta on_close al terminar el envio pase lo que pase:
+    desconexion antes del primer chunk, cancelacion o error. El finally del generador
+    no basta, porque un generador que nunca arranco no lo ejecuta.
+    """
+
+    def __init__(self, content: AsyncGenerator[str, None], on_close: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.on_close()
+
+
 def sse_message(event_id: Optional[str], event: str, data: dict) -> str:
     lines = []
     if event_id:
@@ -109,14 +161,117 @@ def sse_message(event_id: Optional[str], event: str, data: dict) -> str:
     return "\n".join(lines) + "\n"
 
 
+STREAM_ID_PATTERN = re.compile(r"\d{1,20}-\d{1,20}")
+
+
+def parse_stream_id(stream_id: str) -> Tuple[int, int]:
+    milliseconds, sequence = stream_id.split("-", 1)
+    return int(milliseconds), int(sequence)
+
+
+def encode_event_cursor(cursor: Dict[str, str]) -> str:
+    """
+    Id SSE = offsets de todos los streams de la conexion, para que el navegador
+    reanude cada uno donde quedo al reconectar con Last-Event-ID.
+    """
+    prefix_length = len(settings.STREAM_PREFIX) + 1
+    compact = {stream_name[prefix_length:]: stream_id for stream_name, stream_id in cursor.items() if stream_id}
+    raw = json.dumps(compact, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_event_cursor(value: Optional[str], stream_names: List[str]) -> Dict[str, str]:
+    """Offsets validos de Last-Event-ID, solo para streams que la conexion sigue escuchando"""
+    if not value or len(value) > 4096:
+        return {}
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        compact = json.loads(raw)
+    except (ValueError, json.JSONDecodeError):
+        return {}
+    if not isinstance(compact, dict):
+        return {}
+
+    allowed = set(stream_names)
+    cursor = {}
+    for suffix, stream_id in compact.items():
+        stream_name = f"{settings.STREAM_PREFIX}:{suffix}"
+        if stream_name in allowed and isinstance(stream_id, str) and STREAM_ID_PATTERN.fullmatch(stream_id):
+            cursor[stream_name] = stream_id
+    return cursor
+
+
+async def load_stream_baselines(stream_names: List[str]) -> Dict[str, str]:
+    """Ultimo id de cada stream (0-0 si no existe) en un solo round-trip"""
+    pipe = redis_client.pipeline(transaction=False)
+    for stream_name in stream_names:
+        pipe.xrevrange(stream_name, count=1)
+    results = await pipe.execute()
+    return {
+        stream_name: entries[0][0] if entries else "0-0"
+        for stream_name, entries in zip(stream_names, results)
+    }
+
+
+async def read_missed_events(cursor: Dict[str, str]) -> Tuple[List[Tuple[str, str, str]], List[str]]:
+    """
+    Eventos posteriores a cada offset hasta el final actual del stream: como maximo los
+    REPLAY_MAX_EVENTS_PER_STREAM mas recientes y no mas antiguos que REPLAY_WINDOW_SECONDS,
+    para que una ola de reconexiones no relea streams enteros.
+
+    Devuelve tambien los streams donde alguno de esos topes dejo eventos sin entregar.
+    """
+    window_ms = int(time.time() * 1000) - settings.REPLAY_WINDOW_SECONDS * 1000
+    limit = settings.REPLAY_MAX_EVENTS_PER_STREAM
+    stream_names = list(cursor)
+    outside_window = [
+        stream_name for stream_name in stream_names
+        if parse_stream_id(cursor[stream_name]) < (window_ms, 0)
+    ]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for stream_name in stream_names:
+        start = max(parse_stream_id(cursor[stream_name]), (window_ms, 0))
+        # Uno de mas para saber si el tope corta el replay
+        pipe.xrevrange(stream_name, min=f"({start[0]}-{start[1]}", count=limit + 1)
+    for stream_name in outside_window:
+        pipe.xrange(stream_name, min=f"({cursor[stream_name]}", max=f"({window_ms}-0", count=1)
+    results = await pipe.execute()
+
+    missed = []
+    gaps = set()
+    for stream_name, messages in zip(stream_names, results):
+        if len(messages) > limit:
+            gaps.add(stream_name)
+        for stream_id, values in reversed(messages[:limit]):
+            message = prepare_stream_message(stream_name, stream_id, values)
+            if message is not None:
+                missed.append((stream_name, stream_id, message))
+    for stream_name, messages in zip(outside_window, results[len(stream_names):]):
+        if messages:
+            gaps.add(stream_name)
+    # Orden global aproximado por tiempo de publicacion
+    missed.sort(key=lambda item: parse_stream_id(item[1]))
+    return missed, sorted(gaps)
+
+
+def prepare_stream_message(stream_name: str, stream_id: str, values: dict) -> Optional[str]:
+    try:
+        event = json.loads(values.get("event") or "{}")
+    except json.JSONDecodeError:
+        return None
+
+    if is_event_expired(event):
+        return None
+
+    event["stream_name"] = stream_name
+    event["stream_id"] = stream_id
+    # Sin linea id: cada conexion antepone su propio cursor
+    return sse_message(None, SSE_EVENT_NAME, event)
+
+
 async def validate_token(token: str) -> AuthenticatedUser:
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        result = await client.post(
-            f"{settings.BACKEND_API_URL.rstrip('/')}/auth/validate-token",
-            json={"token": token},
-        )
-        result.raise_for_status()
-        payload = result.json().get("data") or {}
+    payload = await auth_client.validate("/auth/validate-token", token)
 
     if not payload.get("valid"):
         raise HTTPException(status_code=401, detail="Token invalido")
@@ -134,13 +289,7 @@ async def validate_token(token: str) -> AuthenticatedUser:
 
 
 async def validate_sse_ticket(ticket: str) -> AuthenticatedUser:
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        result = await client.post(
-            f"{settings.BACKEND_API_URL.rstrip('/')}/auth/validate-sse-ticket",
-            json={"token": ticket},
-        )
-        result.raise_for_status()
-        payload = result.json().get("data") or {}
+    payload = await auth_client.validate("/auth/validate-sse-ticket", ticket)
 
     if not payload.get("valid"):
         raise HTTPException(status_code=401, detail="Ticket SSE invalido")
@@ -191,10 +340,6 @@ def connection_key(user_id: int) -> str:
     return f"{settings.STREAM_PREFIX}:connections:user:{int(user_id)}"
 
 
-def connection_client_prefix(user_id: int) -> str:
-    return f"{connection_key(user_id)}:clients"
-
-
 def normalize_client_id(client_id: Optional[str], token: str) -> str:
     raw_client_id = (client_id or "").strip()
     if raw_client_id and re.fullmatch(r"[A-Za-z0-9_.:-]{1,96}", raw_client_id):
@@ -204,59 +349,28 @@ def normalize_client_id(client_id: Optional[str], token: str) -> str:
     return f"token:{fingerprint}"
 
 
-def connection_client_key(user_id: int, client_id: str) -> str:
-    return f"{connection_client_prefix(user_id)}:{client_id}"
-
-
-async def count_user_connections(user_id: int) -> int:
-    count = 0
-    async for _ in redis_client.scan_iter(match=f"{connection_client_prefix(user_id)}:*", count=50):
-        count += 1
-    return count
-
-
-async def register_connection(user_id: int, client_id: str) -> bool:
-    key = connection_client_key(user_id, client_id)
-    existed = bool(await redis_client.exists(key))
-    await redis_client.set(
-        key,
-        datetime.now(timezone.utc).isoformat(),
-        ex=settings.CONNECTION_TTL_SECONDS,
-    )
-
-    current_count = await count_user_connections(user_id)
-    if current_count <= settings.MAX_CONNECTIONS_PER_USER or existed:
-        return True
-
-    await redis_client.delete(key)
-    return False
-
-
-async def refresh_connection(user_id: int, client_id: str):
-    await redis_client.expire(connection_client_key(user_id, client_id), settings.CONNECTION_TTL_SECONDS)
-
-
-async def release_connection(user_id: int, client_id: str):
-    await redis_client.delete(connection_client_key(user_id, client_id))
-
-
 @app.get("/health")
 async def health():
     await redis_client.ping()
-    return response({"service": settings.SERVICE_NAME, "stream_prefix": settings.STREAM_PREFIX})
+    return response({
+        "service": settings.SERVICE_NAME,
+        "stream_prefix": settings.STREAM_PREFIX,
+        "hub": stream_hub.stats() if stream_hub else None,
+        "connections": connection_registry.stats() if connection_registry else None,
+        "auth": auth_client.stats(),
+    })
 
 
-@app.post("/events/publish")
-async def publish_event(
-    event_request: PublishEventRequest,
-    x_events_token: Optional[str] = Header(default=None),
-):
+def require_publish_token(x_events_token: Optional[str]) -> None:
     if settings.REQUIRE_PUBLISH_TOKEN and not settings.PUBLISH_TOKEN:
         raise HTTPException(status_code=503, detail="Token interno de publicacion no configurado")
 
     if settings.PUBLISH_TOKEN and x_events_token != settings.PUBLISH_TOKEN:
         raise HTTPException(status_code=403, detail="Token interno invalido")
 
+
+def prepare_publish(event_request: PublishEventRequest) -> dict:
+    """Valida el evento y arma el sobre; no toca Redis"""
     if not is_known_event_type(event_request.type):
         raise HTTPException(status_code=400, detail="Tipo de evento no catalogado")
 
@@ -292,32 +406,128 @@ async def publish_event(
     if len(event_json.encode("utf-8")) > settings.MAX_PAYLOAD_BYTES:
         raise HTTPException(status_code=413, detail="Payload de evento demasiado grande")
 
-    stream_names = stream_names_for_event(data)
+    dedupe_key = None
     dedupe_key_value = effective_dedupe_key(event_request)
-
     if dedupe_key_value and coalesce_window_ms > 0:
         dedupe_key = (
             f"{settings.STREAM_PREFIX}:dedupe:{event_request.type}:"
             f"{target_fingerprint(data.get('target') or {})}:{dedupe_key_value}"
         )
-        was_set = await redis_client.set(dedupe_key, "1", nx=True, px=coalesce_window_ms)
-        if not was_set:
-            return response(
-                {"coalesced": True, "streams": stream_names, "event": data},
-                "Evento coalescido",
+
+    return {
+        "data": data,
+        "event_json": event_json,
+        "stream_names": stream_names_for_event(data),
+        "dedupe_key": dedupe_key,
+        "coalesce_window_ms": coalesce_window_ms,
+        "coalesced": False,
+        "published": {},
+    }
+
+
+async def publish_prepared(prepared: List[dict]) -> None:
+    """
+    Publica en dos viajes a Redis para todo el lote: los SET NX de coalescencia
+    y luego todos los XADD seguidos de un EXPIRE por stream distinto.
+    """
+    deduped = [item for item in prepared if item["dedupe_key"]]
+    if deduped:
+        pipe = redis_client.pipeline(transaction=False)
+        for item in deduped:
+            pipe.set(item["dedupe_key"], "1", nx=True, px=item["coalesce_window_ms"])
+        for item, was_set in zip(deduped, await pipe.execute()):
+            item["coalesced"] = not was_set
+
+    pending = [item for item in prepared if not item["coalesced"]]
+    if not pending:
+        return
+
+    pipe = redis_client.pipeline(transaction=False)
+    touched_streams: Dict[str, None] = {}
+    for item in pending:
+        for stream_name in item["stream_names"]:
+            pipe.xadd(
+                stream_name,
+                {"event": item["event_json"]},
+                maxlen=settings.STREAM_MAXLEN,
+                approximate=True,
             )
+            touched_streams[stream_name] = None
+    for stream_name in touched_streams:
+        pipe.expire(stream_name, settings.STREAM_IDLE_TTL_SECONDS)
 
-    published = {}
-    for stream_name in stream_names:
-        published[stream_name] = await redis_client.xadd(
-            stream_name,
-            {"event": event_json},
-            maxlen=settings.STREAM_MAXLEN,
-            approximate=True,
+    stream_ids = iter(await pipe.execute())
+    for item in pending:
+        item["published"] = {stream_name: next(stream_ids) for stream_name in item["stream_names"]}
+
+
+@app.post("/events/publish")
+async def publish_event(
+    event_request: PublishEventRequest,
+    x_events_token: Optional[str] = Header(default=None),
+):
+    require_publish_token(x_events_token)
+
+    prepared = prepare_publish(event_request)
+    await publish_prepared([prepared])
+
+    if prepared["coalesced"]:
+        return response(
+            {"coalesced": True, "streams": prepared["stream_names"], "event": prepared["data"]},
+            "Evento coalescido",
         )
-        await redis_client.expire(stream_name, settings.STREAM_IDLE_TTL_SECONDS)
+    return response({"streams": prepared["published"], "event": prepared["data"]}, "Evento publicado")
+
+
+@app.post("/events/publish/batch")
+async def publish_event_batch(
+    batch_request: PublishEventBatchRequest,
+    x_events_token: Optional[str] = Header(default=None),
+):
+    require_publish_token(x_events_token)
+
+    if len(batch_request.events) > settings.MAX_EVENTS_PER_BATCH:
+        raise HTTPException(status_code=413, detail="Demasiados eventos en el lote")
 
-    return response({"streams": published, "event": data}, "Evento publicado")
+    # Un evento invalido se informa en su posicion sin rechazar el resto del lote
+    results: List[dict] = []
+    prepared: List[dict] = []
+    for index, raw_event in enumerate(batch_request.events):
+        try:
+            item = prepare_publish(PublishEventRequest.model_validate(raw_event))
+        except ValidationError as error:
+            results.append({
+                "index": index,
+                "status_code": 422,
+                "error": [
+                    {"loc": list(detail["loc"]), "msg": detail["msg"], "type": detail["type"]}
+                    for detail in error.errors(include_url=False)
+                ],
+            })
+            continue
+        except HTTPException as error:
+            results.append({"index": index, "status_code": error.status_code, "error": error.detail})
+            continue
+        item["index"] = index
+        prepared.append(item)
+
+    await publish_prepared(prepared)
+
+    for item in prepared:
+        result = {"index": item["index"], "event_id": item["data"]["id"]}
+        if item["coalesced"]:
+            result["coalesced"] = True
+        else:
+            result["streams"] = item["published"]
+        results.append(result)
+    results.sort(key=lambda result: result["index"])
+
+    return response({
+        "results": results,
+        "published": sum(1 for item in prepared if not item["coalesced"]),
+        "coalesced": sum(1 for item in prepared if item["coalesced"]),
+        "rejected": len(batch_request.events) - len(prepared),
+    }, "Lote de eventos procesado")
 
 
 @app.get("/events/stream")
@@ -343,71 +553,98 @@ async def stream_events(
     if len(stream_names) > settings.MAX_STREAMS_PER_CONNECTION:
         raise HTTPException(status_code=413, detail="Demasiados streams para la conexion SSE")
 
-    if not await register_connection(user.user_id, connection_id):
-        raise HTTPException(status_code=429, detail="Demasiadas conexiones SSE para el usuario")
-
-    # last_event_id se acepta por compatibilidad HTTP/SSE, pero este canal es best-effort:
-    # no se reenvian eventos emitidos mientras el usuario estaba desconectado.
-    start_offsets = {stream_name: "$" for stream_name in stream_names}
+    resume_cursor = decode_event_cursor(last_event_id_header or last_event_id, stream_names)
 
     async def generator() -> AsyncGenerator[str, None]:
+        subscription = None
         try:
-            stream_offsets = dict(start_offsets)
-            heartbeat_due = asyncio.get_event_loop().time() + settings.HEARTBEAT_SECONDS
+            # Ultimo id de cada stream antes de suscribirse: desde ahi lee el hub y hasta
+            # el final actual llega el replay, asi no queda hueco entre ambos
+            baselines = await load_stream_baselines(stream_names)
+            cursor = {**baselines, **resume_cursor}
+            subscription = await stream_hub.subscribe(stream_names, offsets=baselines)
+
+            loop = asyncio.get_event_loop()
+            heartbeat_due = loop.time() + settings.HEARTBEAT_SECONDS
+
+            missed, gaps = await read_missed_events(cursor)
 
             yield sse_message(
-                None,
+                encode_event_cursor(cursor),
                 SSE_EVENT_NAME,
                 {
                     "schema": EVENT_SCHEMA,
                     "type": "system.v1.ping",
-                    "payload": {"connected": True},
+                    "payload": {"connected": True, "replayed": len(missed)},
                 },
             )
 
-            while not await request.is_disconnected():
-                await refresh_connection(user.user_id, connection_id)
-                timeout_ms = settings.READ_BLOCK_MS
-                result = await redis_client.xread(
-                    stream_offsets,
-                    count=50,
-                    block=timeout_ms,
+            for stream_name, stream_id, message in missed:
+                cursor[stream_name] = stream_id
+                yield f"id: {encode_event_cursor(cursor)}\n" + message
+
+            if gaps:
+                # Replay recortado: el cliente debe resincronizar en vez de asumir que lo vio todo
+                for stream_name in gaps:
+                    cursor[stream_name] = max(cursor[stream_name], baselines[stream_name], key=parse_stream_id)
+                yield sse_message(
+                    encode_event_cursor(cursor),
+                    SSE_EVENT_NAME,
+                    {
+                        "schema": EVENT_SCHEMA,
+                        "type": "system.v1.replay_gap",
+                        "payload": {"streams": gaps},
+                    },
                 )
 
-                if not result:
-                    now = asyncio.get_event_loop().time()
-                    if now >= heartbeat_due:
-                        heartbeat_due = now + settings.HEARTBEAT_SECONDS
-                        yield sse_message(
-                            None,
-                            SSE_EVENT_NAME,
-                            {
-                                "schema": EVENT_SCHEMA,
-                                "type": "system.v1.ping",
-                                "payload": {"ts": datetime.now(timezone.utc).isoformat()},
-                            },
-                        )
-                        continue
-
-                for stream_name, messages in result:
-                    for stream_id, values in messages:
-                        stream_offsets[stream_name] = stream_id
-                        try:
-                            event = json.loads(values.get("event") or "{}")
-                        except json.JSONDecodeError:
-                            continue
-
-                        if is_event_expired(event):
-                            continue
-
-                        event["stream_name"] = stream_name
-                        event["stream_id"] = stream_id
-                        yield sse_message(stream_id, SSE_EVENT_NAME, event)
+            while not await request.is_disconnected():
+                try:
+                    item = await asyncio.wait_for(
+                        subscription.queue.get(),
+                        timeout=max(0.0, heartbeat_due - loop.time()),
+                    )
+                except asyncio.TimeoutError:
+                    heartbeat_due = loop.time() + settings.HEARTBEAT_SECONDS
+                    yield sse_message(
+                        encode_event_cursor(cursor),
+                        SSE_EVENT_NAME,
+                        {
+                            "schema": EVENT_SCHEMA,
+                            "type": "system.v1.ping",
+                            "payload": {"ts": datetime.now(timezone.utc).isoformat()},
+                        },
+                    )
+                    continue
+
+                if item is None:
+                    # Expulsado por consumidor lento: el navegador reconecta con Last-Event-ID
+                    break
+
+                stream_name, stream_id, message = item
+                # Ya entregado por el replay
+                if parse_stream_id(stream_id) <= parse_stream_id(cursor[stream_name]):
+                    continue
+                cursor[stream_name] = stream_id
+                yield f"id: {encode_event_cursor(cursor)}\n" + message
+        finally:
+            if subscription is not None:
+                stream_hub.unsubscribe(subscription)
+
+    body = generator()
+
+    async def close_connection() -> None:
+        try:
+            await body.aclose()
         finally:
-            await release_connection(user.user_id, connection_id)
+            await connection_registry.release(user.user_id, connection_id)
+
+    # Nada entre el admit y la respuesta puede fallar: el cupo se libera en close_connection
+    if not await connection_registry.admit(user.user_id, connection_id):
+        raise HTTPException(status_code=429, detail="Demasiadas conexiones SSE para el usuario")
 
-    return StreamingResponse(
-        generator(),
+    return ClosingStreamingResponse(
+        body,
+        close_connection,
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache, no-transform",
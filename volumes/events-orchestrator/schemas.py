@@ -46,6 +46,11 @@ class PublishEventRequest(BaseModel):
     payload: Dict[str, Any] = Field(default_factory=dict)
 
 
+class PublishEventBatchRequest(BaseModel):
+    # Sin validar: cada evento se valida por separado para no rechazar el lote entero
+    events: List[Any] = Field(default_factory=list)
+
+
 class AuthenticatedUser(BaseModel):
     user_id: int
     username: Optional[str] = None
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+SLOW_CONSUMER_DISCONNECT = "disconnect"
+SLOW_CONSUMER_DROP_OLDEST = "drop_oldest"
+
+# (stream_name, stream_id, values) -> mensaje SSE ya serializado, o None para descartarlo
+PrepareMessage = Callable[[str, str, Dict[str, Any]], Optional[str]]
+
+
+@dataclass(eq=False)
+class Subscription:
+    """Cola acotada de una conexion SSE. Un None en la cola indica que el hub la expulso."""
+
+    stream_names: List[str]
+    queue: asyncio.Queue
+    closed: bool = False
+    dropped: int = 0
+
+
+class StreamHub:
+    """
+    Un solo lector por proceso: un XREAD sobre todos los streams con suscriptores
+    y reparto en memoria a las colas de cada conexion.
+
+    El costo en Redis depende de los streams activos, no de las conexiones.
+    """
+
+    def __init__(
+        self,
+        prepare_message: PrepareMessage,
+        block_ms: int,
+        read_count: int,
+        client_buffer: int,
+        slow_consumer_policy: str,
+    ):
+        self.prepare_message = prepare_message
+        self.block_ms = block_ms
+        self.read_count = read_count
+        self.client_buffer = max(1, client_buffer)
+        self.slow_consumer_policy = slow_consumer_policy
+
+        self._redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+        self._offsets: Dict[str, str] = {}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._wake = asyncio.Event()
+
+        self.reads = 0
+        self.delivered = 0
+        self.slow_consumers = 0
+        self.dropped_messages = 0
+
+    def start(self, redis_client: redis.Redis) -> None:
+        self._redis = redis_client
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                if not subscription.closed:
+                    subscription.closed = True
+                    while not subscription.queue.empty():
+                        subscription.queue.get_nowait()
+                    subscription.queue.put_nowait(None)
+        self._subscribers.clear()
+        self._offsets.clear()
+
+    async def subscribe(self, stream_names: List[str], offsets: Optional[Dict[str, str]] = None) -> Subscription:
+        """
+        offsets = ultimo id de cada stream leido por el llamador antes de suscribirse.
+        Un stream nuevo para el hub arranca desde ahi: lo publicado mientras el XREAD en
+        curso sigue bloqueado sin ese stream se lee en la siguiente vuelta, no se salta.
+        """
+        offsets = dict(offsets or {})
+        missing = [
+            stream_name for stream_name in stream_names
+            if stream_name not in self._offsets and stream_name not in offsets
+        ]
+        if missing:
+            offsets.update(await self._latest_offsets(missing))
+
+        subscription = Subscription(stream_names=list(stream_names), queue=asyncio.Queue(maxsize=self.client_buffer))
+        for stream_name in subscription.stream_names:
+            self._subscribers.setdefault(stream_name, set()).add(subscription)
+            if stream_name not in self._offsets:
+                self._offsets[stream_name] = offsets[stream_name]
+        self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for stream_name in subscription.stream_names:
+            subscribers = self._subscribers.get(stream_name)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[stream_name]
+                self._offsets.pop(stream_name, None)
+
+    async def _latest_offsets(self, stream_names: List[str]) -> Dict[str, str]:
+        """Ultimo id de cada stream (0-0 si no existe) en un solo round-trip"""
+        pipe = self._redis.pipeline(transaction=False)
+        for stream_name in stream_names:
+            pipe.xrevrange(stream_name, count=1)
+        results = await pipe.execute()
+        return {
+            stream_name: entries[0][0] if entries else "0-0"
+            for stream_name, entries in zip(stream_names, results)
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if not self._offsets:
+                    self._wake.clear()
+                    await self._wake.wait()
+                    continue
+
+                self.reads += 1
+                result = await self._redis.xread(
+                    dict(self._offsets),
+                    count=self.read_count,
+                    block=self.block_ms,
+                )
+                for stream_name, messages in result or []:
+                    self._dispatch(stream_name, messages)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Lector del hub de eventos fallo: %s", exc)
+                await asyncio.sleep(1)
+
+    def _dispatch(self, stream_name: str, messages: List[Any]) -> None:
+        subscribers = self._subscribers.get(stream_name)
+        for stream_id, values in messages:
+            if stream_name in self._offsets:
+                self._offsets[stream_name] = stream_id
+            if not subscribers:
+                continue
+
+            # Se serializa una vez por mensaje, no una por conexion
+            message = self.prepare_message(stream_name, stream_id, values)
+            if message is None:
+                continue
+
+            for subscription in list(subscribers):
+                self._deliver(subscription, stream_name, stream_id, message)
+
+    def _deliver(self, subscription: Subscription, stream_name: str, stream_id: str, message: str) -> None:
+        if subscription.closed:
+            return
+        try:
+            subscription.queue.put_nowait((stream_name, stream_id, message))
+            self.delivered += 1
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.slow_consumer_policy == SLOW_CONSUMER_DROP_OLDEST:
+            subscription.queue.get_nowait()
+            subscription.queue.put_nowait((stream_name, stream_id, message))
+            subscription.dropped += 1
+            self.dropped_messages += 1
+            return
+
+        # Consumidor lento: se cierra y el navegador reconecta
+        subscription.closed = True
+        self.slow_consumers += 1
+        self.unsubscribe(subscription)
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "streams": len(self._offsets),
+            "subscriptions": len({sub for subs in self._subscribers.values() for sub in subs}),
+            "reads": self.reads,
+            "delivered": self.delivered,
+            "slow_consumers": self.slow_consumers,
+            "dropped_messages": self.dropped_messages,
+            "running": self._task is not None and not self._task.done(),
+        }
@@ -124,6 +124,7 @@ class SseCoordinator {
     this.reconnectAttempt = 0;
     this.reconnectTimer = null;
     this.openingStream = false;
+    this.lastEventId = null;
     this.handleBroadcast = this.handleBroadcast.bind(this);
     this.handleStorage = this.handleStorage.bind(this);
     this.releaseOwner = this.releaseOwner.bind(this);
@@ -170,6 +171,7 @@ class SseCoordinator {
 
   stop() {
     this.started = false;
+    this.lastEventId = null;
     this.closeStream();
     this.clearReconnectTimer();
     this.stopOwnerHeartbeat();
@@ -301,6 +303,8 @@ class SseCoordinator {
     const url = new URL(`${resolveEventsUrl().replace(/\/$/, '')}/events/stream`, window.location.origin);
     url.searchParams.set('ticket', ticket);
     url.searchParams.set('client_id', clientId);
+    // Al reconectar, el orquestador reenvia lo publicado despues de este cursor
+    if (this.lastEventId) url.searchParams.set('last_event_id', this.lastEventId);
 
     this.eventSource = new EventSource(url.toString());
 
@@ -320,6 +324,7 @@ class SseCoordinator {
 
   handleSseMessage(message) {
     const eventId = message.lastEventId;
+    if (eventId) this.lastEventId = eventId;
 
     let envelope = null;
     try {
@@ -350,7 +355,10 @@ class SseCoordinator {
     const dedupeKey = event?.stream_name && event?.stream_id
       ? `${event.stream_name}:${event.stream_id}`
       : event?.sse_id;
-    if (!event || isDuplicate(dedupeKey)) return;
+    if (!event) return;
+    // Si esta pestaña pasa a ser la dueña, reanuda desde el ultimo cursor visto
+    if (event.sse_id) this.lastEventId = event.sse_id;
+    if (isDuplicate(dedupeKey)) return;
     this.processEvent(event);
   }
 
@@ -368,7 +376,9 @@ class SseCoordinator {
     const dedupeKey = event?.stream_name && event?.stream_id
       ? `${event.stream_name}:${event.stream_id}`
       : event?.sse_id;
-    if (!event || isDuplicate(dedupeKey)) return;
+    if (!event) return;
+    if (event.sse_id) this.lastEventId = event.sse_id;
+    if (isDuplicate(dedupeKey)) return;
 
     this.processEvent(event);
   }
@@ -378,6 +388,14 @@ class SseCoordinator {
 
     if (event.type === 'system.v1.ping') return;
 
+    if (event.type === 'system.v1.replay_gap') {
+      // Eventos perdidos al reconectar: se recarga el estado en vez de confiar en el replay
+      this.callbacks.refreshPermissions?.();
+      this.callbacks.refreshMenu?.();
+      this.callbacks.refreshProfile?.();
+      return;
+    }
+
     if (event.type === 'notification.v1.toast') {
       this.showToast(payload);
       return;